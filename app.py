@@ -1,17 +1,52 @@
 import streamlit as st
-import pandas as pd
 import os
 from pathlib import Path
 import re
 import streamlit.components.v1 as components  # Para embeber las presentaciones HTML
 import datetime as dt
-import csv
 import textwrap
-import requests  # <-- NEW: para llamar a la API de ElevenLabs
 import base64
+import csv
 import json
+import shutil
+import tempfile
+import threading
+import time
+from contextlib import nullcontext
 from typing import Optional
 from helpers.pexels_client import fetch_pexels_image
+from helpers.response_store import get_response_queue
+from helpers.draft_store import get_draft_store
+from helpers.srs import AGAIN, EASY, GOOD, HARD, get_srs_store
+from helpers.progress import get_progress_store
+from helpers.gradebook import get_gradebook
+from helpers.exams import ExamSet, Question, get_exam_engine
+from helpers.rubrics import compile_rubrics, rescore_responses
+from helpers.response_export import EXPORT_FORMATS, EXPORT_MIME_TYPES, export_responses_to_file
+from helpers.response_search import get_search_index
+from helpers.content_search import MAX_PREFIX_EXPANSIONS, build_index, flatten_text, tokenize
+from helpers.response_archive import archive_summary, archive_terms, compact_responses, term_start
+from helpers.shared_cache import cache_get, cache_key, cache_set, configure_shared_cache, get_shared_cache
+from helpers.tracing import configure_tracing, set_trace_context, span, traced
+from helpers.tts_segments import SegmentCache, fetch_segments, segment_key, split_script, stitch_mp3
+from helpers.tts_dialogue import assign_voices, parse_dialogue, speakers_of
+from helpers.tts_preview import start_preview_relay
+from helpers.lesson_packs import PackCache, PackEntry, prepare_pack, start_pack_server
+from helpers.tts_backends import ElevenLabsBackend, LocalBackend, get_tts_backend, register_tts_backend, tts_backends
+from helpers.tts_limiter import QuotaExceeded, RetryAfter, get_tts_limiter
+from helpers.rerun_profiler import configure_rerun_profiler, list_slow_reruns
+from helpers.metrics import (
+    CACHE_LOOKUPS,
+    CACHE_MISSES,
+    RERUN_SECONDS,
+    RERUNS_FAILED,
+    RESPONSE_SAVE_SECONDS,
+    RESPONSE_SAVES,
+    SESSIONS,
+    start_metrics_server,
+    watch_shared_cache,
+)
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 
 # ==========================
 # BASIC CONFIG
@@ -26,12 +61,66 @@ st.set_page_config(
 BASE_DIR = Path(__file__).parent if "__file__" in globals() else Path(os.getcwd())
 AUDIO_DIR = BASE_DIR / "audio"
 STATIC_DIR = BASE_DIR / "static"  # aquí irán las presentaciones HTML
-RESPONSES_DIR = BASE_DIR / "responses"
-RESPONSES_DIR.mkdir(exist_ok=True)
+RESPONSES_DIR = Path(os.getenv("RESPONSES_DIR", BASE_DIR / "responses"))
+RESPONSES_DIR.mkdir(parents=True, exist_ok=True)
 RESPONSES_FILE = RESPONSES_DIR / "unit2_responses.csv"
+EXPORTS_DIR = RESPONSES_DIR / "exports"
+# Respuestas de trimestres cerrados (Parquet particionado por term/unit)
+ARCHIVE_DIR = RESPONSES_DIR / "archive"
+SEARCH_INDEX_FILE = RESPONSES_DIR / "search.sqlite3"
+# Group-commit del CSV: un solo fsync por lote de respuestas
+RESPONSE_FLUSH_MS = int(os.getenv("RESPONSE_FLUSH_MS", "2"))
+RESPONSE_FLUSH_ROWS = int(os.getenv("RESPONSE_FLUSH_ROWS", "200"))
+RESPONSE_ACK_TIMEOUT = float(os.getenv("RESPONSE_ACK_TIMEOUT", "10"))
+# Borradores autoguardados (debounce por usuario + campo)
+DRAFTS_FILE = RESPONSES_DIR / "drafts.sqlite3"
+DRAFT_AUTOSAVE_SECONDS = float(os.getenv("DRAFT_AUTOSAVE_SECONDS", "3"))
+# Repaso de vocabulario (SM-2): estado por estudiante + palabra, escrito por lotes
+SRS_FILE = RESPONSES_DIR / "srs.sqlite3"
+SRS_FLUSH_SECONDS = float(os.getenv("SRS_FLUSH_SECONDS", "5"))
+# Progreso por estudiante: un bitset sobre el índice del currículo
+PROGRESS_FILE = RESPONSES_DIR / "progress.sqlite3"
+PROGRESS_FLUSH_SECONDS = float(os.getenv("PROGRESS_FLUSH_SECONDS", "3"))
+# Calificaciones: quizzes, respuestas guardadas y notas del profesor (ponderación de ASSESSMENT_WEIGHTS)
+GRADEBOOK_FILE = RESPONSES_DIR / "gradebook.sqlite3"
+# Exámenes cronometrados: la hora límite la fija el servidor; respuestas guardadas por lotes
+EXAMS_FILE = RESPONSES_DIR / "exams.sqlite3"
+EXAM_FLUSH_SECONDS = float(os.getenv("EXAM_FLUSH_SECONDS", "2"))
+EXAM_GRACE_SECONDS = float(os.getenv("EXAM_GRACE_SECONDS", "10"))
+# Cada cuánto la cuenta regresiva del navegador pulsa "Save answers" (0 = nunca)
+EXAM_AUTOSAVE_SECONDS = int(os.getenv("EXAM_AUTOSAVE_SECONDS", "60"))
+# Notas de primera pasada (rúbricas) de todas las respuestas guardadas; 0 = un proceso por CPU
+AUTO_MARKS_FILE = RESPONSES_DIR / "auto_marks.csv"
+RUBRIC_WORKERS = int(os.getenv("RUBRIC_WORKERS", "0"))
 # Carpeta para contenido dinámico (textos, scripts, etc.)
 CONTENT_DIR = BASE_DIR / "content"
 CONTENT_DIR.mkdir(exist_ok=True)
+# Caché compartida entre procesos/réplicas (Pexels, contenido, metadatos de TTS).
+# memory:// | sqlite:////ruta/compartida/cache.db | redis://host:6379/0
+SHARED_CACHE_URL = os.getenv("SHARED_CACHE_URL", f"sqlite:///{BASE_DIR / 'cache' / 'shared_cache.sqlite3'}")
+SHARED_CACHE_MAX_MB = int(os.getenv("SHARED_CACHE_MAX_MB", "64"))
+CONTENT_CACHE_TTL = int(os.getenv("CONTENT_CACHE_TTL", "600"))
+configure_shared_cache(SHARED_CACHE_URL, max_bytes=SHARED_CACHE_MAX_MB * 1024 * 1024)
+# Spans de tiempo (vacío = apagado): jsonl:///ruta/traces.jsonl | http://localhost:4318 (OTLP)
+TRACE_EXPORT = os.getenv("TRACE_EXPORT", "")
+configure_tracing(TRACE_EXPORT)
+# Endpoint Prometheus (GET /metrics) en un hilo del mismo proceso; vacío = apagado.
+# Con varios procesos en un host, cada uno necesita su propio puerto.
+METRICS_PORT = os.getenv("METRICS_PORT", "9108")
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+if METRICS_PORT:
+    start_metrics_server(int(METRICS_PORT), METRICS_HOST)
+    watch_shared_cache(get_shared_cache)
+# Perfil (cProfile + tracemalloc) de los reruns más lentos que el umbral; 0 = apagado.
+PROFILE_SLOW_RERUN_MS = float(os.getenv("PROFILE_SLOW_RERUN_MS", "0") or 0)
+PROFILE_DIR = Path(os.getenv("PROFILE_DIR", BASE_DIR / "profiles"))
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "1.0"))
+RERUN_PROFILER = configure_rerun_profiler(
+    PROFILE_SLOW_RERUN_MS,
+    PROFILE_DIR,
+    sample_rate=PROFILE_SAMPLE_RATE,
+    trace_memory=os.getenv("PROFILE_TRACEMALLOC", "1") == "1",
+)
 
 # Fallback visual (used when no hero image is available)
 _FLUNEX_GRADIENT_SVG = """
@@ -57,6 +146,41 @@ DEFAULT_ELEVEN_VOICE_ID = (
     or os.getenv("ELEVEN_VOICE_ID")
     or "RILOU7YmBhvwJGDGjNmP"
 )
+# Límite de llamadas TTS compartido por todas las sesiones del proceso y cuota
+# mensual de caracteres (0 = sin límite local; el uso se registra igual).
+TTS_REQUESTS_PER_MIN = float(os.getenv("TTS_REQUESTS_PER_MIN", "60"))
+TTS_MAX_CONCURRENT = int(os.getenv("TTS_MAX_CONCURRENT", "2"))
+TTS_MONTHLY_CHARS = int(os.getenv("TTS_MONTHLY_CHARS", "0"))
+TTS_QUOTA_FILE = Path(os.getenv("TTS_QUOTA_FILE", BASE_DIR / "cache" / "tts_quota.sqlite3"))
+# Narraciones largas: un mp3 por segmento (párrafo / grupo de oraciones) cacheado
+# por hash, así al editar una línea solo se vuelve a sintetizar ese segmento.
+TTS_SEGMENT_CHARS = int(os.getenv("TTS_SEGMENT_CHARS", "300"))
+TTS_SEGMENT_DIR = Path(os.getenv("TTS_SEGMENT_DIR", BASE_DIR / "cache" / "tts_segments"))
+# Diálogos: voces por defecto que se reparten entre los hablantes sin voz asignada
+# (separadas por coma) y silencio entre líneas.
+DIALOGUE_VOICES = [
+    v.strip()
+    for v in os.getenv("ELEVEN_DIALOGUE_VOICES", f"{DEFAULT_ELEVEN_VOICE_ID},pNInz6obpgDQGcFmaJgB").split(",")
+    if v.strip()
+]
+DIALOGUE_PAUSE_MS = int(os.getenv("DIALOGUE_PAUSE_MS", "600"))
+# Preview en streaming: relay HTTP propio (se levanta al primer preview). El
+# navegador del admin debe poder abrir TTS_PREVIEW_PUBLIC_URL (o un proxy hacia él).
+TTS_PREVIEW_PORT = int(os.getenv("TTS_PREVIEW_PORT", "8599"))
+TTS_PREVIEW_HOST = os.getenv("TTS_PREVIEW_HOST", "127.0.0.1")
+TTS_PREVIEW_PUBLIC_URL = os.getenv("TTS_PREVIEW_PUBLIC_URL", f"http://localhost:{TTS_PREVIEW_PORT}").rstrip("/")
+# Motor local para borradores (sin red ni cuota): espeak-ng o piper + ffmpeg.
+TTS_LOCAL_ENGINE = os.getenv("TTS_LOCAL_ENGINE", "espeak-ng")
+TTS_LOCAL_VOICE = os.getenv("TTS_LOCAL_VOICE", "")
+# Paquetes offline (.zip por clase o unidad): con LESSON_PACKS_PUBLIC_URL configurado
+# se sirven en streaming desde un relay HTTP propio (como el preview), que los
+# estudiantes deben poder abrir. Sin esa URL (o si el puerto no está disponible)
+# se usa st.download_button: un enlace a localhost apuntaría a la máquina del estudiante.
+LESSON_PACKS_PORT = int(os.getenv("LESSON_PACKS_PORT", "8600"))
+LESSON_PACKS_HOST = os.getenv("LESSON_PACKS_HOST", "127.0.0.1")
+LESSON_PACKS_PUBLIC_URL = os.getenv("LESSON_PACKS_PUBLIC_URL", "").rstrip("/")
+LESSON_PACKS_DIR = Path(os.getenv("LESSON_PACKS_DIR", BASE_DIR / "cache" / "packs"))
+LESSON_PACKS_MAX_MB = int(os.getenv("LESSON_PACKS_MAX_MB", "512"))
 
 # ==========================
 # ADMIN / AUTH CONFIG
@@ -153,14 +277,29 @@ def render_user_status_bar():
             st.caption("Ve a Access para registrarte o iniciar sesión.")
 
 
+def get_response_writer():
+    """Cola write-behind compartida para responses/unit2_responses.csv."""
+    writer = get_response_queue(
+        RESPONSES_FILE,
+        flush_interval_ms=RESPONSE_FLUSH_MS,
+        max_batch_rows=RESPONSE_FLUSH_ROWS,
+    )
+    # Cada lote confirmado se indexa para la búsqueda del Teacher Panel
+    # y cuenta como tarea entregada en el gradebook.
+    writer.add_listener(get_search_index(SEARCH_INDEX_FILE).add_rows)
+    writer.add_listener(get_course_gradebook().record_answers)
+    return writer
+
+
 def save_unit2_response(user_email, user_name, session, hour, exercise_id, text):
     """
     Guarda una respuesta de la Unidad 2 en responses/unit2_responses.csv
     session: 'S1' | 'S2' | 'S3'
     hour: 'H1' | 'H2'
     exercise_id: string corto tipo 'grammar', 'writing', etc.
+    La fila pasa por la cola write-behind y solo se confirma cuando el lote
+    que la contiene ya está en disco (fsync).
     """
-    RESPONSES_DIR.mkdir(exist_ok=True)
     row = {
         "timestamp": dt.datetime.now().isoformat(timespec="seconds"),
         "user_email": user_email or "",
@@ -171,16 +310,51 @@ def save_unit2_response(user_email, user_name, session, hour, exercise_id, text)
         "exercise_id": exercise_id,
         "response": (text or "").replace("\n", "\\n"),
     }
+    started = time.perf_counter()
     try:
-        file_exists = RESPONSES_FILE.exists()
-        with open(RESPONSES_FILE, "a", newline="", encoding="utf-8") as f:
-            writer = csv.DictWriter(f, fieldnames=row.keys())
-            if not file_exists:
-                writer.writeheader()
-            writer.writerow(row)
-        return True, "Answer saved."
+        ticket = get_response_writer().submit(row)
+        if ticket.wait(RESPONSE_ACK_TIMEOUT):
+            RESPONSE_SAVES.inc(status="ok")
+            return True, "Answer saved."
+        if ticket.error:
+            RESPONSE_SAVES.inc(status="error")
+            return False, f"Error saving answer: {ticket.error}"
+        RESPONSE_SAVES.inc(status="timeout")
+        return False, "Error saving answer: the server is busy, please try again."
     except Exception as e:
+        RESPONSE_SAVES.inc(status="error")
         return False, f"Error saving answer: {e}"
+    finally:
+        RESPONSE_SAVE_SECONDS.observe(time.perf_counter() - started)
+
+
+def draft_text_area(label, key, **kwargs):
+    """
+    st.text_area con autoguardado de borrador para estudiantes con sesión.
+    Si el widget aún no tiene estado (primer render o reconexión), se restaura
+    el último borrador guardado para (email, key).
+    """
+    _, email, _ = get_current_user()
+    if not email:
+        return st.text_area(label, key=key, **kwargs)
+
+    store = get_draft_store(DRAFTS_FILE, flush_interval=DRAFT_AUTOSAVE_SECONDS)
+    seen = st.session_state.setdefault("_draft_seen", {})
+    restored = False
+    if key not in st.session_state:
+        draft = store.get(email, key)
+        if draft:
+            st.session_state[key] = draft
+            seen[key] = draft
+            restored = True
+
+    text = st.text_area(label, key=key, **kwargs)
+    if text != seen.get(key, ""):
+        store.put(email, key, text or "")
+        seen[key] = text
+    if restored:
+        st.caption("📝 Draft restored from your last visit.")
+    return text
 
 
 def unit2_answer_box(session, hour, exercise_id, label, height=180):
@@ -194,7 +368,7 @@ def unit2_answer_box(session, hour, exercise_id, label, height=180):
     key_text = f"u2_{session}_{hour}_{exercise_id}"
 
     st.markdown(f"#### ✏️ Your answer – {label}")
-    text = st.text_area(
+    text = draft_text_area(
         "Write here",
         key=key_text,
         height=height,
@@ -207,16 +381,19 @@ def unit2_answer_box(session, hour, exercise_id, label, height=180):
                 "Please go to **Access → Student access** and login with your email "
                 "so your answers are linked to your name."
             )
-        ok, msg = save_unit2_response(
-            user_email=email,
-            user_name=name,
-            session=session,
-            hour=hour,
-            exercise_id=exercise_id,
-            text=text,
-        )
+        with st.spinner("Saving..."):
+            ok, msg = save_unit2_response(
+                user_email=email,
+                user_name=name,
+                session=session,
+                hour=hour,
+                exercise_id=exercise_id,
+                text=text,
+            )
         if ok:
+            record_progress(f"answer:{key_text}")
             st.success("✅ Answer saved correctly.")
+            render_first_pass_mark(key_text, text)
         else:
             st.error(msg)
 
@@ -246,6 +423,7 @@ def _content_file_path(unit: int, lesson: int, content_key: str) -> Path:
     return CONTENT_DIR / f"unit{unit}" / f"class{lesson}" / f"{safe_key}.txt"
 
 
+@traced("content.save_block")
 def save_content_block(unit: int, lesson: int, content_key: str, text: str) -> Path:
     """
     Guarda un bloque de contenido en:
@@ -255,9 +433,16 @@ def save_content_block(unit: int, lesson: int, content_key: str, text: str) -> P
     file_path.parent.mkdir(parents=True, exist_ok=True)
     with open(file_path, "w", encoding="utf-8") as f:
         f.write(text or "")
+    cache_set("content", _content_cache_key(file_path), text or "", ttl=CONTENT_CACHE_TTL)
+    reindex_content_file(file_path)
     return file_path
 
 
+def _content_cache_key(path: Path) -> str:
+    return path.relative_to(CONTENT_DIR).as_posix()
+
+
+@traced("content.load_block")
 def load_content_block(unit: int, lesson: int, content_key: str) -> Optional[str]:
     """
     Carga un bloque de contenido. Regresa None si no existe o si la llave es inválida.
@@ -267,33 +452,48 @@ def load_content_block(unit: int, lesson: int, content_key: str) -> Optional[str
     except ValueError:
         return None
 
+    # Una caché bloqueada o dañada cuenta como fallo: se lee el archivo directamente.
+    cached = cache_get("content", _content_cache_key(file_path))
+    if cached is not None:
+        return cached
+
     if not file_path.exists():
         return None
 
     with open(file_path, "r", encoding="utf-8") as f:
-        return f.read()
+        text = f.read()
+    cache_set("content", _content_cache_key(file_path), text, ttl=CONTENT_CACHE_TTL)
+    return text
 
 
 def structured_content_path(unit: int, lesson: int) -> Path:
     return CONTENT_DIR / f"unit{unit}" / f"class{lesson}" / "content.json"
 
 
+@traced("content.load")
 def load_structured_content(unit: int, lesson: int) -> dict:
     """
     Carga contenido estructurado (JSON) para una clase.
     """
     path = structured_content_path(unit, lesson)
+    cached = cache_get("content", _content_cache_key(path))
+    if cached is not None:
+        return cached
+
     if not path.exists():
         return {}
 
     try:
         with open(path, "r", encoding="utf-8") as f:
             data = json.load(f)
-            return data if isinstance(data, dict) else {}
     except Exception:
         return {}
+    data = data if isinstance(data, dict) else {}
+    cache_set("content", _content_cache_key(path), data, ttl=CONTENT_CACHE_TTL)
+    return data
 
 
+@traced("content.save")
 def save_structured_content(unit: int, lesson: int, payload: dict) -> Path:
     """
     Guarda contenido estructurado (JSON) para una clase.
@@ -304,6 +504,8 @@ def save_structured_content(unit: int, lesson: int, payload: dict) -> Path:
     payload["updated_at"] = dt.datetime.now().isoformat(timespec="seconds")
     with open(path, "w", encoding="utf-8") as f:
         json.dump(payload, f, indent=2, ensure_ascii=False)
+    cache_set("content", _content_cache_key(path), payload, ttl=CONTENT_CACHE_TTL)
+    reindex_content_file(path)
     return path
 
 
@@ -460,6 +662,113 @@ def build_audio_filename(unit: int, slot: str, slot_number: int, audio_number: i
     return f"U{int(unit)}_{slot_code}{int(slot_number)}_audio{int(audio_number)}_{slug}.mp3"
 
 
+def get_tts_limiter_for_app():
+    return get_tts_limiter(
+        TTS_QUOTA_FILE,
+        monthly_chars=TTS_MONTHLY_CHARS,
+        requests_per_minute=TTS_REQUESTS_PER_MIN,
+        burst=TTS_MAX_CONCURRENT,
+        max_concurrent=TTS_MAX_CONCURRENT,
+    )
+
+
+register_tts_backend(
+    ElevenLabsBackend(
+        ELEVEN_API_KEY,
+        DEFAULT_ELEVEN_VOICE_ID,
+        get_tts_limiter_for_app,
+        dialogue_voices=DIALOGUE_VOICES,
+    )
+)
+register_tts_backend(LocalBackend(TTS_LOCAL_ENGINE, default_voice=TTS_LOCAL_VOICE))
+
+
+def _synthesize_segments_with_ui(segments: list, voices: list, model_id: str, engine, *, refresh: bool = False):
+    """
+    Sintetiza en paralelo los segmentos que no están en caché (cada uno con su
+    voz) mostrando cola y progreso; con `refresh` se sintetizan todos de nuevo.
+    Devuelve (mp3 por segmento, stats) o None si algo falló; el error ya se
+    mostró en pantalla.
+    """
+    import requests
+    ctx = get_script_run_ctx()
+    queue_note = st.empty()
+    progress = st.progress(0.0) if len(segments) > 1 else None
+
+    def show_queue_position(position, wait):
+        if position > 1:
+            queue_note.info(f"⏳ Waiting for ElevenLabs: position {position} in the queue…")
+        elif wait:
+            queue_note.info(f"⏳ Rate limit: starting in {wait:.0f} s…")
+
+    def synthesize(i):
+        # Los hilos del pool escriben en los placeholders de esta sesión.
+        if ctx is not None:
+            add_script_run_ctx(threading.current_thread(), ctx)
+        return engine.synthesize(
+            segments[i],
+            voices[i],
+            model_id,
+            previous_text=segments[i - 1] if i > 0 else "",
+            next_text=segments[i + 1] if i + 1 < len(segments) else "",
+            on_wait=show_queue_position,
+        )
+
+    def show_progress(done, total):
+        if progress is not None:
+            progress.progress(done / total, text=f"Synthesizing changed segments: {done}/{total}")
+
+    try:
+        return fetch_segments(
+            segments,
+            synthesize,
+            SegmentCache(TTS_SEGMENT_DIR),
+            [segment_key(segment, *engine.cache_parts(voice, model_id)) for segment, voice in zip(segments, voices)],
+            max_workers=TTS_MAX_CONCURRENT,
+            on_progress=show_progress,
+            refresh=refresh,
+        )
+    except QuotaExceeded as exc:
+        st.error(str(exc))
+    except RetryAfter as exc:
+        st.error(f"ElevenLabs sigue limitando las peticiones (429). Intenta de nuevo en {exc.seconds:.0f} s.")
+    except requests.RequestException as exc:
+        st.error(f"Error llamando a ElevenLabs: {exc}")
+    except RuntimeError as exc:
+        st.error(str(exc))
+    finally:
+        queue_note.empty()
+        if progress is not None:
+            progress.empty()
+    return None
+
+
+def _write_generated_audio(filename: str, audio: bytes) -> Optional[Path]:
+    AUDIO_DIR.mkdir(exist_ok=True)
+    audio_path = AUDIO_DIR / filename
+    try:
+        with open(audio_path, "wb") as f:
+            f.write(audio)
+    except Exception as exc:
+        st.error(f"No se pudo guardar el audio: {exc}")
+        return None
+    return audio_path
+
+
+def _tts_engine_or_error(backend: str):
+    """Motor TTS listo para usar, o None (con el motivo en pantalla)."""
+    try:
+        engine = get_tts_backend(backend)
+    except ValueError as exc:
+        st.error(str(exc))
+        return None
+    reason = engine.unavailable_reason()
+    if reason:
+        st.error(reason)
+        return None
+    return engine
+
+
 def generate_audio_elevenlabs(
     text: str,
     voice_id: Optional[str],
@@ -471,14 +780,33 @@ def generate_audio_elevenlabs(
     Genera audio con ElevenLabs y lo guarda en AUDIO_DIR/filename.
     Retorna la ruta completa del archivo o None si falla.
     """
-    api_key = ELEVEN_API_KEY
-    if not api_key:
-        st.error("ELEVEN_API_KEY no está configurado en .streamlit/secrets.toml o en el entorno.")
+    return generate_audio(text, voice_id, filename, model_id=model_id, backend="elevenlabs")
+
+
+def generate_audio(
+    text: str,
+    voice_id: Optional[str],
+    filename: str,
+    *,
+    model_id: str = "",
+    backend: str = "elevenlabs",
+    regenerate: bool = False,
+):
+    """
+    Genera audio con el motor `backend` ("elevenlabs" | "local") y lo guarda
+    en AUDIO_DIR/filename. Misma caché por segmento y mismos nombres de
+    archivo para todos los motores. Con `regenerate` no se reutiliza nada
+    cacheado (mp3 ni segmentos) y lo nuevo reemplaza a lo anterior.
+    Retorna la ruta o None si falla.
+    """
+    engine = _tts_engine_or_error(backend)
+    if engine is None:
         return None
+    model_id = model_id or engine.default_model
 
-    voice = voice_id or DEFAULT_ELEVEN_VOICE_ID
+    voice = voice_id or engine.default_voice
     if not voice:
-        st.error("Falta configurar el ID de voz de ElevenLabs.")
+        st.error(f"Falta configurar la voz para {engine.label}.")
         return None
 
     clean_text = (text or "").strip()
@@ -486,45 +814,226 @@ def generate_audio_elevenlabs(
         st.error("Escribe un script antes de generar el audio.")
         return None
 
-    url = f"https://api.elevenlabs.io/v1/text-to-speech/{voice}"
-    headers = {
-        "xi-api-key": api_key,
-        "Content-Type": "application/json",
-        "Accept": "audio/mpeg",
-    }
-    payload = {
-        "model_id": model_id,
-        "text": clean_text,
-        "voice_settings": {
-            "stability": 0.4,
-            "similarity_boost": 0.8,
+    # Si otra réplica ya generó este mismo script (texto + voz + modelo) y el
+    # mp3 está en disco, se reutiliza en lugar de volver a llamar a la API.
+    tts_key = cache_key(clean_text, *engine.cache_parts(voice, model_id))
+    meta = None if regenerate else cache_get("tts", tts_key)
+    if meta:
+        cached_path = AUDIO_DIR / meta.get("filename", "")
+        if cached_path.is_file() and cached_path.stat().st_size == meta.get("bytes"):
+            audio_path = AUDIO_DIR / filename
+            if cached_path != audio_path:
+                shutil.copyfile(cached_path, audio_path)
+            return audio_path
+
+    segments = split_script(clean_text, TTS_SEGMENT_CHARS)
+    result = _synthesize_segments_with_ui(segments, [voice] * len(segments), model_id, engine, refresh=regenerate)
+    if result is None:
+        return None
+    parts, seg_stats = result
+    try:
+        audio = stitch_mp3(parts)
+    except ValueError as exc:
+        st.error(f"{engine.label} devolvió un mp3 inválido: {exc}")
+        return None
+    if seg_stats["segments"] > 1:
+        st.caption(
+            f"{seg_stats['segments']} segments: {seg_stats['reused']} reused, "
+            f"{seg_stats['synthesized']} synthesized ({seg_stats['chars_synthesized']:,} characters)."
+        )
+
+    audio_path = _write_generated_audio(filename, audio)
+    if audio_path is None:
+        return None
+
+    _remember_tts_file(tts_key, filename, audio, voice, model_id, len(clean_text))
+    return audio_path
+
+
+def _remember_tts_file(tts_key: str, filename: str, audio: bytes, voice: str, model_id: str, chars: int):
+    """Anota en la caché compartida qué mp3 corresponde a (texto, voz, modelo)."""
+    cache_set(
+        "tts",
+        tts_key,
+        {
+            "filename": filename,
+            "bytes": len(audio),
+            "voice_id": voice,
+            "model_id": model_id,
+            "chars": chars,
+            "created_at": dt.datetime.now().isoformat(timespec="seconds"),
         },
-    }
+    )
 
+
+def start_tts_preview(
+    key: str,
+    text: str,
+    voice_id: Optional[str],
+    filename: str,
+    model_id: str = "",
+    *,
+    backend: str = "elevenlabs",
+):
+    """
+    Empieza a generar el audio en streaming; render_tts_preview_player(key)
+    lo reproduce mientras llega. No se guarda nada hasta que el admin acepta.
+    """
+    engine = _tts_engine_or_error(backend)
+    if engine is None:
+        return
+    clean_text = (text or "").strip()
+    voice = voice_id or engine.default_voice
+    model_id = model_id or engine.default_model
+    if not clean_text:
+        st.error("Escribe un script antes de generar el audio.")
+        return
+    relay = start_preview_relay(TTS_PREVIEW_PORT, TTS_PREVIEW_HOST)
+    if relay is None:
+        st.error(f"No se pudo abrir el puerto {TTS_PREVIEW_PORT} para el preview (TTS_PREVIEW_PORT).")
+        return
     try:
-        resp = requests.post(url, json=payload, headers=headers, timeout=40)
-    except requests.RequestException as exc:
-        st.error(f"Error llamando a ElevenLabs: {exc}")
+        # La cuota se revisa aquí para avisar antes de que empiece el stream.
+        engine.check_quota(len(clean_text))
+    except QuotaExceeded as exc:
+        st.error(str(exc))
+        return
+    previous = st.session_state.get(f"{key}_preview")
+    if previous:
+        relay.discard(previous["token"])
+    token = relay.start(lambda write: engine.stream(clean_text, voice, model_id, write))
+    st.session_state[f"{key}_preview"] = {
+        "token": token,
+        "backend": engine.name,
+        "filename": filename,
+        "text": clean_text,
+        "voice": voice,
+        "model_id": model_id,
+    }
+
+
+def render_tts_preview_player(key: str):
+    preview_state = st.session_state.get(f"{key}_preview")
+    relay = start_preview_relay(TTS_PREVIEW_PORT, TTS_PREVIEW_HOST) if preview_state else None
+    preview = relay.get(preview_state["token"]) if relay else None
+    if preview is None:
+        return
+    st.markdown("##### ▶️ Streaming preview")
+    components.html(
+        f"<audio controls autoplay preload='auto' style='width:100%' "
+        f"src='{TTS_PREVIEW_PUBLIC_URL}/preview/{preview_state['token']}.mp3'></audio>",
+        height=60,
+    )
+    if preview.error:
+        st.error(f"Preview failed: {preview.error}")
+    elif preview.done:
+        st.caption(
+            f"Ready · {preview.size / 1024:.0f} KiB · first audio after {preview.first_chunk_s or 0:.1f} s"
+        )
+    else:
+        st.caption(f"Streaming… {preview.size / 1024:.0f} KiB so far")
+
+    col_ok, col_drop = st.columns(2)
+    with col_ok:
+        if st.button(f"✅ Accept and save as {preview_state['filename']}", key=f"{key}_preview_accept"):
+            audio = relay.result(preview_state["token"])
+            if audio is None:
+                st.info("The preview is still being generated; try again in a moment.")
+            else:
+                path = _write_generated_audio(preview_state["filename"], audio)
+                if path:
+                    engine = get_tts_backend(preview_state.get("backend", "elevenlabs"))
+                    _remember_tts_file(
+                        cache_key(
+                            preview_state["text"],
+                            *engine.cache_parts(preview_state["voice"], preview_state["model_id"]),
+                        ),
+                        preview_state["filename"],
+                        audio,
+                        preview_state["voice"],
+                        preview_state["model_id"],
+                        len(preview_state["text"]),
+                    )
+                    relay.discard(preview_state["token"])
+                    st.session_state.pop(f"{key}_preview", None)
+                    st.success(f"Audio saved in `audio/{preview_state['filename']}`.")
+                    st.audio(str(path))
+    with col_drop:
+        if st.button("🗑️ Discard preview", key=f"{key}_preview_discard"):
+            relay.discard(preview_state["token"])
+            st.session_state.pop(f"{key}_preview", None)
+            st.rerun()
+
+
+def tts_backend_picker(key: str) -> str:
+    """Selector de motor TTS; devuelve el nombre del backend elegido."""
+    backends = tts_backends()
+    name = st.radio(
+        "TTS engine",
+        list(backends),
+        format_func=lambda n: backends[n].label,
+        horizontal=True,
+        key=key,
+    )
+    reason = backends[name].unavailable_reason()
+    if reason:
+        st.caption(f"⚠️ {reason}")
+    elif name != "elevenlabs":
+        st.caption("Draft quality, no API quota used. Regenerate with ElevenLabs for the final version.")
+    return name
+
+
+def generate_dialogue_audio(
+    dialogue: str,
+    voice_map: Optional[dict],
+    filename: str,
+    *,
+    model_id: str = "",
+    pause_ms: Optional[int] = None,
+    backend: str = "elevenlabs",
+    regenerate: bool = False,
+):
+    """
+    Convierte un diálogo "Speaker: texto" en un solo mp3 con una voz por
+    hablante. Cada línea se sintetiza (en paralelo) y se cachea por separado;
+    entre líneas se insertan `pause_ms` de silencio. Con `regenerate` todas
+    las líneas se sintetizan de nuevo.
+    """
+    engine = _tts_engine_or_error(backend)
+    if engine is None:
         return None
+    model_id = model_id or engine.default_model
 
-    if resp.status_code != 200:
-        try:
-            detail = resp.json()
-        except Exception:
-            detail = resp.text
-        st.error(f"Error ElevenLabs ({resp.status_code}): {detail}")
+    lines = parse_dialogue(dialogue)
+    if not lines:
+        st.error("El diálogo no tiene líneas con formato `Speaker: text`.")
+        return None
+    voices = assign_voices(speakers_of(lines), voice_map, engine.dialogue_voices)
+    missing = [speaker for speaker in speakers_of(lines) if speaker not in voices]
+    if missing:
+        st.error(f"Falta la voz de: {', '.join(missing)}")
         return None
 
-    AUDIO_DIR.mkdir(exist_ok=True)
-    audio_path = AUDIO_DIR / filename
+    result = _synthesize_segments_with_ui(
+        [line.text for line in lines],
+        [voices[line.speaker] for line in lines],
+        model_id,
+        engine,
+        refresh=regenerate,
+    )
+    if result is None:
+        return None
+    parts, seg_stats = result
     try:
-        with open(audio_path, "wb") as f:
-            f.write(resp.content)
-    except Exception as exc:
-        st.error(f"No se pudo guardar el audio: {exc}")
+        audio = stitch_mp3(parts, DIALOGUE_PAUSE_MS if pause_ms is None else pause_ms)
+    except ValueError as exc:
+        st.error(f"{engine.label} devolvió un mp3 inválido: {exc}")
         return None
-
-    return audio_path
+    st.caption(
+        f"{seg_stats['segments']} lines, {len(voices)} voices: {seg_stats['reused']} reused, "
+        f"{seg_stats['synthesized']} synthesized ({seg_stats['chars_synthesized']:,} characters)."
+    )
+    return _write_generated_audio(filename, audio)
 
 
 def generate_audio_with_metadata(
@@ -536,17 +1045,21 @@ def generate_audio_with_metadata(
     audio_number: int,
     label: str,
     *,
-    model_id: str = "eleven_turbo_v2",
+    model_id: str = "",
+    backend: str = "elevenlabs",
+    regenerate: bool = False,
 ):
     """
     Envuelve la generación de audio y crea el nombre correcto automáticamente.
     """
     filename = build_audio_filename(unit, slot, slot_number, audio_number, label)
-    path = generate_audio_elevenlabs(
+    path = generate_audio(
         text=text,
         voice_id=voice_id,
         filename=filename,
         model_id=model_id,
+        backend=backend,
+        regenerate=regenerate,
     )
     return path, filename
 
@@ -555,10 +1068,8 @@ def generate_audio_with_metadata(
 # GLOBAL STYLES (BRANDING + DARK MODE FRIENDLY)
 # ==========================
 
-def inject_global_css():
-    st.markdown(
-        """
-<style>
+# También lo usa el sitio estático (python -m helpers.static_site): debe seguir siendo un literal.
+GLOBAL_CSS = """
 :root {
     --flx-primary: #1f4b99;
     --flx-primary-strong: #274b8f;
@@ -1002,10 +1513,13 @@ body {
         background-color: #1d4ed8;
     }
 }
-</style>
-        """,
-        unsafe_allow_html=True
-    )
+"""
+
+
+def inject_global_css():
+    st.markdown(f"<style>{GLOBAL_CSS}</style>", unsafe_allow_html=True)
+
+
 # ==========================
 # COURSE DATA
 # ==========================
@@ -1663,120 +2177,891 @@ LESSONS = {
 }
 
 # ==========================
-# LOGO & SIGNATURE
+# VOCABULARY REVIEW (SRS)
 # ==========================
 
-def show_logo():
-    logo_path = os.path.join("assets", "logo-english-classes.png")
-    if os.path.exists(logo_path):
-        try:
-            st.image(logo_path, width=220)
-        except Exception:
-            st.warning("The file 'logo-english-classes.png' exists but is not a valid image.")
+# Grupos de la clase U3 C1 (pestaña Vocabulary); también son tarjetas de repaso.
+U3_C1_FOOD_GROUPS = {
+    "Fruits": ["apple", "banana", "orange", "grape", "pineapple", "mango"],
+    "Vegetables": ["tomato", "carrot", "onion", "lettuce", "potato", "cucumber"],
+    "Drinks": ["water", "juice", "soda", "coffee", "tea", "milk"],
+    "Other food": ["bread", "rice", "pasta", "eggs", "cheese", "chicken", "fish"],
+}
 
+# U3 C3 (pestaña Vocabulary). "spicy / mild" son dos tarjetas.
+U3_C3_VOCABULARY = {
+    "Taste & texture": ["spicy / mild", "sweet / salty / sour / bitter", "crunchy / soft", "creamy", "fresh", "greasy / oily"],
+    "Cooking methods": ["grilled", "fried", "baked", "boiled", "steamed"],
+    "Preference verbs": ["love", "like", "enjoy", "don’t mind", "don’t like", "hate"],
+}
 
-def show_signature():
-    sig_path = os.path.join("assets", "firma-ivan-diaz.png")
-    if os.path.exists(sig_path):
-        try:
-            st.image(sig_path, width=220)
-        except Exception:
-            st.warning("The file 'firma-ivan-diaz.png' exists but is not a valid image.")
-    else:
-        st.info("Add your signature as 'assets/firma-ivan-diaz.png' to display it here.")
+# Palabras de cada tema de UNITS[*]["vocabulary"]; un tema repetido en dos unidades comparte progreso.
+VOCABULARY_TOPIC_WORDS = {
+    "Countries and nationalities": ["Mexico / Mexican", "Spain / Spanish", "Brazil / Brazilian", "Japan / Japanese", "France / French", "the UK / British"],
+    "Jobs": ["teacher", "doctor", "nurse", "engineer", "waiter", "shop assistant", "mechanic"],
+    "Everyday things": ["keys", "wallet", "umbrella", "phone", "glasses", "backpack"],
+    "Daily routines": ["get up", "have a shower", "get dressed", "have breakfast", "go to work", "go to bed"],
+    "Free-time activities": ["go swimming", "play football", "watch TV", "read a book", "go shopping", "listen to music"],
+    "Food and drink": ["meat", "vegetables", "fruit", "dessert", "snack", "soft drink"],
+    "Restaurants": ["menu", "waiter", "bill", "tip", "starter", "main course", "book a table"],
+    "Buildings and furniture": ["kitchen", "bedroom", "sofa", "wardrobe", "shelf", "armchair"],
+    "Places in a city": ["bank", "post office", "museum", "library", "train station", "square"],
+    "Regular verbs": ["visited", "watched", "studied", "played", "stayed", "worked"],
+    "Life events": ["be born", "start school", "leave school", "get a job", "get married", "move house"],
+    "Days out": ["picnic", "theme park", "zoo", "beach", "tour", "trip"],
+    "Workplace language": ["meeting", "colleague", "boss", "deadline", "office", "shift"],
+    "Geography": ["mountain", "river", "lake", "forest", "desert", "coast"],
+    "Travel and holiday vocabulary": ["passport", "luggage", "boarding pass", "check in", "hotel", "sightseeing"],
+    "Parts of the body": ["head", "arm", "leg", "back", "stomach", "throat"],
+    "Health problems": ["a headache", "a cold", "a fever", "a sore throat", "a stomachache", "a cough"],
+    "Countries and geography": ["capital city", "population", "border", "island", "north / south", "east / west"],
+    "Continents": ["Africa", "Asia", "Europe", "North America", "South America", "Oceania"],
+}
 
-# ==========================
-# APP SHELL / HERO
-# ==========================
 
-def get_logo_data_uri() -> str:
+def vocabulary_decks() -> dict:
     """
-    Returns a data URI for the Flunex logo to embed it in HTML headers.
+    Mazos de repaso: deck -> [(item_key, palabra, categoría)].
+    u3c1 / u3c3 salen de las clases de la Unidad 3; unitN de los temas de UNITS.
     """
-    logo_path = BASE_DIR / "assets" / "logo-english-classes.png"
-    if not logo_path.exists():
-        return ""
-    try:
-        encoded = base64.b64encode(logo_path.read_bytes()).decode("ascii")
-        suffix = logo_path.suffix.lower()
-        mime = "image/png" if suffix in {".png", ".apng", ".webp"} else "image/jpeg"
-        return f"data:{mime};base64,{encoded}"
-    except Exception:
-        return ""
+    decks = {
+        "u3c1": [
+            (f"u3c1/{word}", word, group)
+            for group, words in U3_C1_FOOD_GROUPS.items()
+            for word in words
+        ],
+        "u3c3": [
+            (f"u3c3/{word.strip()}", word.strip(), group)
+            for group, entries in U3_C3_VOCABULARY.items()
+            for entry in entries
+            for word in entry.split(" / ")
+        ],
+    }
+    for unit in UNITS:
+        decks[f"unit{unit['number']}"] = [
+            (f"topic/{_slugify_audio_label(topic)}/{word}", word, topic)
+            for topic in unit["vocabulary"]
+            for word in VOCABULARY_TOPIC_WORDS.get(topic, [])
+        ]
+    return decks
 
 
-def get_shell_media(query: str = "english learning") -> dict:
+@st.cache_resource(show_spinner=False)
+def get_vocab_trainer():
+    """Store SM-2 del proceso con los mazos ya definidos, más la cara de cada tarjeta."""
+    store = get_srs_store(SRS_FILE, flush_interval=SRS_FLUSH_SECONDS)
+    faces = {}
+    for deck, cards in vocabulary_decks().items():
+        store.define_deck(deck, [key for key, _, _ in cards])
+        faces.update({key: (word, category) for key, word, category in cards})
+    return store, faces
+
+
+def render_vocab_trainer(deck: str, title: str = "🔁 Review these words"):
     """
-    Media for the hero area. Uses Pexels if available, otherwise falls back
-    to the local gradient.
+    Una tarjeta por rerun: palabra → "Show answer" → Again / Hard / Good / Easy.
+    next_card() sale del heap del estudiante; la calificación se guarda por lotes.
     """
-    media = fetch_pexels_image(
-        query=query,
-        fallback_url=FLUNEX_GRADIENT_DATA_URI,
-        orientation="landscape",
+    _, email, _ = get_current_user()
+    st.markdown(f"#### {title}")
+    if not email:
+        st.caption("Log in as a student to review these words with spaced repetition.")
+        return
+
+    store, faces = get_vocab_trainer()
+    stats = store.deck_stats(email, deck)
+    st.caption(
+        f"Due today: {stats['due']} · New: {stats['new']} · "
+        f"Learned: {stats['learned']} of {stats['total']}"
     )
-    media["url"] = media.get("url") or FLUNEX_GRADIENT_DATA_URI
-    return media
+    item = store.next_card(email, deck)
+    if item is None:
+        next_due = dt.date.fromordinal(stats["next_due"]).strftime("%d %b") if stats["next_due"] else "later"
+        st.success(f"All caught up ✅ Next review: {next_due}.")
+        return
 
+    word, category = faces[item]
+    reveal_key = f"srs_reveal_{deck}"
+    st.markdown(f"### {word}")
+    if st.session_state.get(reveal_key) != item:
+        st.caption("Say what it means and use it in a sentence. Then check.")
+        if st.button("Show answer", key=f"srs_show_{deck}"):
+            st.session_state[reveal_key] = item
+            st.rerun()
+        return
 
-def render_app_shell():
-    hero_media = get_shell_media("english learning")
-    hero_url = (hero_media.get("url") or FLUNEX_GRADIENT_DATA_URI).replace("'", "%27")
-    logo_uri = get_logo_data_uri()
-    logo_html = f'<img src="{logo_uri}" alt="Flunex logo" />' if logo_uri else "<div class='flx-level-pill'>Flunex</div>"
+    st.info(f"**{word}** → {category}")
+    grades = (("Again", AGAIN), ("Hard", HARD), ("Good", GOOD), ("Easy", EASY))
+    for col, (label, grade) in zip(st.columns(len(grades)), grades):
+        with col:
+            if st.button(label, key=f"srs_{deck}_{grade}", use_container_width=True):
+                store.review(email, item, grade)
+                record_progress(f"vocab:{deck}")
+                st.session_state.pop(reveal_key, None)
+                st.rerun()
 
-    credit = hero_media.get("attribution") or "English learning · classroom"
-    shell_html = textwrap.dedent(
-        f"""
-<div class="flx-shell" style="background-image: linear-gradient(125deg, rgba(15,23,42,0.78), rgba(31,75,153,0.6)), url('{hero_url}');">
-  <div class="flx-shell__header">
-    <div class="flx-brand">
-      {logo_html}
-      <div>
-        <div class="flx-brand__title">Flunex · A2 English Master</div>
-        <div class="flx-brand__subtitle">Learn, teach and track progress with confidence</div>
-      </div>
-    </div>
-    <div class="flx-level-pill">A2 · Elementary</div>
-  </div>
+# ==========================
+# PROGRESS TRACKING
+# ==========================
 
-  <div class="flx-shell__card">
-    <div class="flx-shell__eyebrow">Welcome</div>
-    <div class="flx-shell__headline">Communicate clearly in real situations</div>
-    <p class="flx-shell__copy">
-      Practical lessons, structured progress and bilingual guidance for tourism, work and everyday life.
-      Choose your path below.
-    </p>
-    <div class="flx-shell__actions">
-      <form method="get" class="flx-action-form">
-        <input type="hidden" name="page" value="Access" />
-        <button type="submit" class="flx-cta flx-cta--primary">I am a student</button>
-      </form>
-      <form method="get" class="flx-action-form">
-        <input type="hidden" name="page" value="Content Admin" />
-        <button type="submit" class="flx-cta flx-cta--ghost">I am a teacher / admin</button>
-      </form>
-    </div>
-    <div class="flx-tag">{credit}</div>
-  </div>
-</div>
-"""
-    )
-    st.markdown(shell_html, unsafe_allow_html=True)
+# Lo que las clases especiales de la Unidad 3 registran además de lo común.
+LESSON_PROGRESS_EXTRAS = {
+    (3, 1): [
+        ("audio:U3_C1_audio1_food_words.mp3", "Audio – Food words"),
+        ("audio:U3_C1_audio2_at_the_supermarket.mp3", "Audio – At the supermarket"),
+        ("quiz:u3c1_practice", "Practice answers"),
+        ("quiz:u3c1_mc", "Multiple choice"),
+        ("quiz:u3c1_listening", "Listening quiz"),
+        ("vocab:u3c1", "Vocabulary cards"),
+    ],
+    (3, 3): [
+        ("vocab:u3c3", "Vocabulary cards"),
+    ],
+}
+LESSON_TABS = ("theory", "practice", "insights")
+
+
+def lesson_progress_items(unit_number: int, class_number: int) -> list:
+    """(clave, etiqueta) de todo lo que cuenta para completar una clase."""
+    lesson = LESSONS[unit_number][class_number - 1]
+    items = [(f"lesson:{unit_number}:{class_number}", "Opened the class")]
+    items += [(f"tab:{unit_number}:{class_number}:{tab}", f"{tab.title()} tab") for tab in LESSON_TABS]
+    config = INTERACTIVE_CLASS_CONTENT.get((unit_number, lesson["title"]))
+    if config:
+        prefix = config["key_prefix"]
+        items += [(f"audio:{name}", name) for name in dict.fromkeys(_referenced_files(config, ".mp3"))]
+        if config.get("multiple_choice"):
+            items.append((f"quiz:{prefix}_mc", "Practice quiz"))
+        if (config.get("listening") or {}).get("questions"):
+            items.append((f"quiz:{prefix}_listening", "Listening quiz"))
+        items += [
+            (f"answer:u2_{box['session']}_{box['hour']}_{box['exercise_id']}", box["label"])
+            for box in config.get("answer_boxes", [])
+        ]
+    items += LESSON_PROGRESS_EXTRAS.get((unit_number, class_number), [])
+    return items
 
 
-def render_banner(query: str, title: str, caption: str = ""):
-    media = fetch_pexels_image(
-        query=query,
-        fallback_url=FLUNEX_GRADIENT_DATA_URI,
-        orientation="landscape",
-    )
-    url = (media.get("url") or FLUNEX_GRADIENT_DATA_URI).replace("'", "%27")
-    credit = media.get("attribution")
-    credit_html = f"<span class='flx-tag'>{credit}</span>" if credit else ""
-    caption_html = f"<div class='flx-sub-banner__caption'>{caption}</div>" if caption else ""
+def curriculum_progress_groups() -> dict:
+    """"U3 C1" -> claves de la clase, en el orden del curso."""
+    return {
+        f"U{unit_number} C{index + 1}": [key for key, _ in lesson_progress_items(unit_number, index + 1)]
+        for unit_number, lessons in LESSONS.items()
+        for index in range(len(lessons))
+    }
 
-    st.markdown(
+
+@st.cache_resource(show_spinner=False)
+def get_progress_tracker():
+    """
+    Store de progreso del proceso. El currículo se registra una vez en orden;
+    las claves nuevas se añaden al final y los bits existentes no se mueven.
+    """
+    store = get_progress_store(PROGRESS_FILE, flush_interval=PROGRESS_FLUSH_SECONDS)
+    store.register([key for keys in curriculum_progress_groups().values() for key in keys])
+    return store
+
+
+def record_progress(key: str, done: bool = True):
+    """Evento de completado desde un renderer; sin sesión de estudiante no hace nada."""
+    _, email, _ = get_current_user()
+    if email:
+        get_progress_tracker().mark(email, key, done)
+
+
+def progress_checkbox(key: str, label: str):
+    """Casilla "hecho" ligada al bit `key` del estudiante (restaurada en cada visita)."""
+    _, email, _ = get_current_user()
+    if not email:
+        return
+    store = get_progress_tracker()
+    widget_key = f"progress_{key}"
+    if widget_key not in st.session_state:
+        st.session_state[widget_key] = store.is_done(email, key)
+    done = st.checkbox(label, key=widget_key)
+    if done != store.is_done(email, key):
+        store.mark(email, key, done)
+
+
+def render_lesson_progress(unit_number: int, class_number: int):
+    _, email, _ = get_current_user()
+    if not email:
+        return
+    keys = [key for key, _ in lesson_progress_items(unit_number, class_number)]
+    done = get_progress_tracker().done_count(email, keys)
+    st.progress(done / len(keys), text=f"Your progress in this class: {done} of {len(keys)} steps")
+
+
+def render_progress_heatmap_section():
+    """Mapa de calor de la clase: % de cada lección por estudiante, con AND + popcount sobre los bitsets."""
+    import pandas as pd
+
+    with st.expander("🟩 Class progress heatmap", expanded=False):
+        store = get_progress_tracker()
+        students = store.students()
+        if not students:
+            st.info("No progress recorded yet.")
+            return
+        groups = curriculum_progress_groups()
+        with span("teacher.progress_heatmap", students=len(students), items=store.size):
+            fractions = store.heatmap(students, groups)
+        table = pd.DataFrame(fractions * 100, index=students, columns=list(groups))
+        st.dataframe(
+            table,
+            use_container_width=True,
+            column_config={
+                column: st.column_config.ProgressColumn(column, min_value=0, max_value=100, format="%.0f%%")
+                for column in table.columns
+            },
+        )
+
+        lesson = st.selectbox("Items of one class", list(groups), key="tp_progress_lesson")
+        unit_number, class_number = (int(part[1:]) for part in lesson.split())
+        items = lesson_progress_items(unit_number, class_number)
+        counts = store.item_counts(students, [key for key, _ in items])
+        render_static_table(
+            [[label, f"{count} / {len(students)}"] for (_, label), count in zip(items, counts)],
+            ["Item", "Students done"],
+        )
+
+
+# ==========================
+# GRADEBOOK
+# ==========================
+
+# Componente del gradebook -> fila de ASSESSMENT_WEIGHTS (la tabla publicada manda).
+GRADE_COMPONENTS = {
+    "participation": "Class participation & homework",
+    "progress_checks": "Progress checks",
+    "midterm": "Mid-course test",
+    "final": "Final exam",
+}
+
+
+def grade_weights() -> dict:
+    published = {label: float(weight.rstrip("%")) for label, weight in ASSESSMENT_WEIGHTS}
+    return {component: published[label] for component, label in GRADE_COMPONENTS.items()}
+
+
+def homework_items() -> list:
+    """Claves de todas las respuestas guardables del curso (answer_boxes)."""
+    return [
+        f"answer:u2_{box['session']}_{box['hour']}_{box['exercise_id']}"
+        for config in INTERACTIVE_CLASS_CONTENT.values()
+        for box in config.get("answer_boxes", [])
+    ]
+
+
+@st.cache_resource(show_spinner=False)
+def get_course_gradebook():
+    return get_gradebook(
+        GRADEBOOK_FILE,
+        grade_weights(),
+        expected={"participation": len(homework_items())},
+    )
+
+
+def record_quiz_result(key: str, answers: list):
+    """
+    "Check answers" de un quiz: marca el progreso y guarda la nota como
+    progress check. Solo cuenta el primer intento: repetir el quiz de
+    práctica no sube la nota. `answers` = [(respuesta del estudiante, respuesta correcta)].
+    """
+    record_progress(key)
+    _, email, _ = get_current_user()
+    if not email or not answers:
+        return
+    correct = sum(1 for given, expected in answers if given == expected)
+    if get_course_gradebook().record(email, "progress_checks", key, correct / len(answers), source="quiz", replace=False):
+        st.caption(f"Your score: {correct} / {len(answers)} · saved to your gradebook.")
+    else:
+        st.caption(f"Your score: {correct} / {len(answers)} · only your first attempt counts for your grade.")
+
+
+def render_student_grades():
+    """Notas del estudiante con sesión, bajo la tabla de ponderación."""
+    _, email, _ = get_current_user()
+    if not email:
+        return
+    summary = get_course_gradebook().summary(email)
+    st.markdown("### Your grades so far")
+    if summary is None:
+        st.info("No grades yet. Check your answers in the class quizzes, save your homework or take a progress check to start.")
+        return
+    render_static_table(
+        [
+            [label, f"{summary[c]:.0f}%" if summary[c] is not None else "–"]
+            for c, label in GRADE_COMPONENTS.items()
+        ]
+        + [["**Grade so far**", f"**{summary['grade_so_far']:.1f}%**" if summary["grade_so_far"] is not None else "–"]],
+        ["Component", "Score"],
+    )
+    st.caption("The grade so far only weighs the components you already have a score for.")
+
+
+def render_gradebook_section():
+    """Gradebook del Teacher Panel: tabla del grupo, notas manuales y exportación."""
+    import pandas as pd
+
+    with st.expander("📊 Gradebook", expanded=False):
+        book = get_course_gradebook()
+        with span("teacher.gradebook") as gradebook_span:
+            summaries = book.summaries()
+            gradebook_span.set(students=len(summaries))
+        st.caption(
+            "Ponderación: "
+            + " · ".join(f"{label} {weight}" for label, weight in ASSESSMENT_WEIGHTS)
+            + ". Los quizzes (solo el primer intento) y progress checks cronometrados cuentan como progress checks, cada respuesta "
+            "guardada como tarea entregada y los exámenes mid-course / final como su componente."
+        )
+
+        with st.form("gradebook_manual"):
+            col_s, col_c, col_v = st.columns([0.45, 0.3, 0.25])
+            with col_s:
+                student = st.text_input("Student email", placeholder="student@mail.com")
+            with col_c:
+                component = st.selectbox("Component", list(GRADE_COMPONENTS), format_func=GRADE_COMPONENTS.get)
+            with col_v:
+                value = st.number_input("Score (%)", min_value=0.0, max_value=100.0, value=80.0, step=1.0)
+            note = st.text_input("Note (optional)")
+            col_save, col_clear = st.columns(2)
+            save = col_save.form_submit_button("💾 Save score", use_container_width=True)
+            clear = col_clear.form_submit_button("↩️ Remove manual score", use_container_width=True)
+        if (save or clear) and student.strip():
+            book.set_manual(student.strip(), component, None if clear else value / 100, note)
+            summaries = book.summaries()
+            st.success(f"{GRADE_COMPONENTS[component]} updated for {student.strip()}.")
+        elif save or clear:
+            st.warning("Write the student's email first.")
+
+        if st.button(
+            "🔄 Count answers already saved in the CSV",
+            key="gradebook_import",
+            help="Only live answers are read; answers moved to the term archive were counted before they were archived.",
+        ):
+            if RESPONSES_FILE.exists():
+                get_response_writer().flush(RESPONSE_ACK_TIMEOUT)
+                with open(RESPONSES_FILE, newline="", encoding="utf-8") as f:
+                    book.record_answers(list(csv.DictReader(f)))
+                summaries = book.summaries()
+                st.success("Saved answers counted as homework.")
+            else:
+                st.info("No answers saved yet.")
+
+        if not summaries:
+            st.info("No grades recorded yet.")
+            return
+        columns = {"student": "Student", **GRADE_COMPONENTS, "grade_so_far": "Grade so far", "final_grade": "Final (missing = 0)"}
+        table = pd.DataFrame(summaries)[list(columns)].rename(columns=columns)
+        st.dataframe(
+            table,
+            use_container_width=True,
+            hide_index=True,
+            column_config={label: st.column_config.NumberColumn(label, format="%.1f%%") for label in list(columns.values())[1:]},
+        )
+
+        def export_gradebook() -> bytes:
+            # Archivo propio por descarga, como la exportación de respuestas.
+            EXPORTS_DIR.mkdir(parents=True, exist_ok=True)
+            fd, name = tempfile.mkstemp(prefix="gradebook.", suffix=".csv", dir=EXPORTS_DIR)
+            os.close(fd)
+            path = Path(name)
+            try:
+                book.export_csv(path)
+                return path.read_bytes()
+            finally:
+                path.unlink(missing_ok=True)
+
+        st.download_button(
+            "⬇️ Download per-student summary (CSV)",
+            data=export_gradebook,
+            file_name=f"gradebook_{dt.date.today():%Y%m%d}.csv",
+            mime="text/csv",
+            key="gradebook_download",
+        )
+
+
+# ==========================
+# EXAMS (progress checks, mid-course, final)
+# ==========================
+
+# Bancos de preguntas según ASSESSMENT_STRUCTURE_MD: (enunciado, opciones, respuesta correcta).
+EXAM_QUESTION_SETS = {
+    "pc_u1_u2": {
+        "title": "Progress check 1 · Units 1–2",
+        "component": "progress_checks",
+        "minutes": 15,
+        "questions": [
+            ("She ___ from Mexico.", ["is", "are", "am"], "is"),
+            ("___ do you live? — In Guadalajara.", ["Where", "What", "Who"], "Where"),
+            ("He ___ to work by bus every day.", ["go", "goes", "going"], "goes"),
+            ("I ___ drink coffee. I don't like it.", ["never", "always", "usually"], "never"),
+        ],
+    },
+    "pc_u3_u4": {
+        "title": "Progress check 2 · Units 3–4",
+        "component": "progress_checks",
+        "minutes": 15,
+        "questions": [
+            ("Can I have ___ apple, please?", ["a", "an", "some"], "an"),
+            ("There isn't ___ milk in the fridge.", ["some", "any", "a"], "any"),
+            ("There ___ two banks in my street.", ["is", "are", "be"], "are"),
+            ("The cat is sleeping ___ the table, on the floor.", ["under", "on", "between"], "under"),
+        ],
+    },
+    "midterm": {
+        "title": "Mid-course test · Units 1–5",
+        "component": "midterm",
+        "minutes": 30,
+        "questions": [
+            ("They ___ teachers. They're students.", ["isn't", "aren't", "don't"], "aren't"),
+            ("How often ___ she go to the gym?", ["do", "does", "is"], "does"),
+            ("How ___ water do you drink every day?", ["many", "much", "any"], "much"),
+            ("There ___ a museum next to the park.", ["is", "are", "have"], "is"),
+            ("We ___ our grandparents last weekend.", ["visit", "visited", "visiting"], "visited"),
+            ("I ___ watch TV yesterday. I was too tired.", ["didn't", "don't", "wasn't"], "didn't"),
+        ],
+    },
+    "pc_u6_u7": {
+        "title": "Progress check 3 · Units 6–7",
+        "component": "progress_checks",
+        "minutes": 15,
+        "questions": [
+            ("We ___ to the beach last Saturday.", ["go", "went", "goed"], "went"),
+            ("___ you see the match yesterday?", ["Did", "Do", "Were"], "Did"),
+            ("My new job is ___ than my old one.", ["more interesting", "interestinger", "most interesting"], "more interesting"),
+            ("Listen! The manager ___ on the phone.", ["is talking", "talks", "talked"], "is talking"),
+        ],
+    },
+    "pc_u8_u9": {
+        "title": "Progress check 4 · Units 8–9",
+        "component": "progress_checks",
+        "minutes": 15,
+        "questions": [
+            ("Next summer we ___ visit Cancún.", ["are going to", "going to", "go to"], "are going to"),
+            ("___ time does the train leave?", ["What", "How", "Who"], "What"),
+            ("You have a headache. You ___ drink more water.", ["should", "shouldn't", "don't"], "should"),
+            ("___ this medicine twice a day.", ["Take", "Taking", "To take"], "Take"),
+        ],
+    },
+    "final": {
+        "title": "Final exam · Units 1–10",
+        "component": "final",
+        "minutes": 40,
+        "questions": [
+            ("Where ___ your parents from?", ["are", "is", "do"], "are"),
+            ("My brother ___ TV in the morning.", ["never watches", "watches never", "never watch"], "never watches"),
+            ("Would you like ___ cheese?", ["some", "any", "a"], "some"),
+            ("There ___ any chairs in the classroom.", ["aren't", "isn't", "not"], "aren't"),
+            ("She ___ a new phone last month.", ["buyed", "bought", "buys"], "bought"),
+            ("My suitcase is ___ than yours.", ["heavier", "more heavy", "heaviest"], "heavier"),
+            ("You ___ smoke. It's bad for you.", ["shouldn't", "should", "don't should"], "shouldn't"),
+            ("Have you ever ___ to Canada?", ["been", "went", "go"], "been"),
+        ],
+    },
+}
+
+
+def exam_sets() -> list:
+    return [
+        ExamSet(
+            exam_id,
+            spec["title"],
+            spec["component"],
+            spec["minutes"],
+            tuple(
+                Question(f"q{number}", prompt, tuple(options), answer)
+                for number, (prompt, options, answer) in enumerate(spec["questions"], 1)
+            ),
+        )
+        for exam_id, spec in EXAM_QUESTION_SETS.items()
+    ]
+
+
+@st.cache_resource(show_spinner=False)
+def get_exam_center():
+    """Motor de exámenes con los bancos precargados; cada entrega va al gradebook una sola vez."""
+    engine = get_exam_engine(EXAMS_FILE, flush_interval=EXAM_FLUSH_SECONDS, grace_seconds=EXAM_GRACE_SECONDS)
+    engine.load(exam_sets())
+    book = get_course_gradebook()
+
+    def record_exam(attempt):
+        component = engine.exam(attempt.exam_id).component
+        book.record(attempt.student, component, f"exam:{attempt.exam_id}", attempt.score, source="exam")
+
+    engine.add_listener(record_exam)
+    return engine
+
+
+def render_exam_countdown(attempt):
+    """
+    Cuenta regresiva en el navegador (sin reruns). Solo muestra la hora
+    límite del servidor; al llegar a 0 pulsa "Submit exam" y, cada
+    EXAM_AUTOSAVE_SECONDS, "Save answers" para mandar el lote pendiente.
+    """
+    components.html(
+        f"""
+<div id="exam-clock" style="font-family:sans-serif;font-size:1.3rem;font-weight:600;color:#1f3b73"></div>
+<script>
+const end = Date.now() + {int(attempt.remaining() * 1000)};
+const autosaveMs = {EXAM_AUTOSAVE_SECONDS * 1000};
+let lastSave = Date.now(), submitted = false;
+function press(label) {{
+  try {{
+    for (const b of window.parent.document.querySelectorAll("button")) {{
+      if (b.innerText.includes(label)) {{ b.click(); return; }}
+    }}
+  }} catch (e) {{}}
+}}
+function tick() {{
+  const left = Math.max(0, end - Date.now());
+  const m = Math.floor(left / 60000), s = Math.floor(left / 1000) % 60;
+  document.getElementById("exam-clock").textContent =
+    left ? `⏱️ ${{m}}:${{String(s).padStart(2, "0")}} left` : "⏱️ Time is up: sending your answers…";
+  if (!left && !submitted) {{ submitted = true; press("Submit exam"); return; }}
+  if (autosaveMs && Date.now() - lastSave >= autosaveMs) {{ lastSave = Date.now(); press("Save answers"); }}
+  setTimeout(tick, 250);
+}}
+tick();
+</script>
+""",
+        height=45,
+    )
+
+
+@st.fragment
+def render_exam_attempt(attempt_id: str):
+    """
+    Un intento en curso. Es un fragmento y las preguntas van en un
+    formulario: elegir respuestas no hace rerun, y guardar solo vuelve a
+    ejecutar este bloque.
+    """
+    engine = get_exam_center()
+    attempt = engine.get(attempt_id)
+    exam = engine.exam(attempt.exam_id)
+    if not attempt.submitted and attempt.remaining() <= 0:
+        # La cuenta regresiva pulsa "Submit exam" al llegar a 0, así que ese clic
+        # siempre llega tarde: las respuestas del formulario aún cuentan dentro
+        # del margen (grace). Sin clic, se entrega solo lo guardado.
+        pressed = any(
+            st.session_state.get(f"exam_{action}_{attempt.exam_id}") for action in ("submit", "save")
+        )
+        answers = (
+            {q.qid: st.session_state.get(f"exam_{attempt_id}_{q.qid}") for q in exam.questions} if pressed else None
+        )
+        attempt = engine.submit(attempt_id, answers)
+    if attempt.submitted:
+        total = len(exam.questions)
+        st.success(
+            f"Submitted · {round(attempt.score * total)} / {total} ({attempt.score:.0%}). "
+            "Your score is in your gradebook."
+        )
+        return
+
+    render_exam_countdown(attempt)
+    saved = engine.answers(attempt_id)
+    with st.form(f"exam_{attempt.exam_id}"):
+        for number, question in enumerate(exam.questions, 1):
+            st.radio(
+                f"{number}. {question.prompt}",
+                question.options,
+                index=question.options.index(saved[question.qid]) if question.qid in saved else None,
+                key=f"exam_{attempt_id}_{question.qid}",
+            )
+        col_save, col_submit = st.columns(2)
+        save = col_save.form_submit_button("💾 Save answers", use_container_width=True, key=f"exam_save_{attempt.exam_id}")
+        submit = col_submit.form_submit_button(
+            "✅ Submit exam", type="primary", use_container_width=True, key=f"exam_submit_{attempt.exam_id}"
+        )
+    answers = {q.qid: st.session_state.get(f"exam_{attempt_id}_{q.qid}") for q in exam.questions}
+    if submit:
+        engine.submit(attempt_id, answers)
+        st.rerun()
+    elif save:
+        engine.save(attempt_id, answers)
+        answered = len(engine.answers(attempt_id))
+        if engine.get(attempt_id).remaining() <= 0:
+            st.warning("Time is up: only the answers saved before the end count.")
+        else:
+            st.caption(f"Saved at {dt.datetime.now():%H:%M:%S} · {answered} / {len(exam.questions)} answered.")
+    else:
+        every = f"{EXAM_AUTOSAVE_SECONDS // 60} min" if EXAM_AUTOSAVE_SECONDS % 60 == 0 else f"{EXAM_AUTOSAVE_SECONDS} s"
+        st.caption(f"Answers are saved when you press “Save answers” (and automatically every {every}).")
+
+
+def render_exams_section():
+    """Exámenes del estudiante con sesión: estado de cada uno y el intento elegido."""
+    st.markdown("### Progress checks & exams")
+    _, email, _ = get_current_user()
+    if not email:
+        st.caption("Log in to take the timed progress checks and exams.")
+        return
+    engine = get_exam_center()
+    exams = engine.exams()
+    attempts = {exam.exam_id: engine.attempt(email, exam.exam_id) for exam in exams}
+
+    def status(attempt) -> str:
+        if attempt is None:
+            return "Not started"
+        if attempt.submitted:
+            return f"{attempt.score:.0%}"
+        return f"In progress · {int(attempt.remaining() // 60)} min left"
+
+    render_static_table(
+        [[exam.title, len(exam.questions), f"{exam.minutes} min", status(attempts[exam.exam_id])] for exam in exams],
+        ["Exam", "Questions", "Time", "Status"],
+    )
+    exam_id = st.selectbox(
+        "Exam", [exam.exam_id for exam in exams], format_func=lambda i: engine.exam(i).title, key="exam_choice"
+    )
+    attempt = attempts[exam_id]
+    if attempt is None:
+        exam = engine.exam(exam_id)
+        st.caption(
+            f"{len(exam.questions)} questions · {exam.minutes} minutes. The clock starts when you press Start "
+            "and keeps running if you leave the page."
+        )
+        if st.button("▶️ Start", key=f"exam_start_{exam_id}"):
+            engine.start(email, exam_id)
+            st.rerun()
+        return
+    render_exam_attempt(attempt.attempt_id)
+
+
+def render_exam_results_section():
+    """Resumen por examen para el Teacher Panel (útil durante una aplicación simultánea)."""
+    with st.expander("📝 Exams", expanded=False):
+        engine = get_exam_center()
+        results = engine.results()
+        if not results:
+            st.info("Nobody has started an exam yet.")
+            return
+        rows = []
+        for exam in engine.exams():
+            attempts = [a for a in results if a.exam_id == exam.exam_id]
+            scores = [a.score for a in attempts if a.submitted]
+            rows.append(
+                [
+                    exam.title,
+                    len(attempts) - len(scores),
+                    len(scores),
+                    f"{sum(scores) / len(scores):.0%}" if scores else "–",
+                ]
+            )
+        render_static_table(rows, ["Exam", "In progress", "Submitted", "Average"])
+        st.caption(
+            f"Scores go to the gradebook when an exam is submitted. Unsubmitted attempts are closed "
+            f"automatically {EXAM_GRACE_SECONDS:.0f} s after their time is up."
+        )
+
+
+# ==========================
+# AUTO-CHECK (rubrics)
+# ==========================
+
+
+@st.cache_resource(show_spinner=False)
+def get_answer_rubrics():
+    """ANSWER_RUBRICS compiladas una vez por proceso."""
+    return compile_rubrics(ANSWER_RUBRICS)
+
+
+def render_first_pass_mark(rubric_id: str, text: str):
+    """Nota automática y orientativa de una respuesta; no va al gradebook."""
+    rubric = get_answer_rubrics().get(rubric_id)
+    if rubric is None:
+        return
+    mark = rubric.check(text)
+    tips = f" · to improve: {', '.join(mark.missed)}" if mark.missed else " · well done!"
+    st.caption(f"🧮 Quick check: {mark.score:.0%}{tips}")
+
+
+def render_auto_marks_section():
+    """Teacher Panel: primera pasada de todas las respuestas guardadas con las rúbricas."""
+    import pandas as pd
+
+    with st.expander("🧮 First-pass marks (rubrics)", expanded=False):
+        st.caption(
+            "Cada respuesta guardada se califica con la rúbrica de su ejercicio (`ANSWER_RUBRICS`): "
+            "patrones, palabras clave y extensión. Es una primera pasada para revisar más rápido; "
+            "no cambia el gradebook. Solo califica respuestas en vivo, no las del archivo por trimestre."
+        )
+        if st.button("▶️ Mark all saved answers", key="auto_marks_run"):
+            if not RESPONSES_FILE.exists():
+                st.info("No answers saved yet.")
+            else:
+                get_response_writer().flush(RESPONSE_ACK_TIMEOUT)
+                workers = RUBRIC_WORKERS or min(8, os.cpu_count() or 1)
+                started = time.perf_counter()
+                with st.spinner("Marking answers…"), span("teacher.auto_marks") as marks_span:
+                    count = rescore_responses(RESPONSES_FILE, ANSWER_RUBRICS, AUTO_MARKS_FILE, workers=workers)
+                    marks_span.set(rows=count, workers=workers)
+                st.success(f"{count} answers marked in {time.perf_counter() - started:.1f} s.")
+
+        if not AUTO_MARKS_FILE.exists():
+            return
+        marks = pd.read_csv(AUTO_MARKS_FILE, keep_default_na=False)
+        if marks.empty:
+            st.info("None of the saved answers has a rubric yet.")
+            return
+        summary = marks.groupby("exercise")["score"].agg(["count", "mean"])
+        render_static_table(
+            [[exercise, int(row["count"]), f"{row['mean']:.0%}"] for exercise, row in summary.iterrows()],
+            ["Exercise", "Answers", "Average"],
+        )
+        st.dataframe(
+            marks.sort_values("score")[["user_name", "user_email", "exercise", "score", "missed", "timestamp"]],
+            use_container_width=True,
+            hide_index=True,
+            column_config={
+                "score": st.column_config.ProgressColumn("Mark", min_value=0.0, max_value=1.0, format="percent"),
+                "missed": "To check",
+            },
+        )
+        st.download_button(
+            "⬇️ Download first-pass marks (CSV)",
+            data=AUTO_MARKS_FILE.read_bytes(),
+            file_name=f"auto_marks_{dt.date.today():%Y%m%d}.csv",
+            mime="text/csv",
+            key="auto_marks_download",
+        )
+
+
+# ==========================
+# LOGO & SIGNATURE
+# ==========================
+
+def show_logo():
+    logo_path = os.path.join("assets", "logo-english-classes.png")
+    if os.path.exists(logo_path):
+        try:
+            st.image(logo_path, width=220)
+        except Exception:
+            st.warning("The file 'logo-english-classes.png' exists but is not a valid image.")
+
+
+def show_signature():
+    sig_path = os.path.join("assets", "firma-ivan-diaz.png")
+    if os.path.exists(sig_path):
+        try:
+            st.image(sig_path, width=220)
+        except Exception:
+            st.warning("The file 'firma-ivan-diaz.png' exists but is not a valid image.")
+    else:
+        st.info("Add your signature as 'assets/firma-ivan-diaz.png' to display it here.")
+
+# ==========================
+# APP SHELL / HERO
+# ==========================
+
+def get_logo_data_uri(max_width: int = 240) -> str:
+    """
+    Returns a data URI for the Flunex logo to embed it in HTML headers.
+    The hero shows it at ~56px, so a downscaled copy is embedded instead of
+    the full-size PNG (which would add ~2 MB of base64 to every rerun).
+    """
+    CACHE_LOOKUPS.inc(layer="logo_st_cache")
+    return _logo_data_uri(max_width)
+
+
+@st.cache_data(show_spinner=False)
+def _logo_data_uri(max_width: int) -> str:
+    CACHE_MISSES.inc(layer="logo_st_cache")
+    logo_path = BASE_DIR / "assets" / "logo-english-classes.png"
+    if not logo_path.exists():
+        return ""
+    try:
+        data = logo_path.read_bytes()
+        mime = "image/png" if logo_path.suffix.lower() in {".png", ".apng", ".webp"} else "image/jpeg"
+        try:
+            from io import BytesIO
+
+            from PIL import Image
+
+            with Image.open(BytesIO(data)) as img:
+                img.thumbnail((max_width, max_width))
+                buffer = BytesIO()
+                img.save(buffer, format="PNG", optimize=True)
+            data, mime = buffer.getvalue(), "image/png"
+        except Exception:
+            pass  # Sin Pillow (o imagen rara) se usa el archivo original.
+        return f"data:{mime};base64,{base64.b64encode(data).decode('ascii')}"
+    except Exception:
+        return ""
+
+
+def get_shell_media(query: str = "english learning") -> dict:
+    """
+    Media for the hero area. Uses Pexels if available, otherwise falls back
+    to the local gradient.
+    """
+    media = fetch_pexels_image(
+        query=query,
+        fallback_url=FLUNEX_GRADIENT_DATA_URI,
+        orientation="landscape",
+    )
+    media["url"] = media.get("url") or FLUNEX_GRADIENT_DATA_URI
+    return media
+
+
+def render_app_shell():
+    hero_media = get_shell_media("english learning")
+    hero_url = (hero_media.get("url") or FLUNEX_GRADIENT_DATA_URI).replace("'", "%27")
+    logo_uri = get_logo_data_uri()
+    logo_html = f'<img src="{logo_uri}" alt="Flunex logo" />' if logo_uri else "<div class='flx-level-pill'>Flunex</div>"
+
+    credit = hero_media.get("attribution") or "English learning · classroom"
+    shell_html = textwrap.dedent(
+        f"""
+<div class="flx-shell" style="background-image: linear-gradient(125deg, rgba(15,23,42,0.78), rgba(31,75,153,0.6)), url('{hero_url}');">
+  <div class="flx-shell__header">
+    <div class="flx-brand">
+      {logo_html}
+      <div>
+        <div class="flx-brand__title">Flunex · A2 English Master</div>
+        <div class="flx-brand__subtitle">Learn, teach and track progress with confidence</div>
+      </div>
+    </div>
+    <div class="flx-level-pill">A2 · Elementary</div>
+  </div>
+
+  <div class="flx-shell__card">
+    <div class="flx-shell__eyebrow">Welcome</div>
+    <div class="flx-shell__headline">Communicate clearly in real situations</div>
+    <p class="flx-shell__copy">
+      Practical lessons, structured progress and bilingual guidance for tourism, work and everyday life.
+      Choose your path below.
+    </p>
+    <div class="flx-shell__actions">
+      <form method="get" class="flx-action-form">
+        <input type="hidden" name="page" value="Access" />
+        <button type="submit" class="flx-cta flx-cta--primary">I am a student</button>
+      </form>
+      <form method="get" class="flx-action-form">
+        <input type="hidden" name="page" value="Content Admin" />
+        <button type="submit" class="flx-cta flx-cta--ghost">I am a teacher / admin</button>
+      </form>
+    </div>
+    <div class="flx-tag">{credit}</div>
+  </div>
+</div>
+"""
+    )
+    st.markdown(shell_html, unsafe_allow_html=True)
+
+
+def render_banner(query: str, title: str, caption: str = ""):
+    media = fetch_pexels_image(
+        query=query,
+        fallback_url=FLUNEX_GRADIENT_DATA_URI,
+        orientation="landscape",
+    )
+    url = (media.get("url") or FLUNEX_GRADIENT_DATA_URI).replace("'", "%27")
+    credit = media.get("attribution")
+    credit_html = f"<span class='flx-tag'>{credit}</span>" if credit else ""
+    caption_html = f"<div class='flx-sub-banner__caption'>{caption}</div>" if caption else ""
+
+    st.markdown(
         textwrap.dedent(
             f"""
 <div class="flx-sub-banner" style="background-image: linear-gradient(140deg, rgba(15,23,42,0.78), rgba(31,75,153,0.5)), url('{url}');">
@@ -1802,6 +3087,7 @@ PAGES = [
     {"id": "Assessment & Progress", "label": "Assessment", "icon": "📝"},
     {"id": "Instructor", "label": "Instructor", "icon": "👨‍🏫"},
     {"id": "Enter your class", "label": "Class", "icon": "🎓"},
+    {"id": "Search", "label": "Search", "icon": "🔎"},
     {"id": "Access", "label": "Access", "icon": "🔐"},
     {"id": "Teacher Panel", "label": "Teacher", "icon": "📂"},
     {"id": "Content Admin", "label": "Content admin", "icon": "⚙️"},
@@ -1817,11 +3103,15 @@ def _get_query_params():
     return params
 
 
+def _query_param(name: str) -> Optional[str]:
+    value = _get_query_params().get(name)
+    if isinstance(value, list):
+        value = value[0] if value else None
+    return value
+
+
 def get_current_page_id() -> str:
-    params = _get_query_params()
-    page = params.get("page")
-    if isinstance(page, list):
-        page = page[0] if page else None
+    page = _query_param("page")
     valid_ids = [p["id"] for p in PAGES]
     if not page or page not in valid_ids:
         return "Overview"
@@ -1884,6 +3174,8 @@ def render_audio_card(title: str, filename: str, description: Optional[str] = No
     if description:
         st.caption(description)
     _audio_or_warning(filename)
+    if (AUDIO_DIR / filename).exists():
+        progress_checkbox(f"audio:{filename}", "🎧 I listened to this")
 
 
 def render_presentation_html(filename: str):
@@ -1904,6 +3196,7 @@ def render_presentation_html(filename: str):
 # UNIT 2 – SESSIONS
 # ==========================
 
+@traced("lesson.render_unit2_session1_hour1")
 def render_unit2_session1_hour1():
     st.subheader("Unit 2 – Session 1 · 1st Hour – Grammar & Writing")
     st.markdown("### Theme: Daily routines")
@@ -1999,6 +3292,7 @@ def render_unit2_session1_hour1():
     unit2_answer_box("S1", "H1", "writing", "My typical day – paragraph")
 
 
+@traced("lesson.render_unit2_session1_hour2")
 def render_unit2_session1_hour2():
     st.subheader("Unit 2 – Session 1 · 2nd Hour – Listening & Speaking")
     st.markdown("### Theme: Daily routines (listening & speaking)")
@@ -2068,6 +3362,7 @@ def render_unit2_session1_hour2():
     unit2_answer_box("S1", "H2", "speaking", "Speaking – My day (notes)")
 
 
+@traced("lesson.render_unit2_session2_hour1")
 def render_unit2_session2_hour1():
     st.subheader("Unit 2 – Session 2 · 1st Hour – Grammar & Writing")
     st.markdown("### Theme: Free time & present simple questions")
@@ -2130,6 +3425,7 @@ def render_unit2_session2_hour1():
     unit2_answer_box("S2", "H1", "notes", "Notes / extra examples")
 
 
+@traced("lesson.render_unit2_session2_hour2")
 def render_unit2_session2_hour2():
     st.subheader("Unit 2 – Session 2 · 2nd Hour – Listening & Speaking")
     st.markdown("### Theme: Free time (listening & survey)")
@@ -2186,6 +3482,7 @@ def render_unit2_session2_hour2():
     unit2_answer_box("S2", "H2", "summary", "Final summary to present")
 
 
+@traced("lesson.render_unit2_session3_hour1")
 def render_unit2_session3_hour1():
     st.subheader("Unit 2 – Session 3 · 1st Hour – Grammar & Writing")
     st.markdown("### Theme: Habits & lifestyle")
@@ -2247,6 +3544,7 @@ def render_unit2_session3_hour1():
     unit2_answer_box("S3", "H1", "lifestyle", "My lifestyle – paragraph")
 
 
+@traced("lesson.render_unit2_session3_hour2")
 def render_unit2_session3_hour2():
     st.subheader("Unit 2 – Session 3 · 2nd Hour – Listening & Speaking")
     st.markdown("### Theme: Habits & lifestyle (listening & speaking)")
@@ -2304,6 +3602,7 @@ def render_unit2_session3_hour2():
 # CLASS 1 – FOOD VOCABULARY
 # ==========================
 
+@traced("lesson.unit3_class1_food_vocabulary")
 def unit3_class1_food_vocabulary():
     """
     A2 – Unit 3: Food · Class 1 – Food vocabulary
@@ -2381,64 +3680,9 @@ Write short sentences:
 
         st.markdown("### 2.1 Food groups")
 
-        col1, col2, col3, col4 = st.columns(4)
-
-        with col1:
-            st.markdown(
-                """
-**Fruits**
-
-- apple  
-- banana  
-- orange  
-- grape  
-- pineapple  
-- mango  
-                """
-            )
-
-        with col2:
-            st.markdown(
-                """
-**Vegetables**
-
-- tomato  
-- carrot  
-- onion  
-- lettuce  
-- potato  
-- cucumber  
-                """
-            )
-
-        with col3:
-            st.markdown(
-                """
-**Drinks**
-
-- water  
-- juice  
-- soda  
-- coffee  
-- tea  
-- milk  
-                """
-            )
-
-        with col4:
-            st.markdown(
-                """
-**Other food**
-
-- bread  
-- rice  
-- pasta  
-- eggs  
-- cheese  
-- chicken  
-- fish  
-                """
-            )
+        for col, (group, words) in zip(st.columns(len(U3_C1_FOOD_GROUPS)), U3_C1_FOOD_GROUPS.items()):
+            with col:
+                st.markdown(f"**{group}**\n\n" + "\n".join(f"- {word}  " for word in words))
 
         st.markdown("---")
         st.markdown("### 2.2 Check meaning")
@@ -2470,6 +3714,9 @@ Then say the answers:
             """
         )
 
+        st.markdown("---")
+        render_vocab_trainer("u3c1")
+
     # ============= TAB 3: PRONUNCIATION =============
     with tab3:
         st.subheader("3. Pronunciation – Listen and repeat")
@@ -2521,6 +3768,7 @@ Focus on **word stress**:
         p5 = st.text_input("5) My favourite drink is ______.")
 
         if st.button("Show sample answers – Practice"):
+            record_progress("quiz:u3c1_practice")
             st.markdown(
                 """
 **Sample answers (just examples):**
@@ -2549,6 +3797,7 @@ Focus on **word stress**:
         )
 
         if st.button("Check answers – Multiple choice"):
+            record_quiz_result("quiz:u3c1_mc", [(mc1, "water"), (mc2, "tomato")])
             st.info("Suggested answers: 1) **water**  2) **tomato**")
 
     # ============= TAB 5: LISTENING =============
@@ -2601,6 +3850,7 @@ Then answer the questions.
         )
 
         if st.button("Check answers – Listening"):
+            record_quiz_result("quiz:u3c1_listening", [(l1, "Some apples and bananas"), (l2, "Orange juice")])
             st.info(
                 "Suggested key (adapt to your final script):\n\n"
                 "1) ✅ Some apples and bananas\n"
@@ -2640,7 +3890,7 @@ Complete:
             """
         )
 
-        reflection = st.text_area(
+        reflection = draft_text_area(
             "Write your reflection here:",
             key="u3c1_reflection"
         )
@@ -2683,6 +3933,9 @@ Complete:
                 if path:
                     st.success(f"Audio 1 generated and saved at: {path}")
                     st.audio(str(path))
+            if st.button("▶️ Stream preview of Audio 1", key="btn_u3_c1_audio1_preview"):
+                start_tts_preview("u3_c1_audio1", script1, voice1, audio1_filename)
+            render_tts_preview_player("u3_c1_audio1")
 
         with st.expander("Generate / regenerate Audio 2 – At the supermarket"):
             script2 = st.text_area(
@@ -2711,6 +3964,9 @@ Complete:
                 if path:
                     st.success(f"Audio 2 generated and saved at: {path}")
                     st.audio(str(path))
+            if st.button("▶️ Stream preview of Audio 2", key="btn_u3_c1_audio2_preview"):
+                start_tts_preview("u3_c1_audio2", script2, voice2, audio2_filename)
+            render_tts_preview_player("u3_c1_audio2")
 
 
 # ==========================
@@ -2798,6 +4054,7 @@ def _parse_quiz_payload(raw) -> list:
     return parsed
 
 
+@traced("lesson.render_structured_lesson_content")
 def render_structured_lesson_content(
     content: dict,
     *,
@@ -2826,6 +4083,9 @@ def render_structured_lesson_content(
 
     with tab_dialogue:
         st.markdown("#### Dialogue")
+        dialogue_audio = (content or {}).get("dialogue_audio")
+        if dialogue_audio:
+            _audio_or_warning(dialogue_audio)
         if dialogue:
             st.text(dialogue)
         else:
@@ -2856,6 +4116,7 @@ def render_structured_lesson_content(
                         st.warning(f"Suggested answer: {question['answer']}")
 
 
+@traced("lesson.render_unit3_class2_content")
 def render_unit3_class2_content(content: dict, preview: bool = False):
     notes = content.get("class_notes") or DEFAULT_U3C2_CONTENT["class_notes"]
     dialogue = content.get("listening_dialogue") or DEFAULT_U3C2_CONTENT["listening_dialogue"]
@@ -2872,6 +4133,8 @@ def render_unit3_class2_content(content: dict, preview: bool = False):
 
     with tab_dialogue:
         st.markdown("#### Dialogue")
+        if content.get("dialogue_audio"):
+            _audio_or_warning(content["dialogue_audio"])
         st.text(dialogue)
         st.info("Play your audio file or read this dialogue aloud for listening practice.")
 
@@ -2898,6 +4161,7 @@ def render_unit3_class2_content(content: dict, preview: bool = False):
                         st.warning(f"Suggested answer: {question['answer']}")
 
 
+@traced("lesson.unit3_class2_at_restaurant")
 def unit3_class2_at_restaurant():
     st.title("Unit 3 – Food")
     st.subheader("Class 2 – At the restaurant")
@@ -3022,6 +4286,7 @@ def render_placeholder_lesson(unit_title: str, lesson_title: str):
         st.info("This lesson is not developed yet. Add content by creating a new renderer function like Unit 3 • Class 2.")
 
 
+@traced("lesson.render_u3_c2_at_the_restaurant")
 def render_u3_c2_at_the_restaurant(unit_title: str, lesson_title: str, key_prefix: str = "u3c2"):
     st.subheader(f"{unit_title} • {lesson_title}")
     render_banner(
@@ -3198,6 +4463,7 @@ Examples:
     st.success("Unit 3 • Class 2 is ready. Add your audio file path later where indicated.")
 
 
+@traced("lesson.render_u3_c3_talking_about_food_you_like")
 def render_u3_c3_talking_about_food_you_like(
     unit_title: str = "Unit 3 – Food",
     lesson_title: str = "Class 3 – Talking about food you like"
@@ -3241,13 +4507,12 @@ def render_u3_c3_talking_about_food_you_like(
 
         col1, col2 = st.columns(2)
         with col1:
-            st.markdown("**Taste & texture**")
-            st.write("- spicy / mild\n- sweet / salty / sour / bitter\n- crunchy / soft\n- creamy\n- fresh\n- greasy / oily")
-            st.markdown("**Cooking methods**")
-            st.write("- grilled\n- fried\n- baked\n- boiled\n- steamed")
+            for group in ("Taste & texture", "Cooking methods"):
+                st.markdown(f"**{group}**")
+                st.write("\n".join(f"- {entry}" for entry in U3_C3_VOCABULARY[group]))
         with col2:
             st.markdown("**Preference verbs**")
-            st.write("- love\n- like\n- enjoy\n- don’t mind\n- don’t like\n- hate")
+            st.write("\n".join(f"- {entry}" for entry in U3_C3_VOCABULARY["Preference verbs"]))
             st.markdown("**Useful phrases**")
             st.write("- *My favorite dish is…*\n- *I’m not a fan of…*\n- *It’s too… (spicy/salty/sweet).*")
 
@@ -3255,6 +4520,8 @@ def render_u3_c3_talking_about_food_you_like(
             st.write("Put these words into two groups: taste / texture.")
             st.write("**spicy, crunchy, creamy, salty, soft, bitter, fresh, sweet**")
 
+        render_vocab_trainer("u3c3")
+
     with tabs[2]:
         st.markdown("#### Grammar (A2): love/like/hate + nouns & -ing")
         st.markdown(
@@ -4015,7 +5282,191 @@ INTERACTIVE_CLASS_CONTENT = {
     }
 }
 
+# Rúbricas de primera pasada (helpers/rubrics.py) para las prácticas y answer_boxes.
+# Los patrones se escriben sobre texto normalizado: minúsculas, comillas rectas,
+# contracciones expandidas ("I'm" -> "i am", "don't" -> "do not").
+_RUBRIC_QUESTION = [
+    {"label": "starts like a question", "regex": r"^(?:what|where|who|how|when|why|which|do|does|did|are|is|can|would)\b"},
+    {"label": "ends with ?", "regex": r"\?\s*$"},
+]
+_RUBRIC_THIRD_PERSON = {"label": "no 'she go' (3rd person -s)", "avoid": r"\b(?:he|she) (?:go|have|do|get|wake|take|work|like|play)\b"}
+_RUBRIC_BE_AGREEMENT = {"label": "no 'I is' / 'she are'", "avoid": r"\b(?:i (?:is|are)|(?:he|she|it) (?:are|am))\b"}
+_RUBRIC_ROUTINE_VERB = r"\bi (?:always |usually |often |sometimes |never )?(?:get up|wake up|have|take|go|eat|drink|brush|start|leave|finish|watch|cook|read|sleep|study|work|relax)\b"
+_RUBRIC_FREQUENCY = ["always", "usually", "often", "sometimes", "never", "rarely", "every day", "once a week", "twice a week"]
+
+ANSWER_RUBRICS = {
+    # Unit 1 · Class 1
+    "u1c1_practice_1": {
+        "criteria": [
+            {"label": "says who you are", "regex": r"\b(?:my name is|i am|this is)\b"},
+            {"label": "says your city", "regex": r"\b(?:from|live in|i am in)\b"},
+            _RUBRIC_BE_AGREEMENT,
+        ],
+    },
+    "u1c1_practice_2": {
+        "criteria": [
+            {"label": "he / she is …", "regex": r"\b(?:he|she) is\b"},
+            {"label": "two describing words", "keywords": ["friend", "colleague", "teacher", "student", "doctor", "engineer", "tall", "short", "kind", "funny", "friendly", "nice", "smart", "from"], "min": 2},
+            _RUBRIC_BE_AGREEMENT,
+        ],
+    },
+    "u1c1_practice_3": {"criteria": _RUBRIC_QUESTION},
+    # Unit 1 · Class 2
+    "u1c2_practice_1": {
+        "criteria": [
+            {"label": "I'm + name or job", "regex": r"\bi am (?!from\b)\w+"},
+            {"label": "I'm from + place", "regex": r"\bi am from \w+"},
+            {"label": "no 'I from'", "avoid": r"\bi from\b"},
+        ],
+    },
+    "u1c2_practice_2": {
+        "criteria": [
+            {"label": "he / she is …", "regex": r"\b(?:he|she) is\b|\b(?:his|her) name is\b"},
+            {"label": "nationality", "keywords": ["mexican", "american", "canadian", "brazilian", "spanish", "french", "german", "italian", "japanese", "chinese", "british", "english", "colombian", "argentinian", "peruvian", "chilean"]},
+            {"label": "job", "keywords": ["teacher", "doctor", "nurse", "engineer", "student", "waiter", "waitress", "chef", "driver", "guide", "receptionist", "manager", "lawyer", "police officer", "accountant", "designer", "programmer"]},
+            _RUBRIC_BE_AGREEMENT,
+        ],
+    },
+    "u1c2_practice_3": {"criteria": _RUBRIC_QUESTION},
+    # Unit 1 · Class 3
+    "u1c3_practice_1": {
+        "criteria": [
+            {"label": "family word", "keywords": ["mother", "father", "mom", "dad", "sister", "brother", "grandmother", "grandfather", "aunt", "uncle", "cousin", "son", "daughter", "wife", "husband"]},
+            {"label": "he / she is …", "regex": r"\b(?:he|she) is\b"},
+            {"label": "two sentences", "regex": r"[.!?]\s+\w"},
+            _RUBRIC_BE_AGREEMENT,
+        ],
+    },
+    "u1c3_practice_2": {
+        "criteria": [
+            {
+                "label": "three adjectives",
+                "keywords": ["punctual", "organized", "friendly", "kind", "funny", "helpful", "hard-working", "hardworking", "creative", "patient", "serious", "smart", "intelligent", "polite", "quiet", "talkative", "responsible", "reliable", "honest", "generous", "nice", "calm", "shy", "outgoing", "busy", "professional"],
+                "min": 3,
+            },
+        ],
+    },
+    "u1c3_practice_3": {"criteria": _RUBRIC_QUESTION},
+    # Unit 2 · Class 1
+    "u2c1_practice_1": {
+        "criteria": [
+            {"label": "I + routine verb", "regex": _RUBRIC_ROUTINE_VERB},
+            {"label": "morning / time words", "keywords": ["morning", "at", "o'clock", "early", "breakfast", "shower", "then"], "min": 2},
+            {"label": "12+ words", "min_words": 12},
+            _RUBRIC_THIRD_PERSON,
+        ],
+    },
+    "u2c1_practice_2": {
+        "criteria": [
+            {"label": "I + routine verb", "regex": _RUBRIC_ROUTINE_VERB},
+            {"label": "evening words", "keywords": ["evening", "night", "dinner", "tv", "bed", "home", "sleep"], "min": 2},
+            {"label": "8+ words", "min_words": 8},
+        ],
+    },
+    "u2c1_practice_3": {
+        "criteria": _RUBRIC_QUESTION + [
+            {"label": "uses do / does", "avoid": r"^(?:what time|when|how often|where) (?:you|he|she|they)\b"},
+        ],
+    },
+    # Unit 2 · Class 2
+    "u2c2_practice_1": {
+        "criteria": [
+            {"label": "I like / love / do not like", "regex": r"\bi (?:like|love|do not like|enjoy|hate)\b"},
+            {"label": "two sentences", "regex": r"[.!?]\s+\w"},
+            {"label": "no 'I no like'", "avoid": r"\bi no \w+"},
+        ],
+    },
+    "u2c2_practice_2": {
+        "criteria": [
+            {"label": "activity words", "keywords": ["play", "watch", "read", "swim", "run", "dance", "cook", "walk", "ride", "listen", "paint", "football", "soccer", "music", "movies", "games", "gym", "park"], "min": 2},
+            {"label": "when / how often", "keywords": _RUBRIC_FREQUENCY + ["on", "weekend", "weekends", "saturday", "sunday", "evening", "afternoon"]},
+            {"label": "15+ words", "min_words": 15},
+        ],
+    },
+    "u2c2_practice_3": {
+        "criteria": [
+            {"label": "invitation phrase", "regex": r"\b(?:do you want to|would you like to|let us|shall we|how about|what about|are you free)\b"},
+            {"label": "ends with ?", "regex": r"\?\s*$"},
+        ],
+    },
+    # Unit 2 · Class 3
+    "u2c3_practice_1": {
+        "criteria": [
+            {"label": "two connectors", "keywords": ["and", "but", "because"], "min": 2},
+            {"label": "because + reason", "regex": r"\bbecause \w+"},
+            {"label": "15+ words", "min_words": 15},
+        ],
+    },
+    "u2c3_practice_2": {
+        "criteria": [
+            {"label": "healthy habit", "keywords": ["healthy", "exercise", "walk", "run", "water", "vegetables", "fruit", "sleep", "gym", "yoga", "swim", "bike"]},
+            {"label": "how often", "keywords": _RUBRIC_FREQUENCY + ["every morning", "times a week"]},
+            {"label": "8+ words", "min_words": 8},
+        ],
+    },
+    "u2c3_practice_3": {
+        "criteria": [
+            {"label": "we both …", "regex": r"\b(?:we both|both of us)\b"},
+            {"label": "but I / he / she …", "regex": r"\bbut (?:i|he|she|my)\b"},
+            _RUBRIC_THIRD_PERSON,
+        ],
+    },
+    # Answer boxes (Teacher Panel: first-pass marks)
+    "u2_S1_H1_routine_paragraph": {
+        "criteria": [
+            {"label": "I + routine verb", "regex": _RUBRIC_ROUTINE_VERB, "weight": 2},
+            {"label": "time expressions", "keywords": ["at", "in the morning", "in the afternoon", "in the evening", "every day", "then", "after that", "first"], "min": 2},
+            {"label": "adverb of frequency", "keywords": _RUBRIC_FREQUENCY},
+            {"label": "40+ words", "min_words": 40},
+            _RUBRIC_THIRD_PERSON,
+        ],
+    },
+    "u2_S1_H2_listening_notes": {
+        "criteria": [
+            {"label": "wake-up time (5:30)", "regex": r"\b5[:.]30\b|\bhalf past five\b"},
+            {"label": "checks emails after breakfast", "regex": r"\bemails?\b"},
+            {"label": "routine words", "keywords": ["wakes up", "gets up", "breakfast", "work", "morning", "then"], "min": 2},
+            {"label": "15+ words", "min_words": 15},
+        ],
+    },
+    "u2_S2_H1_free_time_email": {
+        "criteria": [
+            {"label": "greeting", "regex": r"^(?:hi|hello|dear)\b"},
+            {"label": "I like / love / enjoy", "regex": r"\bi (?:like|love|enjoy|do not like|hate)\b"},
+            {"label": "how often", "keywords": _RUBRIC_FREQUENCY + ["on weekends", "on saturdays", "on sundays"]},
+            {"label": "closing", "regex": r"\b(?:best wishes|see you|bye|regards|love|take care|write soon)\b"},
+            {"label": "40+ words", "min_words": 40},
+            {"label": "no 'enjoy to'", "avoid": r"\benjoy to\b"},
+        ],
+    },
+    "u2_S2_H2_listening_summary": {
+        "criteria": [
+            {"label": "most popular: watching TV", "regex": r"\b(?:watch|watching) (?:tv|television)\b"},
+            {"label": "Luis: football twice a week", "regex": r"\btwice a week\b"},
+            {"label": "summary words", "keywords": ["most", "people", "popular", "survey", "some", "many"], "min": 2},
+            {"label": "20+ words", "min_words": 20},
+        ],
+    },
+    "u2_S3_H1_habit_paragraph": {
+        "criteria": [
+            {"label": "habit verbs", "regex": _RUBRIC_ROUTINE_VERB},
+            {"label": "how often", "keywords": _RUBRIC_FREQUENCY},
+            {"label": "connectors", "keywords": ["and", "but", "because", "so"], "min": 2},
+            {"label": "40+ words", "min_words": 40},
+            _RUBRIC_THIRD_PERSON,
+        ],
+    },
+    "u2_S3_H2_reflection_notes": {
+        "criteria": [
+            {"label": "names a habit to change", "regex": r"\b(?:i want to|i will|i am going to|i should|i need to)\b"},
+            {"label": "gives a reason", "regex": r"\bbecause \w+"},
+            {"label": "20+ words", "min_words": 20},
+        ],
+    },
+}
+
 
+@traced("lesson.render_interactive_class")
 def render_interactive_class(config):
     unit_number = config["unit_number"]
     class_number = config["class_number"]
@@ -4039,7 +5490,7 @@ def render_interactive_class(config):
             st.markdown(warmup["intro"])
         for question in warmup.get("questions", []):
             st.markdown(f"- {question}")
-        st.text_area(
+        draft_text_area(
             "Write your ideas here:",
             key=f"{prefix}_warmup_text",
             placeholder=warmup.get("placeholder", ""),
@@ -4064,10 +5515,12 @@ def render_interactive_class(config):
     with tab3:
         st.subheader("Practice")
         for idx, prompt in enumerate(config.get("practice_prompts", []), start=1):
-            st.text_input(
+            answer = st.text_input(
                 f"{idx}) {prompt}",
                 key=f"{prefix}_practice_{idx}"
             )
+            if answer.strip():
+                render_first_pass_mark(f"{prefix}_practice_{idx}", answer)
 
         mc_questions = config.get("multiple_choice", [])
         if mc_questions:
@@ -4083,6 +5536,10 @@ def render_interactive_class(config):
                 answers_store.append((mc["question"], mc["answer"]))
 
             if st.button("Check answers – Practice", key=f"{prefix}_mc_check"):
+                record_quiz_result(
+                    f"quiz:{prefix}_mc",
+                    [(st.session_state.get(f"{prefix}_mc_{idx}"), mc["answer"]) for idx, mc in enumerate(mc_questions, start=1)],
+                )
                 feedback = "\n".join([f"- {q} → **{ans}**" for q, ans in answers_store])
                 st.info(f"Suggested answers:\n{feedback}")
 
@@ -4144,13 +5601,17 @@ def render_interactive_class(config):
                 answers_feedback.append((q["question"], q["answer"]))
 
             if listening_questions and st.button("Check answers – Listening", key=f"{prefix}_listening_check"):
+                record_quiz_result(
+                    f"quiz:{prefix}_listening",
+                    [(st.session_state.get(f"{prefix}_listening_{idx}"), q["answer"]) for idx, q in enumerate(listening_questions, start=1)],
+                )
                 summary = "\n".join([f"- {q} → **{ans}**" for q, ans in answers_feedback])
                 st.info(f"Suggested key:\n{summary}")
 
             if listening.get("writing_prompt"):
                 st.markdown("---")
                 st.markdown("### Listening follow-up")
-                st.text_area(
+                draft_text_area(
                     listening["writing_prompt"],
                     key=f"{prefix}_listening_followup"
                 )
@@ -4169,20 +5630,112 @@ def render_interactive_class(config):
             st.markdown("### Reflection")
             for item in reflection:
                 st.markdown(f"- {item}")
-        st.text_area(
+        draft_text_area(
             "Write your reflection here:",
             key=f"{prefix}_reflection"
         )
+# ==========================
+# COURSE SEARCH (INVERTED INDEX)
+# ==========================
+
+def _content_file_document(path: Path):
+    """
+    (doc_id, title, text, location) para un archivo de content/unit*/class*/.
+    """
+    unit_match = re.search(r"unit(\d+)", path.parent.parent.name)
+    class_match = re.search(r"class(\d+)", path.parent.name)
+    if not unit_match or not class_match or not path.exists():
+        return None
+    unit_number, class_number = int(unit_match.group(1)), int(class_match.group(1))
+    try:
+        raw = path.read_text(encoding="utf-8")
+        text = flatten_text(json.loads(raw)) if path.suffix == ".json" else raw
+    except Exception:
+        return None
+    label = "structured content" if path.suffix == ".json" else f"`{path.stem}`"
+    return (
+        f"content:{unit_number}:{class_number}:{path.name}",
+        f"Unit {unit_number} · Class {class_number} – {label}",
+        text,
+        f"Content Admin · content/unit{unit_number}/class{class_number}/{path.name}",
+    )
+
+
+def iter_course_documents():
+    """
+    Todo el texto del curso: syllabus, LESSONS, clases interactivas,
+    plantilla de U3C2 y los archivos guardados desde Content Admin.
+    """
+    for unit in UNITS:
+        yield (
+            f"unit:{unit['number']}",
+            f"Unit {unit['number']} – {unit['name']} (syllabus)",
+            flatten_text({k: v for k, v in unit.items() if k != "number"}),
+            "Overview · Syllabus",
+        )
+    for unit_number, lessons in LESSONS.items():
+        unit_name = UNITS[unit_number - 1]["name"] if unit_number <= len(UNITS) else ""
+        for lesson in lessons:
+            yield (
+                f"lesson:{unit_number}:{lesson['title']}",
+                f"Unit {unit_number} · {lesson['title']}",
+                flatten_text({k: v for k, v in lesson.items() if k != "title"}),
+                f"Enter your class · Unit {unit_number} – {unit_name} · {lesson['title']}",
+            )
+    for (unit_number, class_title), config in INTERACTIVE_CLASS_CONTENT.items():
+        yield (
+            f"interactive:{unit_number}:{class_title}",
+            f"Unit {unit_number} · {class_title} (interactive class)",
+            flatten_text({k: v for k, v in config.items() if k not in {"key_prefix", "answer_boxes"}}),
+            f"Enter your class · Unit {unit_number} · {class_title}",
+        )
+    yield (
+        "default:u3c2",
+        "Unit 3 · Class 2 – At the restaurant (default template)",
+        flatten_text(DEFAULT_U3C2_CONTENT),
+        "Enter your class · Unit 3 – Food · Class 2 – At the restaurant",
+    )
+    if CONTENT_DIR.exists():
+        for path in sorted(CONTENT_DIR.glob("unit*/class*/*")):
+            if path.suffix in {".json", ".txt"}:
+                doc = _content_file_document(path)
+                if doc:
+                    yield doc
+
+
+def get_course_search_index():
+    """Índice invertido del curso; se construye una vez por proceso."""
+    CACHE_LOOKUPS.inc(layer="course_search_st_resource")
+    return _course_search_index()
+
+
+@st.cache_resource(show_spinner=False)
+def _course_search_index():
+    CACHE_MISSES.inc(layer="course_search_st_resource")
+    return build_index(iter_course_documents())
+
+
+def reindex_content_file(path: Path):
+    """Actualiza solo el documento de `path` después de guardarlo en Content Admin."""
+    try:
+        doc = _content_file_document(Path(path))
+        if doc:
+            get_course_search_index().upsert(*doc)
+    except Exception:
+        pass
+
+
 # ==========================
 # PAGES
 # ==========================
 
-def overview_page():
-    render_app_shell()
+# ==========================
+# READ-ONLY PAGE CONTENT
+# ==========================
+# Literales (sin f-strings ni llamadas): python -m helpers.static_site los lee
+# de este archivo sin ejecutar la app para exportar las páginas a HTML.
 
-    st.markdown("### Course snapshot")
-    st.markdown(
-        """
+OVERVIEW_CARDS_HTML = """
 <div class="flx-card-grid">
   <div class="flx-card">
     <h3>🎯 For whom?</h3>
@@ -4197,75 +5750,226 @@ def overview_page():
     <p>Based on Cambridge Empower A2 (Second Edition).<br>Strong focus on speaking and listening.<br>Real-world topics: travel, work, culture and health.<br>Designed by Iván Díaz, Tourist Guide & English Instructor.</p>
   </div>
 </div>
-""",
-        unsafe_allow_html=True,
-    )
+"""
 
-    st.markdown("### What you gain")
-    st.markdown(
-        """
+OVERVIEW_GAINS_MD = """
 - Speak about life, work, studies and travel plans in clear, simple English.  
 - Understand real conversations at normal speed in common situations.  
 - Write short emails, messages and descriptions with correct grammar.  
 - Build a solid base to move confidently to **B1 – Intermediate**.
         """
-    )
-    st.markdown(
-        "<div class='flx-note'>Real content, bilingual guidance and progress-friendly tasks adapted for tourism and service contexts.</div>",
-        unsafe_allow_html=True,
-    )
+
+OVERVIEW_NOTE = "Real content, bilingual guidance and progress-friendly tasks adapted for tourism and service contexts."
+
+OVERVIEW_SUMMARY_ES = """
+Este curso A2 está pensado para que los estudiantes hablen de su vida diaria, trabajo y viajes 
+en un inglés claro y funcional. Integra el libro Cambridge Empower A2 y lo adapta a contextos 
+reales, especialmente útiles para turismo y servicios.
+            """
+
+CEFR_LEVELS = [
+    ["A1", "Beginner", "Can use very basic everyday expressions, introduce themselves and ask/answer simple questions."],
+    ["A2", "Elementary", "Can talk about daily routines, family, simple work, shopping and immediate needs in simple terms."],
+    ["B1", "Intermediate", "Can deal with most situations while travelling, describe experiences and give simple opinions."],
+    ["B2", "Upper-Intermediate", "Can interact with a good degree of fluency and understand the main ideas of complex texts."],
+    ["C1", "Advanced", "Can express ideas fluently and spontaneously for academic and professional purposes."],
+    ["C2", "Proficiency", "Can understand practically everything and express themselves with precision in almost any context."]
+]
+
+COURSE_LEVEL_FIT_MD = (
+    "This program corresponds to **A2 – Elementary**.\n\n"
+    "- It consolidates basic A1 structures.\n"
+    "- It expands vocabulary for daily life, work and travel.\n"
+    "- It prepares learners to move into **B1 – Intermediate** with confidence."
+)
+
+ASSESSMENT_STRUCTURE_MD = """
+- Unit progress checks every **two units**  
+- **Mid-course assessment** (after Unit 5): listening, reading, writing & speaking  
+- **Final exam** (after Unit 10): full integrated assessment  
+"""
+
+ASSESSMENT_WEIGHTS = [
+    ["Class participation & homework", "20%"],
+    ["Progress checks", "30%"],
+    ["Mid-course test", "20%"],
+    ["Final exam", "30%"],
+]
+
+INSTRUCTOR_BIO_MD = """
+**Instructor:** Iván de Jesús Díaz Navarro  
+**Profile:** Certified Tourist Guide & English Instructor  
+
+This A2 English Master program connects communicative English teaching with real-life 
+contexts, especially tourism, culture and professional interaction.  
+
+Learners not only study grammar and vocabulary – they practise situations they can 
+actually experience in their daily life and work.
+        """
+
+LESSON_PRACTICE_TIP = "You can adapt these activities to face-to-face classes, online sessions or autonomous work."
+LESSON_INSIGHTS_TIP = "Use this space to add your own notes, examples or anecdotes for each group."
+
+
+def render_static_table(rows: list, columns: list):
+    """
+    Tabla pequeña y fija como tabla Markdown: st.table convierte todo a un
+    DataFrame, y eso obliga a importar pandas solo para 4-6 filas.
+    """
+
+    def cell(value) -> str:
+        return str(value).replace("|", "\\|").replace("\n", " ")
+
+    lines = [
+        "| " + " | ".join(cell(c) for c in columns) + " |",
+        "|" + "---|" * len(columns),
+    ]
+    lines += ["| " + " | ".join(cell(v) for v in row) + " |" for row in rows]
+    st.markdown("\n".join(lines))
+
+
+def overview_page():
+    render_app_shell()
+
+    st.markdown("### Course snapshot")
+    st.markdown(OVERVIEW_CARDS_HTML, unsafe_allow_html=True)
+
+    st.markdown("### What you gain")
+    st.markdown(OVERVIEW_GAINS_MD)
+    st.markdown(f"<div class='flx-note'>{OVERVIEW_NOTE}</div>", unsafe_allow_html=True)
 
     st.markdown("#### Quick course facts")
-    facts_df = pd.DataFrame(
+    render_static_table(
         [
             ["Level", COURSE_INFO["level"]],
             ["Total units", COURSE_INFO["units"]],
             ["Suggested total hours", COURSE_INFO["total_hours"]],
             ["Hours per unit (average)", COURSE_INFO["hours_per_unit"]],
         ],
-        columns=["Item", "Details"],
+        ["Item", "Details"],
     )
-    facts_df["Details"] = facts_df["Details"].astype(str)
-    st.table(facts_df)
 
     st.markdown("### 🚀 Ready to start?")
     if st.button("Start your first class", use_container_width=True, key="cta_start_class"):
         go_to_page("Enter your class")
 
     with st.expander("View Spanish summary / Ver resumen en español"):
-        st.write(
-            """
-Este curso A2 está pensado para que los estudiantes hablen de su vida diaria, trabajo y viajes 
-en un inglés claro y funcional. Integra el libro Cambridge Empower A2 y lo adapta a contextos 
-reales, especialmente útiles para turismo y servicios.
-            """
-        )
+        st.write(OVERVIEW_SUMMARY_ES)
 
 
 def levels_page():
     show_logo()
     st.title("🎯 English Levels (CEFR)")
 
-    data = [
-        ["A1", "Beginner", "Can use very basic everyday expressions, introduce themselves and ask/answer simple questions."],
-        ["A2", "Elementary", "Can talk about daily routines, family, simple work, shopping and immediate needs in simple terms."],
-        ["B1", "Intermediate", "Can deal with most situations while travelling, describe experiences and give simple opinions."],
-        ["B2", "Upper-Intermediate", "Can interact with a good degree of fluency and understand the main ideas of complex texts."],
-        ["C1", "Advanced", "Can express ideas fluently and spontaneously for academic and professional purposes."],
-        ["C2", "Proficiency", "Can understand practically everything and express themselves with precision in almost any context."]
-    ]
-    df = pd.DataFrame(data, columns=["Level", "Name", "Description"])
-    st.table(df)
+    render_static_table(CEFR_LEVELS, ["Level", "Name", "Description"])
 
     st.markdown("---")
     st.markdown("### 🟦 Where does this course fit?")
-    st.success(
-        "This program corresponds to **A2 – Elementary**.\n\n"
-        "- It consolidates basic A1 structures.\n"
-        "- It expands vocabulary for daily life, work and travel.\n"
-        "- It prepares learners to move into **B1 – Intermediate** with confidence."
+    st.success(COURSE_LEVEL_FIT_MD)
+
+
+# ==========================
+# OFFLINE LESSON PACKS
+# ==========================
+
+def _referenced_files(value, suffix: str) -> list:
+    """Nombres de archivo (terminados en `suffix`) citados en una config anidada."""
+    if isinstance(value, dict):
+        return [name for v in value.values() for name in _referenced_files(v, suffix)]
+    if isinstance(value, (list, tuple)):
+        return [name for v in value for name in _referenced_files(v, suffix)]
+    if isinstance(value, str) and value.lower().endswith(suffix):
+        return [value]
+    return []
+
+
+def lesson_pack_entries(unit_number: int, lesson_index: int, prefix: str = "") -> list:
+    """
+    Archivos del paquete offline de una clase: texto de la lección, notas,
+    diálogo, quiz, actividades, presentaciones (static/) y mp3 (audio/).
+    """
+    lesson = LESSONS[unit_number][lesson_index]
+    class_number = lesson_index + 1
+    unit = UNITS[unit_number - 1]
+    stored = load_structured_content(unit_number, class_number)
+    interactive = INTERACTIVE_CLASS_CONTENT.get((unit_number, lesson["title"]))
+
+    lines = [f"# {lesson['title']}", "", f"Unit {unit_number} – {unit['name']}", ""]
+    for heading, key in (("Key theory", "theory"), ("Suggested activities", "practice"), ("Insights", "insights")):
+        lines += [f"## {heading}", ""] + [f"- {item}" for item in lesson.get(key, [])] + [""]
+    if stored.get("class_notes"):
+        lines += ["## Class notes", "", stored["class_notes"].strip(), ""]
+    entries = [PackEntry(f"{prefix}lesson.md", data="\n".join(lines).encode("utf-8"))]
+
+    if stored.get("listening_dialogue"):
+        entries.append(PackEntry(f"{prefix}dialogue.txt", data=stored["listening_dialogue"].strip().encode("utf-8")))
+    if stored.get("quiz_json"):
+        entries.append(
+            PackEntry(f"{prefix}quiz.json", data=json.dumps(stored["quiz_json"], indent=2, ensure_ascii=False).encode("utf-8"))
+        )
+    if interactive:
+        entries.append(
+            PackEntry(f"{prefix}activities.json", data=json.dumps(interactive, indent=2, ensure_ascii=False).encode("utf-8"))
+        )
+
+    audio_names = _referenced_files(interactive, ".mp3")
+    if stored.get("dialogue_audio"):
+        audio_names.append(stored["dialogue_audio"])
+    for pattern in (f"U{unit_number}_C{class_number}_*.mp3", f"U{unit_number}_S{class_number}_*.mp3"):
+        audio_names += sorted(path.name for path in AUDIO_DIR.glob(pattern))
+    entries += [PackEntry(f"{prefix}audio/{name}", path=AUDIO_DIR / name) for name in dict.fromkeys(audio_names)]
+
+    decks = _referenced_files(interactive, ".html")
+    decks += sorted(path.name for path in STATIC_DIR.glob(f"unit{unit_number}_session{class_number}_*.html*"))
+    entries += [PackEntry(f"{prefix}slides/{name}", path=STATIC_DIR / name) for name in dict.fromkeys(decks)]
+    return entries
+
+
+def unit_pack_entries(unit_number: int) -> list:
+    entries = []
+    for index, lesson in enumerate(LESSONS.get(unit_number, [])):
+        folder = f"class{index + 1}_{_slugify_audio_label(lesson['title'].split('–')[-1])}/"
+        entries += lesson_pack_entries(unit_number, index, prefix=folder)
+    return entries
+
+
+def render_lesson_pack_downloads(unit_number: int, lesson_index: int, lesson: dict):
+    """Botones de descarga offline (clase / unidad completa)."""
+    class_number = lesson_index + 1
+    unit_slug = _slugify_audio_label(UNITS[unit_number - 1]["name"])
+    lesson_slug = _slugify_audio_label(lesson["title"].split("–")[-1])
+    packs = [
+        ("this class", prepare_pack(lesson_pack_entries(unit_number, lesson_index)),
+         f"U{unit_number}_C{class_number}_{lesson_slug}.zip"),
+        (f"all of Unit {unit_number}", prepare_pack(unit_pack_entries(unit_number)),
+         f"U{unit_number}_{unit_slug}_pack.zip"),
+    ]
+    server = (
+        start_pack_server(LESSON_PACKS_PORT, LESSON_PACKS_HOST, cache_dir=LESSON_PACKS_DIR, max_mb=LESSON_PACKS_MAX_MB)
+        if LESSON_PACKS_PUBLIC_URL
+        else None
     )
 
+    st.markdown("#### 📦 Offline pack")
+    st.caption("Lesson text, dialogue, quiz, slides and audio in one zip, for class without a good connection.")
+    cols = st.columns(len(packs))
+    for col, (what, pack, filename) in zip(cols, packs):
+        label = f"⬇️ Download {what} ({pack.size / 1_048_576:.1f} MB)"
+        with col:
+            if server is not None:
+                st.link_button(label, f"{LESSON_PACKS_PUBLIC_URL}{server.offer(pack, filename)}", use_container_width=True)
+            else:
+                # Sin relay público: al pulsar se arma (o reutiliza) en disco y Streamlit
+                # lee el archivo abierto; la app no guarda otra copia del zip.
+                st.download_button(
+                    label,
+                    data=lambda pack=pack: open(PackCache(LESSON_PACKS_DIR, LESSON_PACKS_MAX_MB * 1_048_576).build(pack), "rb"),
+                    file_name=filename,
+                    mime="application/zip",
+                    key=f"pack_{pack.key}",
+                    use_container_width=True,
+                )
+
 
 def lessons_page():
     show_logo()
@@ -4280,8 +5984,16 @@ def lessons_page():
         st.session_state.pop("registration_success", None)
         st.session_state.pop("registration_message", None)
 
+    # Enlaces profundos (?page=Enter your class&unit=3&lesson=...) desde el sitio estático.
+    linked_unit = _query_param("unit")
+    linked_lesson = _query_param("lesson")
+
     unit_options = [f"Unit {u['number']} – {u['name']}" for u in UNITS]
-    unit_choice = st.selectbox("Choose your unit", unit_options)
+    unit_choice = st.selectbox(
+        "Choose your unit",
+        unit_options,
+        index=next((i for i, u in enumerate(UNITS) if str(u["number"]) == linked_unit), 0),
+    )
     unit_index = unit_options.index(unit_choice)
     unit_number = UNITS[unit_index]["number"]
 
@@ -4291,12 +6003,22 @@ def lessons_page():
         return
 
     lesson_titles = [l["title"] for l in lessons]
-    lesson_choice = st.selectbox("Choose your lesson", lesson_titles)
+    lesson_choice = st.selectbox(
+        "Choose your lesson",
+        lesson_titles,
+        index=lesson_titles.index(linked_lesson) if linked_lesson in lesson_titles else 0,
+    )
 
-    lesson = next(l for l in lessons if l["title"] == lesson_choice)
+    lesson_index = lesson_titles.index(lesson_choice)
+    lesson = lessons[lesson_index]
+
+    class_number = lesson_index + 1
+    record_progress(f"lesson:{unit_number}:{class_number}")
 
     st.markdown(f"## {lesson['title']}")
     st.caption(f"Unit {unit_number} – {UNITS[unit_number - 1]['name']}")
+    # Se rellena al final, cuando los eventos de este rerun ya están registrados.
+    progress_slot = st.empty() if get_current_user()[1] else None
 
     tab_theory, tab_practice, tab_insights = st.tabs(["📘 Theory", "📝 Practice", "💡 Insights"])
 
@@ -4304,18 +6026,26 @@ def lessons_page():
         st.markdown("### Key theory")
         for item in lesson["theory"]:
             st.markdown(f"- {item}")
+        progress_checkbox(f"tab:{unit_number}:{class_number}:theory", "✅ I've read the theory")
 
     with tab_practice:
         st.markdown("### Suggested activities")
         for item in lesson["practice"]:
             st.markdown(f"- {item}")
-        st.info("You can adapt these activities to face-to-face classes, online sessions or autonomous work.")
+        st.info(LESSON_PRACTICE_TIP)
+        progress_checkbox(f"tab:{unit_number}:{class_number}:practice", "✅ I did these activities")
 
     with tab_insights:
         st.markdown("### Teaching & learning insights")
         for item in lesson["insights"]:
             st.markdown(f"- {item}")
-        st.success("Use this space to add your own notes, examples or anecdotes for each group.")
+        st.success(LESSON_INSIGHTS_TIP)
+        progress_checkbox(f"tab:{unit_number}:{class_number}:insights", "✅ I've read the insights")
+
+    with st.expander(f"🔁 Unit {unit_number} vocabulary review · {', '.join(UNITS[unit_index]['vocabulary'])}"):
+        render_vocab_trainer(f"unit{unit_number}", title="Spaced-repetition cards")
+
+    render_lesson_pack_downloads(unit_number, lesson_index, lesson)
 
     interactive_config = INTERACTIVE_CLASS_CONTENT.get((unit_number, lesson_choice))
     if interactive_config:
@@ -4340,49 +6070,30 @@ def lessons_page():
             lesson_title=lesson_choice,
         )
 
+    if progress_slot is not None:
+        with progress_slot:
+            render_lesson_progress(unit_number, class_number)
+
 
 def assessment_page():
     show_logo()
     st.title("📝 Assessment & Progress")
 
     st.markdown("### Assessment structure")
-    st.markdown(
-        """
-- Unit progress checks every **two units**  
-- **Mid-course assessment** (after Unit 5): listening, reading, writing & speaking  
-- **Final exam** (after Unit 10): full integrated assessment  
-"""
-    )
+    st.markdown(ASSESSMENT_STRUCTURE_MD)
 
     st.markdown("### Suggested weighting")
-    df = pd.DataFrame(
-        [
-            ["Class participation & homework", "20%"],
-            ["Progress checks", "30%"],
-            ["Mid-course test", "20%"],
-            ["Final exam", "30%"],
-        ],
-        columns=["Component", "Weight"]
-    )
-    st.table(df)
+    render_static_table(ASSESSMENT_WEIGHTS, ["Component", "Weight"])
+
+    render_exams_section()
+    render_student_grades()
 
 
 def instructor_page():
     show_logo()
     st.title("👨‍🏫 Instructor")
 
-    st.markdown(
-        """
-**Instructor:** Iván de Jesús Díaz Navarro  
-**Profile:** Certified Tourist Guide & English Instructor  
-
-This A2 English Master program connects communicative English teaching with real-life 
-contexts, especially tourism, culture and professional interaction.  
-
-Learners not only study grammar and vocabulary – they practise situations they can 
-actually experience in their daily life and work.
-        """
-    )
+    st.markdown(INSTRUCTOR_BIO_MD)
 
     st.markdown("### Signature")
     show_signature()
@@ -4446,6 +6157,7 @@ def access_page():
 
 
 def teacher_panel_page():
+    import pandas as pd
     show_logo()
     st.title("📂 Teacher Panel – Unit 2 answers")
 
@@ -4470,12 +6182,20 @@ def teacher_panel_page():
         unsafe_allow_html=True,
     )
 
+    render_answer_archive_section()
+    render_progress_heatmap_section()
+    render_gradebook_section()
+    render_exam_results_section()
+    render_auto_marks_section()
+
     if not RESPONSES_FILE.exists():
         st.info("No answers saved yet.")
         return
 
     try:
-        df = pd.read_csv(RESPONSES_FILE)
+        with span("teacher.read_csv") as read_span:
+            df = pd.read_csv(RESPONSES_FILE)
+            read_span.set(rows=len(df))
         if "unit" in df.columns:
             df = df[df["unit"] == 2]
         if df.empty:
@@ -4508,6 +6228,55 @@ def teacher_panel_page():
         if email_filter:
             filtered = filtered[filtered["user_email"].isin(email_filter)]
 
+        render_answer_search_section()
+
+        with st.expander("⬇️ Export answers (CSV / JSONL / Parquet)", expanded=False):
+            st.caption(
+                "Se exporta directamente desde el archivo, por bloques, con los filtros actuales. "
+                "Solo incluye respuestas en vivo: los trimestres compactados están en el archivo por trimestre. "
+                "Para trabajos nocturnos usa: `python -m helpers.response_export --format parquet --out <file>`."
+            )
+            col_e1, col_e2, col_e3 = st.columns(3)
+            with col_e1:
+                export_format = st.selectbox("Format", EXPORT_FORMATS, key="tp_export_format")
+            with col_e2:
+                export_since = st.date_input("From", value=None, key="tp_export_since")
+            with col_e3:
+                export_until = st.date_input("To", value=None, key="tp_export_until")
+
+            export_name = f"unit2_responses.{export_format}"
+
+            def _build_export():
+                get_response_writer().flush(RESPONSE_ACK_TIMEOUT)
+                # Archivo propio por descarga: dos docentes exportando a la vez no comparten destino.
+                EXPORTS_DIR.mkdir(parents=True, exist_ok=True)
+                fd, name = tempfile.mkstemp(prefix="unit2_responses.", suffix=f".{export_format}", dir=EXPORTS_DIR)
+                os.close(fd)
+                target = Path(name)
+                try:
+                    export_responses_to_file(
+                        RESPONSES_FILE,
+                        target,
+                        export_format,
+                        unit=2,
+                        session=None if session_choice == "All sessions" else session_choice,
+                        students=email_filter,
+                        date_from=export_since.isoformat() if export_since else None,
+                        date_to=export_until.isoformat() if export_until else None,
+                    )
+                    return target.read_bytes()
+                finally:
+                    target.unlink(missing_ok=True)
+
+            st.download_button(
+                f"⬇️ Download {export_format.upper()}",
+                data=_build_export,
+                file_name=export_name,
+                mime=EXPORT_MIME_TYPES[export_format],
+                key="tp_export_download",
+                use_container_width=True,
+            )
+
         st.markdown("### Answers table")
         if filtered.empty:
             st.info("No answers match the selected filters.")
@@ -4526,10 +6295,284 @@ def teacher_panel_page():
         st.error(f"Error loading answers: {e}")
 
 
+def course_search_page():
+    show_logo()
+    st.title("🔎 Search the course")
+    st.caption(
+        "Busca en el syllabus, las lecciones, las clases interactivas y el contenido guardado en Content Admin. "
+        "Usa varias palabras para encontrar frases completas, por ejemplo *would like*."
+    )
+
+    index = get_course_search_index()
+    query = st.text_input("Search", key="course_search_query", placeholder="would like, present simple, restaurant…")
+    if not query.strip():
+        st.caption(f"{len(index)} documents indexed.")
+        return
+
+    started = dt.datetime.now()
+    results = index.search(query, limit=30)
+    elapsed_ms = (dt.datetime.now() - started).total_seconds() * 1000
+    if not results:
+        st.info("No results. Try a shorter word (the last word also matches as a prefix).")
+        return
+
+    prefix = tokenize(query)[-1]
+    expansions = index.prefix_count(prefix)
+    truncated = (
+        f" “{prefix}…” matches {expansions} words; only the {MAX_PREFIX_EXPANSIONS} most common were searched, "
+        "type more letters to narrow it."
+        if expansions > MAX_PREFIX_EXPANSIONS
+        else ""
+    )
+    st.caption(f"{len(results)} results in {elapsed_ms:.1f} ms.{truncated}")
+    for item in results:
+        badge = " · 🧩 exact phrase" if item["phrase"] else ""
+        st.markdown(
+            f"**{item['title']}**{badge}  \n"
+            f"<span style='opacity:0.75'>{item['location']}</span>  \n"
+            f"{item['snippet']}",
+            unsafe_allow_html=True,
+        )
+
+
+def render_answer_search_section():
+    """
+    Búsqueda de texto completo (SQLite FTS5) sobre las respuestas guardadas.
+    """
+    st.markdown("### 🔎 Search answers")
+    index = get_search_index(SEARCH_INDEX_FILE)
+    try:
+        index.sync_from_csv(RESPONSES_FILE)
+    except Exception as exc:
+        st.error(f"Error updating the search index: {exc}")
+        return
+
+    facets = index.facets()
+    col_q, col_s, col_e = st.columns([0.5, 0.25, 0.25])
+    with col_q:
+        query = st.text_input(
+            "Words to find",
+            key="tp_search_query",
+            placeholder="Example: grandparents, would like, usually…",
+        )
+    with col_s:
+        search_session = st.selectbox("Session", ["All"] + facets["session"], key="tp_search_session")
+    with col_e:
+        search_exercise = st.selectbox("Exercise", ["All"] + facets["exercise_id"], key="tp_search_exercise")
+
+    if not query.strip():
+        st.caption(f"{index.count()} answers indexed.")
+        return
+
+    results = index.search(
+        query,
+        session=None if search_session == "All" else search_session,
+        exercise_id=None if search_exercise == "All" else search_exercise,
+        limit=50,
+    )
+    if not results:
+        st.info("No answers match your search.")
+        return
+    st.caption(f"Top {len(results)} matches (best first).")
+    for item in results:
+        st.markdown(
+            f"**{item['user_name'] or item['user_email'] or '(no name)'}** · "
+            f"{item['session']}/{item['hour']} · `{item['exercise_id']}` · {item['timestamp']}  \n"
+            f"{item['snippet']}"
+        )
+
+
+def render_answer_archive_section():
+    """
+    Archivo por trimestre: compacta respuestas antiguas a Parquet y muestra
+    analítica histórica sin volver a leer el CSV en vivo.
+    """
+    with st.expander("🗄️ Term archive (older answers)", expanded=False):
+        st.caption(
+            "Las respuestas anteriores a la fecha de corte se mueven a "
+            "`responses/archive/term=<term>/unit=<unit>/` (Parquet comprimido). "
+            "El CSV en vivo se queda pequeño. Las respuestas archivadas ya no aparecen en la tabla de respuestas, "
+            "la exportación, el conteo del gradebook ni las calificaciones por rúbrica: solo aquí."
+        )
+        col_c1, col_c2 = st.columns([0.5, 0.5])
+        with col_c1:
+            cutoff = st.date_input(
+                "Archive answers older than",
+                value=term_start(dt.date.today()),
+                key="tp_archive_cutoff",
+            )
+        with col_c2:
+            st.write("")
+            if st.button("🗜️ Compact now", key="tp_archive_compact", use_container_width=True):
+                try:
+                    writer = get_response_writer()
+                    writer.flush(RESPONSE_ACK_TIMEOUT)
+                    stats = compact_responses(
+                        RESPONSES_FILE,
+                        ARCHIVE_DIR,
+                        cutoff,
+                        lock=writer.exclusive(),
+                        on_archived=get_search_index(SEARCH_INDEX_FILE).remove_before,
+                    )
+                    st.success(
+                        f"Archived {stats['archived']} answers; {stats['kept']} stay in the live file."
+                    )
+                except Exception as exc:
+                    st.error(f"Error compacting answers: {exc}")
+
+        terms = archive_terms(ARCHIVE_DIR)
+        if not terms:
+            st.info("Nothing archived yet.")
+            return
+        selected_terms = st.multiselect("Terms", terms, default=terms[:1], key="tp_archive_terms")
+        try:
+            summary = archive_summary(ARCHIVE_DIR, terms=selected_terms or None)
+        except Exception as exc:
+            st.error(f"Error reading the archive: {exc}")
+            return
+        if summary is None:
+            st.info("No archived answers for the selected terms.")
+        else:
+            st.dataframe(summary.to_pandas(), use_container_width=True, hide_index=True)
+
+
+def render_shared_cache_section():
+    """
+    Aciertos/fallos de la caché compartida. Con SQLite o Redis los contadores
+    suman todos los procesos que usan la misma caché.
+    """
+    import pandas as pd
+    with st.expander("🧠 Shared cache (all app processes)", expanded=False):
+        try:
+            cache = get_shared_cache()
+            rows = cache.stats()
+        except Exception as exc:
+            st.error(f"Shared cache unavailable: {exc}")
+            return
+        st.caption(f"Backend: `{cache.backend}` · `{SHARED_CACHE_URL}`")
+        if not rows:
+            st.info("No cache activity yet.")
+            return
+        stats_df = pd.DataFrame(rows)
+        lookups = stats_df["hits"] + stats_df["misses"]
+        stats_df["hit_rate"] = (stats_df["hits"] / lookups.where(lookups > 0)).fillna(0).round(3)
+        st.dataframe(stats_df, use_container_width=True, hide_index=True)
+
+        col_ns, col_btn = st.columns([0.6, 0.4])
+        with col_ns:
+            namespace = st.selectbox("Namespace", stats_df["namespace"].tolist(), key="shared_cache_ns")
+        with col_btn:
+            st.write("")
+            if st.button("Clear namespace", key="shared_cache_clear", use_container_width=True):
+                cache.clear(namespace)
+                st.success(f"Cleared `{namespace}`.")
+
+
+def render_tts_quota_section():
+    """
+    Cuota mensual de caracteres y cola del limitador de ElevenLabs.
+    """
+    import requests
+    with st.expander("🎚️ TTS quota & queue", expanded=False):
+        limiter = get_tts_limiter_for_app()
+        usage = limiter.ledger.usage()
+        queue = limiter.snapshot()
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("Characters this month", f"{usage['chars']:,}")
+        col2.metric("Remaining", "∞" if usage["remaining"] < 0 else f"{usage['remaining']:,}")
+        col3.metric("Waiting / in flight", f"{queue['waiting']} / {queue['in_flight']}")
+        col4.metric("429s this month", usage["throttled"])
+        if usage["limit"]:
+            st.progress(min(1.0, usage["chars"] / usage["limit"]))
+        if queue["paused_for_s"] > 0:
+            st.warning(f"Paused by Retry-After for another {queue['paused_for_s']:.0f} s.")
+        st.caption(
+            f"{TTS_REQUESTS_PER_MIN:g} requests/min · {TTS_MAX_CONCURRENT} at a time · "
+            f"{usage['requests']:,} requests this month · ledger `{TTS_QUOTA_FILE}`"
+        )
+        if ELEVEN_API_KEY and st.button("Sync usage from ElevenLabs", key="tts_quota_sync"):
+            try:
+                resp = requests.get(
+                    "https://api.elevenlabs.io/v1/user/subscription",
+                    headers={"xi-api-key": ELEVEN_API_KEY},
+                    timeout=10,
+                )
+                resp.raise_for_status()
+                data = resp.json()
+                limiter.ledger.sync(data.get("character_count", 0), data.get("character_limit"))
+                st.success(
+                    f"Synced: {data.get('character_count', 0):,} of {data.get('character_limit', 0):,} characters used."
+                )
+            except (requests.RequestException, ValueError) as exc:
+                st.error(f"Could not read the ElevenLabs subscription: {exc}")
+
+
+def render_slow_reruns_section():
+    """
+    Reruns capturados por el perfilador (PROFILE_SLOW_RERUN_MS), del más lento
+    al más rápido, con las funciones y líneas que dominaron cada uno.
+    """
+    import pandas as pd
+    with st.expander("🐢 Slow reruns (profiler)", expanded=False):
+        if not RERUN_PROFILER:
+            st.caption("Profiler off. Set `PROFILE_SLOW_RERUN_MS` (e.g. 800) and restart the app to capture slow reruns.")
+            return
+        records = list_slow_reruns(PROFILE_DIR, limit=20)
+        st.caption(
+            f"Reruns slower than {PROFILE_SLOW_RERUN_MS:.0f} ms · sample rate {PROFILE_SAMPLE_RATE:g} · `{PROFILE_DIR}`"
+        )
+        if not records:
+            st.info("No slow reruns captured yet.")
+            return
+        st.dataframe(
+            pd.DataFrame(
+                [
+                    {
+                        "recorded_at": r["recorded_at"],
+                        "page": r["page"],
+                        "ms": r["duration_ms"],
+                        "top function": (r["by_own_time"] or [{}])[0].get("function", ""),
+                        "peak KiB": (r.get("memory") or {}).get("peak_delta_kib"),
+                        "session": r["session"][:8],
+                    }
+                    for r in records
+                ]
+            ),
+            use_container_width=True,
+            hide_index=True,
+        )
+        labels = {f"{r['duration_ms']:.0f} ms · {r['page']} · {r['recorded_at']}": r for r in records}
+        record = labels[st.selectbox("Capture", list(labels), key="slow_rerun_pick")]
+        tab_cum, tab_own, tab_mem = st.tabs(["Cumulative time", "Own time", "Allocations"])
+        with tab_cum:
+            st.dataframe(pd.DataFrame(record["by_cumulative"]), use_container_width=True, hide_index=True)
+        with tab_own:
+            st.dataframe(pd.DataFrame(record["by_own_time"]), use_container_width=True, hide_index=True)
+        with tab_mem:
+            memory = record.get("memory")
+            if memory:
+                st.caption(
+                    f"Peak +{memory['peak_delta_kib']} KiB · retained +{memory['retained_kib']} KiB · "
+                    f"lines below grew since the {memory.get('allocations_since', 'start of this rerun')}"
+                )
+                st.dataframe(pd.DataFrame(memory["top_allocations"]), use_container_width=True, hide_index=True)
+            else:
+                st.caption("tracemalloc was off for this capture.")
+        prof_path = PROFILE_DIR / f"{record['id']}.prof"
+        if prof_path.exists():
+            st.download_button(
+                "Download .prof (snakeviz / pstats)",
+                data=prof_path.read_bytes(),
+                file_name=prof_path.name,
+                key="slow_rerun_download",
+            )
+
+
 # ==========================
 # PAGE ROUTER
 # ==========================
 
+@traced("page.render")
 def render_page(page_id: str):
     render_user_status_bar()
     if page_id == "Overview":
@@ -4542,6 +6585,8 @@ def render_page(page_id: str):
         instructor_page()
     elif page_id == "Enter your class":
         lessons_page()
+    elif page_id == "Search":
+        course_search_page()
     elif page_id == "Access":
         access_page()
     elif page_id == "Teacher Panel":
@@ -4551,6 +6596,62 @@ def render_page(page_id: str):
     else:
         overview_page()
 
+def render_dialogue_audio_tools(unit: int, lesson: int, dialogue: str, editor_prefix: str, stored: dict):
+    """
+    Genera el mp3 del listening_dialogue con una voz por hablante y lo enlaza
+    al content.json de la clase (clave dialogue_audio).
+    """
+    with st.expander("🎭 Dialogue audio (one voice per speaker)", expanded=False):
+        lines = parse_dialogue(dialogue)
+        if not lines:
+            st.info("Write the dialogue as `Speaker: text` lines to generate audio.")
+            return
+        speakers = speakers_of(lines)
+        backend = tts_backend_picker(f"{editor_prefix}_dialogue_backend")
+        defaults = assign_voices(speakers, None, get_tts_backend(backend).dialogue_voices)
+        voice_map = {}
+        cols = st.columns(min(3, len(speakers)))
+        for i, speaker in enumerate(speakers):
+            with cols[i % len(cols)]:
+                voice_map[speaker] = st.text_input(
+                    f"Voice for {speaker}",
+                    value=defaults.get(speaker, ""),
+                    key=f"{editor_prefix}_voice_{backend}_{_slugify_audio_label(speaker)}",
+                ).strip()
+        col_p, col_n, col_l = st.columns([0.3, 0.2, 0.5])
+        with col_p:
+            pause_ms = st.number_input(
+                "Pause between lines (ms)", min_value=0, max_value=3000, value=DIALOGUE_PAUSE_MS, step=100,
+                key=f"{editor_prefix}_dialogue_pause",
+            )
+        with col_n:
+            audio_number = st.number_input(
+                "Audio #", min_value=1, max_value=20, value=1, step=1, key=f"{editor_prefix}_dialogue_num"
+            )
+        with col_l:
+            label = st.text_input("Label", value="dialogue", key=f"{editor_prefix}_dialogue_label")
+        filename = build_audio_filename(unit, "C", lesson, int(audio_number), label)
+        st.caption(f"{len(lines)} lines · {len(speakers)} speakers · saved as `audio/{filename}`")
+        if stored.get("dialogue_audio"):
+            st.caption(f"Linked now: `audio/{stored['dialogue_audio']}`")
+        regenerate = st.checkbox(
+            "Regenerate every line (ignore cached audio)",
+            key=f"{editor_prefix}_dialogue_regenerate",
+        )
+        if st.button("Generate dialogue audio", key=f"{editor_prefix}_dialogue_generate"):
+            path = generate_dialogue_audio(
+                dialogue, voice_map, filename, pause_ms=int(pause_ms), backend=backend, regenerate=regenerate
+            )
+            if path:
+                st.audio(str(path))
+                st.session_state[f"{editor_prefix}_dialogue_audio"] = filename
+                if stored:
+                    save_structured_content(unit, lesson, {**stored, "dialogue_audio": filename})
+                    st.success(f"Saved `audio/{filename}` and linked it to this class.")
+                else:
+                    st.success(f"Saved `audio/{filename}`. Save the structured content to link it to this class.")
+
+
 def content_admin_page():
     show_logo()
     render_banner(
@@ -4589,6 +6690,9 @@ You can use this for:
 
     with st.expander("Quick ElevenLabs generator (auto naming)", expanded=False):
         st.caption("Envía el script a ElevenLabs y guarda el mp3 en `audio/` con un nombre consistente.")
+        # Fuera del form: al cambiar de motor se actualizan voz y modelo por defecto.
+        gen_backend = tts_backend_picker("gen_audio_backend")
+        gen_engine = get_tts_backend(gen_backend)
         with st.form("eleven_quick_form"):
             col1, col2, col3 = st.columns(3)
             with col1:
@@ -4632,16 +6736,17 @@ You can use this for:
             )
             gen_voice_id = st.text_input(
                 "Voice ID",
-                value=DEFAULT_ELEVEN_VOICE_ID,
-                key="gen_audio_voice",
+                value=gen_engine.default_voice,
+                key=f"gen_audio_voice_{gen_backend}",
             )
             gen_model_id = st.text_input(
                 "Model ID",
-                value="eleven_turbo_v2",
-                key="gen_audio_model",
+                value=gen_engine.default_model,
+                key=f"gen_audio_model_{gen_backend}",
+                disabled=not gen_engine.default_model,
             )
             gen_script = st.text_area(
-                "Script to send to ElevenLabs",
+                "Script",
                 height=220,
                 key="gen_audio_script",
             )
@@ -4656,8 +6761,28 @@ You can use this for:
                 gen_label,
             )
             st.caption(f"El archivo se guardará como: `audio/{preview_filename}`.")
+            gen_regenerate = st.checkbox(
+                "Regenerate (ignore cached audio)",
+                key="gen_audio_regenerate",
+                help="Synthesizes every segment again and replaces the cached copies, e.g. after a bad take.",
+            )
 
-            submitted_gen_audio = st.form_submit_button("Generate audio with ElevenLabs")
+            col_gen, col_preview = st.columns(2)
+            with col_gen:
+                submitted_gen_audio = st.form_submit_button(f"Generate audio ({gen_engine.label})")
+            with col_preview:
+                submitted_preview = st.form_submit_button("▶️ Stream preview (saved only if accepted)")
+
+        if submitted_preview:
+            start_tts_preview(
+                "gen_audio",
+                gen_script,
+                gen_voice_id,
+                preview_filename,
+                model_id=gen_model_id,
+                backend=gen_backend,
+            )
+        render_tts_preview_player("gen_audio")
 
         if submitted_gen_audio:
             slot_code = gen_slot_choice.split("(")[-1].replace(")", "").strip()
@@ -4670,12 +6795,18 @@ You can use this for:
                 slot_number=int(gen_slot_number),
                 audio_number=int(gen_audio_number),
                 label=gen_label,
-                model_id=gen_model_id or "eleven_turbo_v2",
+                model_id=gen_model_id,
+                backend=gen_backend,
+                regenerate=gen_regenerate,
             )
             if path:
                 st.success(f"Audio saved in `audio/{final_filename}`.")
                 st.audio(str(path))
 
+    render_shared_cache_section()
+    render_tts_quota_section()
+    render_slow_reruns_section()
+
     with st.expander("General text blocks (legacy tools)", expanded=False):
         st.markdown("#### 1. Select where to save / load")
         col1, col2, col3 = st.columns(3)
@@ -4931,6 +7062,7 @@ You can use this for:
         height=160,
         key=f"{editor_prefix}_dialogue",
     )
+    render_dialogue_audio_tools(int(sc_unit), int(sc_class), dialogue_value, editor_prefix, existing_structured)
     script_value = st.text_area(
         "elevenlabs_script",
         value=st.session_state.get(f"{editor_prefix}_script", active_defaults.get("elevenlabs_script", "")),
@@ -5053,6 +7185,11 @@ You can use this for:
                     "elevenlabs_script": script_value,
                     "quiz_json": quiz_payload,
                 }
+                dialogue_audio = st.session_state.get(f"{editor_prefix}_dialogue_audio") or existing_structured.get(
+                    "dialogue_audio"
+                )
+                if dialogue_audio:
+                    payload["dialogue_audio"] = dialogue_audio
                 path = save_structured_content(int(sc_unit), int(sc_class), payload)
                 st.success(f"Structured content saved in: `{path}`")
     with col_export:
@@ -5080,6 +7217,7 @@ You can use this for:
         "listening_dialogue": dialogue_value,
         "elevenlabs_script": script_value,
         "quiz_json": quiz_payload,
+        "dialogue_audio": existing_structured.get("dialogue_audio"),
         "updated_at": existing_structured.get("updated_at"),
     }
     render_structured_lesson_content(preview_payload, preview=True, key_prefix=f"{editor_prefix}_preview")
@@ -5093,10 +7231,27 @@ You can use this for:
 
 def main():
     init_session()
-    inject_global_css()
-    current_page = get_current_page_id()
-    render_page(current_page)
-    render_floating_menu(current_page)
+    ctx = get_script_run_ctx()
+    SESSIONS.touch(ctx.session_id if ctx else None)
+    set_trace_context(session=ctx.session_id if ctx else None)
+    started = time.perf_counter()
+    current_page = "unknown"
+    profiling = RERUN_PROFILER.profile(session=ctx.session_id if ctx else None) if RERUN_PROFILER else nullcontext({})
+    try:
+        with profiling as profile_tags, span("script.run") as run_span:
+            inject_global_css()
+            current_page = get_current_page_id()
+            set_trace_context(page=current_page)
+            run_span.set(page=current_page)
+            profile_tags["page"] = current_page
+            render_page(current_page)
+            render_floating_menu(current_page)
+    except Exception:
+        RERUNS_FAILED.inc(page=current_page)
+        raise
+    finally:
+        # st.rerun()/st.stop() también pasan por aquí: cuentan como rerun.
+        RERUN_SECONDS.observe(time.perf_counter() - started, page=current_page)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,84 @@
+"""
+Course search latency as content grows.
+
+    python -m benchmarks.bench_content_search --docs 6000
+
+Builds a synthetic course (all CEFR levels, many lessons) with the same
+inverted index as the Search page and times typical queries. Also checks
+every "exact phrase" flag against the document text and reports prefixes
+that match more than MAX_PREFIX_EXPANSIONS words.
+"""
+import argparse
+import random
+import re
+import statistics
+import time
+
+from helpers.content_search import MAX_PREFIX_EXPANSIONS, ContentSearchIndex, tokenize
+
+PHRASES = [
+    "I would like a coffee, please.",
+    "Use the present simple for routines.",
+    "Adverbs of frequency go before the main verb.",
+    "Could I have the bill, please?",
+    "Talk about your last holiday using the past simple.",
+    "Compare two cities with comparative adjectives.",
+    "Give advice with should and shouldn't.",
+    "Have you ever visited another country?",
+    "Describe your home: there is / there are.",
+    "Make plans with going to.",
+    # "have you" y "you ever" por separado: no es la frase "have you ever".
+    "I have you on my list. Do you ever cook?",
+]
+QUERIES = ["would like", "present simple", "adverb", "have you ever", "comparative adj", "vocab", "xyzzy"]
+
+
+def wrong_phrase_flags(index: ContentSearchIndex, query: str, results: list) -> int:
+    terms = tokenize(query)
+    if len(terms) < 2:
+        return 0
+    pattern = re.compile(r"\b" + " ".join(terms) + r"\w*")
+    return sum(
+        1
+        for item in results
+        if item["phrase"] != bool(pattern.search(" ".join(index._docs[item["doc_id"]]["tokens"])))
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--docs", type=int, default=6000)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    rng = random.Random(3)
+    index = ContentSearchIndex()
+    start = time.perf_counter()
+    for i in range(args.docs):
+        level = ["A1", "A2", "B1", "B2", "C1", "C2"][i % 6]
+        text = " ".join(rng.choice(PHRASES) for _ in range(rng.randint(10, 60)))
+        text += f" vocabulary{i} topic{i % 97}"
+        index.upsert(f"doc:{i}", f"{level} · Lesson {i}", text, f"{level} · Unit {i % 10 + 1}")
+    print(f"indexed {args.docs} documents in {time.perf_counter() - start:.2f}s")
+
+    start = time.perf_counter()
+    index.upsert("doc:0", "A1 · Lesson 0", "Edited lesson: I would like some tea.", "A1 · Unit 1")
+    print(f"incremental update of one document: {(time.perf_counter() - start) * 1000:.2f} ms")
+
+    wrong = 0
+    for query in QUERIES:
+        timings = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            results = index.search(query, limit=30)
+            timings.append((time.perf_counter() - start) * 1000)
+        wrong += wrong_phrase_flags(index, query, results)
+        expansions = index.prefix_count(tokenize(query)[-1])
+        note = f", prefix matches {expansions} words (top {MAX_PREFIX_EXPANSIONS} searched)" if expansions > MAX_PREFIX_EXPANSIONS else ""
+        print(f"{query!r:>20}: {len(results)} results, median {statistics.median(timings):.2f} ms, "
+              f"p95 {sorted(timings)[int(len(timings) * 0.95) - 1]:.2f} ms{note}")
+    print("phrase flags match the text" if not wrong else f"{wrong} wrong phrase flags")
+
+
+if __name__ == "__main__":
+    main()
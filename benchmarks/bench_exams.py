@@ -0,0 +1,194 @@
+"""
+Synchronized exam burst: a whole cohort starts, saves and submits at once.
+
+    python -m benchmarks.bench_exams --candidates 200 --questions 30 --batches 3
+
+Every candidate is a thread released by one barrier (the minute the
+teacher says "start"). Each starts the exam, answers the questions in
+--batches saves, then submits twice (a double click). Two modes:
+
+  batched   helpers.exams: saves go to memory and are flushed together
+  naive     one SQLite transaction per answered question, as a
+            save-on-every-click page would do
+
+Reported per mode: wall time, p50 / p95 / p99 latency of start, save and
+submit, and disk transactions. The batched run also checks that every
+attempt was scored exactly once, that the repeated submit returned the
+same result, and that the scores match the answers given.
+"""
+import argparse
+import random
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from helpers.exams import ExamEngine, ExamSet, Question
+
+
+def _pct(values: list, p: float) -> float:
+    ordered = sorted(values) or [0.0]
+    return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))] * 1000
+
+
+def _exam(questions: int) -> ExamSet:
+    return ExamSet(
+        "bench",
+        "Bench exam",
+        "final",
+        60,
+        tuple(Question(f"q{i}", f"Question {i}", ("a", "b", "c", "d"), "abcd"[i % 4]) for i in range(questions)),
+    )
+
+
+def _answer_sheets(candidates: int, exam: ExamSet, seed: int) -> list:
+    rng = random.Random(seed)
+    return [{q.qid: rng.choice(q.options) for q in exam.questions} for _ in range(candidates)]
+
+
+def _burst(candidates: int, work) -> float:
+    barrier = threading.Barrier(candidates)
+    errors = []
+
+    def worker(index: int):
+        try:
+            barrier.wait()
+            work(index)
+        except Exception as exc:  # el error se reporta, la corrida sigue
+            errors.append(repr(exc))
+
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(candidates)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    for err in errors[:3]:
+        print(f"  error: {err}")
+    return time.perf_counter() - started
+
+
+def run_batched(path: Path, exam: ExamSet, sheets: list, batches: int, think_s: float, flush_s: float) -> dict:
+    engine = ExamEngine(path, flush_interval=flush_s)
+    engine.load([exam])
+    scored = []
+    engine.add_listener(scored.append)
+    timings = {"start": [], "save": [], "submit": []}
+    repeats_differ = []
+    qids = [q.qid for q in exam.questions]
+    size = -(-len(qids) // batches)
+
+    def work(index: int):
+        t = time.perf_counter()
+        attempt = engine.start(f"candidate{index}@mail.com", exam.exam_id)
+        timings["start"].append(time.perf_counter() - t)
+        for start in range(0, len(qids), size):
+            time.sleep(think_s)
+            t = time.perf_counter()
+            engine.save(attempt.attempt_id, {qid: sheets[index][qid] for qid in qids[start:start + size]})
+            timings["save"].append(time.perf_counter() - t)
+        t = time.perf_counter()
+        first = engine.submit(attempt.attempt_id)
+        timings["submit"].append(time.perf_counter() - t)
+        if engine.submit(attempt.attempt_id) != first:
+            repeats_differ.append(index)
+
+    wall = _burst(len(sheets), work)
+    engine.close()
+    key = {q.qid: q.answer for q in exam.questions}
+    expected = {
+        f"candidate{i}@mail.com": sum(sheet[qid] == answer for qid, answer in key.items()) / len(key)
+        for i, sheet in enumerate(sheets)
+    }
+    wrong = sum(1 for a in engine.results() if abs(a.score - expected[a.student]) > 1e-9)
+    return {
+        "wall": wall,
+        "timings": timings,
+        "transactions": len(sheets) + engine.flushes + engine.submits,  # start + lotes + entregas
+        "scored": len(scored),
+        "repeats_differ": len(repeats_differ),
+        "wrong": wrong,
+    }
+
+
+def run_naive(path: Path, exam: ExamSet, sheets: list, batches: int, think_s: float) -> dict:
+    conn = sqlite3.connect(str(path), check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("CREATE TABLE answers (student TEXT, qid TEXT, answer TEXT, PRIMARY KEY (student, qid)) WITHOUT ROWID")
+    conn.execute("CREATE TABLE submitted (student TEXT PRIMARY KEY, at REAL)")
+    conn.commit()
+    lock = threading.Lock()
+    timings = {"start": [], "save": [], "submit": []}
+    transactions = [0]
+    qids = [q.qid for q in exam.questions]
+    size = -(-len(qids) // batches)
+
+    def commit(sql: str, params: tuple):
+        with lock:
+            with conn:
+                conn.execute(sql, params)
+            transactions[0] += 1
+
+    def work(index: int):
+        student = f"candidate{index}@mail.com"
+        for start in range(0, len(qids), size):
+            time.sleep(think_s)
+            for qid in qids[start:start + size]:
+                t = time.perf_counter()
+                commit(
+                    "INSERT INTO answers VALUES (?, ?, ?) ON CONFLICT(student, qid) DO UPDATE SET answer = excluded.answer",
+                    (student, qid, sheets[index][qid]),
+                )
+                timings["save"].append(time.perf_counter() - t)
+        t = time.perf_counter()
+        commit("INSERT OR REPLACE INTO submitted VALUES (?, ?)", (student, time.time()))
+        timings["submit"].append(time.perf_counter() - t)
+
+    wall = _burst(len(sheets), work)
+    conn.close()
+    return {"wall": wall, "timings": timings, "transactions": transactions[0]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--candidates", type=int, default=200)
+    parser.add_argument("--questions", type=int, default=30)
+    parser.add_argument("--batches", type=int, default=3, help="Saves per candidate.")
+    parser.add_argument("--think-ms", type=float, default=20.0, help="Pause before each save.")
+    parser.add_argument("--flush-s", type=float, default=0.5)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    exam = _exam(args.questions)
+    sheets = _answer_sheets(args.candidates, exam, args.seed)
+    think_s = args.think_ms / 1000
+    with tempfile.TemporaryDirectory() as tmp:
+        batched = run_batched(Path(tmp) / "exams.sqlite3", exam, sheets, args.batches, think_s, args.flush_s)
+        naive = run_naive(Path(tmp) / "naive.sqlite3", exam, sheets, args.batches, think_s)
+
+    print(f"{args.candidates} candidates × {args.questions} questions, {args.batches} saves each")
+    print(f"{'mode':<8} {'step':<7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for name, result in (("batched", batched), ("naive", naive)):
+        for step, values in result["timings"].items():
+            if values:
+                print(
+                    f"{name:<8} {step:<7} {statistics.median(values) * 1000:>8.2f} "
+                    f"{_pct(values, 95):>8.2f} {_pct(values, 99):>8.2f}"
+                )
+    print(f"{'mode':<8} {'wall s':>7} {'transactions':>13}")
+    for name, result in (("batched", batched), ("naive", naive)):
+        print(f"{name:<8} {result['wall']:>7.2f} {result['transactions']:>13}")
+    ok = batched["scored"] == args.candidates and not batched["repeats_differ"] and not batched["wrong"]
+    print(
+        "every attempt scored once, repeated submits identical, scores match"
+        if ok
+        else f"scored {batched['scored']} / {args.candidates}, {batched['repeats_differ']} repeats differ, "
+        f"{batched['wrong']} wrong scores"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Gradebook at cohort scale: vectorized vs per-student grades, incremental updates.
+
+    python -m benchmarks.bench_gradebook --students 5000 --quizzes 30 --homework 6
+
+Seeds a gradebook with quiz scores (progress checks), handed-in homework and
+teacher scores for the mid-course test and final exam, then reports:
+
+  load        reading every score from SQLite into the cohort arrays
+  vectorized  compute_grades() over all students at once
+  python      the same grades with a loop over students and components
+  record()    one quiz score changing: upsert + recompute of that row
+  full        what record() would cost if it recomputed the whole cohort
+  export      per-student summary CSV
+"""
+import argparse
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from helpers.gradebook import Gradebook
+
+WEIGHTS = {"participation": 20, "progress_checks": 30, "midterm": 20, "final": 30}
+
+
+def _python_grades(book: Gradebook, scores: dict, manual: dict) -> dict:
+    """Reference: per student, mean per component (or manual), then the weighted sums."""
+    grades = {}
+    for student, components in scores.items():
+        weighted = covered = 0.0
+        for component, weight in book.weights.items():
+            items = components.get(component, {})
+            value = manual.get((student, component))
+            if value is None and items:
+                value = sum(items.values()) / max(len(items), book.expected[component])
+            if value is not None:
+                weighted += value * weight
+                covered += weight
+        grades[student] = (weighted / covered if covered else None, weighted)
+    return grades
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--students", type=int, default=5000)
+    parser.add_argument("--quizzes", type=int, default=30)
+    parser.add_argument("--homework", type=int, default=6)
+    parser.add_argument("--updates", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    students = [f"student{s}@mail.com" for s in range(args.students)]
+    scores, manual, rows = {}, {}, []
+    for student in students:
+        scores[student] = {"progress_checks": {}, "participation": {}}
+        for q in rng.sample(range(args.quizzes), rng.randint(0, args.quizzes)):
+            value = rng.randint(0, 4) / 4
+            scores[student]["progress_checks"][f"quiz:{q}"] = value
+            rows.append((student, "progress_checks", f"quiz:{q}", value, "quiz"))
+        for h in rng.sample(range(args.homework), rng.randint(0, args.homework)):
+            scores[student]["participation"][f"answer:{h}"] = 1.0
+            rows.append((student, "participation", f"answer:{h}", 1.0, "answer"))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "gradebook.sqlite3"
+        book = Gradebook(path, WEIGHTS, expected={"participation": args.homework})
+        started = time.perf_counter()
+        book.record_many(rows)
+        for student in students:
+            if rng.random() < 0.5:
+                manual[(student, "midterm")] = rng.randint(40, 100) / 100
+                book.set_manual(student, "midterm", manual[(student, "midterm")])
+        print(f"seeded {len(rows)} scores for {args.students} students in {time.perf_counter() - started:.1f} s")
+
+        book = Gradebook(path, WEIGHTS, expected={"participation": args.homework})
+        started = time.perf_counter()
+        cohort = book.cohort()
+        load_ms = (time.perf_counter() - started) * 1000
+
+        expected, weights = book._vectors()
+        started = time.perf_counter()
+        cohort.recompute(expected, weights)
+        vector_ms = (time.perf_counter() - started) * 1000
+
+        started = time.perf_counter()
+        reference = _python_grades(book, scores, manual)
+        python_ms = (time.perf_counter() - started) * 1000
+
+        mismatches = 0
+        for student in students:
+            row = cohort.rows.get(student)
+            so_far, final = reference[student]
+            if row is None:
+                mismatches += so_far is not None
+                continue
+            if abs(cohort.final[row] - final) > 1e-9:
+                mismatches += 1
+
+        started = time.perf_counter()
+        for _ in range(args.updates):
+            book.record(rng.choice(students), "progress_checks", f"quiz:{rng.randrange(args.quizzes)}", rng.random())
+        record_us = (time.perf_counter() - started) * 1e6 / args.updates
+
+        started = time.perf_counter()
+        exported = book.export_csv(Path(tmp) / "gradebook.csv")
+        export_ms = (time.perf_counter() - started) * 1000
+
+    print(f"{'step':<12} {'ms':>9}")
+    print(f"{'load':<12} {load_ms:>9.1f}")
+    print(f"{'vectorized':<12} {vector_ms:>9.2f}")
+    print(f"{'python':<12} {python_ms:>9.1f}")
+    print(f"{'record()':<12} {record_us / 1000:>9.3f}   (incremental: one row recomputed)")
+    print(f"{'full':<12} {vector_ms:>9.2f}   (if every change recomputed the cohort)")
+    print(f"{'export':<12} {export_ms:>9.1f}   ({exported} rows)")
+    print("grades match" if not mismatches else f"{mismatches} students differ")
+
+
+if __name__ == "__main__":
+    main()
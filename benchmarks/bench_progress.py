@@ -0,0 +1,89 @@
+"""
+Class progress heatmap: bitsets vs. scanning an event log.
+
+    python -m benchmarks.bench_progress --students 5000 --items 400 --groups 30
+
+Every student completes a random --done fraction of the items (each
+completion logged --repeats times on average, as reruns and re-clicks do).
+"events" builds the students × groups heatmap by scanning (student, key)
+rows with a dict of sets; "bitsets" uses helpers.progress (AND + popcount
+over the class matrix). Also reports the cost of loading the class from
+SQLite and bytes per student on disk.
+"""
+import argparse
+import random
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+
+from helpers.progress import ProgressStore
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--students", type=int, default=5000)
+    parser.add_argument("--items", type=int, default=400)
+    parser.add_argument("--groups", type=int, default=30)
+    parser.add_argument("--done", type=float, default=0.4)
+    parser.add_argument("--repeats", type=float, default=1.5)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    keys = [f"item:{i}" for i in range(args.items)]
+    per_group = max(1, args.items // args.groups)
+    groups = {f"G{g}": keys[g * per_group:(g + 1) * per_group] for g in range(args.groups)}
+    students = [f"student{s}@mail.com" for s in range(args.students)]
+
+    events = []
+    for student in students:
+        for key in rng.sample(keys, int(args.items * args.done)):
+            events += [(student, key)] * max(1, round(rng.expovariate(1 / args.repeats)))
+    rng.shuffle(events)
+    print(f"{len(events)} events, {args.students} students × {args.items} items, {args.groups} groups")
+
+    started = time.perf_counter()
+    done = defaultdict(set)
+    for student, key in events:
+        done[student].add(key)
+    scan = [
+        [len(done[student].intersection(group)) / len(group) for group in groups.values()]
+        for student in students
+    ]
+    scan_s = time.perf_counter() - started
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "progress.sqlite3"
+        store = ProgressStore(path, flush_interval=3600)
+        store.register(keys)
+        started = time.perf_counter()
+        for student, key in events:
+            store.mark(student, key)
+        mark_us = (time.perf_counter() - started) * 1e6 / len(events)
+        written = store.flush()
+        store.close()
+        size = sum(f.stat().st_size for f in Path(tmp).glob("progress.sqlite3*"))  # + WAL
+
+        store = ProgressStore(path, flush_interval=3600)
+        started = time.perf_counter()
+        store.bitsets(students)
+        load_s = time.perf_counter() - started
+        started = time.perf_counter()
+        heat = store.heatmap(students, groups)
+        bits_s = time.perf_counter() - started
+        store.close()
+
+    mismatches = sum(
+        1 for row, expected in zip(heat.tolist(), scan) for a, b in zip(row, expected) if abs(a - b) > 1e-9
+    )
+    print(f"{'mode':<8} {'ms':>9}")
+    print(f"{'events':<8} {scan_s * 1000:>9.1f}")
+    print(f"{'bitsets':<8} {bits_s * 1000:>9.1f}   (+ {load_s * 1000:.0f} ms to load {args.students} rows the first time)")
+    print(f"mark(): {mark_us:.2f} µs per event, {written} rows in one flush")
+    print(f"disk: {size / args.students:.0f} bytes per student ({size / 1_048_576:.1f} MB with the item index)")
+    print("results match" if not mismatches else f"{mismatches} cells differ")
+
+
+if __name__ == "__main__":
+    main()
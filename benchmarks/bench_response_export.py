@@ -0,0 +1,70 @@
+"""
+Streaming export benchmark over a synthetic responses store.
+
+    python -m benchmarks.bench_response_export --rows 1000000
+
+Reports rows/s, output size and the Python heap peak (tracemalloc) per
+format; the peak should stay flat as --rows grows.
+"""
+import argparse
+import csv
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from helpers.response_export import EXPORT_FORMATS, export_responses_to_file
+from helpers.response_store import RESPONSE_FIELDS
+
+
+def build_synthetic_store(path: Path, rows: int, students: int = 2000):
+    sessions = ["S1", "S2", "S3"]
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(RESPONSE_FIELDS)
+        for i in range(rows):
+            s = i % students
+            writer.writerow(
+                [
+                    f"2025-{1 + i % 12:02d}-{1 + i % 28:02d}T10:{i % 60:02d}:00",
+                    f"student{s}@example.com",
+                    f"Student {s}",
+                    2,
+                    sessions[i % 3],
+                    "H1" if i % 2 else "H2",
+                    f"exercise_{i % 7}",
+                    f"I usually get up at {6 + i % 4}:30.\\nI never go to bed late. ({i})",
+                ]
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--chunk-rows", type=int, default=10_000)
+    parser.add_argument("--formats", nargs="+", default=list(EXPORT_FORMATS))
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source = Path(tmp) / "responses.csv"
+        start = time.perf_counter()
+        build_synthetic_store(source, args.rows)
+        print(f"synthetic store: {args.rows} rows, {source.stat().st_size / 1e6:.1f} MB "
+              f"({time.perf_counter() - start:.1f}s)")
+
+        for fmt in args.formats:
+            target = Path(tmp) / f"export.{fmt}"
+            tracemalloc.start()
+            start = time.perf_counter()
+            count = export_responses_to_file(source, target, fmt, chunk_rows=args.chunk_rows)
+            elapsed = time.perf_counter() - start
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            print(
+                f"{fmt:>8}: {count} rows in {elapsed:.1f}s ({count / elapsed:,.0f} rows/s), "
+                f"{target.stat().st_size / 1e6:.1f} MB, heap peak {peak / 1e6:.1f} MB"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Throughput benchmark: per-row fsync commits vs. the group-commit write queue.
+
+    python -m benchmarks.bench_response_queue --students 40 --saves 25
+
+Every simulated student saves answers from its own thread, like a class
+hitting "Save this answer" at the same time.
+"""
+import argparse
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from helpers.response_store import ResponseWriteQueue, append_rows_fsync
+
+
+def _row(student: int, n: int) -> dict:
+    return {
+        "timestamp": "2025-01-01T10:00:00",
+        "user_email": f"student{student}@example.com",
+        "user_name": f"Student {student}",
+        "unit": 2,
+        "session": "S1",
+        "hour": "H1",
+        "exercise_id": f"ex{n}",
+        "response": "I usually get up at 7:00 and I never go to bed late.",
+    }
+
+
+def _run_threads(students: int, target) -> float:
+    threads = [threading.Thread(target=target, args=(s,)) for s in range(students)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return time.perf_counter() - start
+
+
+def bench_per_row(path: Path, students: int, saves: int) -> dict:
+    lock = threading.Lock()
+
+    def student(s):
+        for n in range(saves):
+            with lock:
+                append_rows_fsync(path, [_row(s, n)])
+
+    elapsed = _run_threads(students, student)
+    total = students * saves
+    return {"mode": "per-row", "rows": total, "commits": total, "seconds": elapsed}
+
+
+def bench_grouped(path: Path, students: int, saves: int, flush_ms: int, batch_rows: int) -> dict:
+    writer = ResponseWriteQueue(path, flush_interval_ms=flush_ms, max_batch_rows=batch_rows)
+
+    def student(s):
+        for n in range(saves):
+            writer.submit(_row(s, n)).wait()
+
+    elapsed = _run_threads(students, student)
+    writer.close()
+    return {"mode": "grouped", "rows": writer.rows_written, "commits": writer.commits, "seconds": elapsed}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--students", type=int, default=40)
+    parser.add_argument("--saves", type=int, default=25)
+    parser.add_argument("--flush-ms", type=int, default=2)
+    parser.add_argument("--batch-rows", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        results = [
+            bench_per_row(Path(tmp) / "per_row.csv", args.students, args.saves),
+            bench_grouped(
+                Path(tmp) / "grouped.csv",
+                args.students,
+                args.saves,
+                args.flush_ms,
+                args.batch_rows,
+            ),
+        ]
+
+    for r in results:
+        print(
+            f"{r['mode']:>8}: {r['rows']} rows, {r['commits']} fsync commits, "
+            f"{r['seconds']:.3f}s, {r['rows'] / r['seconds']:.0f} rows/s"
+        )
+
+
+if __name__ == "__main__":
+    main()
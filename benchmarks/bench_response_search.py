@@ -0,0 +1,100 @@
+"""
+Full-text search latency over a synthetic answers store.
+
+    python -m benchmarks.bench_response_search --rows 100000
+
+Builds the FTS5 index from a CSV (same path as the Teacher Panel catch-up)
+and times ranked, highlighted queries with and without filters.
+"""
+import argparse
+import csv
+import random
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from helpers.response_search import ResponseSearchIndex
+from helpers.response_store import RESPONSE_FIELDS
+
+SENTENCES = [
+    "I usually get up at {h}:30 and have breakfast at home.",
+    "I never go to bed late on weekdays.",
+    "On Saturdays I sometimes play football with my friends.",
+    "My sister watches series in the evening.",
+    "I would like the grilled chicken, please.",
+    "Could I have the bill, please?",
+    "I don't like spicy food because it is too hot.",
+    "We always visit my grandparents on Sunday.",
+    "He works in a hotel and starts work at {h}:00.",
+    "I prefer tea to coffee because it is relaxing.",
+    "My favourite food is tacos with fresh salsa.",
+    "I hardly ever eat fast food.",
+]
+
+QUERIES = [
+    ("1234", {}),
+    ("grandparents", {}),
+    ("would like chicken", {}),
+    ("spicy", {"session": "S2"}),
+    ("get up 7", {"exercise_id": "exercise_3"}),
+    ("favou", {"session": "S1", "exercise_id": "exercise_1"}),
+]
+
+
+def build_varied_store(path: Path, rows: int, students: int = 2000, seed: int = 7):
+    rng = random.Random(seed)
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(RESPONSE_FIELDS)
+        for i in range(rows):
+            s = i % students
+            text = "\\n".join(
+                rng.choice(SENTENCES).format(h=rng.randint(5, 9)) for _ in range(rng.randint(1, 3))
+            )
+            writer.writerow(
+                [
+                    f"2025-{1 + i % 12:02d}-{1 + i % 28:02d}T10:{i % 60:02d}:00",
+                    f"student{s}@example.com",
+                    f"Student {s}",
+                    2,
+                    f"S{1 + i % 3}",
+                    "H1" if i % 2 else "H2",
+                    f"exercise_{i % 7}",
+                    text,
+                ]
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source = Path(tmp) / "responses.csv"
+        build_varied_store(source, args.rows)
+        index = ResponseSearchIndex(Path(tmp) / "search.sqlite3")
+
+        start = time.perf_counter()
+        added = index.sync_from_csv(source)
+        print(f"indexed {added} rows in {time.perf_counter() - start:.1f}s")
+        start = time.perf_counter()
+        again = index.sync_from_csv(source)
+        print(f"incremental re-sync: {again} new rows in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+        for text, filters in QUERIES:
+            timings = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                results = index.search(text, limit=50, **filters)
+                timings.append((time.perf_counter() - start) * 1000)
+            print(
+                f"{text!r:>12} {filters or ''}: {len(results)} hits, "
+                f"median {statistics.median(timings):.2f} ms, max {max(timings):.2f} ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+First-pass marks for a whole response store: compiled rubrics and a process pool.
+
+    python -m benchmarks.bench_rubrics --rows 200000 --workers 1 2 4
+
+Builds a synthetic unit2_responses.csv whose answers go to six answer boxes
+with rubrics shaped like ANSWER_RUBRICS (regexes, keyword lists, word
+counts, typical mistakes), then marks it:
+
+  per-answer  builds the rubric from its spec for every answer (what
+              checking straight from the specs costs)
+  compiled    compile_rubrics() once, one process
+  pool N      rescore_responses() with N worker processes (spawn), each
+              compiling the rubrics once
+
+Also reports the cost of one check() (what a student waits for) and
+verifies that every mode gives the same marks.
+"""
+import argparse
+import csv
+import os
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from helpers.response_export import iter_response_rows
+from helpers.response_store import RESPONSE_FIELDS
+from helpers.rubrics import POOL_MIN_BYTES, Rubric, compile_rubrics, rescore_responses, response_exercise
+
+_VERBS = r"\bi (?:always |usually |often |sometimes |never )?(?:get up|wake up|have|take|go|eat|watch|cook|read|sleep|study|work)\b"
+_FREQUENCY = ["always", "usually", "often", "sometimes", "never", "every day", "twice a week"]
+_THIRD_PERSON = {"label": "3rd person -s", "avoid": r"\b(?:he|she) (?:go|have|do|get|wake|take|work)\b"}
+
+SPECS = {
+    f"u2_{session}_{hour}_{exercise}": {
+        "criteria": [
+            {"label": "I + verb", "regex": _VERBS, "weight": 2},
+            {"label": "time words", "keywords": ["at", "in the morning", "in the evening", "then", "after that", "first"], "min": 2},
+            {"label": "frequency", "keywords": _FREQUENCY},
+            {"label": "connectors", "keywords": ["and", "but", "because", "so"], "min": 2},
+            {"label": "40+ words", "min_words": 40},
+            _THIRD_PERSON,
+        ],
+    }
+    for session, hour, exercise in [
+        ("S1", "H1", "routine_paragraph"),
+        ("S1", "H2", "listening_notes"),
+        ("S2", "H1", "free_time_email"),
+        ("S2", "H2", "listening_summary"),
+        ("S3", "H1", "habit_paragraph"),
+        ("S3", "H2", "reflection_notes"),
+    ]
+}
+
+_SENTENCES = [
+    "I usually get up at 6:30 in the morning.",
+    "Then I have breakfast with my family and I go to work by bus.",
+    "My sister always goes to the gym because she likes sport.",
+    "She go to school at eight.",
+    "I never sleep late, but on Saturdays I watch movies.",
+    "After that I cook dinner and I read a book.",
+    "I don't like waiting for the bus in the evening.",
+    "Twice a week I study English with my friends.",
+    "Me gusta el fútbol.",
+]
+
+
+def build_store(path: Path, rows: int, seed: int):
+    rng = random.Random(seed)
+    boxes = [key.split("_", 3)[1:] for key in SPECS]
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(RESPONSE_FIELDS)
+        for i in range(rows):
+            session, hour, exercise = boxes[i % len(boxes)]
+            text = " ".join(rng.choice(_SENTENCES) for _ in range(rng.randint(1, 8)))
+            writer.writerow(
+                [f"2025-03-{1 + i % 28:02d}T10:00:00", f"student{i % 3000}@mail.com", f"Student {i % 3000}",
+                 2, session, hour, exercise, text]
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source = Path(tmp) / "unit2_responses.csv"
+        build_store(source, args.rows, args.seed)
+        size = source.stat().st_size
+        print(f"{args.rows} answers, {size / 1e6:.1f} MB, {os.cpu_count()} CPUs")
+        rows = list(iter_response_rows(source))
+
+        started = time.perf_counter()
+        slow = [Rubric(response_exercise(row), SPECS[response_exercise(row)]).check(row["response"]).score for row in rows]
+        per_answer_s = time.perf_counter() - started
+
+        rubrics = compile_rubrics(SPECS)
+        started = time.perf_counter()
+        fast = [rubrics[response_exercise(row)].check(row["response"]).score for row in rows]
+        compiled_s = time.perf_counter() - started
+        check_us = compiled_s * 1e6 / len(rows)
+
+        pools = []
+        for workers in args.workers:
+            target = Path(tmp) / f"marks_{workers}.csv"
+            started = time.perf_counter()
+            count = rescore_responses(source, SPECS, target, workers=workers)
+            elapsed = time.perf_counter() - started
+            with open(target, newline="", encoding="utf-8") as f:
+                marks = [float(row["score"]) for row in csv.DictReader(f)]
+            pools.append((workers, elapsed, count, marks))
+
+    mismatches = sum(1 for a, b in zip(slow, fast) if a != b)
+    mismatches += sum(
+        1 for _, _, _, marks in pools for a, b in zip(marks, fast) if abs(a - round(b, 3)) > 1e-9
+    ) + sum(abs(count - len(fast)) for _, _, count, _ in pools)
+    print(f"{'mode':<12} {'s':>7} {'answers/s':>11}")
+    print(f"{'per-answer':<12} {per_answer_s:>7.2f} {len(rows) / per_answer_s:>11.0f}")
+    print(f"{'compiled':<12} {compiled_s:>7.2f} {len(rows) / compiled_s:>11.0f}   (scoring only)")
+    for workers, elapsed, count, _ in pools:
+        note = "   (in-process: store below POOL_MIN_BYTES)" if workers > 1 and size < POOL_MIN_BYTES else ""
+        print(f"{f'pool {workers}':<12} {elapsed:>7.2f} {count / elapsed:>11.0f}   (read CSV + mark + write marks){note}")
+    print(f"one check(): {check_us:.1f} µs")
+    print("marks match" if not mismatches else f"{mismatches} marks differ")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+SRS scheduler cost with many students × many words.
+
+    python -m benchmarks.bench_srs --students 500 --items 2000 --reviews 50000
+
+Seeds srs_cards with a history for every student (--seen of the deck already
+reviewed, due dates spread over the next month), then replays random
+sessions: next_card() + review() through helpers.srs, and the same loop with
+a linear scan for the most overdue card (what a SELECT … ORDER BY due or a
+min() over the student's cards costs per click). Also reports the
+first-touch cost of loading a student, rows per flush and bytes per card on
+disk.
+"""
+import argparse
+import random
+import sqlite3
+import tempfile
+import time
+from pathlib import Path
+
+from helpers.srs import AGAIN, EASY, GOOD, HARD, START_EASE, Card, SRSStore, schedule
+
+
+def _seed(path: Path, students: int, keys: list, seen: float, today: int, rng: random.Random):
+    conn = sqlite3.connect(str(path))
+    store = SRSStore(path, flush_interval=3600)
+    store.define_deck("deck", keys)
+    store.close()
+    ids = [row[0] for row in conn.execute("SELECT id FROM srs_items ORDER BY id")]
+    with conn:
+        for s in range(students):
+            rows = []
+            for item in rng.sample(ids, int(len(ids) * seen)):
+                interval = rng.randint(1, 60)
+                rows.append((f"student{s}@mail.com", item, START_EASE, interval, 3, 0, today + rng.randint(-3, 30)))
+            conn.executemany("INSERT INTO srs_cards VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+    conn.close()
+
+
+def _scan_next(cards: dict, order: list, today: int):
+    """Baseline: min() over every card of the student, then first unseen in deck order."""
+    due = min(((card.due, item) for item, card in cards.items()), default=None)
+    if due is not None and due[0] <= today:
+        return due[1]
+    return next((item for item in order if item not in cards), None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--students", type=int, default=500)
+    parser.add_argument("--items", type=int, default=2000)
+    parser.add_argument("--seen", type=float, default=0.5, help="Fraction of the deck each student already reviewed.")
+    parser.add_argument("--reviews", type=int, default=50000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    keys = [f"bench/word{i}" for i in range(args.items)]
+    grades = [AGAIN, HARD, GOOD, GOOD, GOOD, EASY]
+    today = 740000
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "srs.sqlite3"
+        started = time.perf_counter()
+        _seed(path, args.students, keys, args.seen, today, rng)
+        print(f"seeded {args.students} students × {int(args.items * args.seen)} cards in {time.perf_counter() - started:.1f} s")
+
+        store = SRSStore(path, flush_interval=3600, max_students=args.students)
+        store.define_deck("deck", keys)
+        started = time.perf_counter()
+        for s in range(args.students):
+            store.next_card(f"student{s}@mail.com", "deck", today)
+        load_ms = (time.perf_counter() - started) * 1000 / args.students
+
+        # Misma secuencia de estudiantes y notas para los dos recorridos.
+        plan = [(f"student{rng.randrange(args.students)}@mail.com", rng.choice(grades)) for _ in range(args.reviews)]
+
+        started = time.perf_counter()
+        for student, grade in plan:
+            key = store.next_card(student, "deck", today)
+            if key is not None:
+                store.review(student, key, grade, today)
+        heap_s = time.perf_counter() - started
+
+        cards = {f"student{s}@mail.com": {} for s in range(args.students)}
+        for student in cards:
+            for item in range(args.items):
+                if rng.random() < args.seen:
+                    cards[student][item] = Card(START_EASE, 10, 3, 0, today + rng.randint(-3, 30))
+        order = list(range(args.items))
+        started = time.perf_counter()
+        for student, grade in plan:
+            item = _scan_next(cards[student], order, today)
+            if item is not None:
+                cards[student][item] = schedule(cards[student].get(item, Card()), grade, today)
+        scan_s = time.perf_counter() - started
+
+        started = time.perf_counter()
+        rows = store.flush()
+        flush_ms = (time.perf_counter() - started) * 1000
+        store.close()
+        conn = sqlite3.connect(str(path))
+        total_rows = conn.execute("SELECT COUNT(*) FROM srs_cards").fetchone()[0]
+        conn.close()
+        size = path.stat().st_size
+
+    print(f"{'mode':<6} {'seconds':>8} {'µs/click':>9}")
+    print(f"{'heap':<6} {heap_s:>8.2f} {heap_s * 1e6 / args.reviews:>9.1f}")
+    print(f"{'scan':<6} {scan_s:>8.2f} {scan_s * 1e6 / args.reviews:>9.1f}")
+    print(f"first touch per student: {load_ms:.2f} ms (one primary-key range read + heapify)")
+    print(f"flush: {rows} rows in {flush_ms:.0f} ms (one transaction for {args.reviews} reviews)")
+    print(f"disk: {size / max(1, total_rows):.0f} bytes per card ({total_rows} cards, {size / 1_048_576:.1f} MB)")
+
+
+if __name__ == "__main__":
+    main()
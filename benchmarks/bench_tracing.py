@@ -0,0 +1,57 @@
+"""
+Cost of the tracing instrumentation per call.
+
+    python -m benchmarks.bench_tracing
+
+Compares a bare function call with the same call wrapped in @traced and in
+`with span(...)`, with tracing off and with the JSONL exporter on.
+"""
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+from helpers import tracing
+
+
+def _work():
+    return None
+
+
+@tracing.traced("bench.decorated")
+def _decorated():
+    return None
+
+
+def _with_span():
+    with tracing.span("bench.block", size=1):
+        return None
+
+
+def _per_call_ns(func, calls: int) -> float:
+    start = time.perf_counter_ns()
+    for _ in range(calls):
+        func()
+    return (time.perf_counter_ns() - start) / calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--calls", type=int, default=200_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, target in (("off", ""), ("jsonl", f"jsonl://{Path(tmp) / 'traces.jsonl'}")):
+            tracing.configure_tracing(target)
+            base = _per_call_ns(_work, args.calls)
+            decorated = _per_call_ns(_decorated, args.calls)
+            block = _per_call_ns(_with_span, args.calls)
+            print(
+                f"tracing {label:<5}: bare {base:7.0f} ns | @traced +{decorated - base:7.0f} ns | "
+                f"span() +{block - base:7.0f} ns per call"
+            )
+        tracing.configure_tracing("")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+TTS throughput against a throttling provider, with and without the limiter.
+
+    python -m benchmarks.bench_tts_limiter --jobs 40 --sessions 8
+
+The simulated provider accepts `--provider-concurrency` requests at a time
+and answers 429 (Retry-After: 1) to anything over that, like ElevenLabs'
+per-tier concurrency limit. "naive" fires every session's requests as soon
+as it can and gives up on a 429 (what generate_audio_elevenlabs did); "limiter"
+goes through helpers.tts_limiter with the same concurrency setting.
+"""
+import argparse
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from helpers.tts_limiter import RetryAfter, get_tts_limiter
+
+
+class _Provider:
+    def __init__(self, concurrency: int, latency_s: float):
+        self.concurrency = concurrency
+        self.latency_s = latency_s
+        self.active = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def synthesize(self):
+        with self._lock:
+            if self.active >= self.concurrency:
+                self.rejected += 1
+                raise RetryAfter(1.0)
+            self.active += 1
+        try:
+            time.sleep(self.latency_s)
+            return b"mp3"
+        finally:
+            with self._lock:
+                self.active -= 1
+
+
+def _run(sessions: int, jobs: int, job) -> tuple:
+    done, failed = [], []
+    per_session = [jobs // sessions + (1 if i < jobs % sessions else 0) for i in range(sessions)]
+
+    def worker(count: int):
+        for _ in range(count):
+            try:
+                job()
+                done.append(1)
+            except RetryAfter:
+                failed.append(1)
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in per_session]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return time.perf_counter() - start, len(done), len(failed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--jobs", type=int, default=40)
+    parser.add_argument("--sessions", type=int, default=8)
+    parser.add_argument("--provider-concurrency", type=int, default=2)
+    parser.add_argument("--latency-ms", type=float, default=150.0)
+    args = parser.parse_args()
+
+    print(f"{'mode':<8} {'seconds':>8} {'ok':>5} {'failed':>7} {'429s':>6} {'jobs/s':>7}")
+    provider = _Provider(args.provider_concurrency, args.latency_ms / 1000)
+    elapsed, ok, failed = _run(args.sessions, args.jobs, provider.synthesize)
+    print(f"{'naive':<8} {elapsed:>8.2f} {ok:>5} {failed:>7} {provider.rejected:>6} {ok / elapsed:>7.1f}")
+
+    provider = _Provider(args.provider_concurrency, args.latency_ms / 1000)
+    with tempfile.TemporaryDirectory() as tmp:
+        limiter = get_tts_limiter(
+            Path(tmp) / "quota.sqlite3",
+            requests_per_minute=6000,
+            burst=args.provider_concurrency,
+            max_concurrent=args.provider_concurrency,
+        )
+        elapsed, ok, failed = _run(args.sessions, args.jobs, lambda: limiter.run(500, provider.synthesize))
+        usage = limiter.ledger.usage()
+        limiter.ledger.close()
+    print(f"{'limiter':<8} {elapsed:>8.2f} {ok:>5} {failed:>7} {provider.rejected:>6} {ok / elapsed:>7.1f}")
+    print(f"quota ledger: {usage['chars']:,} chars in {usage['requests']} requests")
+
+
+if __name__ == "__main__":
+    main()
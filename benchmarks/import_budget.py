@@ -0,0 +1,134 @@
+"""
+Cold-start import budget for app.py.
+
+    python -m benchmarks.import_budget            # compare against import_budget.json
+    python -m benchmarks.import_budget --update   # re-record after an intended change
+    python -m benchmarks.import_budget --tree 25  # also print the 25 slowest imports (-X importtime)
+
+Imports app.py in fresh interpreters (`python -X importtime -c "import app"`)
+and reports, as the median of --repeat runs:
+
+  imports_ms  time spent importing the modules app.py pulls in (its own
+              module body is not counted: the server runs it on every rerun,
+              page_budgets measures that)
+  per module  cumulative import time of every direct import of app.py
+
+Exits with status 1 when imports_ms goes past the budget by more than the
+threshold, or when a module listed under "lazy" (pandas, requests, …) is
+imported at startup instead of on the page that needs it.
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+BUDGET_PATH = Path(__file__).resolve().parent / "import_budget.json"
+# streamlit.components.v1 no está: `import streamlit` ya lo carga (<1 ms).
+DEFAULT_LAZY = ["pandas", "numpy", "pyarrow", "requests", "PIL"]
+DEFAULT_THRESHOLD = 0.5
+
+_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+def parse_importtime(stderr: str) -> list:
+    """(module, self_us, cumulative_us, depth) per `-X importtime` line, in output order."""
+    rows = []
+    for line in stderr.splitlines():
+        match = _LINE.match(line)
+        if match:
+            rows.append((match.group(4), int(match.group(1)), int(match.group(2)), len(match.group(3)) // 2))
+    return rows
+
+
+def direct_imports(rows: list, parent: str = "app") -> dict:
+    """
+    Cumulative µs of the modules imported directly by `parent`. importtime
+    prints children before their parent, one level deeper.
+    """
+    index = next(i for i, row in enumerate(rows) if row[0] == parent)
+    depth = rows[index][3]
+    children = {}
+    for name, _, cumulative, row_depth in reversed(rows[:index]):
+        if row_depth <= depth:
+            break
+        if row_depth == depth + 1:
+            children[name] = cumulative
+    return children
+
+
+def sample() -> dict:
+    env = {**os.environ, "METRICS_PORT": "", "PYTHONDONTWRITEBYTECODE": "1"}
+    code = "import sys, json, app; print(json.dumps(sorted(sys.modules)))"
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=False,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "import app failed")
+    rows = parse_importtime(proc.stderr)
+    app_row = next(row for row in rows if row[0] == "app")
+    return {
+        "imports_us": app_row[2] - app_row[1],
+        "modules": direct_imports(rows),
+        "loaded": set(json.loads(proc.stdout.strip().splitlines()[-1])),
+        "rows": rows,
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--budget", type=Path, default=BUDGET_PATH)
+    parser.add_argument("--update", action="store_true", help="Write the measured value as the new budget.")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--tree", type=int, default=0, help="Print the N slowest imports by cumulative time.")
+    args = parser.parse_args(argv)
+
+    budget = json.loads(args.budget.read_text(encoding="utf-8")) if args.budget.exists() else {}
+    lazy = budget.get("lazy", DEFAULT_LAZY)
+    threshold = budget.get("threshold", DEFAULT_THRESHOLD)
+
+    runs = [sample() for _ in range(args.repeat)]
+    imports_ms = statistics.median(run["imports_us"] for run in runs) / 1000
+    modules = {
+        name: statistics.median(run["modules"].get(name, 0) for run in runs) / 1000
+        for name in runs[0]["modules"]
+    }
+
+    print(f"{'direct import of app.py':<40} {'ms':>8}")
+    for name, ms in sorted(modules.items(), key=lambda item: -item[1]):
+        if ms >= 1:
+            print(f"{name:<40} {ms:>8.1f}")
+    print(f"{'total (median of ' + str(args.repeat) + ')':<40} {imports_ms:>8.1f}")
+
+    if args.tree:
+        print("\nslowest imports (cumulative ms, first run):")
+        for name, _, cumulative, depth in sorted(runs[0]["rows"], key=lambda row: -row[2])[: args.tree]:
+            print(f"{cumulative / 1000:>8.1f}  {'  ' * depth}{name}")
+
+    if args.update:
+        args.budget.write_text(
+            json.dumps({"threshold": threshold, "lazy": lazy, "imports_ms": round(imports_ms, 1)}, indent=2) + "\n",
+            encoding="utf-8",
+        )
+        print(f"Budget written to {args.budget}")
+        return 0
+
+    failures = []
+    eager = [name for name in lazy if name in runs[0]["loaded"]]
+    if eager:
+        failures.append(f"imported at startup, should be lazy: {', '.join(eager)}")
+    limit = budget.get("imports_ms")
+    if limit is not None and imports_ms > limit * (1 + threshold):
+        failures.append(f"imports_ms {imports_ms:.1f} > budget {limit} (+{threshold:.0%})")
+    for failure in failures:
+        print(failure, file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
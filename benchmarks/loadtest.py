@@ -0,0 +1,286 @@
+"""
+Concurrent-session load test for the Streamlit app, driven by AppTest.
+
+    python -m benchmarks.loadtest --sessions 1 5 10 25 --iterations 3
+    python -m benchmarks.loadtest --scenario teacher --seed-answers 200000 --sessions 1 4
+
+Every session runs in its own thread, like the Streamlit server runs one
+script thread per browser tab, so all sessions share this process's GIL,
+caches and singletons. AppTest normally builds a fresh runtime, script
+cache and secrets object on each run and swaps them in globally, which is
+not safe across threads and recompiles app.py on every rerun. The harness
+installs a single shared runtime and script cache instead, as a real
+server process has.
+
+Scenarios:
+  student  register on Access, open Unit 3 · Class 2, answer the quiz,
+           open Unit 2 and save a written answer (goes through the writer queue)
+  teacher  log in as admin and open the Teacher Panel over the seeded answers
+  exam     register as a new candidate, open Assessment and start the
+           mid-course test with everybody else, save the answers
+           --iterations times, submit and reload the page
+
+External APIs (Pexels, ElevenLabs) are replaced with local stubs and all
+data goes to a temporary directory. Reported per session count: p50 / p95 /
+p99 latency of each rerun, reruns per second and process RSS.
+"""
+import argparse
+import itertools
+import os
+import resource
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from unittest import mock
+
+import requests
+
+APP_PATH = Path(__file__).resolve().parent.parent / "app.py"
+ADMIN_CODE = "A2-ADMIN-2025"
+_CANDIDATES = itertools.count()
+
+
+class _StubResponse:
+    def __init__(self, status_code=200, payload=None, content=b""):
+        self.status_code = status_code
+        self._payload = payload or {}
+        self.content = content
+        self.text = ""
+
+    def json(self):
+        return self._payload
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"stub status {self.status_code}")
+
+
+def _stub_api(latency_s: float):
+    photos = [
+        {
+            "src": {"large2x": f"https://images.example/{i}.jpg"},
+            "photographer": f"Stub {i}",
+            "url": f"https://pexels.example/{i}",
+        }
+        for i in range(12)
+    ]
+
+    def fake_get(url, *args, **kwargs):
+        time.sleep(latency_s)
+        return _StubResponse(payload={"photos": photos})
+
+    def fake_post(url, *args, **kwargs):
+        time.sleep(latency_s)
+        return _StubResponse(content=b"\xff\xfb\x90\x00" * 512)
+
+    return mock.patch.multiple(requests, get=fake_get, post=fake_post)
+
+
+@contextmanager
+def _shared_streamlit_runtime(secrets: dict):
+    import streamlit as st
+    from streamlit.runtime import Runtime
+    from streamlit.runtime.caching.storage.dummy_cache_storage import MemoryCacheStorageManager
+    from streamlit.runtime.dataframe_source_manager import DataframeSourceManager
+    from streamlit.runtime.media_file_manager import MediaFileManager
+    from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage
+    from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+    from streamlit.runtime.secrets import Secrets
+    from streamlit.testing.v1 import app_test, local_script_runner
+    from streamlit.testing.v1.util import patch_config_options
+
+    runtime = mock.MagicMock(spec=Runtime)
+    runtime.media_file_mgr = MediaFileManager(MemoryMediaFileStorage("/mock/media"))
+    runtime.dataframe_source_mgr = DataframeSourceManager()
+    runtime.cache_storage_manager = MemoryCacheStorageManager()
+    script_cache = ScriptCache()
+
+    # AppTest asigna Runtime._instance al inicio y al final de cada corrida;
+    # con una subclase esas asignaciones ya no tocan el runtime compartido.
+    class _PerRunRuntime(Runtime):
+        _instance = None
+
+    shared_secrets = Secrets()
+    shared_secrets._secrets = dict(secrets)
+    saved_instance, saved_secrets = Runtime._instance, st.secrets
+    Runtime._instance, st.secrets = runtime, shared_secrets
+    try:
+        with patch_config_options({"global.appTest": True}), mock.patch.multiple(
+            app_test,
+            Runtime=_PerRunRuntime,
+            ScriptCache=lambda: script_cache,
+            patch_config_options=lambda options: nullcontext(),
+        ), mock.patch.object(local_script_runner, "ScriptCache", lambda: script_cache):
+            yield
+    finally:
+        Runtime._instance, st.secrets = saved_instance, saved_secrets
+
+
+def current_rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        # macOS / sin /proc: pico de RSS (ru_maxrss está en bytes en macOS, KiB en Linux).
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+class _Session:
+    """One scripted browser tab. Every rerun is timed into `latencies`."""
+
+    def __init__(self, index: int, latencies: list, errors: list, timeout: float):
+        from streamlit.testing.v1 import AppTest
+
+        self.index = index
+        self.latencies = latencies
+        self.errors = errors
+        self.at = AppTest.from_file(str(APP_PATH), default_timeout=timeout)
+
+    def rerun(self, action=None):
+        start = time.perf_counter()
+        if action is None:
+            self.at.run()
+        else:
+            action().run()
+        self.latencies.append(time.perf_counter() - start)
+        if self.at.exception:
+            self.errors.append(self.at.exception[0].value)
+
+    def go(self, page: str):
+        self.rerun(lambda: self.at.selectbox(key="nav_selectbox").set_value(page))
+
+    def _select(self, label: str, option: str):
+        box = next(s for s in self.at.selectbox if s.label == label)
+        self.rerun(lambda: box.select(option))
+
+    def student(self, iterations: int):
+        self.rerun()
+        self.go("Access")
+        self.at.text_input(key="reg_name").input(f"Load Student {self.index}")
+        self.at.text_input(key="reg_email").input(f"load{self.index}@example.com")
+        self.rerun(lambda: self.at.button(key="reg_btn").click())
+        for i in range(iterations):
+            self.go("Enter your class")
+            self._select("Choose your unit", "Unit 3 – Food")
+            self._select("Choose your lesson", "Class 2 – At the restaurant")
+            quiz = [r for r in self.at.radio if r.key and r.key.startswith("u3c2_quiz_")]
+            for radio in quiz[:3]:
+                self.rerun(lambda radio=radio: radio.set_value(radio.options[-1]))
+            self._select("Choose your unit", "Unit 2 – Daily Life")
+            boxes = [t for t in self.at.text_area if t.key and t.key.startswith("u2_")]
+            if boxes:
+                box = boxes[0]
+                box.input(f"I usually get up at 7. Answer {i} from session {self.index}.")
+                self.rerun(lambda: self.at.button(key=f"save_{box.key}").click())
+
+    def exam(self, iterations: int):
+        self.rerun()
+        self.go("Access")
+        candidate = next(_CANDIDATES)  # un intento por estudiante: cada corrida usa correos nuevos
+        self.at.text_input(key="reg_name").input(f"Load Candidate {candidate}")
+        self.at.text_input(key="reg_email").input(f"candidate{candidate}@example.com")
+        self.rerun(lambda: self.at.button(key="reg_btn").click())
+        self.go("Assessment & Progress")
+        self.rerun(lambda: self.at.selectbox(key="exam_choice").set_value("midterm"))
+        self.rerun(lambda: self.at.button(key="exam_start_midterm").click())
+        for i in range(iterations):
+            for radio in self.at.radio:
+                if radio.key and radio.key.startswith("exam_"):
+                    radio.set_value(radio.options[(self.index + i) % len(radio.options)])
+            self.rerun(lambda: self.at.button(key="exam_save_midterm").click())
+        self.rerun(lambda: self.at.button(key="exam_submit_midterm").click())
+        self.rerun()
+
+    def teacher(self, iterations: int):
+        self.rerun()
+        self.go("Teacher Panel")
+        self.at.text_input(key="teacher_panel_code").input(ADMIN_CODE)
+        self.rerun(lambda: self.at.button(key="teacher_panel_btn").click())
+        for _ in range(iterations):
+            self.rerun()
+
+
+def run_level(scenario: str, sessions: int, iterations: int, timeout: float) -> dict:
+    latencies: list = []
+    errors: list = []
+    barrier = threading.Barrier(sessions)
+
+    def worker(index: int):
+        try:
+            session = _Session(index, latencies, errors, timeout)
+            barrier.wait()
+            getattr(session, scenario)(iterations)
+        except Exception as exc:  # el error se reporta, la corrida sigue
+            errors.append(repr(exc))
+
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(sessions)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    ordered = sorted(latencies) or [0.0]
+
+    def pct(p: float) -> float:
+        return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))] * 1000
+
+    return {
+        "sessions": sessions,
+        "reruns": len(latencies),
+        "p50_ms": statistics.median(ordered) * 1000,
+        "p95_ms": pct(95),
+        "p99_ms": pct(99),
+        "reruns_per_s": len(latencies) / elapsed if elapsed else 0.0,
+        "rss_mb": current_rss_mb(),
+        "errors": errors,
+    }
+
+
+def seed_answers(responses_dir: Path, rows: int):
+    from benchmarks.bench_response_export import build_synthetic_store
+
+    build_synthetic_store(responses_dir / "unit2_responses.csv", rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scenario", choices=["student", "teacher", "exam"], default="student")
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 5, 10, 25])
+    parser.add_argument("--iterations", type=int, default=2, help="Scripted loops per session.")
+    parser.add_argument("--seed-answers", type=int, default=0, help="Synthetic answers already saved.")
+    parser.add_argument("--stub-latency-ms", type=float, default=50.0, help="Simulated external API latency.")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Max seconds per rerun.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["RESPONSES_DIR"] = str(Path(tmp) / "responses")
+        os.environ["SHARED_CACHE_URL"] = f"sqlite:///{Path(tmp) / 'cache.sqlite3'}"
+        os.environ.setdefault("DRAFT_AUTOSAVE_SECONDS", "3")
+        if args.seed_answers:
+            Path(os.environ["RESPONSES_DIR"]).mkdir(parents=True, exist_ok=True)
+            seed_answers(Path(os.environ["RESPONSES_DIR"]), args.seed_answers)
+            print(f"seeded {args.seed_answers} answers")
+
+        print(f"scenario={args.scenario} iterations={args.iterations} stub latency={args.stub_latency_ms:.0f} ms")
+        print(f"{'sessions':>8} {'reruns':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'reruns/s':>9} {'RSS MB':>8}")
+        with _stub_api(args.stub_latency_ms / 1000), _shared_streamlit_runtime({"PEXELS_API_KEY": "stub"}):
+            for n in args.sessions:
+                r = run_level(args.scenario, n, args.iterations, args.timeout)
+                print(
+                    f"{r['sessions']:>8} {r['reruns']:>7} {r['p50_ms']:>9.1f} {r['p95_ms']:>9.1f} "
+                    f"{r['p99_ms']:>9.1f} {r['reruns_per_s']:>9.1f} {r['rss_mb']:>8.0f}"
+                )
+                for err in r["errors"][:3]:
+                    print(f"         error: {err}")
+
+
+if __name__ == "__main__":
+    main()
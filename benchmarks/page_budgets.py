@@ -0,0 +1,227 @@
+"""
+Per-page performance budgets.
+
+    python -m benchmarks.page_budgets            # compare against page_budgets.json
+    python -m benchmarks.page_budgets --update   # re-record the budgets after an intended change
+    python -m benchmarks.page_budgets --only "lesson:3:*"
+
+Renders every entry in PAGES and every lesson of "Enter your class"
+headlessly (AppTest) and measures one steady-state rerun of each:
+
+  time_ms   script execution time, fastest of --repeat reruns (timed inside
+            the script thread, so AppTest's polling is not included)
+  elements  number of elements sent to the browser
+  bytes     serialized size of the forward messages (what goes over the websocket)
+
+Exits with status 1 when any target goes past its budget by more than the
+threshold stored in the budgets file, so it can gate CI.
+"""
+import argparse
+import ast
+import fnmatch
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+from unittest import mock
+
+APP_PATH = Path(__file__).resolve().parent.parent / "app.py"
+BUDGETS_PATH = Path(__file__).resolve().parent / "page_budgets.json"
+ADMIN_CODE = "A2-ADMIN-2025"
+ADMIN_PAGES = {"Teacher Panel": "teacher_panel", "Content Admin": "content_admin"}
+DEFAULT_THRESHOLDS = {"time_ms": 0.5, "elements": 0.1, "bytes": 0.2}
+# Tiempo mínimo de holgura: evita fallar por ruido en páginas de pocos ms.
+TIME_SLACK_MS = 15.0
+
+
+def _app_literals(*names):
+    """PAGES / UNITS / LESSONS straight from app.py, without running the app."""
+    tree = ast.parse(APP_PATH.read_text(encoding="utf-8"))
+    found = {}
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and isinstance(node.targets[0], ast.Name):
+            name = node.targets[0].id
+            if name in names:
+                found[name] = ast.literal_eval(node.value)
+    return [found[name] for name in names]
+
+
+def list_targets():
+    pages, units, lessons = _app_literals("PAGES", "UNITS", "LESSONS")
+    targets = [(f"page:{p['id']}", {"page": p["id"]}) for p in pages]
+    for unit in units:
+        for lesson in lessons.get(unit["number"], []):
+            targets.append(
+                (
+                    f"lesson:{unit['number']}:{lesson['title']}",
+                    {
+                        "page": "Enter your class",
+                        "unit": f"Unit {unit['number']} – {unit['name']}",
+                        "lesson": lesson["title"],
+                    },
+                )
+            )
+    return targets
+
+
+def _shared_script_cache():
+    """
+    AppTest compiles app.py again on every run; the server compiles it once.
+    Sharing one ScriptCache keeps compile time out of the measured reruns.
+    """
+    from contextlib import ExitStack
+
+    from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+    from streamlit.testing.v1 import app_test, local_script_runner
+
+    cache = ScriptCache()
+    stack = ExitStack()
+    stack.enter_context(mock.patch.object(app_test, "ScriptCache", lambda: cache))
+    stack.enter_context(mock.patch.object(local_script_runner, "ScriptCache", lambda: cache))
+    return stack
+
+
+class _RunRecorder:
+    """
+    Times the script body of each run and sizes the messages it produced.
+    """
+
+    def __init__(self):
+        self.script_ms = 0.0
+        self.elements = 0
+        self.bytes = 0
+
+    def patch(self):
+        from contextlib import ExitStack
+
+        from streamlit.runtime.scriptrunner.script_runner import ScriptRunner
+        from streamlit.testing.v1 import local_script_runner
+
+        original = local_script_runner.parse_tree_from_messages
+        run_script = ScriptRunner._run_script
+
+        def timed_run_script(runner, rerun_data):
+            start = time.perf_counter()
+            try:
+                return run_script(runner, rerun_data)
+            finally:
+                self.script_ms = (time.perf_counter() - start) * 1000
+
+        def recording(messages):
+            self.bytes = sum(msg.ByteSize() for msg in messages)
+            self.elements = sum(
+                1
+                for msg in messages
+                if msg.WhichOneof("type") == "delta" and msg.delta.WhichOneof("type") == "new_element"
+            )
+            return original(messages)
+
+        stack = ExitStack()
+        stack.enter_context(mock.patch.object(local_script_runner, "parse_tree_from_messages", recording))
+        stack.enter_context(mock.patch.object(local_script_runner.LocalScriptRunner, "_run_script", timed_run_script))
+        return stack
+
+
+def _open_target(spec: dict, timeout: float):
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(str(APP_PATH), default_timeout=timeout)
+    at.run()
+    at.selectbox(key="nav_selectbox").set_value(spec["page"]).run()
+    prefix = ADMIN_PAGES.get(spec["page"])
+    if prefix:
+        at.text_input(key=f"{prefix}_code").input(ADMIN_CODE)
+        at.button(key=f"{prefix}_btn").click().run()
+    if "unit" in spec:
+        next(s for s in at.selectbox if s.label == "Choose your unit").select(spec["unit"]).run()
+        next(s for s in at.selectbox if s.label == "Choose your lesson").select(spec["lesson"]).run()
+    return at
+
+
+def measure(spec: dict, recorder: _RunRecorder, repeat: int, timeout: float) -> dict:
+    at = _open_target(spec, timeout)
+    timings = []
+    for _ in range(repeat):
+        at.run()
+        timings.append(recorder.script_ms)
+    if at.exception:
+        raise RuntimeError(at.exception[0].value)
+    return {
+        "time_ms": round(min(timings), 1),
+        "elements": recorder.elements,
+        "bytes": recorder.bytes,
+    }
+
+
+def compare(name: str, measured: dict, budget: dict, thresholds: dict) -> list:
+    failures = []
+    for metric, value in measured.items():
+        limit = budget.get(metric)
+        if limit is None:
+            continue
+        allowed = limit * (1 + thresholds.get(metric, 0))
+        if metric == "time_ms":
+            allowed = max(allowed, limit + TIME_SLACK_MS)
+        if value > allowed:
+            failures.append(f"{name}: {metric} {value} > budget {limit} (+{thresholds.get(metric, 0):.0%})")
+    return failures
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--budgets", type=Path, default=BUDGETS_PATH)
+    parser.add_argument("--update", action="store_true", help="Write the measured values as the new budgets.")
+    parser.add_argument("--only", help="Glob over target names, e.g. 'page:*' or 'lesson:3:*'.")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    args = parser.parse_args(argv)
+
+    budgets = json.loads(args.budgets.read_text(encoding="utf-8")) if args.budgets.exists() else {}
+    thresholds = {**DEFAULT_THRESHOLDS, **budgets.get("thresholds", {})}
+    targets = [(n, s) for n, s in list_targets() if not args.only or fnmatch.fnmatch(n, args.only)]
+
+    results, failures = {}, []
+    recorder = _RunRecorder()
+    with tempfile.TemporaryDirectory() as tmp:
+        # Páginas renderizadas sobre datos vacíos y sin APIs externas, para que
+        # los números no dependan de la máquina de quien corre la suite.
+        os.environ["RESPONSES_DIR"] = str(Path(tmp) / "responses")
+        os.environ["SHARED_CACHE_URL"] = "memory://"
+        with recorder.patch(), _shared_script_cache():
+            for name, spec in targets:
+                try:
+                    measured = measure(spec, recorder, args.repeat, args.timeout)
+                except Exception as exc:
+                    failures.append(f"{name}: failed to render ({exc})")
+                    print(f"{name:<58} ERROR {exc}")
+                    continue
+                results[name] = measured
+                budget = budgets.get("pages", {}).get(name)
+                problems = compare(name, measured, budget, thresholds) if budget else []
+                failures.extend(problems)
+                status = "FAIL" if problems else ("new" if not budget else "ok")
+                print(
+                    f"{name:<58} {measured['time_ms']:>8.1f} ms {measured['elements']:>5} el "
+                    f"{measured['bytes'] / 1024:>9.1f} KiB  {status}"
+                )
+
+    if args.update:
+        pages = budgets.get("pages", {})
+        pages.update(results)
+        args.budgets.write_text(
+            json.dumps({"thresholds": thresholds, "pages": dict(sorted(pages.items()))}, indent=2, ensure_ascii=False)
+            + "\n",
+            encoding="utf-8",
+        )
+        print(f"Budgets written to {args.budgets}")
+        return 0
+
+    for failure in failures:
+        print(failure, file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,286 @@
+import bisect
+import heapq
+import itertools
+import math
+import re
+import threading
+import unicodedata
+from operator import add, mul
+from typing import Dict, Iterable, List, Set, Tuple
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+_MARKUP_RE = re.compile(r"[*_`#>|]+")
+# Si un prefijo abarca más palabras, solo se buscan las más frecuentes (ver prefix_count()).
+MAX_PREFIX_EXPANSIONS = 64
+
+
+def normalize_text(text: str) -> str:
+    """Lowercase and strip accents so 'Iván' and 'ivan' match."""
+    decomposed = unicodedata.normalize("NFKD", text or "")
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).lower()
+
+
+def tokenize(text: str) -> List[str]:
+    return _WORD_RE.findall(normalize_text(text))
+
+
+def flatten_text(value) -> str:
+    """
+    Join every string inside nested dicts/lists (lesson configs, quiz JSON…).
+    """
+    if value is None:
+        return ""
+    if isinstance(value, str):
+        return value
+    if isinstance(value, dict):
+        return "\n".join(flatten_text(v) for v in value.values())
+    if isinstance(value, (list, tuple, set)):
+        return "\n".join(flatten_text(v) for v in value)
+    return str(value)
+
+
+class ContentSearchIndex:
+    """
+    In-memory inverted index for course content.
+    - postings: token -> {doc_id: term frequency / document length}
+    - bigrams: "word next" -> {doc_id}; a two-word phrase is a set lookup and
+      longer phrases use them as a filter before checking word positions
+    - a sorted vocabulary for prefix matching with bisect
+    - upsert()/remove() update only the postings of one document
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._docs: Dict[str, Dict] = {}
+        self._postings: Dict[str, Dict[str, float]] = {}
+        self._bigrams: Dict[str, Set[str]] = {}
+        self._vocab: List[str] = []
+        self._vocab_dirty = False
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def upsert(self, doc_id: str, title: str, text: str, location: str = ""):
+        tokens = tokenize(f"{title}\n{text}")
+        with self._lock:
+            self._remove_postings(doc_id)
+            self._docs[doc_id] = {
+                "title": title,
+                "text": text,
+                "location": location,
+                "length": len(tokens) or 1,
+                "tokens": tuple(tokens),
+            }
+            step = 1.0 / (len(tokens) or 1)
+            for token in tokens:
+                docs = self._postings.get(token)
+                if docs is None:
+                    docs = self._postings[token] = {}
+                    self._vocab_dirty = True
+                docs[doc_id] = docs.get(doc_id, 0.0) + step
+            for pair in zip(tokens, tokens[1:]):
+                self._bigrams.setdefault(" ".join(pair), set()).add(doc_id)
+
+    def remove(self, doc_id: str):
+        with self._lock:
+            self._remove_postings(doc_id)
+            self._docs.pop(doc_id, None)
+
+    def _remove_postings(self, doc_id: str):
+        if doc_id not in self._docs:
+            return
+        tokens = self._docs[doc_id]["tokens"]
+        for pair in set(zip(tokens, tokens[1:])):
+            key = " ".join(pair)
+            docs = self._bigrams.get(key)
+            if docs is not None:
+                docs.discard(doc_id)
+                if not docs:
+                    del self._bigrams[key]
+        for token in set(tokens):
+            docs = self._postings.get(token)
+            if docs is None:
+                continue
+            docs.pop(doc_id, None)
+            if not docs:
+                del self._postings[token]
+                self._vocab_dirty = True
+
+    def _vocabulary(self) -> List[str]:
+        if self._vocab_dirty:
+            self._vocab = sorted(self._postings)
+            self._vocab_dirty = False
+        return self._vocab
+
+    def _prefix_range(self, prefix: str) -> Tuple[List[str], int, int]:
+        vocab = self._vocabulary()
+        return vocab, bisect.bisect_left(vocab, prefix), bisect.bisect_right(vocab, prefix + "\uffff")
+
+    def prefix_count(self, prefix: str) -> int:
+        """How many indexed words start with `prefix` (more than MAX_PREFIX_EXPANSIONS means truncation)."""
+        with self._lock:
+            _, start, end = self._prefix_range(prefix)
+            return end - start
+
+    def expand_prefix(self, prefix: str) -> List[str]:
+        """
+        Indexed words that start with `prefix`. Past MAX_PREFIX_EXPANSIONS only
+        the words found in most documents are kept.
+        """
+        vocab, start, end = self._prefix_range(prefix)
+        if end - start <= MAX_PREFIX_EXPANSIONS:
+            return vocab[start:end]
+        return heapq.nlargest(MAX_PREFIX_EXPANSIONS, vocab[start:end], key=lambda token: len(self._postings[token]))
+
+    def search(self, query: str, limit: int = 20, snippet_words: int = 18) -> List[Dict]:
+        """
+        Every query word must appear in the document; the last word also
+        matches as a prefix. Documents where the words appear as a phrase
+        (e.g. "would like") rank first, then by tf-idf. Phrase positions and
+        snippets are only checked / built for the top `limit` documents.
+        """
+        terms = tokenize(query)
+        if not terms:
+            return []
+        with self._lock:
+            n_docs = len(self._docs) or 1
+            last_expansions = self.expand_prefix(terms[-1])
+            term_postings: List[Dict[str, float]] = []
+            for i, term in enumerate(terms):
+                if i == len(terms) - 1 and last_expansions != [term]:
+                    if len(last_expansions) == 1:
+                        postings = self._postings[last_expansions[0]]
+                    else:
+                        postings = {}
+                        for token in last_expansions:
+                            for doc_id, tf in self._postings[token].items():
+                                postings[doc_id] = postings.get(doc_id, 0.0) + tf
+                else:
+                    postings = self._postings.get(term, {})
+                if not postings:
+                    return []
+                term_postings.append(postings)
+
+            candidates = set(min(term_postings, key=len))
+            for postings in term_postings:
+                candidates &= postings.keys()
+            # tf-idf por columnas con map(): el bucle corre en C, no por documento en Python.
+            ordered = list(candidates)
+            totals = None
+            for postings in term_postings:
+                weight = math.log(1 + n_docs / len(postings))
+                column = map(mul, map(postings.__getitem__, ordered), itertools.repeat(weight))
+                totals = column if totals is None else map(add, totals, column)
+            scores = dict(zip(ordered, totals))
+
+            phrase_pool = self._phrase_docs(terms, last_expansions) & candidates
+            if len(terms) > 2:
+                # Los bigramas solo filtran: se comprueban posiciones en orden de puntaje hasta tener `limit`.
+                expansions = set(last_expansions)
+                phrase_docs = set()
+                for doc_id in _by_score(phrase_pool, scores, 2 * limit):
+                    if _has_phrase(self._docs[doc_id]["tokens"], terms[:-1], expansions):
+                        phrase_docs.add(doc_id)
+                        if len(phrase_docs) >= limit:
+                            break
+            else:
+                phrase_docs = phrase_pool
+            top = heapq.nlargest(limit, phrase_docs, key=scores.__getitem__)
+            if len(top) < limit:
+                top += heapq.nlargest(limit - len(top), candidates - phrase_docs, key=scores.__getitem__)
+
+            hits: Dict[str, bool] = {}
+            results = []
+            for doc_id in top:
+                doc = self._docs[doc_id]
+                phrase = doc_id in phrase_docs
+                results.append(
+                    {
+                        "doc_id": doc_id,
+                        "title": doc["title"],
+                        "location": doc["location"],
+                        "score": round(scores[doc_id] + (10.0 if phrase else 0.0), 4),
+                        "phrase": phrase,
+                        "snippet": _snippet(doc["text"] or doc["title"], terms, snippet_words, hits),
+                    }
+                )
+            return results
+
+    def _phrase_docs(self, terms: List[str], last_expansions: List[str]) -> Set[str]:
+        """
+        Documents where each pair of consecutive query words appears next to
+        each other. Exact for two words; for longer queries the pairs may be
+        in different places, so search() checks positions.
+        """
+        if len(terms) < 2:
+            return set()
+        docs = None
+        for i in range(len(terms) - 1):
+            if i == len(terms) - 2:
+                pair_docs = set()
+                for token in last_expansions:
+                    pair_docs |= self._bigrams.get(f"{terms[i]} {token}", set())
+            else:
+                pair_docs = self._bigrams.get(f"{terms[i]} {terms[i + 1]}", set())
+            docs = pair_docs if docs is None else docs & pair_docs
+            if not docs:
+                return set()
+        return set(docs)
+
+
+def _by_score(docs: Set[str], scores: Dict[str, float], head: int) -> Iterable[str]:
+    """`docs` from best to worst score; only sorts them all if more than `head` are consumed."""
+    top = heapq.nlargest(head, docs, key=scores.__getitem__)
+    yield from top
+    if len(top) < len(docs):
+        yield from sorted(docs.difference(top), key=scores.__getitem__, reverse=True)
+
+
+def _has_phrase(tokens: Tuple[str, ...], head: List[str], last: Set[str]) -> bool:
+    """True if `head` followed by one of the words in `last` appears in `tokens`."""
+    size = len(head)
+    start = 0
+    while True:
+        try:
+            pos = tokens.index(head[0], start)
+        except ValueError:
+            return False
+        end = pos + size
+        if end < len(tokens) and list(tokens[pos:end]) == head and tokens[end] in last:
+            return True
+        start = pos + 1
+
+
+def _snippet(text: str, terms: List[str], width: int, hits: Dict[str, bool]) -> str:
+    """
+    About `width` words around the first hit, with matching words in bold.
+    `hits` remembers which words matched, shared by all snippets of a search.
+    """
+    words = text.split()
+    exact, prefix = set(terms[:-1]), terms[-1]
+
+    def is_hit(word: str) -> bool:
+        hit = hits.get(word)
+        if hit is None:
+            hit = hits[word] = any(t in exact or t.startswith(prefix) for t in tokenize(word))
+        return hit
+
+    first = next((i for i, w in enumerate(words) if is_hit(w)), 0)
+    start = max(0, first - width // 3)
+    window = [w for w in (_MARKUP_RE.sub("", w) for w in words[start:start + width]) if w]
+    snippet = " ".join(f"**{w}**" if is_hit(w) else w for w in window)
+    if start > 0:
+        snippet = "… " + snippet
+    if start + width < len(words):
+        snippet += " …"
+    return snippet
+
+
+def build_index(documents: Iterable[Tuple[str, str, str, str]]) -> ContentSearchIndex:
+    """
+    documents: (doc_id, title, text, location) tuples.
+    """
+    index = ContentSearchIndex()
+    for doc_id, title, text, location in documents:
+        index.upsert(doc_id, title, text, location)
+    return index
@@ -0,0 +1,130 @@
+import atexit
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+
+class DraftStore:
+    """
+    Debounced autosave for long-form answers.
+    `put()` only updates an in-memory map keyed by (user, field), so repeated
+    edits coalesce into the latest text. A background thread writes the map
+    to SQLite in one transaction every `flush_interval` seconds, which keeps
+    the disk write rate constant no matter how many students are typing.
+    """
+
+    def __init__(self, path: Path, *, flush_interval: float = 3.0):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.flush_interval = max(0.05, float(flush_interval))
+        self.puts = 0
+        self.flushes = 0
+        self.rows_written = 0
+        self._pending: Dict[Tuple[str, str], Tuple[str, float]] = {}
+        self._pending_lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS drafts ("
+            " user TEXT NOT NULL,"
+            " field TEXT NOT NULL,"
+            " text TEXT NOT NULL,"
+            " updated_at REAL NOT NULL,"
+            " PRIMARY KEY (user, field)"
+            ") WITHOUT ROWID"
+        )
+        self._conn.commit()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="draft-autosave", daemon=True)
+        self._thread.start()
+
+    def put(self, user: str, field: str, text: str):
+        with self._pending_lock:
+            self._pending[(user, field)] = (text or "", time.time())
+            self.puts += 1
+
+    def get(self, user: str, field: str) -> Optional[str]:
+        """
+        Latest draft for (user, field): pending text first, then the primary-key lookup.
+        """
+        with self._pending_lock:
+            pending = self._pending.get((user, field))
+        if pending is not None:
+            return pending[0]
+        with self._db_lock:
+            row = self._conn.execute(
+                "SELECT text FROM drafts WHERE user = ? AND field = ?",
+                (user, field),
+            ).fetchone()
+        return row[0] if row else None
+
+    def discard(self, user: str, field: str):
+        with self._pending_lock:
+            self._pending.pop((user, field), None)
+        with self._db_lock:
+            self._conn.execute("DELETE FROM drafts WHERE user = ? AND field = ?", (user, field))
+            self._conn.commit()
+
+    def flush(self) -> int:
+        with self._pending_lock:
+            batch, self._pending = self._pending, {}
+        if not batch:
+            return 0
+        rows = [(user, field, text, ts) for (user, field), (text, ts) in batch.items()]
+        try:
+            with self._db_lock:
+                with self._conn:
+                    self._conn.executemany(
+                        "INSERT INTO drafts (user, field, text, updated_at) VALUES (?, ?, ?, ?) "
+                        "ON CONFLICT(user, field) DO UPDATE SET "
+                        "text = excluded.text, updated_at = excluded.updated_at",
+                        rows,
+                    )
+        except sqlite3.Error:
+            with self._pending_lock:
+                for key, value in batch.items():
+                    self._pending.setdefault(key, value)
+            raise
+        self.flushes += 1
+        self.rows_written += len(rows)
+        return len(rows)
+
+    def close(self):
+        self._stop.set()
+        self._thread.join(timeout=2.0)
+        self.flush()
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except sqlite3.Error:
+                # Se reintenta en el siguiente ciclo; los borradores siguen en memoria.
+                continue
+
+
+_STORES: Dict[Path, DraftStore] = {}
+_STORES_LOCK = threading.Lock()
+
+
+def get_draft_store(path: Path, **kwargs) -> DraftStore:
+    """
+    Process-wide draft store per SQLite file, shared by every Streamlit session.
+    """
+    key = Path(path).resolve()
+    with _STORES_LOCK:
+        store = _STORES.get(key)
+        if store is None:
+            store = DraftStore(key, **kwargs)
+            _STORES[key] = store
+        return store
+
+
+@atexit.register
+def _close_all_stores():
+    for store in list(_STORES.values()):
+        store.close()
@@ -0,0 +1,434 @@
+"""
+Timed exams: server-side deadlines, batched autosave, idempotent submit.
+
+    engine = get_exam_engine(Path("responses/exams.sqlite3"))
+    engine.load([ExamSet("pc1", "Progress check 1", "progress_checks", 20, (Question(...), ...))])
+    attempt = engine.start("ana@mail.com", "pc1")      # the same attempt if called again
+    engine.save(attempt.attempt_id, {"q1": "went"})     # memory now, disk in the next batch
+    engine.submit(attempt.attempt_id)                    # scored once; repeats return the same result
+
+Question sets are loaded once per process and checked (unique ids, the
+answer among the options); scoring is a dict lookup per question.
+
+The deadline is fixed on the server when the attempt starts
+(started_at + minutes). The browser only displays a countdown to it:
+answers that arrive after deadline + `grace_seconds` are ignored, and the
+background thread submits expired attempts with what was saved. One row
+per (student, exam) makes starting twice impossible, and submit is a
+single `UPDATE … WHERE submitted_at IS NULL`, so a double click, a
+reconnect or two processes submitting at once score the attempt exactly
+once. Listeners (e.g. the gradebook) run only for that first submit.
+
+Saved answers update memory at once and are upserted in one transaction
+every `flush_interval` seconds, like the draft store: a cohort saving at
+the same minute costs one write per batch, not one per question.
+"""
+import atexit
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+
+class Question(NamedTuple):
+    qid: str
+    prompt: str
+    options: Tuple[str, ...]
+    answer: str
+
+
+class ExamSet(NamedTuple):
+    exam_id: str
+    title: str
+    component: str  # componente del gradebook
+    minutes: int
+    questions: Tuple[Question, ...]
+
+
+_ATTEMPT_COLUMNS = "attempt_id, student, exam_id, started_at, deadline, submitted_at, score"
+
+
+class Attempt(NamedTuple):
+    attempt_id: str
+    student: str
+    exam_id: str
+    started_at: float
+    deadline: float
+    submitted_at: Optional[float] = None
+    score: Optional[float] = None  # 0..1
+
+    @property
+    def submitted(self) -> bool:
+        return self.submitted_at is not None
+
+    def remaining(self, now: Optional[float] = None) -> float:
+        """Seconds left (0 when the time is up)."""
+        return max(0.0, self.deadline - (time.time() if now is None else now))
+
+
+class ExamEngine:
+    def __init__(self, path: Path, *, flush_interval: float = 2.0, grace_seconds: float = 10.0):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.flush_interval = max(0.05, float(flush_interval))
+        self.grace_seconds = max(0.0, float(grace_seconds))
+        self.saves = 0
+        self.late_saves = 0
+        self.flushes = 0
+        self.rows_written = 0
+        self.submits = 0
+        self._exams: Dict[str, ExamSet] = {}
+        self._keys: Dict[str, Dict[str, str]] = {}
+        self._attempts: Dict[str, Attempt] = {}
+        self._by_student: Dict[Tuple[str, str], str] = {}
+        self._answers: Dict[str, Dict[str, str]] = {}
+        self._dirty: Dict[str, Set[str]] = {}
+        self._closing: Set[str] = set()
+        self._listeners: List[Callable[[Attempt], None]] = []
+        self._lock = threading.RLock()
+        self._db_lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS exam_attempts ("
+            " attempt_id TEXT PRIMARY KEY,"
+            " student TEXT NOT NULL,"
+            " exam_id TEXT NOT NULL,"
+            " started_at REAL NOT NULL,"
+            " deadline REAL NOT NULL,"
+            " submitted_at REAL,"
+            " score REAL,"
+            " UNIQUE (student, exam_id)"
+            ")"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS exam_attempts_open ON exam_attempts (deadline) WHERE submitted_at IS NULL"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS exam_answers ("
+            " attempt_id TEXT NOT NULL,"
+            " qid TEXT NOT NULL,"
+            " answer TEXT NOT NULL,"
+            " saved_at REAL NOT NULL,"
+            " PRIMARY KEY (attempt_id, qid)"
+            ") WITHOUT ROWID"
+        )
+        self._conn.commit()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="exam-autosave", daemon=True)
+        self._thread.start()
+
+    # --------------------------
+    # Bancos de preguntas
+    # --------------------------
+
+    def load(self, exams: Iterable[ExamSet]):
+        """Preload question sets (replacing sets with the same id). Invalid sets raise ValueError."""
+        checked = {}
+        for exam in exams:
+            qids = [q.qid for q in exam.questions]
+            if not qids:
+                raise ValueError(f"{exam.exam_id}: no questions")
+            if len(set(qids)) != len(qids):
+                raise ValueError(f"{exam.exam_id}: repeated question ids")
+            if exam.minutes <= 0:
+                raise ValueError(f"{exam.exam_id}: minutes must be more than 0")
+            for q in exam.questions:
+                if q.answer not in q.options:
+                    raise ValueError(f"{exam.exam_id}/{q.qid}: the answer is not one of the options")
+            checked[exam.exam_id] = exam
+        with self._lock:
+            self._exams.update(checked)
+            self._keys.update((e.exam_id, {q.qid: q.answer for q in e.questions}) for e in checked.values())
+
+    def exam(self, exam_id: str) -> ExamSet:
+        try:
+            return self._exams[exam_id]
+        except KeyError:
+            raise ValueError(f"Unknown exam: {exam_id}") from None
+
+    def exams(self) -> List[ExamSet]:
+        return list(self._exams.values())
+
+    def add_listener(self, callback: Callable[[Attempt], None]):
+        """`callback(attempt)` after an attempt is scored (once per attempt). Registering twice is a no-op."""
+        if callback not in self._listeners:
+            self._listeners.append(callback)
+
+    # --------------------------
+    # Intentos
+    # --------------------------
+
+    def _row_attempt(self, row) -> Attempt:
+        attempt = Attempt(*row)
+        self._attempts[attempt.attempt_id] = attempt
+        self._by_student[(attempt.student, attempt.exam_id)] = attempt.attempt_id
+        return attempt
+
+    def start(self, student: str, exam_id: str, now: Optional[float] = None) -> Attempt:
+        """The student's attempt at `exam_id`, starting the clock the first time."""
+        if not student:
+            raise ValueError("student is required")
+        exam = self.exam(exam_id)
+        existing = self.attempt(student, exam_id)
+        if existing is not None:
+            return existing
+        now = time.time() if now is None else now
+        with self._lock:
+            with self._db_lock:
+                with self._conn:
+                    # Otro proceso puede haber empezado a la vez: gana la primera fila.
+                    self._conn.execute(
+                        "INSERT OR IGNORE INTO exam_attempts (attempt_id, student, exam_id, started_at, deadline) "
+                        "VALUES (?, ?, ?, ?, ?)",
+                        (uuid.uuid4().hex, student, exam_id, now, now + exam.minutes * 60),
+                    )
+                row = self._conn.execute(
+                    f"SELECT {_ATTEMPT_COLUMNS} FROM exam_attempts WHERE student = ? AND exam_id = ?",
+                    (student, exam_id),
+                ).fetchone()
+            return self._row_attempt(row)
+
+    def attempt(self, student: str, exam_id: str) -> Optional[Attempt]:
+        """Current state of the student's attempt, or None if not started."""
+        with self._lock:
+            attempt_id = self._by_student.get((student, exam_id))
+            if attempt_id is not None:
+                return self._attempts[attempt_id]
+            with self._db_lock:
+                row = self._conn.execute(
+                    f"SELECT {_ATTEMPT_COLUMNS} FROM exam_attempts WHERE student = ? AND exam_id = ?",
+                    (student, exam_id),
+                ).fetchone()
+            return self._row_attempt(row) if row else None
+
+    def get(self, attempt_id: str) -> Attempt:
+        """Attempt by id (memory first, then disk)."""
+        with self._lock:
+            attempt = self._attempts.get(attempt_id)
+            if attempt is None:
+                with self._db_lock:
+                    row = self._conn.execute(
+                        f"SELECT {_ATTEMPT_COLUMNS} FROM exam_attempts WHERE attempt_id = ?", (attempt_id,)
+                    ).fetchone()
+                if row is None:
+                    raise ValueError(f"Unknown attempt: {attempt_id}")
+                attempt = self._row_attempt(row)
+            return attempt
+
+    def _loaded_answers(self, attempt_id: str) -> Dict[str, str]:
+        answers = self._answers.get(attempt_id)
+        if answers is None:
+            with self._db_lock:
+                answers = dict(
+                    self._conn.execute("SELECT qid, answer FROM exam_answers WHERE attempt_id = ?", (attempt_id,))
+                )
+            self._answers[attempt_id] = answers
+        return answers
+
+    def answers(self, attempt_id: str) -> Dict[str, str]:
+        """Saved answers (pending ones included)."""
+        with self._lock:
+            return dict(self._loaded_answers(attempt_id))
+
+    def save(self, attempt_id: str, answers: Dict[str, Optional[str]], now: Optional[float] = None) -> int:
+        """
+        Keep a batch of answers; returns how many changed. Unknown questions
+        and empty answers are skipped; after the deadline (+ grace) or once
+        submitted nothing is accepted.
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            attempt = self.get(attempt_id)
+            if attempt.submitted or attempt_id in self._closing or now > attempt.deadline + self.grace_seconds:
+                self.late_saves += 1
+                return 0
+            key = self._keys.get(attempt.exam_id, {})
+            saved = self._loaded_answers(attempt_id)
+            changed = [
+                (qid, answer)
+                for qid, answer in answers.items()
+                if qid in key and answer is not None and saved.get(qid) != answer
+            ]
+            if changed:
+                saved.update(changed)
+                self._dirty.setdefault(attempt_id, set()).update(qid for qid, _ in changed)
+            self.saves += 1
+            return len(changed)
+
+    def score(self, exam_id: str, answers: Dict[str, str]) -> Tuple[int, int]:
+        """(correct, questions) for a set of answers."""
+        key = self._keys[exam_id]
+        return sum(1 for qid, answer in key.items() if answers.get(qid) == answer), len(key)
+
+    def submit(
+        self, attempt_id: str, answers: Optional[Dict[str, Optional[str]]] = None, now: Optional[float] = None
+    ) -> Attempt:
+        """
+        Score the attempt with its saved answers (plus `answers`, if still on
+        time). Idempotent: a submitted attempt is returned as it is. An attempt
+        whose exam is no longer loaded (renamed or removed) is closed without
+        a score and listeners are not called.
+        """
+        now = time.time() if now is None else now
+        if answers:
+            self.save(attempt_id, answers, now)
+        with self._lock:
+            attempt = self.get(attempt_id)
+            if attempt.submitted:
+                return attempt
+            given = self._loaded_answers(attempt_id)
+            if attempt.exam_id in self._keys:
+                correct, total = self.score(attempt.exam_id, given)
+                score = correct / total
+            else:
+                score = None
+            dirty = self._dirty.pop(attempt_id, set())
+            rows = [(attempt_id, qid, given[qid], now) for qid in dirty]
+            submitted_at = min(now, attempt.deadline + self.grace_seconds)
+            self._closing.add(attempt_id)
+        try:
+            with self._db_lock:
+                with self._conn:
+                    self._upsert_answers(rows)
+                    won = self._conn.execute(
+                        "UPDATE exam_attempts SET submitted_at = ?, score = ? "
+                        "WHERE attempt_id = ? AND submitted_at IS NULL",
+                        (submitted_at, score, attempt_id),
+                    ).rowcount
+                    if not won:
+                        row = self._conn.execute(
+                            f"SELECT {_ATTEMPT_COLUMNS} FROM exam_attempts WHERE attempt_id = ?",
+                            (attempt_id,),
+                        ).fetchone()
+        except sqlite3.Error:
+            with self._lock:
+                self._closing.discard(attempt_id)
+                self._dirty.setdefault(attempt_id, set()).update(dirty)
+            raise
+        with self._lock:
+            self._closing.discard(attempt_id)
+            if not won:
+                # Ya lo entregó otro hilo o proceso: su nota es la que vale.
+                return self._row_attempt(row)
+            attempt = attempt._replace(submitted_at=submitted_at, score=score)
+            self._attempts[attempt_id] = attempt
+            self.submits += 1
+        if score is None:
+            return attempt
+        for callback in list(self._listeners):
+            try:
+                callback(attempt)
+            except Exception:
+                # El intento ya está entregado; el gradebook se puede rellenar después.
+                pass
+        return attempt
+
+    def close_expired(self, now: Optional[float] = None) -> int:
+        """
+        Submit every open attempt past deadline + grace. Returns how many were
+        closed; one attempt that fails is left open for the next call.
+        """
+        now = time.time() if now is None else now
+        with self._db_lock:
+            expired = [
+                row[0]
+                for row in self._conn.execute(
+                    "SELECT attempt_id FROM exam_attempts WHERE submitted_at IS NULL AND deadline < ?",
+                    (now - self.grace_seconds,),
+                )
+            ]
+        closed = 0
+        for attempt_id in expired:
+            try:
+                self.submit(attempt_id, now=now)
+            except Exception:
+                # Un intento con problemas no debe dejar abiertos los demás.
+                continue
+            closed += 1
+        return closed
+
+    def results(self, exam_id: Optional[str] = None) -> List[Attempt]:
+        """Every attempt (of one exam, if given), from disk, ordered by student."""
+        query = f"SELECT {_ATTEMPT_COLUMNS} FROM exam_attempts"
+        params: tuple = ()
+        if exam_id is not None:
+            query += " WHERE exam_id = ?"
+            params = (exam_id,)
+        with self._db_lock:
+            rows = self._conn.execute(query + " ORDER BY student, exam_id", params).fetchall()
+        return [Attempt(*row) for row in rows]
+
+    # --------------------------
+    # Persistencia
+    # --------------------------
+
+    def _upsert_answers(self, rows):
+        self._conn.executemany(
+            "INSERT INTO exam_answers (attempt_id, qid, answer, saved_at) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(attempt_id, qid) DO UPDATE SET answer = excluded.answer, saved_at = excluded.saved_at",
+            rows,
+        )
+
+    def flush(self) -> int:
+        with self._lock:
+            dirty, self._dirty = self._dirty, {}
+            now = time.time()
+            rows = [
+                (attempt_id, qid, self._answers[attempt_id][qid], now)
+                for attempt_id, qids in dirty.items()
+                for qid in qids
+            ]
+        if not rows:
+            return 0
+        try:
+            with self._db_lock:
+                with self._conn:
+                    self._upsert_answers(rows)
+        except sqlite3.Error:
+            with self._lock:
+                for attempt_id, qids in dirty.items():
+                    self._dirty.setdefault(attempt_id, set()).update(qids)
+            raise
+        self.flushes += 1
+        self.rows_written += len(rows)
+        return len(rows)
+
+    def close(self):
+        self._stop.set()
+        self._thread.join(timeout=2.0)
+        self.flush()
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+                self.close_expired()
+            except Exception:
+                # Se reintenta en el siguiente ciclo; las respuestas siguen en memoria.
+                # Nunca se deja morir el hilo: sin él nada más llega a disco.
+                continue
+
+
+_ENGINES: Dict[Path, ExamEngine] = {}
+_ENGINES_LOCK = threading.Lock()
+
+
+def get_exam_engine(path: Path, **kwargs) -> ExamEngine:
+    """Process-wide exam engine per SQLite file, shared by every Streamlit session."""
+    key = Path(path).resolve()
+    with _ENGINES_LOCK:
+        engine = _ENGINES.get(key)
+        if engine is None:
+            engine = ExamEngine(key, **kwargs)
+            _ENGINES[key] = engine
+        return engine
+
+
+@atexit.register
+def _close_all_engines():
+    for engine in list(_ENGINES.values()):
+        engine.close()
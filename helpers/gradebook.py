@@ -0,0 +1,360 @@
+"""
+Weighted course grades.
+
+    book = get_gradebook(Path("responses/gradebook.sqlite3"),
+                         {"participation": 0.2, "progress_checks": 0.3, "midterm": 0.2, "final": 0.3},
+                         expected={"participation": 6})
+    book.record("ana@mail.com", "progress_checks", "quiz:u2c1_mc", 0.75)
+    book.record("ana@mail.com", "progress_checks", "quiz:u2c1_mc", 1.0, replace=False)   # first score stays
+    book.set_manual("ana@mail.com", "midterm", 0.82)
+    book.summary("ana@mail.com")      # per-component scores, grade so far, final grade
+
+Scores are 0..1. A component's score is the mean of its item scores; with
+`expected[c]` the mean is taken over at least that many items (homework
+not handed in counts as 0). A manual score set by the teacher replaces the
+component's computed score.
+
+  grade_so_far  weighted over the components that have a score
+  final_grade   missing components count as 0
+
+SQLite is the source of truth; every record is one small upsert. The whole
+cohort is kept in memory as numpy arrays (students × components: sum,
+count, manual), loaded on first use. Grades for everybody are one
+vectorized pass; record() / set_manual() only recompute the student's row.
+"""
+import csv
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+
+def compute_grades(sums, counts, manual, expected, weights):
+    """
+    (component scores, grade so far, final grade) for a block of rows.
+    All inputs are arrays: rows × components, except expected / weights
+    (components,). Rows without any score get NaN as grade so far.
+    """
+    import numpy as np
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        scores = np.where(counts > 0, sums / np.maximum(counts, expected), np.nan)
+    scores = np.where(np.isnan(manual), scores, manual)
+    present = ~np.isnan(scores)
+    weighted = np.where(present, scores, 0.0) * weights
+    final = weighted.sum(axis=1)
+    covered = (present * weights).sum(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        so_far = np.where(covered > 0, final / covered, np.nan)
+    return scores, so_far, final
+
+
+class _Cohort:
+    """In-memory arrays; rows grow by doubling so new students are O(1) amortized."""
+
+    def __init__(self, components: Sequence[str], capacity: int = 64):
+        import numpy as np
+
+        self.np = np
+        self.components = list(components)
+        self.rows: Dict[str, int] = {}
+        self.students: List[str] = []
+        self.items: Dict[Tuple[int, int, str], float] = {}
+        width = len(components)
+        self.sums = np.zeros((capacity, width))
+        self.counts = np.zeros((capacity, width), dtype=np.int32)
+        self.manual = np.full((capacity, width), np.nan)
+        self.scores = np.full((capacity, width), np.nan)
+        self.so_far = np.full(capacity, np.nan)
+        self.final = np.zeros(capacity)
+
+    def row(self, student: str) -> int:
+        row = self.rows.get(student)
+        if row is None:
+            row = len(self.students)
+            if row == self.sums.shape[0]:
+                self._grow()
+            self.rows[student] = row
+            self.students.append(student)
+        return row
+
+    def _grow(self):
+        np = self.np
+        for name, fill in (("sums", 0.0), ("counts", 0), ("manual", np.nan), ("scores", np.nan), ("so_far", np.nan), ("final", 0.0)):
+            current = getattr(self, name)
+            grown = np.full((current.shape[0] * 2,) + current.shape[1:], fill, dtype=current.dtype)
+            grown[: current.shape[0]] = current
+            setattr(self, name, grown)
+
+    def put(self, row: int, column: int, item: str, score: float):
+        previous = self.items.get((row, column, item))
+        self.items[(row, column, item)] = score
+        if previous is None:
+            self.sums[row, column] += score
+            self.counts[row, column] += 1
+        else:
+            self.sums[row, column] += score - previous
+
+    def recompute(self, expected, weights, rows: Optional[slice] = None):
+        rows = slice(0, len(self.students)) if rows is None else rows
+        scores, so_far, final = compute_grades(
+            self.sums[rows], self.counts[rows], self.manual[rows], expected, weights
+        )
+        self.scores[rows] = scores
+        self.so_far[rows] = so_far
+        self.final[rows] = final
+
+
+class Gradebook:
+    def __init__(self, path: Path, weights: Dict[str, float], *, expected: Optional[Dict[str, int]] = None):
+        if not weights:
+            raise ValueError("weights must name at least one component")
+        total = float(sum(weights.values()))
+        if total <= 0:
+            raise ValueError("weights must add up to more than 0")
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.components = list(weights)
+        self.weights = {c: float(w) / total for c, w in weights.items()}
+        self.expected = {c: int((expected or {}).get(c, 0)) for c in self.components}
+        self.recomputes = 0
+        self._cohort: Optional[_Cohort] = None
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS grade_scores ("
+            " student TEXT NOT NULL,"
+            " component TEXT NOT NULL,"
+            " item TEXT NOT NULL,"
+            " score REAL NOT NULL,"
+            " source TEXT NOT NULL,"
+            " updated_at REAL NOT NULL,"
+            " PRIMARY KEY (student, component, item)"
+            ") WITHOUT ROWID"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS grade_manual ("
+            " student TEXT NOT NULL,"
+            " component TEXT NOT NULL,"
+            " score REAL NOT NULL,"
+            " note TEXT NOT NULL DEFAULT '',"
+            " updated_at REAL NOT NULL,"
+            " PRIMARY KEY (student, component)"
+            ") WITHOUT ROWID"
+        )
+        self._conn.commit()
+
+    def _column(self, component: str) -> int:
+        try:
+            return self.components.index(component)
+        except ValueError:
+            raise ValueError(f"Unknown grade component: {component}") from None
+
+    def _vectors(self):
+        import numpy as np
+
+        return (
+            np.array([self.expected[c] for c in self.components], dtype=np.float64),
+            np.array([self.weights[c] for c in self.components], dtype=np.float64),
+        )
+
+    # --------------------------
+    # Escritura
+    # --------------------------
+
+    def record(self, student: str, component: str, item: str, score: float, source: str = "quiz", *, replace: bool = True) -> bool:
+        """
+        Store one item score (0..1); a repeated item replaces the previous
+        score, or with replace=False keeps it. True if the score was stored.
+        """
+        return self.record_many([(student, component, item, score, source)], replace=replace) > 0
+
+    def record_many(self, rows: Iterable[Tuple[str, str, str, float, str]], *, replace: bool = True) -> int:
+        """
+        Many item scores in one transaction; only the touched students are
+        recomputed. With replace=False items that already have a score are
+        left as they are. Returns how many scores were stored.
+        """
+        now = time.time()
+        clean = []
+        for student, component, item, score, source in rows:
+            if not student:
+                continue
+            self._column(component)
+            clean.append((student, component, item, min(1.0, max(0.0, float(score))), source, now))
+        if not clean:
+            return 0
+        with self._lock:
+            with self._conn:
+                if replace:
+                    self._conn.executemany(
+                        "INSERT INTO grade_scores (student, component, item, score, source, updated_at) "
+                        "VALUES (?, ?, ?, ?, ?, ?) "
+                        "ON CONFLICT(student, component, item) DO UPDATE SET "
+                        "score = excluded.score, source = excluded.source, updated_at = excluded.updated_at",
+                        clean,
+                    )
+                else:
+                    clean = [
+                        row
+                        for row in clean
+                        if self._conn.execute(
+                            "INSERT INTO grade_scores (student, component, item, score, source, updated_at) "
+                            "VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT(student, component, item) DO NOTHING",
+                            row,
+                        ).rowcount
+                    ]
+            if self._cohort is not None:
+                touched = set()
+                for student, component, item, score, _, _ in clean:
+                    row = self._cohort.row(student)
+                    self._cohort.put(row, self._column(component), item, score)
+                    touched.add(row)
+                self._recompute_rows(touched)
+        return len(clean)
+
+    def record_answers(self, rows: List[Dict], component: str = "participation"):
+        """
+        Response-queue listener: every committed answer row counts as one
+        handed-in homework item (score 1) for its student.
+        """
+        self.record_many(
+            (
+                row.get("user_email", ""),
+                component,
+                f"answer:u{row.get('unit', '')}_{row.get('session', '')}_{row.get('hour', '')}_{row.get('exercise_id', '')}",
+                1.0,
+                "answer",
+            )
+            for row in rows
+        )
+
+    def set_manual(self, student: str, component: str, score: Optional[float], note: str = ""):
+        """Teacher score for a whole component (0..1); None removes it and the computed score is used again."""
+        column = self._column(component)
+        with self._lock:
+            with self._conn:
+                if score is None:
+                    self._conn.execute(
+                        "DELETE FROM grade_manual WHERE student = ? AND component = ?", (student, component)
+                    )
+                else:
+                    score = min(1.0, max(0.0, float(score)))
+                    self._conn.execute(
+                        "INSERT INTO grade_manual (student, component, score, note, updated_at) VALUES (?, ?, ?, ?, ?) "
+                        "ON CONFLICT(student, component) DO UPDATE SET "
+                        "score = excluded.score, note = excluded.note, updated_at = excluded.updated_at",
+                        (student, component, score, note or "", time.time()),
+                    )
+            if self._cohort is not None:
+                row = self._cohort.row(student)
+                self._cohort.manual[row, column] = self._cohort.np.nan if score is None else score
+                self._recompute_rows({row})
+
+    def _recompute_rows(self, rows):
+        expected, weights = self._vectors()
+        for row in rows:
+            self._cohort.recompute(expected, weights, slice(row, row + 1))
+        self.recomputes += len(rows)
+
+    # --------------------------
+    # Lectura
+    # --------------------------
+
+    def cohort(self) -> _Cohort:
+        """Every score in memory (loaded once), with grades for all students."""
+        with self._lock:
+            if self._cohort is None:
+                cohort = _Cohort(self.components)
+                columns = {c: i for i, c in enumerate(self.components)}
+                for student, component, item, score in self._conn.execute(
+                    "SELECT student, component, item, score FROM grade_scores"
+                ):
+                    if component in columns:
+                        cohort.put(cohort.row(student), columns[component], item, score)
+                for student, component, score in self._conn.execute(
+                    "SELECT student, component, score FROM grade_manual"
+                ):
+                    if component in columns:
+                        cohort.manual[cohort.row(student), columns[component]] = score
+                expected, weights = self._vectors()
+                cohort.recompute(expected, weights)
+                self._cohort = cohort
+            return self._cohort
+
+    def reload(self):
+        """Forget the in-memory cohort (after editing the database by hand)."""
+        with self._lock:
+            self._cohort = None
+
+    def summary(self, student: str) -> Optional[dict]:
+        with self._lock:
+            cohort = self.cohort()
+            row = cohort.rows.get(student)
+            if row is None:
+                return None
+            return self._summary_row(cohort, row)
+
+    def summaries(self) -> List[dict]:
+        """One dict per student (sorted by email), ready for a table or CSV."""
+        with self._lock:
+            cohort = self.cohort()
+            return [self._summary_row(cohort, cohort.rows[s]) for s in sorted(cohort.students)]
+
+    def _summary_row(self, cohort: _Cohort, row: int) -> dict:
+        np = cohort.np
+        summary = {"student": cohort.students[row]}
+        for column, component in enumerate(self.components):
+            score = cohort.scores[row, column]
+            summary[component] = None if np.isnan(score) else round(float(score) * 100, 1)
+            summary[f"{component}_items"] = int(cohort.counts[row, column])
+            summary[f"{component}_manual"] = not np.isnan(cohort.manual[row, column])
+        so_far = cohort.so_far[row]
+        summary["grade_so_far"] = None if np.isnan(so_far) else round(float(so_far) * 100, 1)
+        summary["final_grade"] = round(float(cohort.final[row]) * 100, 1)
+        return summary
+
+    def export_csv(self, path: Path) -> int:
+        """
+        Per-student summaries to CSV (written to a temp file of its own, then
+        renamed). Returns the row count.
+        """
+        rows = self.summaries()
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fields = ["student"] + [
+            name for c in self.components for name in (c, f"{c}_items", f"{c}_manual")
+        ] + ["grade_so_far", "final_grade"]
+        # Un temporal por llamada: dos exportaciones al mismo destino no se mezclan.
+        fd, tmp_name = tempfile.mkstemp(prefix=path.name + ".", suffix=".part", dir=path.parent)
+        tmp = Path(tmp_name)
+        try:
+            with os.fdopen(fd, "w", newline="", encoding="utf-8") as f:
+                writer = csv.DictWriter(f, fieldnames=fields)
+                writer.writeheader()
+                writer.writerows(rows)
+            tmp.replace(path)
+        except BaseException:
+            tmp.unlink(missing_ok=True)
+            raise
+        return len(rows)
+
+
+_BOOKS: Dict[Path, Gradebook] = {}
+_BOOKS_LOCK = threading.Lock()
+
+
+def get_gradebook(path: Path, weights: Dict[str, float], **kwargs) -> Gradebook:
+    """Process-wide gradebook per SQLite file, shared by every Streamlit session."""
+    key = Path(path).resolve()
+    with _BOOKS_LOCK:
+        book = _BOOKS.get(key)
+        if book is None:
+            book = Gradebook(key, weights, **kwargs)
+            _BOOKS[key] = book
+        return book
@@ -0,0 +1,377 @@
+"""
+Offline lesson packs: zip archives of a lesson (or a whole unit) streamed
+to the browser as they are written.
+
+    entries = [PackEntry("lesson.md", data=b"..."), PackEntry("audio/U3_C1_audio1.mp3", path=...)]
+    pack = prepare_pack(entries)           # sizes + CRCs, no archive in memory
+    server = start_pack_server(8600, cache_dir=Path("cache/packs"))
+    url = server.offer(pack, "U3_C1_food_vocabulary.zip")   # /packs/<key>/U3_C1_food_vocabulary.zip
+
+The archive is written by a small zip writer (no zip64, no data
+descriptors) instead of zipfile, so every size is known before the first
+byte goes out: responses carry an exact Content-Length and MP3s are copied
+from audio/ in chunks as stored (uncompressed) entries. Text entries are
+deflated up front; they are small.
+
+Packs are cached on disk under a hash of their content (arcnames + CRC +
+size of every entry). A repeated download is a plain file copy; the first
+one is streamed to the browser and to the cache at the same time.
+prepare_pack() itself is memoized on the entries (text bytes, file size and
+mtime), so a page rerun does not compress and hash every entry again.
+"""
+import hashlib
+import os
+import re
+import shutil
+import struct
+import tempfile
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+from urllib.parse import quote, unquote
+
+from helpers.metrics import CACHE_LOOKUPS, CACHE_MISSES
+
+CHUNK_BYTES = 256 * 1024
+_KEY = re.compile(r"[0-9a-f]{32}")
+OFFER_TTL = 60 * 60
+# Ya comprimidos: deflate no gana nada y cuesta CPU.
+STORED_SUFFIXES = {".mp3", ".m4a", ".ogg", ".png", ".jpg", ".jpeg", ".webp", ".zip", ".pdf"}
+# Fecha fija en todas las entradas: mismo contenido = mismos bytes = misma caché.
+_DOS_TIME, _DOS_DATE = 0, (2024 - 1980) << 9 | 1 << 5 | 1
+
+
+class PackEntry(NamedTuple):
+    arcname: str
+    path: Optional[Path] = None
+    data: Optional[bytes] = None
+
+
+class _Member(NamedTuple):
+    name: bytes
+    method: int  # 0 = stored, 8 = deflate
+    crc: int
+    size: int
+    compressed_size: int
+    path: Optional[Path]
+    payload: Optional[bytes]  # texto ya comprimido
+
+
+class Pack(NamedTuple):
+    key: str
+    members: Tuple[_Member, ...]
+    size: int  # bytes exactos del .zip
+
+
+_FINGERPRINTS: Dict[Tuple[str, int, int], Tuple[int, str]] = {}
+_FINGERPRINTS_LOCK = threading.Lock()
+_PACKS: "OrderedDict[bytes, Pack]" = OrderedDict()
+_PACKS_LOCK = threading.Lock()
+PREPARED_PACKS = 64
+
+
+def _fingerprint(path: Path) -> Tuple[int, int, str]:
+    """(size, crc32, sha256) of a file; cached per (path, size, mtime) so audio is read once."""
+    stat = path.stat()
+    cache_key = (str(path), stat.st_size, stat.st_mtime_ns)
+    with _FINGERPRINTS_LOCK:
+        cached = _FINGERPRINTS.get(cache_key)
+    if cached is None:
+        crc, digest = 0, hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(CHUNK_BYTES), b""):
+                crc = zlib.crc32(chunk, crc)
+                digest.update(chunk)
+        cached = (crc, digest.hexdigest())
+        with _FINGERPRINTS_LOCK:
+            _FINGERPRINTS[cache_key] = cached
+    return stat.st_size, cached[0], cached[1]
+
+
+def _entries_key(entries: List[PackEntry]) -> bytes:
+    """Cheap identity of a list of entries: text bytes as they are, files by (size, mtime)."""
+    digest = hashlib.blake2b(digest_size=16)
+    for entry in entries:
+        digest.update(entry.arcname.encode("utf-8") + b"\0")
+        if entry.path is not None:
+            try:
+                stat = Path(entry.path).stat()
+                digest.update(f"{entry.path}\0{stat.st_size}\0{stat.st_mtime_ns}\0".encode("utf-8"))
+            except OSError:
+                digest.update(f"{entry.path}\0-\0".encode("utf-8"))
+        else:
+            data = entry.data or b""
+            digest.update(len(data).to_bytes(8, "little") + data)
+    return digest.digest()
+
+
+def prepare_pack(entries: List[PackEntry]) -> Pack:
+    """
+    Sizes, CRCs and the content key of an archive, without building it.
+    Entries whose file is missing are skipped; duplicate arcnames keep the
+    first one. The result is reused while no entry changes.
+    """
+    key = _entries_key(entries)
+    with _PACKS_LOCK:
+        pack = _PACKS.get(key)
+        if pack is not None:
+            _PACKS.move_to_end(key)
+            return pack
+    pack = _prepare_pack(entries)
+    with _PACKS_LOCK:
+        _PACKS[key] = pack
+        while len(_PACKS) > PREPARED_PACKS:
+            _PACKS.popitem(last=False)
+    return pack
+
+
+def _prepare_pack(entries: List[PackEntry]) -> Pack:
+    members: List[_Member] = []
+    digest = hashlib.sha256()
+    seen = set()
+    for entry in entries:
+        name = entry.arcname.replace("\\", "/").lstrip("/")
+        if not name or name in seen:
+            continue
+        if entry.path is not None:
+            path = Path(entry.path)
+            if not path.is_file():
+                continue
+            size, crc, sha = _fingerprint(path)
+            member = _Member(name.encode("utf-8"), 0, crc, size, size, path, None)
+        else:
+            data = entry.data or b""
+            sha = hashlib.sha256(data).hexdigest()
+            crc = zlib.crc32(data)
+            if Path(name).suffix.lower() in STORED_SUFFIXES:
+                member = _Member(name.encode("utf-8"), 0, crc, len(data), len(data), None, data)
+            else:
+                compressor = zlib.compressobj(9, zlib.DEFLATED, -15)
+                payload = compressor.compress(data) + compressor.flush()
+                member = _Member(name.encode("utf-8"), 8, crc, len(data), len(payload), None, payload)
+        seen.add(name)
+        members.append(member)
+        digest.update(member.name + b"\0" + sha.encode("ascii") + b"\0")
+    if len(members) > 0xFFFF:
+        raise ValueError("too many files for a zip without zip64")
+
+    size = 22  # fin del directorio central
+    for member in members:
+        size += 30 + len(member.name) + member.compressed_size + 46 + len(member.name)
+    if size > 0xFFFFFFFF:
+        raise ValueError("pack larger than 4 GiB (zip64 is not supported)")
+    return Pack(digest.hexdigest()[:32], tuple(members), size)
+
+
+def write_zip(pack: Pack, write: Callable[[bytes], None]):
+    """Write the archive to write() in order; memory use is one chunk at a time."""
+    offset = 0
+    central = []
+    for member in pack.members:
+        flags = 0x0800  # nombres en UTF-8
+        header = struct.pack(
+            "<IHHHHHIIIHH",
+            0x04034B50, 20, flags, member.method, _DOS_TIME, _DOS_DATE,
+            member.crc, member.compressed_size, member.size, len(member.name), 0,
+        )
+        write(header + member.name)
+        if member.path is not None:
+            crc = 0
+            with open(member.path, "rb") as f:
+                for chunk in iter(lambda: f.read(CHUNK_BYTES), b""):
+                    crc = zlib.crc32(chunk, crc)
+                    write(chunk)
+            if crc != member.crc:
+                raise RuntimeError(f"{member.path.name} changed while the pack was being written")
+        else:
+            write(member.payload)
+        central.append(
+            struct.pack(
+                "<IHHHHHHIIIHHHHHII",
+                0x02014B50, 20, 20, flags, member.method, _DOS_TIME, _DOS_DATE,
+                member.crc, member.compressed_size, member.size, len(member.name),
+                0, 0, 0, 0, 0o100644 << 16, offset,
+            )
+            + member.name
+        )
+        offset += len(header) + len(member.name) + member.compressed_size
+    directory = b"".join(central)
+    write(directory)
+    write(struct.pack("<IHHHHIIH", 0x06054B50, 0, 0, len(central), len(central), len(directory), offset, 0))
+
+
+class PackCache:
+    """One .zip per pack key, written atomically; least recently used packs go first over max_bytes."""
+
+    def __init__(self, directory: Path, max_bytes: int = 512 * 1024 * 1024):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+
+    def path(self, key: str) -> Path:
+        return self.directory / f"{key}.zip"
+
+    def get(self, key: str) -> Optional[Path]:
+        path = self.path(key)
+        CACHE_LOOKUPS.inc(layer="lesson_packs")
+        if not path.exists():
+            CACHE_MISSES.inc(layer="lesson_packs")
+            return None
+        try:
+            os.utime(path)  # marca de uso para prune()
+        except OSError:
+            pass
+        return path
+
+    def stream(self, pack: Pack, write: Callable[[bytes], None]) -> bool:
+        """
+        Send the pack to write(): from disk when cached (True), otherwise
+        built on the fly while a copy goes to the cache (False). If write()
+        fails (client gone) the partial copy is discarded.
+        """
+        cached = self.get(pack.key)
+        if cached is not None:
+            with open(cached, "rb") as f:
+                for chunk in iter(lambda: f.read(CHUNK_BYTES), b""):
+                    write(chunk)
+            return True
+        self.directory.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                def tee(chunk: bytes):
+                    f.write(chunk)
+                    write(chunk)
+
+                write_zip(pack, tee)
+            os.replace(tmp, self.path(pack.key))
+        except BaseException:
+            Path(tmp).unlink(missing_ok=True)
+            raise
+        self.prune()
+        return False
+
+    def build(self, pack: Pack) -> Path:
+        """The cached file for `pack`, writing it first if needed."""
+        cached = self.get(pack.key)
+        if cached is None:
+            self.stream(pack, lambda chunk: None)
+            cached = self.path(pack.key)
+        return cached
+
+    def prune(self):
+        files = []
+        for path in self.directory.glob("*.zip"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+
+
+# ==========================
+# HTTP
+# ==========================
+
+class PackServer:
+    def __init__(self, server: ThreadingHTTPServer, cache: PackCache):
+        self.server = server
+        self.cache = cache
+        self._offers: Dict[str, Tuple[Pack, float]] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def port(self) -> int:
+        return self.server.server_address[1]
+
+    def offer(self, pack: Pack, filename: str) -> str:
+        """
+        Make `pack` downloadable; returns the URL path /packs/<key>/<filename>.
+        Offering the same pack again (every rerun) only refreshes it.
+        """
+        self._expire()
+        with self._lock:
+            self._offers[pack.key] = (pack, time.monotonic())
+        return f"/packs/{pack.key}/{quote(filename)}"
+
+    def get(self, key: str) -> Optional[Pack]:
+        with self._lock:
+            offer = self._offers.get(key)
+        return offer[0] if offer else None
+
+    def _expire(self):
+        cutoff = time.monotonic() - OFFER_TTL
+        with self._lock:
+            for key in [k for k, (_, created) in self._offers.items() if created < cutoff]:
+                del self._offers[key]
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    packs: PackServer = None
+
+    def do_GET(self):
+        parts = self.path.split("?")[0].strip("/").split("/")
+        if len(parts) != 3 or parts[0] != "packs" or not _KEY.fullmatch(parts[1]):
+            self.send_error(404)
+            return
+        key, filename = parts[1], unquote(parts[2])
+        pack = self.packs.get(key)
+        # Tras un reinicio no hay ofertas, pero lo que ya está en caché se sigue sirviendo.
+        cached = self.packs.cache.get(key) if pack is None else None
+        if pack is None and cached is None:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/zip")
+        self.send_header("Content-Length", str(pack.size if pack else cached.stat().st_size))
+        self.send_header("Content-Disposition", f"attachment; filename*=UTF-8''{quote(filename)}")
+        # El contenido de una clave nunca cambia.
+        self.send_header("ETag", f'"{key}"')
+        self.send_header("Cache-Control", "public, max-age=31536000, immutable")
+        self.end_headers()
+        try:
+            if pack is not None:
+                self.packs.cache.stream(pack, self.wfile.write)
+            else:
+                with open(cached, "rb") as f:
+                    shutil.copyfileobj(f, self.wfile, CHUNK_BYTES)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # descarga cancelada; la copia parcial ya se descartó
+
+    def log_message(self, *args):
+        pass
+
+
+_SERVER: Dict[str, PackServer] = {}
+_SERVER_LOCK = threading.Lock()
+
+
+def start_pack_server(port: int, host: str = "127.0.0.1", *, cache_dir: Path, max_mb: int = 512) -> Optional[PackServer]:
+    """
+    Serve offered packs on http://host:port/packs/<key>/<file>.zip from a
+    daemon thread, once per process. Returns None if the port is taken.
+    """
+    with _SERVER_LOCK:
+        if "server" in _SERVER:
+            return _SERVER["server"]
+        handler = type("PackHandler", (_Handler,), {})
+        try:
+            server = ThreadingHTTPServer((host, port), handler)
+        except OSError:
+            return None
+        server.daemon_threads = True
+        packs = PackServer(server, PackCache(cache_dir, max_mb * 1024 * 1024))
+        handler.packs = packs
+        threading.Thread(target=server.serve_forever, name="lesson-packs-http", daemon=True).start()
+        _SERVER["server"] = packs
+        return packs
@@ -0,0 +1,345 @@
+"""
+Prometheus-format metrics served from a small HTTP thread inside the app
+process (GET /metrics). No client library needed.
+
+Metrics are created once at import time (module-level singletons below)
+and updated from the app; values computed at scrape time (active sessions,
+shared cache stats) come from collectors registered with add_collector().
+"""
+import bisect
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+Sample = Tuple[Dict[str, str], float]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> tuple:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def _label_dict(self, key: tuple) -> Dict[str, str]:
+        return dict(zip(self.labelnames, key))
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"] + self._lines()
+
+    def _lines(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[tuple, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def _lines(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_labels(self._label_dict(k))} {_number(v)}" for k, v in items]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = float(value)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # key -> [counts por bucket..., +Inf], sum
+        self._data: Dict[tuple, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._data.setdefault(key, ([0] * (len(self.buckets) + 1), [0.0]))
+            counts[index] += 1
+            total[0] += value
+
+    def time(self, **labels):
+        return _Timer(self, labels)
+
+    def count(self, **labels) -> int:
+        data = self._data.get(self._key(labels))
+        return sum(data[0]) if data else 0
+
+    def _lines(self):
+        lines = []
+        with self._lock:
+            items = sorted((k, (list(c), t[0])) for k, (c, t) in self._data.items())
+        for key, (counts, total) in items:
+            labels = self._label_dict(key)
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_labels({**labels, 'le': _number(bound)})} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(labels)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(labels)} {cumulative}")
+        return lines
+
+
+class _Timer:
+    """`with HISTOGRAM.time(page=...)`: observes the elapsed seconds on exit."""
+
+    def __init__(self, histogram: Histogram, labels: Dict[str, str]):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+        return False
+
+
+Collector = Callable[[], Iterable[Tuple[str, str, str, List[Sample]]]]
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+        self._collectors: List[Collector] = []
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector: Collector):
+        """
+        collector() yields (name, type, help, [(labels, value), ...]) at scrape time.
+        """
+        with self._lock:
+            if collector not in self._collectors:
+                self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in list(self._metrics):
+            lines.extend(metric.render())
+        for collector in list(self._collectors):
+            try:
+                families = list(collector())
+            except Exception as exc:
+                lines.append(f"# collector {getattr(collector, '__name__', 'collector')} failed: {exc}")
+                continue
+            for name, kind, help_text, samples in families:
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                lines.extend(f"{name}{_labels(labels)} {_number(value)}" for labels, value in samples)
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+RERUN_SECONDS = REGISTRY.register(
+    Histogram("a2em_rerun_seconds", "Script rerun duration by page id.", ["page"])
+)
+RERUNS_FAILED = REGISTRY.register(
+    Counter("a2em_rerun_errors_total", "Reruns that raised an exception, by page id.", ["page"])
+)
+RESPONSE_SAVES = REGISTRY.register(
+    Counter("a2em_response_saves_total", "Student answer saves by result.", ["status"])
+)
+RESPONSE_SAVE_SECONDS = REGISTRY.register(
+    Histogram("a2em_response_save_seconds", "Time from submit to durable write acknowledgement.")
+)
+EXTERNAL_CALL_SECONDS = REGISTRY.register(
+    Histogram("a2em_external_call_seconds", "Latency of external API calls.", ["service"])
+)
+EXTERNAL_CALL_ERRORS = REGISTRY.register(
+    Counter("a2em_external_call_errors_total", "Failed external API calls.", ["service"])
+)
+CACHE_LOOKUPS = REGISTRY.register(
+    Counter("a2em_cache_lookups_total", "Lookups per cache layer (st.cache_*, TTS segments, lesson packs).", ["layer"])
+)
+CACHE_MISSES = REGISTRY.register(
+    Counter("a2em_cache_misses_total", "Misses per cache layer (st.cache_*, TTS segments, lesson packs).", ["layer"])
+)
+
+
+class SessionTracker:
+    """
+    Streamlit sessions seen within the last `window` seconds.
+    """
+
+    def __init__(self, window: float = 300.0):
+        self.window = window
+        self._seen: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def touch(self, session_id: Optional[str]):
+        if session_id:
+            with self._lock:
+                self._seen[session_id] = time.monotonic()
+
+    def active(self) -> int:
+        cutoff = time.monotonic() - self.window
+        with self._lock:
+            for session_id in [s for s, ts in self._seen.items() if ts < cutoff]:
+                del self._seen[session_id]
+            return len(self._seen)
+
+
+SESSIONS = SessionTracker()
+
+
+def _collect_sessions():
+    yield (
+        "a2em_active_sessions",
+        "gauge",
+        f"Sessions with a rerun in the last {int(SESSIONS.window)} seconds.",
+        [({}, SESSIONS.active())],
+    )
+
+
+_RATIO_SOURCES: List[Callable[[], List[Sample]]] = []
+
+
+def _process_cache_ratios() -> List[Sample]:
+    samples = []
+    for (layer,), lookups in sorted(CACHE_LOOKUPS._values.items()):
+        misses = CACHE_MISSES.value(layer=layer)
+        samples.append(({"layer": layer, "namespace": ""}, (lookups - misses) / lookups if lookups else 0.0))
+    return samples
+
+
+def _collect_cache_ratios():
+    samples = []
+    for source in list(_RATIO_SOURCES):
+        samples.extend(source())
+    yield "a2em_cache_hit_ratio", "gauge", "Hit ratio per cache layer / namespace.", samples
+
+
+_RATIO_SOURCES.append(_process_cache_ratios)
+REGISTRY.add_collector(_collect_sessions)
+REGISTRY.add_collector(_collect_cache_ratios)
+
+
+def watch_shared_cache(get_cache: Callable):
+    """
+    Export helpers.shared_cache counters (summed over every process that
+    uses the same backend) and add its namespaces to a2em_cache_hit_ratio.
+    Idempotent per `get_cache` callable.
+    """
+    if any(getattr(src, "get_cache", None) is get_cache for src in _RATIO_SOURCES):
+        return
+
+    def rows():
+        cache = get_cache()
+        return f"shared_{cache.backend}", cache.stats()
+
+    def ratios() -> List[Sample]:
+        layer, stats = rows()
+        return [
+            (
+                {"layer": layer, "namespace": r["namespace"]},
+                r["hits"] / (r["hits"] + r["misses"]) if r["hits"] + r["misses"] else 0.0,
+            )
+            for r in stats
+        ]
+
+    def collect_shared_cache():
+        layer, stats = rows()
+        for counter in ("hits", "misses", "evictions"):
+            yield (
+                f"a2em_shared_cache_{counter}_total",
+                "counter",
+                f"Shared cache {counter} (all processes).",
+                [({"layer": layer, "namespace": r["namespace"]}, r[counter]) for r in stats],
+            )
+
+    ratios.get_cache = get_cache
+    _RATIO_SOURCES.append(ratios)
+    REGISTRY.add_collector(collect_shared_cache)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    registry: Registry = REGISTRY
+
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/metrics", "/"):
+            self.send_error(404)
+            return
+        body = self.registry.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+_SERVER: Dict[str, object] = {}
+_SERVER_LOCK = threading.Lock()
+
+
+def start_metrics_server(port: int, host: str = "127.0.0.1") -> Optional[int]:
+    """
+    Serve REGISTRY on http://host:port/metrics from a daemon thread, once per
+    process. Returns the bound port, or None if the port is taken (e.g. by
+    another app process on the same host).
+    """
+    with _SERVER_LOCK:
+        if "server" in _SERVER:
+            return _SERVER["server"].server_address[1]
+        try:
+            server = ThreadingHTTPServer((host, port), _Handler)
+        except OSError:
+            return None
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+        _SERVER["server"] = server
+        return server.server_address[1]
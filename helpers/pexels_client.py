@@ -1,9 +1,12 @@
 import random
-from typing import Dict
+from typing import Dict, List
 
-import requests
 import streamlit as st
 
+from helpers.metrics import CACHE_LOOKUPS, CACHE_MISSES, EXTERNAL_CALL_ERRORS, EXTERNAL_CALL_SECONDS
+from helpers.shared_cache import shared_cached
+from helpers.tracing import span, traced
+
 
 def _placeholder(query: str, fallback_url: str) -> Dict:
     return {
@@ -15,35 +18,31 @@ def _placeholder(query: str, fallback_url: str) -> Dict:
     }
 
 
-@st.cache_data(show_spinner=False, ttl=3600)
-def fetch_pexels_image(query: str, fallback_url: str, orientation: str = "landscape") -> Dict:
+@shared_cached("pexels", ttl=3600)
+def _search_photos(query: str, orientation: str) -> List[Dict]:
     """
-    Minimal Pexels client with caching and a safe fallback.
-    Returns a dict with url, attribution and source info.
+    Pexels search results, shared by every app process through the shared
+    cache. Raises on any failure so errors are never cached.
     """
-    api_key = st.secrets.get("PEXELS_API_KEY")
-    if not api_key:
-        return _placeholder(query, fallback_url)
+    import requests  # solo en un fallo de caché
 
+    api_key = st.secrets.get("PEXELS_API_KEY")
     headers = {"Authorization": api_key}
     params = {"query": query, "per_page": 12, "orientation": orientation}
-
-    try:
-        resp = requests.get(
-            "https://api.pexels.com/v1/search",
-            headers=headers,
-            params=params,
-            timeout=7,
-        )
-        if resp.status_code != 200:
-            return _placeholder(query, fallback_url)
-
-        data = resp.json()
-        photos = data.get("photos") or []
-        if not photos:
-            return _placeholder(query, fallback_url)
-
-        photo = random.choice(photos)
+    with span("http.pexels", query=query), EXTERNAL_CALL_SECONDS.time(service="pexels"):
+        try:
+            resp = requests.get(
+                "https://api.pexels.com/v1/search",
+                headers=headers,
+                params=params,
+                timeout=7,
+            )
+            resp.raise_for_status()
+        except Exception:
+            EXTERNAL_CALL_ERRORS.inc(service="pexels")
+            raise
+    photos = []
+    for photo in resp.json().get("photos") or []:
         src = photo.get("src") or {}
         url = (
             src.get("large2x")
@@ -51,19 +50,45 @@ def fetch_pexels_image(query: str, fallback_url: str, orientation: str = "landsc
             or src.get("original")
             or src.get("medium")
         )
-        if not url:
-            return _placeholder(query, fallback_url)
+        if url:
+            photos.append(
+                {
+                    "url": url,
+                    "photographer": photo.get("photographer") or "Pexels",
+                    "page_url": photo.get("url"),
+                }
+            )
+    return photos
 
-        photographer = photo.get("photographer") or "Pexels"
-        page_url = photo.get("url")
-        attribution = f"Photo: {photographer} (Pexels)"
 
-        return {
-            "url": url,
-            "query": query,
-            "attribution": attribution,
-            "source": "pexels",
-            "credit_url": page_url,
-        }
+@traced("pexels.fetch")
+def fetch_pexels_image(query: str, fallback_url: str, orientation: str = "landscape") -> Dict:
+    """
+    Minimal Pexels client with caching and a safe fallback.
+    Returns a dict with url, attribution and source info.
+    """
+    CACHE_LOOKUPS.inc(layer="pexels_st_cache")
+    return _fetch_pexels_image(query, fallback_url, orientation)
+
+
+@st.cache_data(show_spinner=False, ttl=3600)
+def _fetch_pexels_image(query: str, fallback_url: str, orientation: str) -> Dict:
+    CACHE_MISSES.inc(layer="pexels_st_cache")
+    if not st.secrets.get("PEXELS_API_KEY"):
+        return _placeholder(query, fallback_url)
+
+    try:
+        photos = _search_photos(query, orientation)
     except Exception:
         return _placeholder(query, fallback_url)
+    if not photos:
+        return _placeholder(query, fallback_url)
+
+    photo = random.choice(photos)
+    return {
+        "url": photo["url"],
+        "query": query,
+        "attribution": f"Photo: {photo['photographer']} (Pexels)",
+        "source": "pexels",
+        "credit_url": photo["page_url"],
+    }
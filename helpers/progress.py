@@ -0,0 +1,319 @@
+"""
+Per-student progress as bitsets over a stable index of curriculum items.
+
+    store = get_progress_store(Path("responses/progress.sqlite3"))
+    store.mark("ana@mail.com", "audio:U3_C1_audio1_food_words.mp3")
+    store.is_done("ana@mail.com", "lesson:3:1")
+    store.heatmap(["ana@mail.com", ...], {"U3 C1": [...keys...], ...})   # students × groups, 0..1
+
+Every item key ("lesson:3:1", "tab:3:1:theory", "quiz:u2c1_mc", …) gets a bit
+position the first time it is seen; positions are never reused or
+reordered, so adding lessons later does not move anybody's bits. A
+student's progress is one integer (one BLOB row on disk): ~50 bytes for
+400 items, and marking an item twice changes nothing. Bits are assigned
+inside a write transaction, so several processes on one file agree on them.
+
+Marks update memory at once and are written in batches every
+`flush_interval` seconds, like the draft store. A flush merges the marks
+set or cleared here into the stored bitset (read-modify-write in one
+transaction), so marks written by another process are kept. heatmap() and
+item_counts() load the bitsets of a class into a students × bytes uint8
+matrix and answer with AND + popcount over whole columns (numpy,
+imported on first use) instead of scanning events.
+"""
+import atexit
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+_POPCOUNT = None
+
+
+def _popcount_table():
+    global _POPCOUNT
+    if _POPCOUNT is None:
+        import numpy as np
+
+        _POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+    return _POPCOUNT
+
+
+class ProgressStore:
+    def __init__(self, path: Path, *, flush_interval: float = 3.0):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.flush_interval = max(0.05, float(flush_interval))
+        self.marks = 0
+        self.flushes = 0
+        self.rows_written = 0
+        self._bits: Dict[str, int] = {}
+        self._index: Dict[str, int] = {}
+        # student -> (bits set, bits cleared) since the last flush
+        self._pending: Dict[str, Tuple[int, int]] = {}
+        self._lock = threading.RLock()
+        self._db_lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS progress_items (bit INTEGER PRIMARY KEY, key TEXT NOT NULL UNIQUE)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS progress ("
+            " student TEXT PRIMARY KEY,"
+            " bits BLOB NOT NULL,"
+            " updated_at REAL NOT NULL"
+            ") WITHOUT ROWID"
+        )
+        self._conn.commit()
+        self._index = dict((key, bit) for bit, key in self._conn.execute("SELECT bit, key FROM progress_items"))
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="progress-flush", daemon=True)
+        self._thread.start()
+
+    # --------------------------
+    # Índice del currículo
+    # --------------------------
+
+    def register(self, keys: Sequence[str]) -> List[int]:
+        """
+        Bit positions of `keys`, assigning the next free ones to new keys (in
+        the given order). The next bit comes from MAX(bit) on disk inside the
+        write transaction, not from this process's copy of the index, and
+        keys another process registered first keep its bit.
+        """
+        with self._lock:
+            missing = [key for key in dict.fromkeys(keys) if key not in self._index]
+            if missing:
+                marks = ",".join("?" * len(missing))
+                with self._db_lock:
+                    with self._conn:
+                        self._conn.execute("BEGIN IMMEDIATE")
+                        self._conn.executemany(
+                            "INSERT OR IGNORE INTO progress_items (bit, key) "
+                            "SELECT COALESCE(MAX(bit), -1) + 1, ? FROM progress_items",
+                            [(key,) for key in missing],
+                        )
+                        rows = self._conn.execute(
+                            f"SELECT bit, key FROM progress_items WHERE key IN ({marks})", missing
+                        ).fetchall()
+                self._index.update((key, bit) for bit, key in rows)
+            return [self._index[key] for key in keys]
+
+    @property
+    def size(self) -> int:
+        """Bits per student: highest known bit + 1 (other processes may own bits in between)."""
+        with self._lock:
+            return max(self._index.values(), default=-1) + 1
+
+    # --------------------------
+    # Estudiantes
+    # --------------------------
+
+    def _load(self, student: str) -> int:
+        bits = self._bits.get(student)
+        if bits is None:
+            with self._db_lock:
+                row = self._conn.execute("SELECT bits FROM progress WHERE student = ?", (student,)).fetchone()
+            bits = int.from_bytes(row[0], "little") if row else 0
+            self._bits[student] = bits
+        return bits
+
+    def mark(self, student: str, key: str, done: bool = True) -> bool:
+        """Set (or clear) one item; True if it changed. Unchanged marks cost no write."""
+        if not student:
+            return False
+        with self._lock:
+            bit = 1 << self.register([key])[0]
+            bits = self._load(student)
+            updated = bits | bit if done else bits & ~bit
+            if updated == bits:
+                return False
+            self._bits[student] = updated
+            added, cleared = self._pending.get(student, (0, 0))
+            self._pending[student] = (added | bit, cleared & ~bit) if done else (added & ~bit, cleared | bit)
+            self.marks += 1
+            return True
+
+    def is_done(self, student: str, key: str) -> bool:
+        with self._lock:
+            bit = self._index.get(key)
+            return bit is not None and bool(self._load(student) >> bit & 1)
+
+    def completed(self, student: str) -> List[str]:
+        with self._lock:
+            bits = self._load(student)
+            return [key for key, bit in self._index.items() if bits >> bit & 1]
+
+    def done_count(self, student: str, keys: Sequence[str]) -> int:
+        """How many of `keys` the student completed (popcount of bits & mask)."""
+        with self._lock:
+            mask = 0
+            for bit in self.register(keys):
+                mask |= 1 << bit
+            return (self._load(student) & mask).bit_count()
+
+    def students(self) -> List[str]:
+        """Every student with at least one saved mark (plus those pending)."""
+        with self._db_lock:
+            saved = [row[0] for row in self._conn.execute("SELECT student FROM progress ORDER BY student")]
+        with self._lock:
+            return sorted(set(saved) | self._pending.keys())
+
+    def bitsets(self, students: Sequence[str]) -> List[int]:
+        """Bitsets of many students: one query for those not in memory yet."""
+        with self._lock:
+            missing = [s for s in dict.fromkeys(students) if s not in self._bits]
+        for start in range(0, len(missing), 500):
+            chunk = missing[start:start + 500]
+            marks = ",".join("?" * len(chunk))
+            with self._db_lock:
+                rows = dict(self._conn.execute(f"SELECT student, bits FROM progress WHERE student IN ({marks})", chunk))
+            with self._lock:
+                for student in chunk:
+                    # Una marca hecha mientras tanto gana a lo leído de disco.
+                    self._bits.setdefault(student, int.from_bytes(rows.get(student, b""), "little"))
+        with self._lock:
+            return [self._bits[s] for s in students]
+
+    # --------------------------
+    # Consultas de clase (vectorizadas)
+    # --------------------------
+
+    def matrix(self, students: Sequence[str]):
+        """students × ceil(items / 8) uint8 matrix; bit i of a row is byte i // 8, bit i % 8."""
+        import numpy as np
+
+        bitsets = self.bitsets(students)
+        # Un bitset leído de disco puede traer bits que otro proceso registró y este aún no conoce.
+        width = max([(self.size + 7) // 8] + [(bits.bit_length() + 7) // 8 for bits in bitsets])
+        packed = b"".join(bits.to_bytes(width, "little") for bits in bitsets)
+        return np.frombuffer(packed, dtype=np.uint8).reshape(len(students), width)
+
+    def mask(self, keys: Sequence[str], width: Optional[int] = None):
+        """uint8 row with the bits of `keys` set, as wide as matrix() (unknown keys are registered)."""
+        import numpy as np
+
+        positions = self.register(keys)
+        row = np.zeros(width if width is not None else (self.size + 7) // 8, dtype=np.uint8)
+        for bit in positions:
+            row[bit >> 3] |= 1 << (bit & 7)
+        return row
+
+    def heatmap(self, students: Sequence[str], groups: Dict[str, Sequence[str]]):
+        """
+        Fraction of each group's items done by each student (students × groups,
+        float). Each group is one AND + popcount over the whole class matrix.
+        """
+        import numpy as np
+
+        self.register([key for keys in groups.values() for key in keys])
+        table = _popcount_table()
+        bits = self.matrix(students)
+        result = np.zeros((len(students), len(groups)), dtype=np.float64)
+        for column, keys in enumerate(groups.values()):
+            mask = self.mask(keys, bits.shape[1])
+            total = int(table[mask].sum())
+            if total:
+                result[:, column] = table[bits & mask].sum(axis=1, dtype=np.uint32) / total
+        return result
+
+    def item_counts(self, students: Sequence[str], keys: Sequence[str]):
+        """How many of `students` completed each key (int array, in `keys` order)."""
+        import numpy as np
+
+        positions = np.array(self.register(keys), dtype=np.int64)
+        bits = self.matrix(students)
+        unpacked = np.unpackbits(bits, axis=1, bitorder="little")
+        return unpacked[:, positions].sum(axis=0, dtype=np.int64)
+
+    # --------------------------
+    # Persistencia
+    # --------------------------
+
+    def flush(self) -> int:
+        """
+        Write pending marks: each stored bitset is read and updated with the
+        bits set / cleared here in one write transaction, so concurrent
+        writers (other processes on the same file) do not overwrite each other.
+        """
+        with self._lock:
+            changes, self._pending = self._pending, {}
+        if not changes:
+            return 0
+        students = list(changes)
+        now = time.time()
+        merged = {}
+        try:
+            with self._db_lock:
+                with self._conn:
+                    self._conn.execute("BEGIN IMMEDIATE")
+                    stored = {}
+                    for start in range(0, len(students), 500):
+                        chunk = students[start:start + 500]
+                        marks = ",".join("?" * len(chunk))
+                        stored.update(
+                            self._conn.execute(f"SELECT student, bits FROM progress WHERE student IN ({marks})", chunk)
+                        )
+                    for student, (added, cleared) in changes.items():
+                        merged[student] = (int.from_bytes(stored.get(student, b""), "little") | added) & ~cleared
+                    self._conn.executemany(
+                        "INSERT INTO progress (student, bits, updated_at) VALUES (?, ?, ?) "
+                        "ON CONFLICT(student) DO UPDATE SET bits = excluded.bits, updated_at = excluded.updated_at",
+                        [
+                            (student, bits.to_bytes((bits.bit_length() + 7) // 8, "little"), now)
+                            for student, bits in merged.items()
+                        ],
+                    )
+        except sqlite3.Error:
+            with self._lock:
+                # Lo marcado después del fallo manda sobre el lote que no se pudo escribir.
+                for student, (added, cleared) in changes.items():
+                    new_added, new_cleared = self._pending.get(student, (0, 0))
+                    self._pending[student] = (
+                        (added & ~new_cleared) | new_added,
+                        (cleared & ~new_added) | new_cleared,
+                    )
+            raise
+        with self._lock:
+            # La memoria recoge las marcas de otros procesos, más lo marcado aquí durante la escritura.
+            for student, bits in merged.items():
+                added, cleared = self._pending.get(student, (0, 0))
+                self._bits[student] = (bits | added) & ~cleared
+        self.flushes += 1
+        self.rows_written += len(merged)
+        return len(merged)
+
+    def close(self):
+        self._stop.set()
+        self._thread.join(timeout=2.0)
+        self.flush()
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except sqlite3.Error:
+                # Se reintenta en el siguiente ciclo; las marcas siguen en memoria.
+                continue
+
+
+_STORES: Dict[Path, ProgressStore] = {}
+_STORES_LOCK = threading.Lock()
+
+
+def get_progress_store(path: Path, **kwargs) -> ProgressStore:
+    """Process-wide progress store per SQLite file, shared by every Streamlit session."""
+    key = Path(path).resolve()
+    with _STORES_LOCK:
+        store = _STORES.get(key)
+        if store is None:
+            store = ProgressStore(key, **kwargs)
+            _STORES[key] = store
+        return store
+
+
+@atexit.register
+def _close_all_stores():
+    for store in list(_STORES.values()):
+        store.close()
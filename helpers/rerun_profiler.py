@@ -0,0 +1,212 @@
+"""
+Opt-in profiler for slow reruns.
+
+    profiler = configure_rerun_profiler(threshold_ms=800, out_dir=Path("profiles"))
+    with profiler.profile(session=session_id) as tags:
+        tags["page"] = current_page
+        render_page(current_page)
+
+Each (sampled) rerun runs under cProfile; when it takes longer than the
+threshold the profile is written as a .prof file (pstats / snakeviz) with a
+JSON summary next to it: top functions by cumulative and own time and, when
+tracemalloc is on, the rerun's peak / retained memory and the lines whose
+memory grew the most since the previous capture (or since the profiler
+started). Fast reruns only read two counters: the tracemalloc snapshots are
+taken after a rerun has passed the threshold, and that snapshot becomes the
+baseline for the next capture. Faster reruns are thrown away, so only the
+slow ones cost disk; the newest `keep` captures are kept.
+
+Only one rerun is profiled at a time per process: concurrent reruns skip the
+profiler instead of waiting (on Python 3.12+ cProfile cannot run in two
+threads at once anyway).
+"""
+import cProfile
+import io
+import json
+import pstats
+import random
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional
+
+TOP_FUNCTIONS = 25
+TOP_ALLOCATIONS = 15
+
+
+def _func_label(func) -> str:
+    filename, line, name = func
+    if filename == "~":
+        return name  # built-ins: "<built-in method time.sleep>"
+    return f"{Path(filename).name}:{line}({name})"
+
+
+def _top_functions(stats: pstats.Stats, key: str, limit: int) -> List[Dict]:
+    # stats.stats: func -> (primitive calls, total calls, own time, cumulative time, callers)
+    rows = sorted(stats.stats.items(), key=lambda item: item[1][2 if key == "tottime" else 3], reverse=True)
+    return [
+        {
+            "function": _func_label(func),
+            "calls": total_calls,
+            "own_ms": round(own * 1000, 2),
+            "cumulative_ms": round(cumulative * 1000, 2),
+        }
+        for func, (_, total_calls, own, cumulative, _) in rows[:limit]
+    ]
+
+
+def _snapshot() -> tracemalloc.Snapshot:
+    return tracemalloc.take_snapshot().filter_traces(
+        (
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        )
+    )
+
+
+def _top_allocations(current: tracemalloc.Snapshot, baseline: tracemalloc.Snapshot, limit: int) -> List[Dict]:
+    """Lines whose live memory grew the most from `baseline` to `current`."""
+    diffs = [d for d in current.compare_to(baseline, "lineno") if d.size_diff > 0]
+    return [
+        {
+            "line": f"{Path(diff.traceback[0].filename).name}:{diff.traceback[0].lineno}",
+            "size_diff_kib": round(diff.size_diff / 1024, 1),
+            "blocks_diff": diff.count_diff,
+            "size_kib": round(diff.size / 1024, 1),
+        }
+        for diff in diffs[:limit]
+    ]
+
+
+class RerunProfiler:
+    def __init__(
+        self,
+        out_dir: Path,
+        threshold_ms: float,
+        *,
+        sample_rate: float = 1.0,
+        trace_memory: bool = True,
+        keep: int = 50,
+    ):
+        self.out_dir = Path(out_dir)
+        self.threshold_ms = threshold_ms
+        self.sample_rate = sample_rate
+        self.trace_memory = trace_memory
+        self.keep = keep
+        self._busy = threading.Lock()
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start(1)
+        # Base de comparación de memoria: se renueva solo cuando se guarda una captura.
+        self._baseline = _snapshot() if trace_memory and tracemalloc.is_tracing() else None
+        self._baseline_label = "profiler start"
+
+    @contextmanager
+    def profile(self, page: str = "", session: Optional[str] = None):
+        """Yields a dict of tags; the caller may fill in "page" once it is known."""
+        tags = {"page": page, "session": session or ""}
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            yield tags
+            return
+        if not self._busy.acquire(blocking=False):
+            yield tags
+            return
+        profiler = cProfile.Profile()
+        tracing = self.trace_memory and tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.reset_peak()
+            mem_before = tracemalloc.get_traced_memory()[0]
+        started = time.perf_counter()
+        profiler.enable()
+        try:
+            yield tags
+        finally:
+            profiler.disable()
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            try:
+                if elapsed_ms >= self.threshold_ms:
+                    memory = None
+                    if tracing and tracemalloc.is_tracing():
+                        current, peak = tracemalloc.get_traced_memory()
+                        snapshot = _snapshot()
+                        memory = {
+                            "peak_delta_kib": round((peak - mem_before) / 1024, 1),
+                            "retained_kib": round((current - mem_before) / 1024, 1),
+                            "allocations_since": self._baseline_label,
+                            "top_allocations": (
+                                _top_allocations(snapshot, self._baseline, TOP_ALLOCATIONS)
+                                if self._baseline is not None
+                                else []
+                            ),
+                        }
+                        self._baseline, self._baseline_label = snapshot, "previous capture"
+                    self._save(profiler, tags["page"], tags["session"], elapsed_ms, memory)
+            except Exception:
+                # Un perfil perdido no debe tumbar la página.
+                pass
+            finally:
+                self._busy.release()
+
+    def _save(self, profiler: cProfile.Profile, page: str, session: Optional[str], elapsed_ms: float, memory):
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        slug = "".join(c if c.isalnum() else "-" for c in page).strip("-").lower() or "page"
+        stem = f"{stamp}-{int(elapsed_ms)}ms-{slug}-{random.getrandbits(24):06x}"
+        profiler.dump_stats(str(self.out_dir / f"{stem}.prof"))
+        stats = pstats.Stats(profiler, stream=io.StringIO())
+        record = {
+            "id": stem,
+            "page": page,
+            "session": session or "",
+            "duration_ms": round(elapsed_ms, 1),
+            "recorded_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "by_cumulative": _top_functions(stats, "cumtime", TOP_FUNCTIONS),
+            "by_own_time": _top_functions(stats, "tottime", TOP_FUNCTIONS),
+            "memory": memory,
+        }
+        (self.out_dir / f"{stem}.json").write_text(json.dumps(record, ensure_ascii=False), encoding="utf-8")
+        self._prune()
+
+    def _prune(self):
+        """Keep only the `keep` newest captures (older ones are deleted, however slow)."""
+        records = sorted(
+            list_slow_reruns(self.out_dir), key=lambda r: (r.get("recorded_at", ""), r.get("id", "")), reverse=True
+        )
+        for record in records[self.keep:]:
+            for suffix in (".json", ".prof"):
+                (self.out_dir / f"{record['id']}{suffix}").unlink(missing_ok=True)
+
+
+def list_slow_reruns(out_dir: Path, limit: Optional[int] = None) -> List[Dict]:
+    """Captured reruns, slowest first (reads every process's captures in out_dir)."""
+    records = []
+    for path in Path(out_dir).glob("*.json"):
+        try:
+            records.append(json.loads(path.read_text(encoding="utf-8")))
+        except (OSError, ValueError):
+            continue
+    records.sort(key=lambda r: r.get("duration_ms", 0), reverse=True)
+    return records[:limit] if limit else records
+
+
+_profiler: Optional[RerunProfiler] = None
+_profiler_lock = threading.Lock()
+
+
+def configure_rerun_profiler(threshold_ms: float, out_dir: Path, **kwargs) -> Optional[RerunProfiler]:
+    """
+    Process-wide profiler (created once, like the other helpers' singletons).
+    threshold_ms <= 0 leaves profiling off and returns None.
+    """
+    global _profiler
+    if threshold_ms <= 0:
+        return None
+    with _profiler_lock:
+        if _profiler is None:
+            _profiler = RerunProfiler(out_dir, threshold_ms, **kwargs)
+        return _profiler
+
+
+def get_rerun_profiler() -> Optional[RerunProfiler]:
+    return _profiler
@@ -0,0 +1,336 @@
+import csv
+import datetime as dt
+import json
+import os
+import uuid
+from contextlib import nullcontext
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional
+
+from helpers.response_store import RESPONSE_FIELDS
+
+# Columnas que viven dentro de los archivos; term y unit van en la ruta (hive).
+ARCHIVE_COLUMNS = [name for name in RESPONSE_FIELDS if name != "unit"]
+ARCHIVE_CHUNK_ROWS = 50_000
+# Manifiestos de compactaciones a medias; pyarrow ignora los nombres con "_" o ".".
+MANIFEST_DIR = "_compactions"
+
+
+def _pyarrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+        import pyarrow.fs as pafs
+        import pyarrow.parquet as pq
+    except ImportError as exc:
+        raise RuntimeError("The answer archive requires pyarrow (pip install pyarrow).") from exc
+    return pa, ds, pafs, pq
+
+
+def term_for(timestamp: str) -> str:
+    """
+    Term label for an ISO timestamp: T1 = Jan–Apr, T2 = May–Aug, T3 = Sep–Dec.
+    Example: '2025-09-14T10:00:00' -> '2025T3'
+    """
+    try:
+        year, month = int(timestamp[:4]), int(timestamp[5:7])
+    except (TypeError, ValueError):
+        return "unknown"
+    return f"{year}T{(month - 1) // 4 + 1}"
+
+
+def term_start(day: dt.date) -> dt.date:
+    """First day of the term that contains `day`."""
+    return dt.date(day.year, ((day.month - 1) // 4) * 4 + 1, 1)
+
+
+def _archive_schema(pa):
+    return pa.schema([(name, pa.string()) for name in ARCHIVE_COLUMNS])
+
+
+class _PartitionWriters:
+    """
+    One Parquet writer per (term, unit) partition, fed in fixed-size batches.
+    """
+
+    def __init__(self, archive_dir: Path, chunk_rows: int):
+        self.pa, _, _, self.pq = _pyarrow()
+        self.schema = _archive_schema(self.pa)
+        self.archive_dir = archive_dir
+        self.chunk_rows = chunk_rows
+        self.batch_id = uuid.uuid4().hex[:12]
+        # Se escribe oculto y se publica con rename después de cambiar el CSV en vivo.
+        self.final_name = f"part-{self.batch_id}.parquet"
+        self.pending_name = f".{self.final_name}.pending"
+        self._buffers: Dict[tuple, List[Dict]] = {}
+        self._writers: Dict[tuple, object] = {}
+        self.rows = 0
+
+    def add(self, term: str, unit: str, row: Dict):
+        key = (term, unit or "0")
+        buffer = self._buffers.setdefault(key, [])
+        buffer.append(row)
+        if len(buffer) >= self.chunk_rows:
+            self._write(key)
+
+    def _write(self, key: tuple):
+        rows = self._buffers.get(key) or []
+        if not rows:
+            return
+        writer = self._writers.get(key)
+        if writer is None:
+            term, unit = key
+            part_dir = self.archive_dir / f"term={term}" / f"unit={unit}"
+            part_dir.mkdir(parents=True, exist_ok=True)
+            writer = self.pq.ParquetWriter(
+                str(part_dir / self.pending_name),
+                self.schema,
+                compression="zstd",
+                compression_level=9,
+                use_dictionary=["user_email", "user_name", "session", "hour", "exercise_id"],
+            )
+            self._writers[key] = writer
+        columns = {name: [row.get(name) or "" for row in rows] for name in ARCHIVE_COLUMNS}
+        writer.write_table(self.pa.Table.from_pydict(columns, schema=self.schema))
+        self.rows += len(rows)
+        self._buffers[key] = []
+
+    def close(self):
+        for key in list(self._buffers):
+            self._write(key)
+        for writer in self._writers.values():
+            writer.close()
+        return sorted(self._writers)
+
+    def files(self) -> List[List[str]]:
+        """[pending, final] paths of every partition file, relative to the archive."""
+        return [
+            [f"term={term}/unit={unit}/{self.pending_name}", f"term={term}/unit={unit}/{self.final_name}"]
+            for term, unit in sorted(self._writers)
+        ]
+
+
+def _fsync_file(path: Path):
+    with open(path, "rb") as f:
+        os.fsync(f.fileno())
+
+
+def _fsync_dir(path: Path):
+    """Make renames / new entries in `path` durable (no-op where directories cannot be opened, e.g. Windows)."""
+    try:
+        fd = os.open(str(path), os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _write_manifest(path: Path, manifest: Dict):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+        f.flush()
+        os.fsync(f.fileno())
+    tmp.replace(path)
+    _fsync_dir(path.parent)
+
+
+def _publish(archive_dir: Path, files: List[List[str]]):
+    for pending, final in files:
+        try:
+            (archive_dir / pending).replace(archive_dir / final)
+        except FileNotFoundError:
+            pass  # ya publicado (otra recuperación llegó antes)
+    for part_dir in {(archive_dir / final).parent for _, final in files}:
+        _fsync_dir(part_dir)
+
+
+def recover_compactions(archive_dir: Path, *, rollback: bool = True) -> int:
+    """
+    Finish what an interrupted compact_responses() left behind. A manifest
+    whose temporary live file is gone means the CSV swap happened: its
+    partition files are published. Otherwise the swap never happened and the
+    rows are still live, so (with `rollback`) its partition files are deleted.
+    Returns the number of manifests resolved.
+
+    Roll-forward is safe at any time; rollback (and removing orphaned
+    partition files) only while holding the compaction lock.
+    """
+    archive_dir = Path(archive_dir)
+    manifest_dir = archive_dir / MANIFEST_DIR
+    if not manifest_dir.exists():
+        return 0
+    resolved = 0
+    for path in sorted(manifest_dir.glob("*.json")):
+        try:
+            manifest = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            continue
+        if not Path(manifest["tmp"]).exists():
+            _publish(archive_dir, manifest["files"])
+        elif rollback:
+            for pending, _ in manifest["files"]:
+                (archive_dir / pending).unlink(missing_ok=True)
+            Path(manifest["tmp"]).unlink(missing_ok=True)
+        else:
+            continue
+        path.unlink(missing_ok=True)
+        resolved += 1
+    if rollback:
+        # Partes de una compactación que se cayó antes de escribir su manifiesto.
+        for orphan in archive_dir.glob("term=*/unit=*/.part-*.parquet.pending"):
+            orphan.unlink(missing_ok=True)
+    return resolved
+
+
+def compact_responses(
+    live_path: Path,
+    archive_dir: Path,
+    cutoff: dt.date,
+    *,
+    lock=None,
+    chunk_rows: int = ARCHIVE_CHUNK_ROWS,
+    on_archived: Optional[Callable[[str], object]] = None,
+) -> Dict:
+    """
+    Move every answer older than `cutoff` from the live CSV into the archive
+    (archive_dir/term=<term>/unit=<unit>/part-*.parquet) and rewrite the live
+    file with the remaining rows. `lock` is a context manager that pauses the
+    live writer while the file is swapped (ResponseWriteQueue.exclusive()).
+    `on_archived(cutoff)` runs once the rows are archived, still under `lock`,
+    so derived copies (the search index) can drop the same rows.
+
+    The partitions are written hidden and only published after the live file
+    is swapped, with a manifest in between: a crash at any point leaves each
+    row either live or archived, never both (see recover_compactions()).
+    Every file is fsynced before the rename that depends on it, and the
+    directories after their renames, so this also holds after a power loss.
+    """
+    live_path = Path(live_path)
+    archive_dir = Path(archive_dir)
+    stats = {"archived": 0, "kept": 0, "partitions": []}
+    if not live_path.exists():
+        return stats
+
+    cutoff_str = cutoff.isoformat()
+    tmp_path = live_path.with_name(live_path.name + ".compact")
+    with lock if lock is not None else nullcontext():
+        recover_compactions(archive_dir)
+        writers = _PartitionWriters(archive_dir, chunk_rows)
+        try:
+            with open(live_path, "r", newline="", encoding="utf-8") as src, open(
+                tmp_path, "w", newline="", encoding="utf-8"
+            ) as dst:
+                reader = csv.DictReader(src)
+                kept = csv.DictWriter(dst, fieldnames=reader.fieldnames or RESPONSE_FIELDS)
+                kept.writeheader()
+                for row in reader:
+                    timestamp = row.get("timestamp") or ""
+                    if timestamp[:10] and timestamp[:10] < cutoff_str:
+                        row["response"] = (row.get("response") or "").replace("\\n", "\n")
+                        writers.add(term_for(timestamp), row.get("unit") or "", row)
+                    else:
+                        kept.writerow(row)
+                        stats["kept"] += 1
+                dst.flush()
+                os.fsync(dst.fileno())
+            stats["partitions"] = [f"term={t}/unit={u}" for t, u in writers.close()]
+            # Las partes deben estar en disco antes de que el manifiesto las nombre.
+            for pending, _ in writers.files():
+                _fsync_file(archive_dir / pending)
+            for part_dir in {(archive_dir / pending).parent for pending, _ in writers.files()}:
+                _fsync_dir(part_dir)
+        except Exception:
+            writers.close()
+            for pending, _ in writers.files():
+                (archive_dir / pending).unlink(missing_ok=True)
+            tmp_path.unlink(missing_ok=True)
+            raise
+        stats["archived"] = writers.rows
+        files = writers.files()
+        manifest = archive_dir / MANIFEST_DIR / f"{writers.batch_id}.json"
+        if files:
+            _write_manifest(
+                manifest,
+                {"batch": writers.batch_id, "cutoff": cutoff_str, "tmp": str(tmp_path), "files": files},
+            )
+        tmp_path.replace(live_path)
+        _fsync_dir(live_path.parent)
+        _publish(archive_dir, files)
+        manifest.unlink(missing_ok=True)
+        if on_archived is not None and stats["archived"]:
+            on_archived(cutoff_str)
+    return stats
+
+
+def open_archive(archive_dir: Path):
+    """
+    pyarrow dataset over the archive with hive partitions and memory-mapped reads.
+    Returns None when nothing has been archived yet.
+    """
+    archive_dir = Path(archive_dir)
+    recover_compactions(archive_dir, rollback=False)
+    if not archive_dir.exists() or not any(archive_dir.glob("term=*/unit=*/*.parquet")):
+        return None
+    pa, ds, pafs, _ = _pyarrow()
+    partitioning = ds.partitioning(
+        pa.schema([("term", pa.string()), ("unit", pa.int32())]),
+        flavor="hive",
+    )
+    return ds.dataset(
+        str(archive_dir),
+        format="parquet",
+        partitioning=partitioning,
+        filesystem=pafs.LocalFileSystem(use_mmap=True),
+    )
+
+
+def scan_archive(
+    archive_dir: Path,
+    columns: Optional[List[str]] = None,
+    *,
+    terms: Optional[Iterable[str]] = None,
+    units: Optional[Iterable[int]] = None,
+    sessions: Optional[Iterable[str]] = None,
+):
+    """
+    Column-pruned scan: only `columns` are decoded and partitions outside
+    `terms` / `units` are skipped without being opened.
+    """
+    dataset = open_archive(archive_dir)
+    if dataset is None:
+        return None
+    _, ds, _, _ = _pyarrow()
+    expr = None
+    for field, values in (("term", terms), ("unit", units), ("session", sessions)):
+        if values:
+            clause = ds.field(field).isin(list(values))
+            expr = clause if expr is None else expr & clause
+    return dataset.to_table(columns=columns, filter=expr)
+
+
+def archive_summary(archive_dir: Path, *, terms: Optional[Iterable[str]] = None):
+    """
+    Answers and distinct students per term / unit / session. Only the session
+    and user_email columns are decoded; term and unit come from the paths.
+    """
+    table = scan_archive(archive_dir, ["term", "unit", "session", "user_email"], terms=terms)
+    if table is None or table.num_rows == 0:
+        return None
+    summary = table.group_by(["term", "unit", "session"]).aggregate(
+        [("user_email", "count"), ("user_email", "count_distinct")]
+    )
+    summary = summary.select(
+        ["term", "unit", "session", "user_email_count", "user_email_count_distinct"]
+    ).rename_columns(["term", "unit", "session", "answers", "students"])
+    return summary.sort_by([("term", "descending"), ("unit", "ascending"), ("session", "ascending")])
+
+
+def archive_terms(archive_dir: Path) -> List[str]:
+    archive_dir = Path(archive_dir)
+    if not archive_dir.exists():
+        return []
+    return sorted((p.name.split("=", 1)[1] for p in archive_dir.glob("term=*")), reverse=True)
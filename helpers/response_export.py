@@ -0,0 +1,189 @@
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+import tempfile
+from pathlib import Path
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Optional
+
+from helpers.response_store import RESPONSE_FIELDS
+
+EXPORT_FORMATS = ("csv", "jsonl", "parquet")
+EXPORT_MIME_TYPES = {
+    "csv": "text/csv",
+    "jsonl": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet",
+}
+DEFAULT_CHUNK_ROWS = 10_000
+
+
+def iter_response_rows(
+    path: Path,
+    *,
+    unit: Optional[int] = None,
+    session: Optional[str] = None,
+    students: Optional[Iterable[str]] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+) -> Iterator[Dict]:
+    """
+    Lee el CSV de respuestas fila por fila aplicando filtros.
+    date_from / date_to son fechas ISO (YYYY-MM-DD), ambas inclusivas.
+    """
+    path = Path(path)
+    if not path.exists():
+        return
+    student_set = {s.strip().lower() for s in students or [] if s and s.strip()}
+    unit_str = str(unit) if unit is not None else None
+
+    with open(path, "r", newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            if unit_str is not None and (row.get("unit") or "") != unit_str:
+                continue
+            if session and row.get("session") != session:
+                continue
+            if student_set and (row.get("user_email") or "").lower() not in student_set:
+                continue
+            day = (row.get("timestamp") or "")[:10]
+            if date_from and day < date_from:
+                continue
+            if date_to and day > date_to:
+                continue
+            row["response"] = (row.get("response") or "").replace("\\n", "\n")
+            yield row
+
+
+def iter_chunks(rows: Iterable[Dict], chunk_rows: int = DEFAULT_CHUNK_ROWS) -> Iterator[List[Dict]]:
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_rows:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _write_csv(chunks: Iterable[List[Dict]], out: BinaryIO) -> int:
+    count = 0
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=RESPONSE_FIELDS, extrasaction="ignore")
+    writer.writeheader()
+    for chunk in chunks:
+        writer.writerows(chunk)
+        out.write(buffer.getvalue().encode("utf-8"))
+        buffer.seek(0)
+        buffer.truncate()
+        count += len(chunk)
+    out.write(buffer.getvalue().encode("utf-8"))
+    return count
+
+
+def _write_jsonl(chunks: Iterable[List[Dict]], out: BinaryIO) -> int:
+    count = 0
+    for chunk in chunks:
+        lines = [
+            json.dumps({k: row.get(k, "") for k in RESPONSE_FIELDS}, ensure_ascii=False)
+            for row in chunk
+        ]
+        out.write(("\n".join(lines) + "\n").encode("utf-8"))
+        count += len(chunk)
+    return count
+
+
+def _write_parquet(chunks: Iterable[List[Dict]], out: BinaryIO) -> int:
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as exc:
+        raise RuntimeError("Parquet export requires pyarrow (pip install pyarrow).") from exc
+
+    schema = pa.schema([(name, pa.string()) for name in RESPONSE_FIELDS])
+    count = 0
+    with pq.ParquetWriter(out, schema, compression="zstd") as writer:
+        for chunk in chunks:
+            columns = {name: [row.get(name) or "" for row in chunk] for name in RESPONSE_FIELDS}
+            writer.write_table(pa.Table.from_pydict(columns, schema=schema))
+            count += len(chunk)
+        if count == 0:
+            writer.write_table(schema.empty_table())
+    return count
+
+
+_WRITERS = {
+    "csv": _write_csv,
+    "jsonl": _write_jsonl,
+    "parquet": _write_parquet,
+}
+
+
+def export_responses(
+    path: Path,
+    out: BinaryIO,
+    fmt: str = "csv",
+    *,
+    chunk_rows: int = DEFAULT_CHUNK_ROWS,
+    **filters,
+) -> int:
+    """
+    Exporta respuestas en bloques de `chunk_rows` filas al stream binario `out`.
+    Solo un bloque vive en memoria a la vez. Regresa el número de filas exportadas.
+    """
+    fmt = (fmt or "csv").lower()
+    if fmt not in _WRITERS:
+        raise ValueError(f"Unsupported export format: {fmt}")
+    rows = iter_response_rows(path, **filters)
+    return _WRITERS[fmt](iter_chunks(rows, chunk_rows), out)
+
+
+def export_responses_to_file(path: Path, target: Path, fmt: str = "csv", **kwargs) -> int:
+    target = Path(target)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    # Un temporal por llamada: dos exportaciones al mismo destino no se mezclan.
+    fd, tmp_name = tempfile.mkstemp(prefix=target.name + ".", suffix=".part", dir=target.parent)
+    tmp = Path(tmp_name)
+    try:
+        with os.fdopen(fd, "wb") as out:
+            count = export_responses(path, out, fmt, **kwargs)
+        tmp.replace(target)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    return count
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Stream student responses to CSV, JSONL or Parquet (e.g. for nightly jobs).",
+    )
+    parser.add_argument("--source", default="responses/unit2_responses.csv", help="Responses CSV store.")
+    parser.add_argument("--format", choices=EXPORT_FORMATS, default="csv")
+    parser.add_argument("--out", required=True, help="Output file, or '-' for stdout.")
+    parser.add_argument("--unit", type=int)
+    parser.add_argument("--session", help="S1 | S2 | S3")
+    parser.add_argument("--student", action="append", default=[], help="Student email (repeatable).")
+    parser.add_argument("--since", help="First day to include (YYYY-MM-DD).")
+    parser.add_argument("--until", help="Last day to include (YYYY-MM-DD).")
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS)
+    args = parser.parse_args(argv)
+
+    filters = {
+        "unit": args.unit,
+        "session": args.session,
+        "students": args.student,
+        "date_from": args.since,
+        "date_to": args.until,
+        "chunk_rows": args.chunk_rows,
+    }
+    if args.out == "-":
+        count = export_responses(Path(args.source), sys.stdout.buffer, args.format, **filters)
+    else:
+        count = export_responses_to_file(Path(args.source), Path(args.out), args.format, **filters)
+    print(f"Exported {count} rows.", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
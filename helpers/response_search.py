@@ -0,0 +1,305 @@
+import csv
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from helpers.response_store import RESPONSE_FIELDS
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS answers (
+    id INTEGER PRIMARY KEY,
+    row_key TEXT NOT NULL UNIQUE,
+    timestamp TEXT,
+    user_email TEXT,
+    user_name TEXT,
+    unit TEXT,
+    session TEXT,
+    hour TEXT,
+    exercise_id TEXT,
+    response TEXT
+);
+CREATE INDEX IF NOT EXISTS answers_session_exercise ON answers (session, exercise_id);
+CREATE VIRTUAL TABLE IF NOT EXISTS answers_fts USING fts5(
+    response,
+    user_name,
+    content='answers',
+    content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS answers_ai AFTER INSERT ON answers BEGIN
+    INSERT INTO answers_fts (rowid, response, user_name) VALUES (new.id, new.response, new.user_name);
+END;
+CREATE TRIGGER IF NOT EXISTS answers_ad AFTER DELETE ON answers BEGIN
+    INSERT INTO answers_fts (answers_fts, rowid, response, user_name)
+    VALUES ('delete', old.id, old.response, old.user_name);
+END;
+CREATE TRIGGER IF NOT EXISTS answers_au AFTER UPDATE ON answers BEGIN
+    INSERT INTO answers_fts (answers_fts, rowid, response, user_name)
+    VALUES ('delete', old.id, old.response, old.user_name);
+    INSERT INTO answers_fts (rowid, response, user_name) VALUES (new.id, new.response, new.user_name);
+END;
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+
+# Identidad de una respuesta: quién, cuándo y en qué ejercicio (no su texto).
+_KEY_FIELDS = ("user_email", "timestamp", "unit", "session", "hour", "exercise_id")
+# Se sube al cambiar _row_key(); un índice con otra versión se reconstruye desde el CSV.
+ROW_KEY_VERSION = "2"
+
+
+def _row_key(row: Dict) -> str:
+    raw = "\x1f".join(str(row.get(name, "")) for name in _KEY_FIELDS)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def build_fts_query(text: str) -> str:
+    """
+    Turn free text into a safe FTS5 query: every word must appear and the
+    last word also matches as a prefix (search-as-you-type).
+    """
+    tokens = _TOKEN_RE.findall(text or "")
+    if not tokens:
+        return ""
+    quoted = [f'"{t}"' for t in tokens]
+    quoted[-1] += "*"
+    return " ".join(quoted)
+
+
+class ResponseSearchIndex:
+    """
+    SQLite FTS5 index over the `response` column of the answers store.
+    Rows are keyed by (student, timestamp, unit, session, hour, exercise), so
+    the same row can arrive both from the writer queue and from a CSV catch-up
+    without being indexed twice, while two saves of the same text at different
+    times stay two rows. Rows moved to the archive are removed with remove_before().
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        if self._meta("row_key") != ROW_KEY_VERSION:
+            # Claves de otra versión: se vacía y la próxima sincronización relee el CSV entero.
+            with self._conn:
+                self._conn.execute("DELETE FROM answers")
+                self._conn.execute("DELETE FROM meta WHERE key LIKE 'offset:%' OR key LIKE 'fingerprint:%'")
+                self._set_meta("row_key", ROW_KEY_VERSION)
+        self._conn.commit()
+
+    def add_rows(self, rows: Iterable[Dict]) -> int:
+        """
+        Index new rows (as written to the CSV, with '\\n' escaped). A row whose
+        key is already indexed updates its text (the later save wins). Returns
+        rows inserted or changed.
+        """
+        params = []
+        for row in rows:
+            params.append(
+                (
+                    _row_key(row),
+                    str(row.get("timestamp", "")),
+                    str(row.get("user_email", "")),
+                    str(row.get("user_name", "")),
+                    str(row.get("unit", "")),
+                    str(row.get("session", "")),
+                    str(row.get("hour", "")),
+                    str(row.get("exercise_id", "")),
+                    str(row.get("response", "")).replace("\\n", "\n"),
+                )
+            )
+        if not params:
+            return 0
+        with self._lock, self._conn:
+            cursor = self._conn.executemany(
+                "INSERT INTO answers "
+                "(row_key, timestamp, user_email, user_name, unit, session, hour, exercise_id, response) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(row_key) DO UPDATE SET user_name = excluded.user_name, response = excluded.response "
+                "WHERE answers.response IS NOT excluded.response OR answers.user_name IS NOT excluded.user_name",
+                params,
+            )
+            return max(cursor.rowcount, 0)
+
+    def remove_before(self, cutoff: str) -> int:
+        """
+        Drop rows older than `cutoff` (ISO date), the ones compact_responses()
+        moves to the archive. Returns rows removed.
+        """
+        with self._lock, self._conn:
+            return self._conn.execute(
+                "DELETE FROM answers WHERE timestamp <> '' AND substr(timestamp, 1, 10) < ?", (cutoff,)
+            ).rowcount
+
+    def _meta(self, key: str) -> Optional[str]:
+        row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key: str, value: str):
+        self._conn.execute(
+            "INSERT INTO meta (key, value) VALUES (?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            (key, value),
+        )
+
+    def sync_from_csv(self, csv_path: Path, batch_rows: int = 5000) -> int:
+        """
+        Index rows appended to the CSV since the last sync. Only the new bytes
+        are read. The offset is stored with a fingerprint of the file (inode
+        plus a hash of the header and first row); if the file was rewritten
+        (e.g. compacted) the fingerprint or the line boundary no longer match,
+        and the file is rescanned with already-indexed rows matched by their key.
+        """
+        csv_path = Path(csv_path)
+        if not csv_path.exists():
+            return 0
+        with self._lock:
+            offset = int(self._meta(f"offset:{csv_path}") or 0)
+            fingerprint = self._meta(f"fingerprint:{csv_path}")
+
+        added = 0
+        with open(csv_path, "rb") as f:
+            first_line = f.readline()
+            data_start = f.tell()
+            first_row = f.readline()
+            if not first_row.endswith(b"\n"):
+                first_row = b""
+            current = f"{os.fstat(f.fileno()).st_ino}:{hashlib.sha1(first_line + first_row).hexdigest()}"
+            if offset > data_start and current == fingerprint:
+                # El offset debe caer justo después de un salto de línea.
+                f.seek(offset - 1)
+                if f.read(1) != b"\n":
+                    offset = 0
+            else:
+                offset = 0
+            if offset < data_start:
+                offset = data_start
+            fieldnames = next(csv.reader([first_line.decode("utf-8")]), RESPONSE_FIELDS)
+            f.seek(offset)
+            pending = []
+            for raw in f:
+                if not raw.endswith(b"\n"):
+                    # Última línea a medio escribir: se indexa en la siguiente sincronización.
+                    break
+                offset += len(raw)
+                values = next(csv.reader([raw.decode("utf-8")]), None)
+                if values:
+                    pending.append(dict(zip(fieldnames, values)))
+                if len(pending) >= batch_rows:
+                    added += self.add_rows(pending)
+                    pending = []
+            added += self.add_rows(pending)
+
+        with self._lock, self._conn:
+            self._set_meta(f"offset:{csv_path}", str(offset))
+            self._set_meta(f"fingerprint:{csv_path}", current)
+        return added
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+
+    def facets(self) -> Dict[str, List[str]]:
+        with self._lock:
+            sessions = [r[0] for r in self._conn.execute("SELECT DISTINCT session FROM answers ORDER BY 1")]
+            exercises = [r[0] for r in self._conn.execute("SELECT DISTINCT exercise_id FROM answers ORDER BY 1")]
+        return {"session": sessions, "exercise_id": exercises}
+
+    def search(
+        self,
+        text: str,
+        *,
+        session: Optional[str] = None,
+        exercise_id: Optional[str] = None,
+        limit: int = 50,
+        mark: tuple = ("**", "**"),
+    ) -> List[Dict]:
+        """
+        Ranked (bm25) search. Only the top `limit` rows are fetched and
+        highlighted, so cost does not grow with the number of matches shown.
+        """
+        query = build_fts_query(text)
+        if not query:
+            return []
+        sql = (
+            "SELECT a.timestamp, a.user_email, a.user_name, a.session, a.hour, a.exercise_id, "
+            "a.response, f.rank "
+            "FROM answers_fts f JOIN answers a ON a.id = f.rowid "
+            "WHERE answers_fts MATCH ?"
+        )
+        params: list = [query]
+        if session:
+            sql += " AND a.session = ?"
+            params.append(session)
+        if exercise_id:
+            sql += " AND a.exercise_id = ?"
+            params.append(exercise_id)
+        sql += " ORDER BY f.rank LIMIT ?"
+        params.append(int(limit))
+
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        keys = ["timestamp", "user_email", "user_name", "session", "hour", "exercise_id", "response", "rank"]
+        terms = [t.lower() for t in _TOKEN_RE.findall(text)]
+        results = []
+        for row in rows:
+            item = dict(zip(keys, row))
+            item["snippet"] = highlight_snippet(item["response"], terms, mark)
+            results.append(item)
+        return results
+
+
+def highlight_snippet(text: str, terms: List[str], mark: tuple = ("**", "**"), width: int = 24) -> str:
+    """
+    Window of about `width` words around the first hit, with every word that
+    matches a query term wrapped in `mark`. The last term matches as a prefix.
+    """
+    words = (text or "").split()
+    if not words:
+        return ""
+    exact, prefix = set(terms[:-1]), terms[-1] if terms else ""
+
+    def is_hit(word: str) -> bool:
+        for token in _TOKEN_RE.findall(word.lower()):
+            if token in exact or (prefix and token.startswith(prefix)):
+                return True
+        return False
+
+    hits = [i for i, w in enumerate(words) if is_hit(w)]
+    first = hits[0] if hits else 0
+    start = max(0, first - width // 3)
+    window = words[start:start + width]
+    marked = [f"{mark[0]}{w}{mark[1]}" if is_hit(w) else w for w in window]
+    snippet = " ".join(marked)
+    if start > 0:
+        snippet = "… " + snippet
+    if start + width < len(words):
+        snippet += " …"
+    return snippet
+
+
+_INDEXES: Dict[Path, ResponseSearchIndex] = {}
+_INDEXES_LOCK = threading.Lock()
+
+
+def get_search_index(path: Path) -> ResponseSearchIndex:
+    """
+    Process-wide search index per SQLite file.
+    """
+    key = Path(path).resolve()
+    with _INDEXES_LOCK:
+        index = _INDEXES.get(key)
+        if index is None:
+            index = ResponseSearchIndex(key)
+            _INDEXES[key] = index
+        return index
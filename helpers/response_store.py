@@ -0,0 +1,209 @@
+import atexit
+import csv
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional
+
+RESPONSE_FIELDS = [
+    "timestamp",
+    "user_email",
+    "user_name",
+    "unit",
+    "session",
+    "hour",
+    "exercise_id",
+    "response",
+]
+
+
+def append_rows_fsync(path: Path, rows: Iterable[Dict], fieldnames: List[str] = RESPONSE_FIELDS) -> int:
+    """
+    Append rows to the CSV store in a single write and fsync before returning.
+    Writes the header when the file is new or empty. Returns the number of rows written.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    rows = list(rows)
+    with open(path, "a", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames, extrasaction="ignore")
+        if f.tell() == 0:
+            writer.writeheader()
+        writer.writerows(rows)
+        f.flush()
+        os.fsync(f.fileno())
+    return len(rows)
+
+
+class SaveTicket:
+    """
+    Acknowledgement for one queued row.
+    `wait()` returns True once the batch that contains the row is fsync'd.
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+        self.ok = False
+        self.error: Optional[str] = None
+        self.batch_size = 0
+
+    def _resolve(self, ok: bool, batch_size: int, error: Optional[str] = None):
+        self.ok = ok
+        self.batch_size = batch_size
+        self.error = error
+        self._event.set()
+
+    @property
+    def done(self) -> bool:
+        return self._event.is_set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self._event.wait(timeout) and self.ok
+
+
+class ResponseWriteQueue:
+    """
+    Write-behind queue for the responses CSV.
+    A single writer thread groups pending rows and commits them with one
+    write + fsync every `flush_interval_ms` or every `max_batch_rows` rows,
+    whichever comes first.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        fieldnames: List[str] = RESPONSE_FIELDS,
+        *,
+        flush_interval_ms: int = 2,
+        max_batch_rows: int = 200,
+    ):
+        self.path = Path(path)
+        self.fieldnames = list(fieldnames)
+        self.flush_interval = max(0, int(flush_interval_ms)) / 1000.0
+        self.max_batch_rows = max(1, int(max_batch_rows))
+        self.commits = 0
+        self.rows_written = 0
+        self._listeners: List[Callable[[List[Dict]], None]] = []
+        self._queue: "queue.Queue" = queue.Queue()
+        self._commit_lock = threading.Lock()
+        self._closed = False
+        self._thread = threading.Thread(
+            target=self._run,
+            name=f"response-writer:{self.path.name}",
+            daemon=True,
+        )
+        self._thread.start()
+
+    def submit(self, row: Dict) -> SaveTicket:
+        ticket = SaveTicket()
+        if self._closed:
+            ticket._resolve(False, 0, "writer is closed")
+            return ticket
+        self._queue.put((row, ticket))
+        return ticket
+
+    def add_listener(self, callback: Callable[[List[Dict]], None]):
+        """
+        Register `callback(rows)` to run on the writer thread after each commit
+        (e.g. incremental search indexing). Registering the same callback twice is a no-op.
+        """
+        if callback not in self._listeners:
+            self._listeners.append(callback)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Block until every row submitted so far has been committed.
+        """
+        ticket = SaveTicket()
+        self._queue.put((None, ticket))
+        return ticket.wait(timeout)
+
+    @contextmanager
+    def exclusive(self):
+        """
+        Hold off commits while another job rewrites the file (e.g. archive compaction).
+        Saves submitted meanwhile stay queued and are committed afterwards.
+        """
+        with self._commit_lock:
+            yield
+
+    def close(self, timeout: float = 5.0):
+        if self._closed:
+            return
+        self.flush(timeout)
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch = [first]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.max_batch_rows:
+                # Drain whatever is already waiting, then hold the batch open
+                # until the deadline so late arrivals share the same fsync.
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    try:
+                        item = self._queue.get(timeout=remaining)
+                    except queue.Empty:
+                        break
+                if item is None:
+                    self._commit(batch)
+                    return
+                batch.append(item)
+            self._commit(batch)
+
+    def _commit(self, batch: list):
+        rows = [row for row, _ in batch if row is not None]
+        error = None
+        if rows:
+            try:
+                with self._commit_lock:
+                    append_rows_fsync(self.path, rows, self.fieldnames)
+                self.commits += 1
+                self.rows_written += len(rows)
+            except Exception as exc:
+                error = str(exc)
+        for _, ticket in batch:
+            ticket._resolve(error is None, len(rows), error)
+        if rows and error is None:
+            for callback in list(self._listeners):
+                try:
+                    callback(rows)
+                except Exception:
+                    # Un índice secundario nunca debe tumbar al writer.
+                    pass
+
+
+_QUEUES: Dict[Path, ResponseWriteQueue] = {}
+_QUEUES_LOCK = threading.Lock()
+
+
+def get_response_queue(path: Path, **kwargs) -> ResponseWriteQueue:
+    """
+    Process-wide writer per CSV file, shared by every Streamlit session.
+    """
+    key = Path(path).resolve()
+    with _QUEUES_LOCK:
+        writer = _QUEUES.get(key)
+        if writer is None:
+            writer = ResponseWriteQueue(key, **kwargs)
+            _QUEUES[key] = writer
+        return writer
+
+
+@atexit.register
+def _close_all_queues():
+    for writer in list(_QUEUES.values()):
+        writer.close(timeout=2.0)
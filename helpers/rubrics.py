@@ -0,0 +1,337 @@
+"""
+First-pass marks for free-text answers from per-exercise rubrics.
+
+    rubrics = compile_rubrics({
+        "u2_S1_H1_routine_paragraph": {
+            "criteria": [
+                {"label": "present simple (3rd person)", "regex": r"\\b(?:he|she) \\w+s\\b"},
+                {"label": "time expressions", "keywords": ["at", "in the morning", "every day"], "min": 2},
+                {"label": "40+ words", "min_words": 40},
+                {"label": "no 'she go'", "avoid": r"\\b(?:he|she) (?:go|have|do)\\b"},
+            ],
+        },
+    })
+    rubrics["u2_S1_H1_routine_paragraph"].check("I get up at 7 ...")   # Mark(score=0.75, ...)
+    rescore_responses(Path("responses/unit2_responses.csv"), specs, workers=4)
+
+A rubric spec is plain data (so it can be shipped to worker processes):
+
+  normalize  steps applied to the answer (and to accepted answers / keywords)
+             before matching, in order; default DEFAULT_NORMALIZE
+  accept     exact answers that get full marks after normalization
+  criteria   each one {"label", "weight" (default 1)} plus one of:
+               regex      met when the pattern is found
+               keywords   met when at least `min` (default 1) different ones appear
+                          (whole words or phrases; punctuation around them is ignored)
+               min_words  met with at least that many words
+               avoid      met when the pattern (a typical mistake) is NOT found
+
+The mark is the weight of the criteria met over the total weight (an
+accepted answer is 1.0, an empty one 0.0). Patterns are written against
+normalized text: lower case, straight quotes, contractions expanded.
+
+compile_rubrics() turns specs into matchers once: one compiled pattern
+per regex criterion, and keyword lists become a set of words plus a few
+phrases. Checking an answer tokenizes it once; keywords are set
+intersections and only regex criteria scan the text. rescore_responses() streams the response CSV
+in chunks to a process pool; each worker compiles the rubrics once in its
+initializer and only (index, exercise, text) tuples travel between
+processes.
+"""
+import csv
+import os
+import re
+import tempfile
+import unicodedata
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+from helpers.response_export import iter_chunks, iter_response_rows
+
+DEFAULT_NORMALIZE = ("quotes", "lower", "contractions", "spaces")
+DEFAULT_CHUNK_ROWS = 5_000
+# Por debajo de esto arrancar procesos cuesta más que calificar en el mismo proceso.
+POOL_MIN_BYTES = 1_000_000
+MARK_FIELDS = ["timestamp", "user_email", "user_name", "exercise", "score", "met", "missed"]
+
+_CONTRACTIONS = {
+    "i'm": "i am",
+    "you're": "you are",
+    "we're": "we are",
+    "they're": "they are",
+    "he's": "he is",
+    "she's": "she is",
+    "it's": "it is",
+    "that's": "that is",
+    "there's": "there is",
+    "what's": "what is",
+    "where's": "where is",
+    "don't": "do not",
+    "doesn't": "does not",
+    "didn't": "did not",
+    "isn't": "is not",
+    "aren't": "are not",
+    "wasn't": "was not",
+    "weren't": "were not",
+    "can't": "cannot",
+    "won't": "will not",
+    "i've": "i have",
+    "i'd": "i would",
+    "i'll": "i will",
+    "let's": "let us",
+}
+_CONTRACTIONS_RE = re.compile(r"\b(?:" + "|".join(re.escape(c) for c in _CONTRACTIONS) + r")\b")
+_QUOTES = (("’", "'"), ("‘", "'"), ("´", "'"), ("`", "'"), ("“", '"'), ("”", '"'))
+_PUNCTUATION_RE = re.compile(r"[^\w\s']")
+# Puntuación pegada a una palabra ("morning." / "(tv)"); los apóstrofos internos se quedan.
+_EDGE_PUNCTUATION = ".,;:!?¡¿\"'()[]{}…-–—"
+
+
+def _straight_quotes(text: str) -> str:
+    for curly, straight in _QUOTES:
+        if curly in text:
+            text = text.replace(curly, straight)
+    return text
+
+
+def _strip_accents(text: str) -> str:
+    return "".join(c for c in unicodedata.normalize("NFKD", text) if not unicodedata.combining(c))
+
+
+NORMALIZERS: Dict[str, Callable[[str], str]] = {
+    "quotes": _straight_quotes,
+    "lower": str.lower,
+    "accents": _strip_accents,
+    # Las contracciones se buscan en minúsculas: va después de "lower".
+    "contractions": lambda text: _CONTRACTIONS_RE.sub(lambda m: _CONTRACTIONS[m.group(0)], text) if "'" in text else text,
+    "punctuation": lambda text: _PUNCTUATION_RE.sub(" ", text),
+    "spaces": lambda text: " ".join(text.split()),
+}
+
+
+def _tokens(text: str) -> List[str]:
+    """Words of a normalized text, without the punctuation stuck to them."""
+    return [word for word in (w.strip(_EDGE_PUNCTUATION) for w in text.split()) if word]
+
+
+class Mark(NamedTuple):
+    score: float  # 0..1
+    met: Tuple[str, ...]
+    missed: Tuple[str, ...]
+    accepted: bool = False
+
+
+class _Criterion(NamedTuple):
+    label: str
+    weight: float
+    kind: str  # regex | keywords | min_words | avoid
+    pattern: Optional["re.Pattern"] = None
+    words: frozenset = frozenset()  # keywords de una palabra: intersección de conjuntos
+    phrases: Tuple[str, ...] = ()  # de varias: " in the morning " dentro del texto tokenizado
+    minimum: int = 0
+
+
+class Rubric:
+    """A compiled rubric. check() never raises on odd input; it just scores it."""
+
+    __slots__ = ("exercise", "steps", "accepted", "criteria", "total")
+
+    def __init__(self, exercise: str, spec: Dict):
+        self.exercise = exercise
+        steps = spec.get("normalize", DEFAULT_NORMALIZE)
+        unknown = [step for step in steps if step not in NORMALIZERS]
+        if unknown:
+            raise ValueError(f"{exercise}: unknown normalize steps {unknown}")
+        self.steps = tuple(NORMALIZERS[step] for step in steps)
+        self.accepted = frozenset(self.normalize(answer) for answer in spec.get("accept", ()))
+        self.criteria = tuple(self._compile(c) for c in spec.get("criteria", ()))
+        self.total = sum(c.weight for c in self.criteria)
+        if not self.accepted and not self.total:
+            raise ValueError(f"{exercise}: a rubric needs accepted answers or weighted criteria")
+
+    def _compile(self, criterion: Dict) -> _Criterion:
+        label = criterion.get("label") or self.exercise
+        weight = float(criterion.get("weight", 1))
+        try:
+            if "regex" in criterion or "avoid" in criterion:
+                kind = "regex" if "regex" in criterion else "avoid"
+                return _Criterion(label, weight, kind, pattern=re.compile(criterion[kind]))
+            if "keywords" in criterion:
+                keywords = {" ".join(_tokens(self.normalize(w))) for w in criterion["keywords"] if w}
+                keywords.discard("")
+                return _Criterion(
+                    label,
+                    weight,
+                    "keywords",
+                    words=frozenset(k for k in keywords if " " not in k),
+                    phrases=tuple(f" {k} " for k in keywords if " " in k),
+                    minimum=max(1, int(criterion.get("min", 1))),
+                )
+            if "min_words" in criterion:
+                return _Criterion(label, weight, "min_words", minimum=int(criterion["min_words"]))
+        except re.error as exc:
+            raise ValueError(f"{self.exercise} / {label}: {exc}") from None
+        raise ValueError(f"{self.exercise} / {label}: a criterion needs regex, keywords, min_words or avoid")
+
+    def normalize(self, text: str) -> str:
+        for step in self.steps:
+            text = step(text)
+        return text
+
+    def check(self, text: Optional[str]) -> Mark:
+        text = self.normalize(text or "")
+        if not text:
+            return Mark(0.0, (), tuple(c.label for c in self.criteria))
+        if text in self.accepted:
+            return Mark(1.0, tuple(c.label for c in self.criteria), (), True)
+        tokens = _tokens(text)
+        present = set(tokens)
+        padded = f" {' '.join(tokens)} "
+        met, missed, score = [], [], 0.0
+        for c in self.criteria:
+            if c.kind == "regex":
+                ok = c.pattern.search(text) is not None
+            elif c.kind == "avoid":
+                ok = c.pattern.search(text) is None
+            elif c.kind == "keywords":
+                found = len(c.words & present) if c.words else 0
+                if found < c.minimum:
+                    found += sum(1 for phrase in c.phrases if phrase in padded)
+                ok = found >= c.minimum
+            else:
+                ok = len(tokens) >= c.minimum
+            (met if ok else missed).append(c.label)
+            score += c.weight if ok else 0.0
+        return Mark(score / self.total if self.total else 0.0, tuple(met), tuple(missed))
+
+
+def compile_rubrics(specs: Dict[str, Dict]) -> Dict[str, Rubric]:
+    """Compile every spec (ValueError names the exercise and criterion that is wrong)."""
+    return {exercise: Rubric(exercise, spec) for exercise, spec in specs.items()}
+
+
+def response_exercise(row: Dict) -> str:
+    """Rubric id of a saved answer row: the answer box key, e.g. "u2_S1_H1_routine_paragraph"."""
+    return f"u{row.get('unit', '')}_{row.get('session', '')}_{row.get('hour', '')}_{row.get('exercise_id', '')}"
+
+
+# --------------------------
+# Re-calificación por lotes (pool de procesos)
+# --------------------------
+
+_WORKER_RUBRICS: Dict[str, Rubric] = {}
+
+
+def _init_worker(specs: Dict[str, Dict]):
+    global _WORKER_RUBRICS
+    _WORKER_RUBRICS = compile_rubrics(specs)
+
+
+def _score_chunk(items: Sequence[Tuple[int, str, str]], rubrics: Optional[Dict[str, Rubric]] = None) -> List[Tuple]:
+    rubrics = _WORKER_RUBRICS if rubrics is None else rubrics
+    scored = []
+    for index, exercise, text in items:
+        rubric = rubrics.get(exercise)
+        if rubric is not None:
+            mark = rubric.check(text)
+            scored.append((index, mark.score, mark.met, mark.missed))
+    return scored
+
+
+def score_rows(
+    rows: Iterable[Dict],
+    specs: Dict[str, Dict],
+    *,
+    workers: int = 1,
+    chunk_rows: int = DEFAULT_CHUNK_ROWS,
+) -> Iterator[Dict]:
+    """
+    First-pass mark of every row that has a rubric (rows without one are
+    skipped), in input order. With workers > 1 chunks are scored in a
+    process pool ("spawn": safe inside a threaded server).
+    """
+    kept: Dict[int, Dict] = {}
+
+    def tagged(chunk: List[Dict], offset: int) -> List[Tuple[int, str, str]]:
+        items = []
+        for index, row in enumerate(chunk, offset):
+            exercise = response_exercise(row)
+            if exercise in specs:
+                kept[index] = {
+                    "timestamp": row.get("timestamp", ""),
+                    "user_email": row.get("user_email", ""),
+                    "user_name": row.get("user_name", ""),
+                    "exercise": exercise,
+                }
+                items.append((index, exercise, row.get("response") or ""))
+        return items
+
+    def emit(scored: List[Tuple]) -> Iterator[Dict]:
+        for index, score, met, missed in scored:
+            row = kept.pop(index)
+            row.update(score=round(score, 3), met="; ".join(met), missed="; ".join(missed))
+            yield row
+
+    chunks = iter_chunks(rows, chunk_rows)
+    if workers <= 1:
+        rubrics = compile_rubrics(specs)
+        offset = 0
+        for chunk in chunks:
+            yield from emit(_score_chunk(tagged(chunk, offset), rubrics))
+            offset += len(chunk)
+        return
+
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(specs,),
+    ) as pool:
+        # Como mucho 2 lotes por worker en vuelo: memoria acotada con CSVs grandes.
+        pending, offset = [], 0
+        for chunk in chunks:
+            pending.append(pool.submit(_score_chunk, tagged(chunk, offset)))
+            offset += len(chunk)
+            if len(pending) >= workers * 2:
+                yield from emit(pending.pop(0).result())
+        for future in pending:
+            yield from emit(future.result())
+
+
+def rescore_responses(
+    path: Path,
+    specs: Dict[str, Dict],
+    target: Path,
+    *,
+    workers: int = 1,
+    chunk_rows: int = DEFAULT_CHUNK_ROWS,
+) -> int:
+    """
+    Mark every saved answer in the CSV store and write MARK_FIELDS rows to
+    `target`. Stores smaller than POOL_MIN_BYTES are marked in this process.
+    Returns the row count.
+    """
+    path = Path(path)
+    if not path.exists() or path.stat().st_size < POOL_MIN_BYTES:
+        workers = 1
+    target = Path(target)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    # Un temporal por llamada: dos docentes recalificando a la vez no escriben el mismo archivo.
+    fd, tmp_name = tempfile.mkstemp(prefix=target.name + ".", suffix=".part", dir=target.parent)
+    tmp = Path(tmp_name)
+    count = 0
+    try:
+        with os.fdopen(fd, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=MARK_FIELDS)
+            writer.writeheader()
+            for row in score_rows(iter_response_rows(path), specs, workers=workers, chunk_rows=chunk_rows):
+                writer.writerow(row)
+                count += 1
+        tmp.replace(target)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    return count
@@ -0,0 +1,510 @@
+import atexit
+import functools
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+# Marca interna para distinguir "no está en caché" de un valor None guardado.
+_MISSING = object()
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+def _encode(value: Any) -> bytes:
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _decode(raw: bytes) -> Any:
+    return json.loads(raw.decode("utf-8") if isinstance(raw, (bytes, bytearray)) else raw)
+
+
+class _StatsBuffer:
+    """
+    Hit/miss/set counters per namespace, kept in memory and folded into the
+    backend's shared counters in one write instead of one write per lookup.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts: Dict[Tuple[str, str], int] = {}
+
+    def add(self, namespace: str, counter: str, amount: int = 1):
+        with self._lock:
+            key = (namespace, counter)
+            self._counts[key] = self._counts.get(key, 0) + amount
+
+    def drain(self) -> Dict[Tuple[str, str], int]:
+        with self._lock:
+            counts, self._counts = self._counts, {}
+        return counts
+
+
+class SharedCache:
+    """
+    Base class for cache backends. Values must be JSON-serialisable so every
+    backend (and every process) reads them back the same way.
+    Keys live inside a namespace ("pexels", "content", "tts"…) so one
+    namespace can be cleared or measured without touching the others.
+    """
+
+    backend = "base"
+
+    def get(self, namespace: str, key: str, default: Any = None) -> Any:
+        raise NotImplementedError
+
+    def set(self, namespace: str, key: str, value: Any, ttl: Optional[float] = None):
+        raise NotImplementedError
+
+    def delete(self, namespace: str, key: str):
+        raise NotImplementedError
+
+    def clear(self, namespace: Optional[str] = None):
+        raise NotImplementedError
+
+    def stats(self) -> List[Dict]:
+        """
+        One dict per namespace: hits, misses, sets, evictions, entries, bytes.
+        For shared backends the counters add up every process.
+        """
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class MemoryCache(SharedCache):
+    """
+    Per-process LRU with TTL. Useful for a single replica and for local runs;
+    it is not shared, so stats only cover this process.
+    """
+
+    backend = "memory"
+
+    def __init__(self, *, max_entries: int = 2048):
+        self.max_entries = max(1, int(max_entries))
+        self._lock = threading.Lock()
+        self._data: "OrderedDict[Tuple[str, str], Tuple[bytes, Optional[float]]]" = OrderedDict()
+        self._counts: Dict[str, Dict[str, int]] = {}
+
+    def _count(self, namespace: str, counter: str):
+        ns = self._counts.setdefault(namespace, {"hits": 0, "misses": 0, "sets": 0, "evictions": 0})
+        ns[counter] += 1
+
+    def get(self, namespace, key, default=None):
+        with self._lock:
+            item = self._data.get((namespace, key))
+            if item is not None and (item[1] is None or item[1] > time.time()):
+                self._data.move_to_end((namespace, key))
+                self._count(namespace, "hits")
+                return _decode(item[0])
+            if item is not None:
+                del self._data[(namespace, key)]
+            self._count(namespace, "misses")
+            return default
+
+    def set(self, namespace, key, value, ttl=None):
+        raw = _encode(value)
+        expires_at = time.time() + ttl if ttl else None
+        with self._lock:
+            self._data[(namespace, key)] = (raw, expires_at)
+            self._data.move_to_end((namespace, key))
+            self._count(namespace, "sets")
+            while len(self._data) > self.max_entries:
+                (old_ns, _), _ = self._data.popitem(last=False)
+                self._count(old_ns, "evictions")
+
+    def delete(self, namespace, key):
+        with self._lock:
+            self._data.pop((namespace, key), None)
+
+    def clear(self, namespace=None):
+        with self._lock:
+            if namespace is None:
+                self._data.clear()
+                return
+            for item_key in [k for k in self._data if k[0] == namespace]:
+                del self._data[item_key]
+
+    def stats(self):
+        with self._lock:
+            sizes: Dict[str, List[int]] = {}
+            for (ns, _), (raw, _) in self._data.items():
+                entry = sizes.setdefault(ns, [0, 0])
+                entry[0] += 1
+                entry[1] += len(raw)
+            names = sorted(set(self._counts) | set(sizes))
+            return [
+                {
+                    "namespace": ns,
+                    **self._counts.get(ns, {"hits": 0, "misses": 0, "sets": 0, "evictions": 0}),
+                    "entries": sizes.get(ns, [0, 0])[0],
+                    "bytes": sizes.get(ns, [0, 0])[1],
+                }
+                for ns in names
+            ]
+
+
+_SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache_entries (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    expires_at REAL,
+    accessed_at REAL NOT NULL,
+    PRIMARY KEY (namespace, key)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS cache_entries_accessed ON cache_entries (accessed_at);
+CREATE TABLE IF NOT EXISTS cache_stats (
+    namespace TEXT NOT NULL,
+    counter TEXT NOT NULL,
+    value INTEGER NOT NULL,
+    PRIMARY KEY (namespace, counter)
+) WITHOUT ROWID;
+"""
+
+
+class SQLiteCache(SharedCache):
+    """
+    Cache in one SQLite file (WAL) that every process on the same host
+    opens. Single host only: WAL needs shared memory between the processes,
+    so the file must not live on a network volume (NFS/SMB); several hosts
+    should use RedisCache. Expired rows are treated as misses and purged
+    during eviction. Every 32 writes the total size is checked and, past
+    `max_bytes`, the least recently used rows are deleted.
+
+    Lookups do not write: access times and hit/miss counters are buffered
+    and flushed together every `flush_interval` seconds (or on stats()).
+    """
+
+    backend = "sqlite"
+
+    def __init__(self, path: Path, *, max_bytes: int = DEFAULT_MAX_BYTES, flush_interval: float = 1.0):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = int(max_bytes)
+        self.flush_interval = float(flush_interval)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), timeout=10, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SQLITE_SCHEMA)
+        self._conn.commit()
+        self._stats = _StatsBuffer()
+        self._touched: Dict[Tuple[str, str], float] = {}
+        self._last_flush = time.monotonic()
+        self._sets_since_check = 0
+
+    def get(self, namespace, key, default=None):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM cache_entries WHERE namespace = ? AND key = ?",
+                (namespace, key),
+            ).fetchone()
+            if row is not None and (row[1] is None or row[1] > now):
+                self._touched[(namespace, key)] = now
+                hit = True
+            else:
+                hit = False
+        self._stats.add(namespace, "hits" if hit else "misses")
+        self._maybe_flush()
+        return _decode(row[0]) if hit else default
+
+    def set(self, namespace, key, value, ttl=None):
+        raw = _encode(value)
+        now = time.time()
+        expires_at = now + ttl if ttl else None
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO cache_entries (namespace, key, value, size, expires_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(namespace, key) DO UPDATE SET value = excluded.value, "
+                "size = excluded.size, expires_at = excluded.expires_at, accessed_at = excluded.accessed_at",
+                (namespace, key, raw, len(raw), expires_at, now),
+            )
+            self._sets_since_check += 1
+            check = self._sets_since_check >= 32
+            if check:
+                self._sets_since_check = 0
+        self._stats.add(namespace, "sets")
+        if check:
+            self.evict()
+        self._maybe_flush()
+
+    def delete(self, namespace, key):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM cache_entries WHERE namespace = ? AND key = ?", (namespace, key))
+
+    def clear(self, namespace=None):
+        with self._lock, self._conn:
+            if namespace is None:
+                self._conn.execute("DELETE FROM cache_entries")
+            else:
+                self._conn.execute("DELETE FROM cache_entries WHERE namespace = ?", (namespace,))
+
+    def evict(self) -> int:
+        """
+        Drop expired rows, then the least recently used ones until the cache
+        fits in `max_bytes`. Returns the number of rows removed.
+        """
+        removed: Dict[str, int] = {}
+        with self._lock, self._conn:
+            for ns, count in self._conn.execute(
+                "SELECT namespace, COUNT(*) FROM cache_entries WHERE expires_at <= ? GROUP BY namespace",
+                (time.time(),),
+            ).fetchall():
+                removed[ns] = removed.get(ns, 0) + count
+            self._conn.execute("DELETE FROM cache_entries WHERE expires_at <= ?", (time.time(),))
+            total = self._conn.execute("SELECT TOTAL(size) FROM cache_entries").fetchone()[0]
+            if total > self.max_bytes:
+                excess = total - self.max_bytes
+                victims = []
+                freed = 0
+                for ns, key, size in self._conn.execute(
+                    "SELECT namespace, key, size FROM cache_entries ORDER BY accessed_at"
+                ):
+                    victims.append((ns, key))
+                    removed[ns] = removed.get(ns, 0) + 1
+                    freed += size
+                    if freed >= excess:
+                        break
+                self._conn.executemany(
+                    "DELETE FROM cache_entries WHERE namespace = ? AND key = ?", victims
+                )
+        for ns, count in removed.items():
+            self._stats.add(ns, "evictions", count)
+        return sum(removed.values())
+
+    def _maybe_flush(self):
+        if time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        counts = self._stats.drain()
+        with self._lock:
+            touched, self._touched = self._touched, {}
+            self._last_flush = time.monotonic()
+            if not counts and not touched:
+                return
+            with self._conn:
+                self._conn.executemany(
+                    "UPDATE cache_entries SET accessed_at = MAX(accessed_at, ?) WHERE namespace = ? AND key = ?",
+                    [(ts, ns, key) for (ns, key), ts in touched.items()],
+                )
+                self._conn.executemany(
+                    "INSERT INTO cache_stats (namespace, counter, value) VALUES (?, ?, ?) "
+                    "ON CONFLICT(namespace, counter) DO UPDATE SET value = value + excluded.value",
+                    [(ns, counter, amount) for (ns, counter), amount in counts.items()],
+                )
+
+    def stats(self):
+        self.flush()
+        with self._lock:
+            counters: Dict[str, Dict[str, int]] = {}
+            for ns, counter, value in self._conn.execute("SELECT namespace, counter, value FROM cache_stats"):
+                counters.setdefault(ns, {})[counter] = value
+            sizes = {
+                ns: (entries, size)
+                for ns, entries, size in self._conn.execute(
+                    "SELECT namespace, COUNT(*), TOTAL(size) FROM cache_entries GROUP BY namespace"
+                )
+            }
+        return [
+            {
+                "namespace": ns,
+                "hits": counters.get(ns, {}).get("hits", 0),
+                "misses": counters.get(ns, {}).get("misses", 0),
+                "sets": counters.get(ns, {}).get("sets", 0),
+                "evictions": counters.get(ns, {}).get("evictions", 0),
+                "entries": sizes.get(ns, (0, 0))[0],
+                "bytes": int(sizes.get(ns, (0, 0))[1]),
+            }
+            for ns in sorted(set(counters) | set(sizes))
+        ]
+
+    def close(self):
+        try:
+            self.flush()
+        except sqlite3.Error:
+            pass
+        with self._lock:
+            self._conn.close()
+
+
+class RedisCache(SharedCache):
+    """
+    Redis (or any server speaking its protocol, e.g. KeyDB / Valkey).
+    TTL uses SET EX, size limits are the server's maxmemory + LRU policy,
+    and stats live in one hash per namespace so every replica adds to them.
+    """
+
+    backend = "redis"
+
+    def __init__(self, url: str, *, prefix: str = "a2em"):
+        try:
+            import redis
+        except ImportError as exc:
+            raise RuntimeError("The redis cache backend requires redis-py (pip install redis).") from exc
+        self._client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def _key(self, namespace: str, key: str) -> str:
+        return f"{self.prefix}:{namespace}:{key}"
+
+    def _count(self, namespace: str, counter: str):
+        self._client.hincrby(f"{self.prefix}:stats:{namespace}", counter, 1)
+
+    def get(self, namespace, key, default=None):
+        raw = self._client.get(self._key(namespace, key))
+        self._count(namespace, "hits" if raw is not None else "misses")
+        return _decode(raw) if raw is not None else default
+
+    def set(self, namespace, key, value, ttl=None):
+        self._client.set(self._key(namespace, key), _encode(value), ex=int(ttl) if ttl else None)
+        self._count(namespace, "sets")
+
+    def delete(self, namespace, key):
+        self._client.delete(self._key(namespace, key))
+
+    def clear(self, namespace=None):
+        pattern = f"{self.prefix}:{namespace}:*" if namespace else f"{self.prefix}:*"
+        for item_key in self._client.scan_iter(match=pattern, count=500):
+            if namespace is None or not item_key.decode().startswith(f"{self.prefix}:stats:"):
+                self._client.delete(item_key)
+
+    def stats(self):
+        rows = []
+        stats_prefix = f"{self.prefix}:stats:"
+        for stats_key in sorted(self._client.scan_iter(match=stats_prefix + "*", count=500)):
+            ns = stats_key.decode()[len(stats_prefix):]
+            counters = {k.decode(): int(v) for k, v in self._client.hgetall(stats_key).items()}
+            entries = sum(1 for _ in self._client.scan_iter(match=f"{self.prefix}:{ns}:*", count=500))
+            rows.append(
+                {
+                    "namespace": ns,
+                    "hits": counters.get("hits", 0),
+                    "misses": counters.get("misses", 0),
+                    "sets": counters.get("sets", 0),
+                    "evictions": 0,
+                    "entries": entries,
+                    "bytes": 0,
+                }
+            )
+        return rows
+
+    def close(self):
+        self._client.close()
+
+
+def open_shared_cache(url: str, *, max_bytes: int = DEFAULT_MAX_BYTES) -> SharedCache:
+    """
+    Backend from a URL:
+      memory://                      per-process LRU
+      sqlite:////abs/path/cache.db   shared file (processes on one host; local disk only)
+      redis://host:6379/0            Redis-protocol server
+    """
+    parsed = urlparse(url or "memory://")
+    if parsed.scheme == "memory":
+        return MemoryCache()
+    if parsed.scheme == "sqlite":
+        # Igual que SQLAlchemy: sqlite:///relativo.db y sqlite:////ruta/absoluta.db
+        path = url[len("sqlite://"):]
+        path = path[1:] if path.startswith("/") else path
+        return SQLiteCache(Path(path), max_bytes=max_bytes)
+    if parsed.scheme in {"redis", "rediss", "unix"}:
+        return RedisCache(url)
+    raise ValueError(f"Unsupported shared cache URL: {url}")
+
+
+_CACHES: Dict[str, SharedCache] = {}
+_CACHES_LOCK = threading.Lock()
+_DEFAULT = {"url": "memory://", "max_bytes": DEFAULT_MAX_BYTES}
+
+
+def configure_shared_cache(url: str, *, max_bytes: int = DEFAULT_MAX_BYTES):
+    """Choose the backend returned by get_shared_cache() when no URL is given."""
+    _DEFAULT["url"] = url or "memory://"
+    _DEFAULT["max_bytes"] = int(max_bytes)
+
+
+def get_shared_cache(url: Optional[str] = None) -> SharedCache:
+    """
+    Process-wide cache per URL.
+    """
+    url = url or _DEFAULT["url"]
+    with _CACHES_LOCK:
+        cache = _CACHES.get(url)
+        if cache is None:
+            cache = open_shared_cache(url, max_bytes=_DEFAULT["max_bytes"])
+            _CACHES[url] = cache
+        return cache
+
+
+def cache_get(namespace: str, key: str, default: Any = None) -> Any:
+    """
+    get_shared_cache().get() that treats any backend error (locked or
+    corrupt SQLite file, Redis down) as a miss, so callers fall back to a
+    direct load instead of failing the page.
+    """
+    try:
+        return get_shared_cache().get(namespace, key, default)
+    except Exception:
+        return default
+
+
+def cache_set(namespace: str, key: str, value: Any, ttl: Optional[float] = None) -> bool:
+    """get_shared_cache().set() that ignores backend errors. False if the value was not stored."""
+    try:
+        get_shared_cache().set(namespace, key, value, ttl=ttl)
+    except Exception:
+        return False
+    return True
+
+
+def cache_key(*args, **kwargs) -> str:
+    raw = json.dumps([args, sorted(kwargs.items())], default=str, ensure_ascii=False)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def shared_cached(namespace: str, *, ttl: Optional[float] = None, cache: Optional[Callable[[], SharedCache]] = None):
+    """
+    Decorator: memoise a function's JSON-serialisable result in the shared
+    cache. Exceptions are not cached, so a failed API call is retried on the
+    next request instead of being served to every replica. A cache that
+    cannot be read or written is skipped and the function is called directly.
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key = f"{func.__name__}:{cache_key(*args, **kwargs)}"
+            try:
+                store = cache() if cache is not None else get_shared_cache()
+                value = store.get(namespace, key, _MISSING)
+            except Exception:
+                store, value = None, _MISSING
+            if value is not _MISSING:
+                return value
+            value = func(*args, **kwargs)
+            if store is not None:
+                try:
+                    store.set(namespace, key, value, ttl=ttl)
+                except Exception:
+                    pass
+            return value
+
+        return wrapper
+
+    return decorator
+
+
+@atexit.register
+def _close_all_caches():
+    for cache in list(_CACHES.values()):
+        cache.close()
@@ -0,0 +1,346 @@
+"""
+Spaced-repetition vocabulary review (SM-2).
+
+    store = get_srs_store(Path("responses/srs.sqlite3"))
+    store.define_deck("u3c1", ["u3c1/apple", "u3c1/banana", ...])   # once per process
+    item = store.next_card("ana@mail.com", "u3c1")
+    store.review("ana@mail.com", item, GOOD)
+
+State is one small row per (student, item) that has been reviewed at least
+once: ease (per mille), interval (days), repetitions, lapses and the due
+day (date ordinal). Item keys are interned to integers, so the table is
+five integers and a student email per row.
+
+Per student and deck the store keeps, in memory:
+
+  - a heap of (due, seq, item) for cards already seen; next_card() peeks the
+    top and review() pushes the new due date, O(log n) each. Outdated heap
+    entries are skipped when they surface (lazy deletion by seq).
+  - a queue of cards never seen, in deck order, served when nothing is due.
+
+Reviews only update memory; a background thread upserts the pending rows
+in one transaction every `flush_interval` seconds (as the draft store
+does), so the write rate does not grow with the number of clicks.
+"""
+import atexit
+import datetime as dt
+import heapq
+import sqlite3
+import threading
+from collections import OrderedDict, deque
+from pathlib import Path
+from typing import Deque, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+AGAIN, HARD, GOOD, EASY = 1, 3, 4, 5
+MIN_EASE = 1300
+START_EASE = 2500
+
+
+class Card(NamedTuple):
+    ease: int = START_EASE  # factor SM-2 × 1000
+    interval: int = 0  # días
+    reps: int = 0
+    lapses: int = 0
+    due: int = 0  # date.toordinal()
+
+
+def schedule(card: Card, grade: int, today: int) -> Card:
+    """
+    SM-2 with grades 0–5. Below 3 the card starts over (repetitions back
+    to 0) and is due again tomorrow.
+    """
+    grade = max(0, min(5, int(grade)))
+    miss = 5 - grade
+    ease = max(MIN_EASE, card.ease + 100 - miss * (80 + miss * 20))
+    if grade < 3:
+        return Card(ease, 1, 0, card.lapses + 1, today + 1)
+    if card.reps == 0:
+        interval = 1
+    elif card.reps == 1:
+        interval = 6
+    else:
+        interval = max(card.interval + 1, round(card.interval * ease / 1000))
+    return Card(ease, interval, card.reps + 1, card.lapses, today + interval)
+
+
+def today_ordinal() -> int:
+    return dt.date.today().toordinal()
+
+
+class _DeckDef(NamedTuple):
+    items: Tuple[int, ...]
+    members: frozenset
+
+
+class _Deck:
+    __slots__ = ("items", "heap", "new")
+
+    def __init__(self, items: Tuple[int, ...], heap: list, new: Deque[int]):
+        self.items = items
+        self.heap = heap
+        self.new = new
+
+
+class _Student:
+    __slots__ = ("cards", "seq", "decks")
+
+    def __init__(self, cards: Dict[int, Card]):
+        self.cards = cards
+        self.seq: Dict[int, int] = {}
+        self.decks: Dict[str, _Deck] = {}
+
+
+class SRSStore:
+    def __init__(self, path: Path, *, flush_interval: float = 3.0, max_students: int = 5000):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.flush_interval = max(0.05, float(flush_interval))
+        self.max_students = max(1, int(max_students))
+        self.reviews = 0
+        self.flushes = 0
+        self.rows_written = 0
+        self._students: "OrderedDict[str, _Student]" = OrderedDict()
+        self._item_ids: Dict[str, int] = {}
+        self._item_keys: Dict[int, str] = {}
+        self._decks: Dict[str, _DeckDef] = {}
+        self._pending: Dict[Tuple[str, int], Card] = {}
+        self._flushing: Dict[Tuple[str, int], Card] = {}
+        self._seq = 0
+        self._lock = threading.RLock()
+        self._db_lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS srs_items (id INTEGER PRIMARY KEY, key TEXT NOT NULL UNIQUE)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS srs_cards ("
+            " student TEXT NOT NULL,"
+            " item INTEGER NOT NULL,"
+            " ease INTEGER NOT NULL,"
+            " interval INTEGER NOT NULL,"
+            " reps INTEGER NOT NULL,"
+            " lapses INTEGER NOT NULL,"
+            " due INTEGER NOT NULL,"
+            " PRIMARY KEY (student, item)"
+            ") WITHOUT ROWID"
+        )
+        self._conn.commit()
+        for item_id, key in self._conn.execute("SELECT id, key FROM srs_items"):
+            self._item_ids[key] = item_id
+            self._item_keys[item_id] = key
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="srs-flush", daemon=True)
+        self._thread.start()
+
+    # --------------------------
+    # Estado en memoria
+    # --------------------------
+
+    def _intern(self, keys: Sequence[str]) -> Tuple[int, ...]:
+        missing = [key for key in dict.fromkeys(keys) if key not in self._item_ids]
+        if missing:
+            with self._db_lock:
+                with self._conn:
+                    self._conn.executemany("INSERT OR IGNORE INTO srs_items (key) VALUES (?)", [(k,) for k in missing])
+                    marks = ",".join("?" * len(missing))
+                    rows = self._conn.execute(f"SELECT id, key FROM srs_items WHERE key IN ({marks})", missing).fetchall()
+            for item_id, key in rows:
+                self._item_ids[key] = item_id
+                self._item_keys[item_id] = key
+        return tuple(self._item_ids[key] for key in keys)
+
+    def _student(self, student: str) -> _Student:
+        state = self._students.get(student)
+        if state is not None:
+            self._students.move_to_end(student)
+            return state
+        with self._db_lock:
+            rows = self._conn.execute(
+                "SELECT item, ease, interval, reps, lapses, due FROM srs_cards WHERE student = ?",
+                (student,),
+            ).fetchall()
+        cards = {row[0]: Card(*row[1:]) for row in rows}
+        # Lo que aún no llegó a disco manda sobre la fila guardada.
+        for batch in (self._flushing, self._pending):
+            cards.update({item: card for (owner, item), card in batch.items() if owner == student})
+        state = _Student(cards)
+        self._students[student] = state
+        while len(self._students) > self.max_students:
+            self._students.popitem(last=False)
+        return state
+
+    def _deck(self, state: _Student, deck: str) -> _Deck:
+        try:
+            items = self._decks[deck].items
+        except KeyError:
+            raise KeyError(f"Unknown SRS deck: {deck}") from None
+        current = state.decks.get(deck)
+        if current is not None and current.items is items:
+            return current
+        heap, new = [], deque()
+        for item in items:
+            card = state.cards.get(item)
+            if card is None:
+                new.append(item)
+            else:
+                heap.append((card.due, state.seq.get(item, 0), item))
+        heapq.heapify(heap)
+        current = _Deck(items, heap, new)
+        state.decks[deck] = current
+        return current
+
+    @staticmethod
+    def _top(state: _Student, deck: _Deck) -> Optional[Tuple[int, int, int]]:
+        """Valid heap top; stale entries (card reviewed since) are dropped on the way."""
+        heap = deck.heap
+        while heap:
+            due, seq, item = heap[0]
+            card = state.cards.get(item)
+            if card is not None and card.due == due and state.seq.get(item, 0) == seq:
+                return heap[0]
+            heapq.heappop(heap)
+        return None
+
+    # --------------------------
+    # API
+    # --------------------------
+
+    def define_deck(self, deck: str, keys: Sequence[str]):
+        """
+        Register (or replace) the ordered item keys of a deck. Students keep
+        their card state; their queues for this deck are rebuilt on next use.
+        """
+        with self._lock:
+            items = self._intern(list(keys))
+            current = self._decks.get(deck)
+            if current is None or current.items != items:
+                self._decks[deck] = _DeckDef(items, frozenset(items))
+
+    def decks(self) -> Dict[str, List[str]]:
+        with self._lock:
+            return {deck: [self._item_keys[item] for item in d.items] for deck, d in self._decks.items()}
+
+    def next_card(self, student: str, deck: str, today: Optional[int] = None) -> Optional[str]:
+        """
+        Key of the card to show now: the most overdue card of the deck,
+        else the first card never seen, else None (nothing due today).
+        """
+        today = today_ordinal() if today is None else today
+        with self._lock:
+            state = self._student(student)
+            current = self._deck(state, deck)
+            top = self._top(state, current)
+            if top is not None and top[0] <= today:
+                return self._item_keys[top[2]]
+            while current.new:
+                item = current.new[0]
+                if item not in state.cards:
+                    return self._item_keys[item]
+                current.new.popleft()
+            return None
+
+    def review(self, student: str, key: str, grade: int, today: Optional[int] = None) -> Card:
+        """Apply a grade (AGAIN / HARD / GOOD / EASY) and queue the new state for the next flush."""
+        today = today_ordinal() if today is None else today
+        with self._lock:
+            item = self._intern([key])[0]
+            state = self._student(student)
+            card = schedule(state.cards.get(item, Card()), grade, today)
+            state.cards[item] = card
+            self._seq += 1
+            state.seq[item] = self._seq
+            for name, current in state.decks.items():
+                definition = self._decks.get(name)
+                if definition is not None and current.items is definition.items and item in definition.members:
+                    heapq.heappush(current.heap, (card.due, self._seq, item))
+            self._pending[(student, item)] = card
+            self.reviews += 1
+            return card
+
+    def card(self, student: str, key: str) -> Optional[Card]:
+        with self._lock:
+            item = self._item_ids.get(key)
+            return None if item is None else self._student(student).cards.get(item)
+
+    def deck_stats(self, student: str, deck: str, today: Optional[int] = None) -> Dict[str, object]:
+        """Counts for the trainer header: due now, never seen, learned (interval ≥ 21 days), next due day."""
+        today = today_ordinal() if today is None else today
+        with self._lock:
+            state = self._student(student)
+            current = self._deck(state, deck)
+            seen = [state.cards[item] for item in current.items if item in state.cards]
+        return {
+            "total": len(current.items),
+            "due": sum(1 for card in seen if card.due <= today),
+            "new": len(current.items) - len(seen),
+            "learned": sum(1 for card in seen if card.interval >= 21),
+            "next_due": min((card.due for card in seen if card.due > today), default=None),
+        }
+
+    # --------------------------
+    # Persistencia
+    # --------------------------
+
+    def flush(self) -> int:
+        with self._lock:
+            batch, self._pending = self._pending, {}
+            self._flushing = batch
+        if not batch:
+            return 0
+        rows = [(student, item, *card) for (student, item), card in batch.items()]
+        try:
+            with self._db_lock:
+                with self._conn:
+                    self._conn.executemany(
+                        "INSERT INTO srs_cards (student, item, ease, interval, reps, lapses, due) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?) "
+                        "ON CONFLICT(student, item) DO UPDATE SET "
+                        "ease = excluded.ease, interval = excluded.interval, reps = excluded.reps, "
+                        "lapses = excluded.lapses, due = excluded.due",
+                        rows,
+                    )
+        except sqlite3.Error:
+            with self._lock:
+                for key, value in batch.items():
+                    self._pending.setdefault(key, value)
+                self._flushing = {}
+            raise
+        with self._lock:
+            self._flushing = {}
+        self.flushes += 1
+        self.rows_written += len(rows)
+        return len(rows)
+
+    def close(self):
+        self._stop.set()
+        self._thread.join(timeout=2.0)
+        self.flush()
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except sqlite3.Error:
+                # Se reintenta en el siguiente ciclo; los repasos siguen en memoria.
+                continue
+
+
+_STORES: Dict[Path, SRSStore] = {}
+_STORES_LOCK = threading.Lock()
+
+
+def get_srs_store(path: Path, **kwargs) -> SRSStore:
+    """Process-wide SRS store per SQLite file, shared by every Streamlit session."""
+    key = Path(path).resolve()
+    with _STORES_LOCK:
+        store = _STORES.get(key)
+        if store is None:
+            store = SRSStore(key, **kwargs)
+            _STORES[key] = store
+        return store
+
+
+@atexit.register
+def _close_all_stores():
+    for store in list(_STORES.values()):
+        store.close()
@@ -0,0 +1,467 @@
+"""
+Static export of the read-only course pages.
+
+    python -m helpers.static_site --out site --app-url https://a2.example.com
+
+Overview, Levels, Assessment, Instructor and the theory / practice /
+insights of every lesson in LESSONS become plain HTML that shares the app's
+stylesheet (GLOBAL_CSS), so a web server or CDN can serve anonymous visitors
+without opening a Streamlit session. The content comes from app.py's
+literals (like benchmarks.page_budgets), without running the app.
+
+  assets/    CSS and images named by content hash (app.3f9c1d2e7a.css):
+             serve with "Cache-Control: public, max-age=31536000, immutable"
+  *.html     stable URLs, short cache; interactive parts (exercises, audio,
+             access) link into the live app with ?page=…&unit=…&lesson=…
+  .gz / .br  precompressed copy next to every text file (brotli only when
+             the `brotli` package is installed)
+"""
+import argparse
+import ast
+import gzip
+import hashlib
+import html
+import json
+import re
+import shutil
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional
+from urllib.parse import urlencode
+
+APP_PATH = Path(__file__).resolve().parent.parent / "app.py"
+TEXT_SUFFIXES = {".html", ".css", ".svg", ".json", ".txt", ".xml"}
+# Por debajo de esto la versión comprimida casi no ahorra nada.
+MIN_COMPRESS_BYTES = 256
+
+# Lo que en la app pone Streamlit (layout, tablas, avisos) y GLOBAL_CSS no trae.
+STATIC_CSS = """
+body { margin: 0; font-family: "Source Sans Pro", system-ui, -apple-system, "Segoe UI", sans-serif; line-height: 1.55; }
+.static-main { max-width: 920px; margin: 0 auto; padding: 1.2rem 1rem 3rem; }
+.static-nav { display: flex; flex-wrap: wrap; gap: 0.4rem; align-items: center; padding: 0.6rem 1rem;
+  background: var(--flx-primary); }
+.static-nav a { color: #fff; text-decoration: none; padding: 0.3rem 0.7rem; border-radius: 999px; font-weight: 600; }
+.static-nav a[aria-current="page"] { background: rgba(255, 255, 255, 0.2); }
+.static-nav .static-nav__app { margin-left: auto; background: #fff; color: var(--flx-primary); }
+.static-logo { width: 220px; height: auto; }
+.static-table { border-collapse: collapse; width: 100%; margin: 0.6rem 0 1.2rem; }
+.static-table th, .static-table td { border: 1px solid rgba(15, 23, 42, 0.12); padding: 0.45rem 0.7rem; text-align: left; vertical-align: top; }
+.static-table th { background: rgba(31, 75, 153, 0.08); }
+.static-callout { padding: 0.8rem 1rem; border-radius: 0.6rem; margin: 0.8rem 0; }
+.static-callout--info { background: rgba(28, 131, 225, 0.1); }
+.static-callout--success { background: rgba(33, 195, 84, 0.12); }
+.static-live { display: inline-block; margin-top: 0.4rem; }
+.static-lessons { columns: 2 18rem; }
+.static-footer { color: #64748b; font-size: 0.85rem; margin-top: 2.5rem; }
+details { margin: 1rem 0; }
+summary { cursor: pointer; font-weight: 600; }
+"""
+
+NAV = [
+    ("index.html", "🏠 Overview"),
+    ("levels.html", "📊 Levels"),
+    ("lessons/index.html", "🎓 Lessons"),
+    ("assessment.html", "📝 Assessment"),
+    ("instructor.html", "👨‍🏫 Instructor"),
+]
+
+
+def app_literals(app_path: Path, *names: str) -> Dict[str, object]:
+    """Module-level literals of app.py by name, without running the app."""
+    tree = ast.parse(Path(app_path).read_text(encoding="utf-8"))
+    found = {}
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and isinstance(node.targets[0], ast.Name):
+            name = node.targets[0].id
+            if name in names:
+                found[name] = ast.literal_eval(node.value)
+    missing = [name for name in names if name not in found]
+    if missing:
+        raise ValueError(f"app.py has no literal {', '.join(missing)}")
+    return found
+
+
+# ==========================
+# Markdown (the subset the pages use)
+# ==========================
+
+_INLINE = [
+    (re.compile(r"`([^`]+)`"), r"<code>\1</code>"),
+    (re.compile(r"\*\*(.+?)\*\*"), r"<strong>\1</strong>"),
+    (re.compile(r"(?<![\w*])\*(?!\s)(.+?)(?<!\s)\*(?![\w*])"), r"<em>\1</em>"),
+    (re.compile(r"\[([^\]]+)\]\(([^)\s]+)\)"), r'<a href="\2">\1</a>'),
+]
+
+
+def _inline(text: str) -> str:
+    text = html.escape(text, quote=False)
+    for pattern, repl in _INLINE:
+        text = pattern.sub(repl, text)
+    return text
+
+
+def _lines_html(lines: List[str]) -> str:
+    # Dos espacios al final = salto de línea, como en Streamlit.
+    return "".join(
+        _inline(line.strip()) + ("<br>" if line.endswith("  ") and i < len(lines) - 1 else "\n")
+        for i, line in enumerate(lines)
+    ).strip()
+
+
+def markdown_to_html(text: str) -> str:
+    """Headings, bullet lists, rules, paragraphs, bold/italic/code/links."""
+    out: List[str] = []
+    paragraph: List[str] = []
+    items: List[str] = []
+
+    def flush():
+        if paragraph:
+            out.append(f"<p>{_lines_html(paragraph)}</p>")
+            paragraph.clear()
+        if items:
+            out.append("<ul>" + "".join(f"<li>{_inline(item)}</li>" for item in items) + "</ul>")
+            items.clear()
+
+    for raw in (text or "").splitlines():
+        line = raw.strip()
+        heading = re.match(r"^(#{1,6})\s+(.*)$", line)
+        if not line:
+            flush()
+        elif heading:
+            flush()
+            level = len(heading.group(1))
+            out.append(f"<h{level}>{_inline(heading.group(2))}</h{level}>")
+        elif line in ("---", "***"):
+            flush()
+            out.append("<hr>")
+        elif re.match(r"^[-*]\s+", line):
+            if paragraph:
+                flush()
+            items.append(re.sub(r"^[-*]\s+", "", line))
+        elif items:
+            items[-1] += " " + line  # continuación del punto anterior
+        else:
+            paragraph.append(raw.rstrip("\n") if raw.endswith("  ") else line)
+    flush()
+    return "\n".join(out)
+
+
+# ==========================
+# Site
+# ==========================
+
+def _slug(text: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "-", text.lower()).strip("-")
+
+
+def _table(columns: List[str], rows: List[List[object]]) -> str:
+    head = "".join(f"<th>{html.escape(str(c))}</th>" for c in columns)
+    body = "".join(
+        "<tr>" + "".join(f"<td>{html.escape(str(cell))}</td>" for cell in row) + "</tr>" for row in rows
+    )
+    return f"<table class='static-table'><thead><tr>{head}</tr></thead><tbody>{body}</tbody></table>"
+
+
+def _callout(kind: str, markdown: str) -> str:
+    return f"<div class='static-callout static-callout--{kind}'>{markdown_to_html(markdown)}</div>"
+
+
+def _downscaled_png(data: bytes, max_width: int) -> bytes:
+    """Same idea as get_logo_data_uri(): ship the size the page shows, not the original."""
+    try:
+        from io import BytesIO
+
+        from PIL import Image
+
+        with Image.open(BytesIO(data)) as img:
+            img.thumbnail((max_width, max_width))
+            buffer = BytesIO()
+            img.save(buffer, format="PNG", optimize=True)
+        return buffer.getvalue()
+    except Exception:
+        return data  # sin Pillow (o imagen rara) se publica el archivo original
+
+
+class _SiteWriter:
+    def __init__(self, root: Path, app_url: str):
+        self.root = root
+        self.app_url = app_url.rstrip("/")
+        self.assets: Dict[str, str] = {}
+
+    def asset(self, logical_name: str, data: bytes) -> str:
+        """Write assets/<stem>.<hash><suffix> and return its path relative to the site root."""
+        stem, dot, suffix = logical_name.rpartition(".")
+        digest = hashlib.sha256(data).hexdigest()[:10]
+        rel = f"assets/{stem}.{digest}{dot}{suffix}"
+        target = self.root / rel
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_bytes(data)
+        self.assets[logical_name] = rel
+        return rel
+
+    def app_link(self, page: str, **params) -> str:
+        query = urlencode({"page": page, **{k: v for k, v in params.items() if v is not None}})
+        return f"{self.app_url}/?{query}"
+
+    def page(self, rel_path: str, title: str, body: str, *, description: str = ""):
+        prefix = "../" * rel_path.count("/")
+        current = ' aria-current="page"'
+        nav = "".join(
+            f"<a href='{prefix}{href}'{current if href == rel_path else ''}>{label}</a>" for href, label in NAV
+        )
+        document = f"""<!doctype html>
+<html lang="en">
+<head>
+<meta charset="utf-8">
+<meta name="viewport" content="width=device-width, initial-scale=1">
+<title>{html.escape(title)} · A2 English Master</title>
+<meta name="description" content="{html.escape(description or title)}">
+<link rel="stylesheet" href="{prefix}{self.assets['app.css']}">
+</head>
+<body>
+<nav class="static-nav">{nav}<a class="static-nav__app" href="{html.escape(self.app_url)}/">Open the app ↗</a></nav>
+<main class="static-main">
+{body}
+<p class="static-footer">Flunex · A2 English Master. Exercises, audio and progress tracking are in the
+<a href="{html.escape(self.app_url)}/">live app</a>.</p>
+</main>
+</body>
+</html>
+"""
+        target = self.root / rel_path
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_text(document, encoding="utf-8")
+
+
+def _logo_img(site: _SiteWriter, prefix: str = "") -> str:
+    rel = site.assets.get("logo.png")
+    return f"<img class='static-logo' src='{prefix}{rel}' alt='Flunex logo'>" if rel else ""
+
+
+def _overview(site: _SiteWriter, lit: Dict) -> str:
+    info = lit["COURSE_INFO"]
+    logo = site.assets.get("logo.png")
+    logo_html = f'<img src="{logo}" alt="Flunex logo" />' if logo else "<div class='flx-level-pill'>Flunex</div>"
+    facts = [
+        ["Level", info["level"]],
+        ["Total units", info["units"]],
+        ["Suggested total hours", info["total_hours"]],
+        ["Hours per unit (average)", info["hours_per_unit"]],
+    ]
+    # Mismo marcado que render_app_shell(), con enlaces en lugar de formularios.
+    return f"""
+<div class="flx-shell" style="background-image: linear-gradient(125deg, rgba(15,23,42,0.78), rgba(31,75,153,0.6));">
+  <div class="flx-shell__header">
+    <div class="flx-brand">
+      {logo_html}
+      <div>
+        <div class="flx-brand__title">Flunex · A2 English Master</div>
+        <div class="flx-brand__subtitle">Learn, teach and track progress with confidence</div>
+      </div>
+    </div>
+    <div class="flx-level-pill">A2 · Elementary</div>
+  </div>
+  <div class="flx-shell__card">
+    <div class="flx-shell__eyebrow">Welcome</div>
+    <div class="flx-shell__headline">Communicate clearly in real situations</div>
+    <p class="flx-shell__copy">
+      Practical lessons, structured progress and bilingual guidance for tourism, work and everyday life.
+      Choose your path below.
+    </p>
+    <div class="flx-shell__actions">
+      <a class="flx-cta flx-cta--primary" href="{html.escape(site.app_link('Access'))}">I am a student</a>
+      <a class="flx-cta flx-cta--ghost" href="{html.escape(site.app_link('Content Admin'))}">I am a teacher / admin</a>
+    </div>
+  </div>
+</div>
+<h3>Course snapshot</h3>
+{lit["OVERVIEW_CARDS_HTML"]}
+<h3>What you gain</h3>
+{markdown_to_html(lit["OVERVIEW_GAINS_MD"])}
+<div class='flx-note'>{lit["OVERVIEW_NOTE"]}</div>
+<h4>Quick course facts</h4>
+{_table(["Item", "Details"], facts)}
+<h3>🚀 Ready to start?</h3>
+<p><a class="flx-cta flx-cta--primary" href="{html.escape(site.app_link('Enter your class'))}">Start your first class</a></p>
+<details><summary>View Spanish summary / Ver resumen en español</summary>
+{markdown_to_html(lit["OVERVIEW_SUMMARY_ES"])}
+</details>
+"""
+
+
+def _lesson_body(site: _SiteWriter, lit: Dict, unit: Dict, lesson: Dict, interactive: bool) -> str:
+    link = html.escape(site.app_link("Enter your class", unit=unit["number"], lesson=lesson["title"]))
+    if interactive:
+        live = _callout(
+            "info",
+            "This class also has interactive exercises, audio and saved answers in the app.",
+        ) + f"<a class='flx-cta flx-cta--primary static-live' href='{link}'>Open the interactive class ↗</a>"
+    else:
+        live = f"<p><a class='static-live' href='{link}'>Open this class in the app ↗</a></p>"
+
+    def bullets(items):
+        return "<ul>" + "".join(f"<li>{_inline(item)}</li>" for item in items) + "</ul>"
+
+    return f"""
+{_logo_img(site, "../")}
+<h2>{html.escape(lesson["title"])}</h2>
+<p class="static-footer">Unit {unit["number"]} – {html.escape(unit["name"])}</p>
+<h3>📘 Key theory</h3>
+{bullets(lesson.get("theory", []))}
+<h3>📝 Suggested activities</h3>
+{bullets(lesson.get("practice", []))}
+{_callout("info", lit["LESSON_PRACTICE_TIP"])}
+<h3>💡 Teaching &amp; learning insights</h3>
+{bullets(lesson.get("insights", []))}
+{_callout("success", lit["LESSON_INSIGHTS_TIP"])}
+{live}
+"""
+
+
+def precompress(root: Path, *, min_bytes: int = MIN_COMPRESS_BYTES) -> Dict[str, int]:
+    """
+    Write file.gz (and file.br when `brotli` is importable) next to every
+    text file, only when smaller than the original. Deterministic output
+    (gzip mtime 0) so unchanged files do not churn CDN caches.
+    """
+    try:
+        import brotli
+    except ImportError:
+        brotli = None
+    totals = {"files": 0, "raw": 0, "gzip": 0, "brotli": 0}
+    for path in sorted(p for p in root.rglob("*") if p.is_file() and p.suffix in TEXT_SUFFIXES):
+        data = path.read_bytes()
+        if len(data) < min_bytes:
+            continue
+        totals["files"] += 1
+        totals["raw"] += len(data)
+        packed = gzip.compress(data, compresslevel=9, mtime=0)
+        if len(packed) < len(data):
+            path.with_name(path.name + ".gz").write_bytes(packed)
+        totals["gzip"] += min(len(packed), len(data))
+        if brotli is not None:
+            packed = brotli.compress(data, quality=11)
+            if len(packed) < len(data):
+                path.with_name(path.name + ".br").write_bytes(packed)
+            totals["brotli"] += min(len(packed), len(data))
+    if brotli is None:
+        totals["brotli"] = None
+    return totals
+
+
+def build_site(out_dir: Path, app_url: str, *, app_path: Path = APP_PATH, compress: bool = True) -> Dict:
+    """
+    Build the whole site into out_dir (replaced atomically: it is written to
+    a sibling .part directory first). Returns page/asset counts and sizes.
+    """
+    app_path = Path(app_path)
+    lit = app_literals(
+        app_path,
+        "GLOBAL_CSS", "COURSE_INFO", "UNITS", "LESSONS", "INTERACTIVE_CLASS_CONTENT",
+        "OVERVIEW_CARDS_HTML", "OVERVIEW_GAINS_MD", "OVERVIEW_NOTE", "OVERVIEW_SUMMARY_ES",
+        "CEFR_LEVELS", "COURSE_LEVEL_FIT_MD", "ASSESSMENT_STRUCTURE_MD", "ASSESSMENT_WEIGHTS",
+        "INSTRUCTOR_BIO_MD", "LESSON_PRACTICE_TIP", "LESSON_INSIGHTS_TIP",
+    )
+    out_dir = Path(out_dir)
+    work = out_dir.with_name(out_dir.name + ".part")
+    shutil.rmtree(work, ignore_errors=True)
+    work.mkdir(parents=True)
+    site = _SiteWriter(work, app_url)
+
+    site.asset("app.css", (lit["GLOBAL_CSS"].strip() + "\n" + STATIC_CSS.strip() + "\n").encode("utf-8"))
+    assets_dir = app_path.parent / "assets"
+    for logical, source in (("logo.png", "logo-english-classes.png"), ("signature.png", "firma-ivan-diaz.png")):
+        path = assets_dir / source
+        if path.exists() and path.stat().st_size:
+            site.asset(logical, _downscaled_png(path.read_bytes(), 440))
+
+    site.page("index.html", "Overview", _overview(site, lit), description=lit["COURSE_INFO"]["description"])
+    site.page(
+        "levels.html",
+        "English Levels (CEFR)",
+        f"""{_logo_img(site)}<h1>🎯 English Levels (CEFR)</h1>
+{_table(["Level", "Name", "Description"], lit["CEFR_LEVELS"])}
+<hr><h3>🟦 Where does this course fit?</h3>
+{_callout("success", lit["COURSE_LEVEL_FIT_MD"])}""",
+    )
+    site.page(
+        "assessment.html",
+        "Assessment & Progress",
+        f"""{_logo_img(site)}<h1>📝 Assessment &amp; Progress</h1>
+<h3>Assessment structure</h3>
+{markdown_to_html(lit["ASSESSMENT_STRUCTURE_MD"])}
+<h3>Suggested weighting</h3>
+{_table(["Component", "Weight"], lit["ASSESSMENT_WEIGHTS"])}""",
+    )
+    signature = site.assets.get("signature.png")
+    site.page(
+        "instructor.html",
+        "Instructor",
+        f"""{_logo_img(site)}<h1>👨‍🏫 Instructor</h1>
+{markdown_to_html(lit["INSTRUCTOR_BIO_MD"])}
+<h3>Signature</h3>
+{f"<img class='static-logo' src='{signature}' alt='Signature'>" if signature else ""}""",
+    )
+
+    interactive = set(lit["INTERACTIVE_CLASS_CONTENT"])
+    index_parts = [_logo_img(site, "../"), "<h1>📖 Lessons</h1>"]
+    lesson_count = 0
+    for unit in lit["UNITS"]:
+        lessons = lit["LESSONS"].get(unit["number"], [])
+        if not lessons:
+            continue
+        links = []
+        for lesson in lessons:
+            rel = f"lessons/unit-{unit['number']}-{_slug(lesson['title'])}.html"
+            site.page(
+                rel,
+                f"Unit {unit['number']} · {lesson['title']}",
+                _lesson_body(site, lit, unit, lesson, (unit["number"], lesson["title"]) in interactive),
+            )
+            lesson_count += 1
+            links.append(f"<li><a href='{rel.split('/', 1)[1]}'>{html.escape(lesson['title'])}</a></li>")
+        index_parts.append(
+            f"<h3>Unit {unit['number']} – {html.escape(unit['name'])}</h3>"
+            f"<p>{html.escape(unit.get('focus', ''))}</p><ul>{''.join(links)}</ul>"
+        )
+    site.page("lessons/index.html", "Lessons", "\n".join(index_parts))
+
+    (work / "asset-manifest.json").write_text(json.dumps(site.assets, indent=2, sort_keys=True), encoding="utf-8")
+    compression = precompress(work) if compress else None
+
+    if out_dir.exists():
+        shutil.rmtree(out_dir)
+    work.rename(out_dir)
+    return {
+        "pages": 5 + lesson_count,
+        "lessons": lesson_count,
+        "assets": dict(site.assets),
+        "compression": compression,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Export the read-only course pages as a static site (for a plain web server or CDN).",
+    )
+    parser.add_argument("--out", default="site", help="Output directory (replaced).")
+    parser.add_argument(
+        "--app-url",
+        default="http://localhost:8501",
+        help="Public URL of the live Streamlit app, for links to interactive pages.",
+    )
+    parser.add_argument("--no-compress", action="store_true", help="Skip the .gz / .br copies.")
+    args = parser.parse_args(argv)
+
+    summary = build_site(Path(args.out), args.app_url, compress=not args.no_compress)
+    print(f"Wrote {summary['pages']} pages ({summary['lessons']} lessons) to {args.out}/", file=sys.stderr)
+    stats = summary["compression"]
+    if stats and stats["raw"]:
+        line = f"{stats['files']} text files: {stats['raw'] / 1024:.0f} KiB, gzip {stats['gzip'] / 1024:.0f} KiB"
+        line += f", brotli {stats['brotli'] / 1024:.0f} KiB" if stats["brotli"] is not None else " (pip install brotli for .br)"
+        print(line, file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,389 @@
+"""
+Lightweight tracing: nested timing spans exported to a JSONL file or to an
+OTLP/HTTP (JSON) collector.
+
+    with span("pexels.search", query=query):
+        ...
+
+    @traced("content.load")
+    def load_structured_content(...): ...
+
+While tracing is off (the default) `span()` returns a shared no-op object
+and `@traced` adds one global lookup per call, so the instrumentation can
+stay on the hot paths.
+"""
+import argparse
+import atexit
+import contextvars
+import functools
+import json
+import queue
+import random
+import sys
+import threading
+import time
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List, Optional
+
+_current_span: contextvars.ContextVar = contextvars.ContextVar("a2em_current_span", default=None)
+_trace_attrs: contextvars.ContextVar = contextvars.ContextVar("a2em_trace_attrs", default={})
+_exporter = None
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+
+_NOOP = _NoopSpan()
+
+
+class Span:
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "attrs", "start_ns", "end_ns", "error", "_token")
+
+    def __init__(self, name: str, attrs: Dict):
+        parent = _current_span.get()
+        self.name = name
+        self.trace_id = parent.trace_id if parent else f"{random.getrandbits(128):032x}"
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent.span_id if parent else None
+        self.attrs = {**_trace_attrs.get(), **attrs}
+        self.start_ns = 0
+        self.end_ns = 0
+        self.error = None
+        self._token = None
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        self._token = _current_span.set(self)
+        self.start_ns = time.time_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.end_ns = time.time_ns()
+        _current_span.reset(self._token)
+        if exc_type is not None:
+            self.error = f"{exc_type.__name__}: {exc}"
+        exporter = _exporter
+        if exporter is not None:
+            exporter.submit(self)
+        return False
+
+    def to_dict(self) -> Dict:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_ns": self.start_ns,
+            "duration_ms": round((self.end_ns - self.start_ns) / 1e6, 3),
+            "attrs": self.attrs,
+            "error": self.error,
+        }
+
+
+def span(name: str, **attrs):
+    """Timing span; nested spans share the trace and point to their parent."""
+    if _exporter is None:
+        return _NOOP
+    return Span(name, attrs)
+
+
+def traced(name: Optional[str] = None, **attrs):
+    """Decorator version of span(); the span name defaults to the function name."""
+
+    def decorator(func):
+        span_name = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _exporter is None:
+                return func(*args, **kwargs)
+            with Span(span_name, attrs):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def set_trace_context(**attrs):
+    """Attributes (session, page…) added to every span started in this context."""
+    _trace_attrs.set({**_trace_attrs.get(), **{k: v for k, v in attrs.items() if v is not None}})
+
+
+def tracing_enabled() -> bool:
+    return _exporter is not None
+
+
+class _BatchExporter:
+    """
+    Finished spans go into a queue; a daemon thread writes them in batches
+    every `interval` seconds, so exporting never blocks a page render.
+    """
+
+    def __init__(self, *, interval: float = 1.0, max_queue: int = 10_000):
+        self.interval = interval
+        self.dropped = 0
+        self._queue: "queue.Queue[Span]" = queue.Queue(maxsize=max_queue)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="trace-export", daemon=True)
+        self._thread.start()
+
+    def submit(self, item: Span):
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            self.dropped += 1
+
+    def _drain(self) -> List[Span]:
+        batch = []
+        while True:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                return batch
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.flush()
+
+    def flush(self):
+        batch = self._drain()
+        if batch:
+            try:
+                self.export(batch)
+            except Exception:
+                # Trazas perdidas antes que una página caída.
+                self.dropped += len(batch)
+
+    def export(self, batch: List[Span]):
+        raise NotImplementedError
+
+    def close(self):
+        self._stop.set()
+        self._thread.join(timeout=2.0)
+        self.flush()
+
+
+class JsonlExporter(_BatchExporter):
+    def __init__(self, path: Path, **kwargs):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        super().__init__(**kwargs)
+
+    def export(self, batch):
+        lines = "".join(json.dumps(s.to_dict(), ensure_ascii=False, default=str) + "\n" for s in batch)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(lines)
+
+
+def _otlp_value(value):
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def to_otlp(batch: List[Span], service_name: str) -> Dict:
+    """OTLP/HTTP JSON body (ExportTraceServiceRequest) for a batch of spans."""
+    spans = []
+    for s in batch:
+        item = {
+            "traceId": s.trace_id,
+            "spanId": s.span_id,
+            "name": s.name,
+            "kind": 1,
+            "startTimeUnixNano": str(s.start_ns),
+            "endTimeUnixNano": str(s.end_ns),
+            "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in s.attrs.items()],
+            "status": {"code": 2, "message": s.error} if s.error else {"code": 1},
+        }
+        if s.parent_id:
+            item["parentSpanId"] = s.parent_id
+        spans.append(item)
+    return {
+        "resourceSpans": [
+            {
+                "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": service_name}}]},
+                "scopeSpans": [{"scope": {"name": "a2em.tracing"}, "spans": spans}],
+            }
+        ]
+    }
+
+
+class OtlpHttpExporter(_BatchExporter):
+    def __init__(self, endpoint: str, *, service_name: str = "a2-english-master", **kwargs):
+        self.url = endpoint.rstrip("/") + "/v1/traces"
+        self.service_name = service_name
+        super().__init__(**kwargs)
+
+    def export(self, batch):
+        import requests
+
+        resp = requests.post(self.url, json=to_otlp(batch, self.service_name), timeout=5)
+        resp.raise_for_status()
+
+
+def configure_tracing(target: str = ""):
+    """
+    target:
+      ""                          tracing off
+      jsonl:///path/traces.jsonl  append spans to a local file
+      http://localhost:4318       OTLP/HTTP JSON collector
+    """
+    global _exporter
+    if _exporter is not None and getattr(_exporter, "target", None) == target:
+        return
+    old, _exporter = _exporter, None
+    if old is not None:
+        old.close()
+    if not target:
+        return
+    if target.startswith("jsonl://"):
+        exporter = JsonlExporter(Path(target[len("jsonl://"):]))
+    elif target.startswith(("http://", "https://")):
+        exporter = OtlpHttpExporter(target)
+    else:
+        raise ValueError(f"Unsupported trace export target: {target}")
+    exporter.target = target
+    _exporter = exporter
+
+
+@atexit.register
+def _close_exporter():
+    if _exporter is not None:
+        _exporter.close()
+
+
+# ==========================
+# CLI: collector stand-in + summary
+# ==========================
+
+def _from_otlp_value(value: Dict):
+    if "intValue" in value:
+        return int(value["intValue"])
+    return next(iter(value.values()), None)
+
+
+def _otlp_to_rows(body: Dict) -> List[Dict]:
+    rows = []
+    for resource_spans in body.get("resourceSpans", []):
+        for scope_spans in resource_spans.get("scopeSpans", []):
+            for s in scope_spans.get("spans", []):
+                attrs = {a["key"]: _from_otlp_value(a["value"]) for a in s.get("attributes", [])}
+                start, end = int(s["startTimeUnixNano"]), int(s["endTimeUnixNano"])
+                rows.append(
+                    {
+                        "trace_id": s["traceId"],
+                        "span_id": s["spanId"],
+                        "parent_id": s.get("parentSpanId"),
+                        "name": s["name"],
+                        "start_ns": start,
+                        "duration_ms": round((end - start) / 1e6, 3),
+                        "attrs": attrs,
+                        "error": (s.get("status") or {}).get("message"),
+                    }
+                )
+    return rows
+
+
+def serve_collector(port: int, out: Path):
+    """
+    Minimal OTLP/HTTP JSON receiver for local runs: POST /v1/traces and
+    every span is appended to `out` in the same JSONL format as JsonlExporter.
+    """
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            if self.path.rstrip("/") != "/v1/traces":
+                self.send_error(404)
+                return
+            length = int(self.headers.get("Content-Length") or 0)
+            try:
+                rows = _otlp_to_rows(json.loads(self.rfile.read(length)))
+            except (ValueError, KeyError) as exc:
+                self.send_error(400, str(exc))
+                return
+            with lock, open(out, "a", encoding="utf-8") as f:
+                f.writelines(json.dumps(r, ensure_ascii=False) + "\n" for r in rows)
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.end_headers()
+            self.wfile.write(b"{}")
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    print(f"Collecting OTLP spans on http://127.0.0.1:{port}/v1/traces -> {out}", file=sys.stderr)
+    server.serve_forever()
+
+
+def summarize(path: Path, top: int = 20) -> List[Dict]:
+    """Total / mean / p95 time and self time per span name from a JSONL trace file."""
+    spans = [json.loads(line) for line in open(path, encoding="utf-8") if line.strip()]
+    child_time: Dict[str, float] = defaultdict(float)
+    for s in spans:
+        if s.get("parent_id"):
+            child_time[s["parent_id"]] += s["duration_ms"]
+    by_name: Dict[str, List] = defaultdict(list)
+    for s in spans:
+        by_name[s["name"]].append((s["duration_ms"], s["duration_ms"] - child_time.get(s["span_id"], 0.0)))
+    rows = []
+    for name, items in by_name.items():
+        durations = sorted(d for d, _ in items)
+        rows.append(
+            {
+                "name": name,
+                "count": len(items),
+                "total_ms": round(sum(durations), 1),
+                "self_ms": round(sum(s for _, s in items), 1),
+                "mean_ms": round(sum(durations) / len(durations), 2),
+                "p95_ms": round(durations[min(len(durations) - 1, int(len(durations) * 0.95))], 2),
+            }
+        )
+    return sorted(rows, key=lambda r: r["self_ms"], reverse=True)[:top]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Tracing utilities.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    collect = sub.add_parser("collect", help="Run a local OTLP/HTTP JSON collector.")
+    collect.add_argument("--port", type=int, default=4318)
+    collect.add_argument("--out", type=Path, default=Path("traces.jsonl"))
+    report = sub.add_parser("summary", help="Slowest span names in a JSONL trace file.")
+    report.add_argument("path", type=Path)
+    report.add_argument("--top", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    if args.command == "collect":
+        serve_collector(args.port, args.out)
+        return 0
+    print(f"{'span':<40} {'count':>6} {'total ms':>10} {'self ms':>10} {'mean ms':>9} {'p95 ms':>9}")
+    for r in summarize(args.path, args.top):
+        print(
+            f"{r['name']:<40} {r['count']:>6} {r['total_ms']:>10.1f} {r['self_ms']:>10.1f} "
+            f"{r['mean_ms']:>9.2f} {r['p95_ms']:>9.2f}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,283 @@
+"""
+TTS engines behind one interface.
+
+    backend = get_tts_backend("local")
+    mp3 = backend.synthesize("Hello!", backend.default_voice, "")
+
+  elevenlabs  premium voices over the ElevenLabs API (rate limit + quota via
+              helpers.tts_limiter)
+  local       offline drafts: espeak-ng or piper through subprocess, encoded
+              to MP3 with ffmpeg, so segment caching, stitching and the
+              audio/ filenames work exactly as for ElevenLabs
+
+Every backend returns MP3 bytes and raises RuntimeError with a readable
+message on failure (ElevenLabs also raises QuotaExceeded / RetryAfter /
+requests.RequestException).
+"""
+import re
+import shutil
+import subprocess
+import tempfile
+from pathlib import Path
+from typing import Callable, Dict, Optional, Tuple
+
+from helpers.metrics import EXTERNAL_CALL_ERRORS, EXTERNAL_CALL_SECONDS
+from helpers.tracing import span
+from helpers.tts_limiter import RetryAfter, parse_retry_after
+
+
+class StreamCancelled(Exception):
+    """Raised by a stream() write callback to stop pulling audio (e.g. a discarded preview)."""
+
+
+class TTSBackend:
+    name = "base"
+    label = "Base"
+    default_voice = ""
+    default_model = ""
+    # Voces que se reparten los hablantes de un diálogo sin voz asignada.
+    dialogue_voices: Tuple[str, ...] = ()
+
+    def unavailable_reason(self) -> Optional[str]:
+        """None when the backend can be used, otherwise why not (shown to the admin)."""
+        return None
+
+    def cache_parts(self, voice: str, model_id: str) -> Tuple[str, ...]:
+        """Extra cache-key parts so two engines never share cached audio for the same text."""
+        return (self.name, voice, model_id)
+
+    def synthesize(
+        self,
+        text: str,
+        voice: str,
+        model_id: str,
+        *,
+        previous_text: str = "",
+        next_text: str = "",
+        on_wait: Optional[Callable] = None,
+    ) -> bytes:
+        raise NotImplementedError
+
+    def check_quota(self, chars: int):
+        """Raise QuotaExceeded before starting work the quota cannot cover (no quota by default)."""
+
+    def stream(self, text: str, voice: str, model_id: str, write: Callable[[bytes], None]):
+        """
+        Default: no incremental output, the whole file is one chunk. write()
+        may raise StreamCancelled to stop the stream early.
+        """
+        write(self.synthesize(text, voice, model_id))
+
+
+class ElevenLabsBackend(TTSBackend):
+    name = "elevenlabs"
+    label = "ElevenLabs (premium)"
+    api_url = "https://api.elevenlabs.io/v1/text-to-speech"
+
+    def __init__(
+        self,
+        api_key: Optional[str],
+        default_voice: str,
+        limiter: Callable,
+        *,
+        default_model: str = "eleven_turbo_v2",
+        dialogue_voices: Tuple[str, ...] = (),
+    ):
+        self.api_key = api_key
+        self.default_voice = default_voice
+        self.default_model = default_model
+        self.dialogue_voices = tuple(dialogue_voices) or (default_voice,)
+        self._limiter = limiter
+
+    def unavailable_reason(self):
+        if not self.api_key:
+            return "ELEVEN_API_KEY no está configurado en .streamlit/secrets.toml o en el entorno."
+        return None
+
+    def check_quota(self, chars):
+        self._limiter().ledger.check(chars)
+
+    def cache_parts(self, voice, model_id):
+        # Mismo formato que antes de existir otros motores: el audio ya cacheado sigue valiendo.
+        return (voice, model_id)
+
+    def _request(self, text: str, model_id: str, *, previous_text: str = "", next_text: str = ""):
+        headers = {
+            "xi-api-key": self.api_key,
+            "Content-Type": "application/json",
+            "Accept": "audio/mpeg",
+        }
+        payload = {
+            "model_id": model_id or self.default_model,
+            "text": text,
+            "voice_settings": {
+                "stability": 0.4,
+                "similarity_boost": 0.8,
+            },
+        }
+        if previous_text:
+            payload["previous_text"] = previous_text
+        if next_text:
+            payload["next_text"] = next_text
+        return headers, payload
+
+    def synthesize(self, text, voice, model_id, *, previous_text="", next_text="", on_wait=None):
+        """
+        previous_text / next_text give the voice the neighbouring segments so
+        intonation carries across stitched segments.
+        """
+        import requests
+
+        url = f"{self.api_url}/{voice}"
+        headers, payload = self._request(text, model_id, previous_text=previous_text, next_text=next_text)
+
+        def call():
+            with span("http.elevenlabs", voice_id=voice, model_id=payload["model_id"], chars=len(text)), \
+                    EXTERNAL_CALL_SECONDS.time(service="elevenlabs"):
+                resp = requests.post(url, json=payload, headers=headers, timeout=40)
+            if resp.status_code == 429:
+                EXTERNAL_CALL_ERRORS.inc(service="elevenlabs")
+                raise RetryAfter(parse_retry_after(resp.headers.get("Retry-After")))
+            if resp.status_code != 200:
+                # Se lanza dentro de call(): el limitador solo descuenta caracteres de respuestas 200.
+                EXTERNAL_CALL_ERRORS.inc(service="elevenlabs")
+                try:
+                    detail = resp.json()
+                except Exception:
+                    detail = resp.text
+                raise RuntimeError(f"Error ElevenLabs ({resp.status_code}): {detail}")
+            return resp.content
+
+        try:
+            return self._limiter().run(len(text), call, on_wait=on_wait)
+        except requests.RequestException:
+            EXTERNAL_CALL_ERRORS.inc(service="elevenlabs")
+            raise
+
+    def stream(self, text, voice, model_id, write):
+        """/stream endpoint: every MP3 chunk goes to write() as it arrives."""
+        import requests
+
+        url = f"{self.api_url}/{voice}/stream"
+        headers, payload = self._request(text, model_id)
+        params = {"optimize_streaming_latency": 3, "output_format": "mp3_44100_128"}
+
+        def call():
+            with span("http.elevenlabs.stream", voice_id=voice, model_id=payload["model_id"], chars=len(text)), \
+                    EXTERNAL_CALL_SECONDS.time(service="elevenlabs_stream"):
+                with requests.post(url, json=payload, headers=headers, params=params, stream=True, timeout=40) as resp:
+                    if resp.status_code == 429:
+                        EXTERNAL_CALL_ERRORS.inc(service="elevenlabs_stream")
+                        raise RetryAfter(parse_retry_after(resp.headers.get("Retry-After")))
+                    if resp.status_code != 200:
+                        EXTERNAL_CALL_ERRORS.inc(service="elevenlabs_stream")
+                        raise RuntimeError(f"Error ElevenLabs ({resp.status_code}): {resp.text[:300]}")
+                    try:
+                        for chunk in resp.iter_content(chunk_size=None):
+                            write(chunk)
+                    except StreamCancelled:
+                        # Se cierra la conexión y no se baja más audio; la petición (200) ya cuenta en la cuota.
+                        return False
+            return True
+
+        return self._limiter().run(len(text), call)
+
+
+# "[modo: teacher friendly]", "[pausas largas]"… son indicaciones para ElevenLabs;
+# un motor local las leería en voz alta.
+_STAGE_DIRECTIONS = re.compile(r"\[[^\]]*\]")
+
+
+class LocalBackend(TTSBackend):
+    """
+    espeak-ng (voice = espeak voice, e.g. "en-us") or piper (voice = path to
+    an .onnx model). Output is WAV, re-encoded to MP3 with ffmpeg.
+    """
+
+    name = "local"
+    label = "Local draft (offline)"
+
+    def __init__(self, engine: str = "espeak-ng", *, default_voice: str = "", words_per_minute: int = 150, ffmpeg: str = "ffmpeg"):
+        self.engine = engine
+        self.default_voice = default_voice or ("en-us" if "espeak" in engine else "")
+        # espeak: la variante "+f3" da una segunda voz distinguible para diálogos.
+        self.dialogue_voices = (
+            (self.default_voice, f"{self.default_voice}+f3") if "espeak" in engine else (self.default_voice,)
+        )
+        self.words_per_minute = words_per_minute
+        self.ffmpeg = ffmpeg
+
+    def unavailable_reason(self):
+        missing = [tool for tool in (self.engine, self.ffmpeg) if shutil.which(tool) is None]
+        if missing:
+            return (
+                f"Local TTS needs {' and '.join(missing)} on PATH "
+                "(e.g. `apt install espeak-ng ffmpeg`, or piper from https://github.com/rhasspy/piper)."
+            )
+        if "piper" in Path(self.engine).name and not self.default_voice:
+            return "Set TTS_LOCAL_VOICE to a piper .onnx voice model."
+        return None
+
+    def _run(self, cmd, stdin: bytes, what: str) -> bytes:
+        try:
+            proc = subprocess.run(cmd, input=stdin, capture_output=True, timeout=120, check=False)
+        except FileNotFoundError as exc:
+            raise RuntimeError(self.unavailable_reason() or str(exc)) from exc
+        except subprocess.TimeoutExpired as exc:
+            raise RuntimeError(f"{what} took longer than {exc.timeout:.0f} s") from exc
+        if proc.returncode != 0:
+            raise RuntimeError(f"{what} failed: {proc.stderr.decode('utf-8', 'replace').strip()[-300:]}")
+        return proc.stdout
+
+    def _wav(self, text: str, voice: str) -> bytes:
+        if "piper" in Path(self.engine).name:
+            with tempfile.TemporaryDirectory() as tmp:
+                out = Path(tmp) / "speech.wav"
+                self._run(
+                    [self.engine, "--model", voice, "--output_file", str(out)],
+                    text.encode("utf-8"),
+                    "piper",
+                )
+                return out.read_bytes()
+        return self._run(
+            [self.engine, "-v", voice, "-s", str(self.words_per_minute), "--stdin", "--stdout"],
+            text.encode("utf-8"),
+            self.engine,
+        )
+
+    def synthesize(self, text, voice, model_id, *, previous_text="", next_text="", on_wait=None):
+        spoken = " ".join(_STAGE_DIRECTIONS.sub(" ", text).split())
+        if not spoken:
+            raise RuntimeError("Nothing to say once the [stage directions] are removed.")
+        with span("tts.local", engine=self.engine, chars=len(spoken)):
+            wav = self._wav(spoken, voice or self.default_voice)
+            return self._run(
+                [
+                    self.ffmpeg, "-hide_banner", "-loglevel", "error",
+                    "-f", "wav", "-i", "pipe:0",
+                    "-ar", "44100", "-ac", "1", "-codec:a", "libmp3lame", "-b:a", "96k",
+                    "-write_xing", "0", "-id3v2_version", "0",
+                    "-f", "mp3", "pipe:1",
+                ],
+                wav,
+                "ffmpeg",
+            )
+
+
+_BACKENDS: Dict[str, TTSBackend] = {}
+
+
+def register_tts_backend(backend: TTSBackend) -> TTSBackend:
+    _BACKENDS[backend.name] = backend
+    return backend
+
+
+def get_tts_backend(name: str) -> TTSBackend:
+    try:
+        return _BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"Unknown TTS backend: {name}") from None
+
+
+def tts_backends() -> Dict[str, TTSBackend]:
+    return dict(_BACKENDS)
@@ -0,0 +1,72 @@
+"""
+Multi-voice dialogues for TTS.
+
+    Waiter: Good evening. Here is the menu.
+    Customer: Thanks. Can I have the tomato soup?
+
+parse_dialogue() turns speaker-tagged text into lines and assign_voices()
+maps speakers to voice IDs. Each line is then synthesized and cached like a
+narration segment (helpers.tts_segments) and the lines are stitched with
+silent frames in between (stitch_mp3(parts, pause_ms)).
+"""
+import re
+from typing import Dict, List, NamedTuple, Optional, Sequence
+
+NARRATOR = "Narrator"
+
+# "Speaker A:", "Waiter:", "Mrs. Brown:" … al inicio de la línea (máx. 4 palabras)
+_SPEAKER_LINE = re.compile(r"^\s*([A-Za-z][\w.'\-]*(?: [\w.'\-]+){0,3})\s*:\s*(.*)$")
+
+
+class DialogueLine(NamedTuple):
+    speaker: str
+    text: str
+
+
+def parse_dialogue(text: str) -> List[DialogueLine]:
+    """
+    One DialogueLine per "Speaker: text" line. Untagged lines continue the
+    previous speaker's line; untagged text before the first tag is read by
+    NARRATOR. Blank lines and lines without text are skipped.
+    """
+    lines: List[DialogueLine] = []
+    for raw in (text or "").splitlines():
+        raw = raw.strip()
+        if not raw:
+            continue
+        match = _SPEAKER_LINE.match(raw)
+        if match and not match.group(2).startswith("//"):  # "https://…" no es un hablante
+            speaker, said = match.group(1).strip(), match.group(2).strip()
+            if said:
+                lines.append(DialogueLine(speaker, said))
+            continue
+        if lines:
+            last = lines[-1]
+            lines[-1] = DialogueLine(last.speaker, f"{last.text} {raw}")
+        else:
+            lines.append(DialogueLine(NARRATOR, raw))
+    return lines
+
+
+def speakers_of(lines: Sequence[DialogueLine]) -> List[str]:
+    """Speakers in order of first appearance."""
+    return list(dict.fromkeys(line.speaker for line in lines))
+
+
+def assign_voices(
+    speakers: Sequence[str],
+    voice_map: Optional[Dict[str, str]],
+    default_voices: Sequence[str],
+) -> Dict[str, str]:
+    """Explicit voice_map entries first; every other speaker takes the next default voice in turn."""
+    voice_map = {k: v for k, v in (voice_map or {}).items() if v}
+    assigned: Dict[str, str] = {}
+    pool = [v for v in default_voices if v]
+    turn = 0
+    for speaker in speakers:
+        if speaker in voice_map:
+            assigned[speaker] = voice_map[speaker]
+        elif pool:
+            assigned[speaker] = pool[turn % len(pool)]
+            turn += 1
+    return assigned
@@ -0,0 +1,329 @@
+import datetime as dt
+import sqlite3
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Callable, Dict, Optional, Tuple
+
+
+class QuotaExceeded(RuntimeError):
+    pass
+
+
+class RetryAfter(Exception):
+    """Raised by a TTS call that was throttled (HTTP 429); `seconds` comes from Retry-After."""
+
+    def __init__(self, seconds: float, message: str = ""):
+        super().__init__(message or f"throttled, retry after {seconds:g}s")
+        self.seconds = float(seconds)
+
+
+class TokenBucket:
+    """
+    `rate` tokens per second, at most `capacity` saved up for bursts.
+    Not thread-safe on its own: TTSLimiter calls it under its condition lock.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float = 1.0, now: Optional[float] = None) -> float:
+        now = time.monotonic() if now is None else now
+        self._refill(now)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate if self.rate > 0 else float("inf")
+
+    def take(self, amount: float = 1.0):
+        self.tokens -= amount
+
+
+class QuotaLedger:
+    """
+    Characters sent to the TTS provider per calendar month, in SQLite so the
+    count survives restarts and is shared by every process on the machine.
+    monthly_chars = 0 means no local limit (usage is still recorded).
+
+    A call reserves its characters before it starts (check and add in one
+    write transaction, so concurrent callers cannot all pass the check) and
+    gives them back if it fails; the count includes calls in flight.
+    """
+
+    def __init__(self, path: Path, monthly_chars: int = 0):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.monthly_chars = int(monthly_chars)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=10)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS tts_usage ("
+            " period TEXT PRIMARY KEY,"
+            " chars INTEGER NOT NULL DEFAULT 0,"
+            " requests INTEGER NOT NULL DEFAULT 0,"
+            " throttled INTEGER NOT NULL DEFAULT 0"
+            ")"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def period(now: Optional[dt.datetime] = None) -> str:
+        return (now or dt.datetime.now()).strftime("%Y-%m")
+
+    def usage(self) -> Dict[str, int]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT chars, requests, throttled FROM tts_usage WHERE period = ?", (self.period(),)
+            ).fetchone()
+        chars, requests, throttled = row or (0, 0, 0)
+        return {
+            "chars": chars,
+            "requests": requests,
+            "throttled": throttled,
+            "limit": self.monthly_chars,
+            "remaining": max(0, self.monthly_chars - chars) if self.monthly_chars else -1,
+        }
+
+    def _quota_error(self, used: int, chars: int) -> QuotaExceeded:
+        return QuotaExceeded(
+            f"Monthly TTS quota reached: {used:,} of {self.monthly_chars:,} characters used "
+            f"({chars:,} more requested)."
+        )
+
+    def check(self, chars: int):
+        """Raise QuotaExceeded if `chars` more would not fit (advisory: reserve() is what holds them)."""
+        if self.monthly_chars:
+            used = self.usage()["chars"]
+            if used + chars > self.monthly_chars:
+                raise self._quota_error(used, chars)
+
+    def reserve(self, chars: int) -> str:
+        """
+        Count `chars` now, or raise QuotaExceeded, in one transaction.
+        Returns the period to pass to commit() / release().
+        """
+        period = self.period()
+        with self._lock, self._conn:
+            self._conn.execute("BEGIN IMMEDIATE")
+            row = self._conn.execute("SELECT chars FROM tts_usage WHERE period = ?", (period,)).fetchone()
+            used = row[0] if row else 0
+            if self.monthly_chars and used + chars > self.monthly_chars:
+                raise self._quota_error(used, chars)
+            self._conn.execute(
+                "INSERT INTO tts_usage (period, chars) VALUES (?, ?) "
+                "ON CONFLICT(period) DO UPDATE SET chars = chars + excluded.chars",
+                (period, int(chars)),
+            )
+        return period
+
+    def commit(self, period: str):
+        """The reserved call succeeded: count the request."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO tts_usage (period, requests) VALUES (?, 1) "
+                "ON CONFLICT(period) DO UPDATE SET requests = requests + 1",
+                (period,),
+            )
+
+    def release(self, chars: int, period: str):
+        """The reserved call failed: give its characters back."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE tts_usage SET chars = MAX(0, chars - ?) WHERE period = ?", (int(chars), period)
+            )
+
+    def _bump(self, column: str, amount: int, requests: int = 0):
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"INSERT INTO tts_usage (period, {column}, requests) VALUES (?, ?, ?) "
+                f"ON CONFLICT(period) DO UPDATE SET {column} = {column} + excluded.{column}, "
+                "requests = requests + excluded.requests",
+                (self.period(), amount, requests),
+            )
+
+    def record(self, chars: int):
+        """Count a finished request that was not reserved."""
+        self._bump("chars", int(chars), requests=1)
+
+    def record_throttled(self):
+        self._bump("throttled", 1)
+
+    def sync(self, used_chars: int, limit_chars: Optional[int] = None):
+        """Overwrite this month's count with the provider's figure (e.g. ElevenLabs /v1/user/subscription)."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO tts_usage (period, chars) VALUES (?, ?) "
+                "ON CONFLICT(period) DO UPDATE SET chars = excluded.chars",
+                (self.period(), int(used_chars)),
+            )
+        if limit_chars:
+            self.monthly_chars = int(limit_chars)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class TTSLimiter:
+    """
+    Client-side throttle for TTS calls, shared by every session in the process.
+
+    Callers queue FIFO; the head of the queue goes when a request token is
+    available (`requests_per_minute`, bursts up to `burst`), fewer than
+    `max_concurrent` calls are in flight and no Retry-After pause is active.
+    A call that raises RetryAfter pauses the whole limiter for that long and
+    is retried from the front of the queue, so one 429 does not turn into a
+    burst of 429s from the other waiting sessions.
+    """
+
+    def __init__(
+        self,
+        *,
+        requests_per_minute: float = 60.0,
+        burst: int = 3,
+        max_concurrent: int = 2,
+        max_retries: int = 3,
+        ledger: Optional[QuotaLedger] = None,
+    ):
+        self.bucket = TokenBucket(requests_per_minute / 60.0, max(1, burst))
+        self.max_concurrent = max(1, int(max_concurrent))
+        self.max_retries = max_retries
+        self.ledger = ledger
+        self.completed = 0
+        self.throttled = 0
+        self._cond = threading.Condition()
+        self._queue: deque = deque()
+        self._active = 0
+        self._blocked_until = 0.0
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._cond:
+            return {
+                "waiting": len(self._queue),
+                "in_flight": self._active,
+                "paused_for_s": max(0.0, self._blocked_until - time.monotonic()),
+                "completed": self.completed,
+                "throttled": self.throttled,
+            }
+
+    def _ready_in(self, ticket: object) -> Tuple[int, Optional[float]]:
+        """(queue position, seconds until this ticket may go; None = wait for a slot)."""
+        position = self._queue.index(ticket) + 1
+        if position > 1 or self._active >= self.max_concurrent:
+            return position, None
+        now = time.monotonic()
+        return position, max(self._blocked_until - now, self.bucket.wait_time(1.0, now))
+
+    def _acquire(self, on_wait: Optional[Callable[[int, Optional[float]], None]], front: bool):
+        ticket = object()
+        with self._cond:
+            if front:
+                self._queue.appendleft(ticket)
+            else:
+                self._queue.append(ticket)
+        try:
+            while True:
+                with self._cond:
+                    position, wait = self._ready_in(ticket)
+                    if wait is not None and wait <= 0:
+                        self.bucket.take(1.0)
+                        self._queue.remove(ticket)
+                        self._active += 1
+                        self._cond.notify_all()
+                        return
+                if on_wait is not None:
+                    on_wait(position, wait)
+                with self._cond:
+                    self._cond.wait(timeout=min(wait, 0.5) if wait is not None else 0.5)
+        except BaseException:
+            with self._cond:
+                if ticket in self._queue:
+                    self._queue.remove(ticket)
+                    self._cond.notify_all()
+            raise
+
+    def _release(self):
+        with self._cond:
+            self._active -= 1
+            self._cond.notify_all()
+
+    def pause(self, seconds: float):
+        with self._cond:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + max(0.0, seconds))
+            self.throttled += 1
+            self._cond.notify_all()
+
+    def run(self, chars: int, call: Callable[[], object], on_wait: Optional[Callable] = None):
+        """
+        Run `call()` once the limiter allows it. `chars` are reserved against
+        the quota before queueing (QuotaExceeded if they do not fit) and given
+        back if the call finally fails. call() must raise on any failed
+        response (not only 429 -> RetryAfter), so failed requests never use
+        up the quota. Re-raises RetryAfter once `max_retries` retries are used up.
+        on_wait(position, seconds_or_None) is called while queued (UI updates).
+        """
+        period = self.ledger.reserve(chars) if self.ledger is not None else None
+        try:
+            for attempt in range(self.max_retries + 1):
+                self._acquire(on_wait, front=attempt > 0)
+                try:
+                    result = call()
+                except RetryAfter as exc:
+                    self.pause(exc.seconds)
+                    if self.ledger is not None:
+                        self.ledger.record_throttled()
+                    if attempt == self.max_retries:
+                        raise
+                    continue
+                finally:
+                    self._release()
+                self.completed += 1
+                if self.ledger is not None:
+                    self.ledger.commit(period)
+                return result
+        except BaseException:
+            if self.ledger is not None:
+                self.ledger.release(chars, period)
+            raise
+
+
+def parse_retry_after(value: Optional[str], default: float = 5.0) -> float:
+    """Retry-After header: delta-seconds or an HTTP date."""
+    if not value:
+        return default
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        from email.utils import parsedate_to_datetime
+
+        when = parsedate_to_datetime(value)
+        return max(0.0, (when - dt.datetime.now(when.tzinfo)).total_seconds())
+    except (TypeError, ValueError):
+        return default
+
+
+_LIMITERS: Dict[Path, TTSLimiter] = {}
+_LIMITERS_LOCK = threading.Lock()
+
+
+def get_tts_limiter(ledger_path: Path, *, monthly_chars: int = 0, **kwargs) -> TTSLimiter:
+    """
+    Process-wide limiter per quota ledger file, shared by every Streamlit session.
+    """
+    key = Path(ledger_path).resolve()
+    with _LIMITERS_LOCK:
+        limiter = _LIMITERS.get(key)
+        if limiter is None:
+            limiter = TTSLimiter(ledger=QuotaLedger(key, monthly_chars), **kwargs)
+            _LIMITERS[key] = limiter
+        return limiter
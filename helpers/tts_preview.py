@@ -0,0 +1,198 @@
+"""
+Streaming TTS previews.
+
+The Streamlit websocket only delivers whole elements, so audio that is still
+being generated cannot go through st.audio. Instead a small HTTP relay runs
+in the app process (like the metrics endpoint):
+
+    relay = start_preview_relay(8599)
+    token = relay.start(produce)     # produce(write) streams the MP3 chunks
+    <audio src="http://host:8599/preview/<token>.mp3" autoplay>
+
+Generation starts in a background thread as soon as the preview is
+registered and keeps going if the browser disconnects. Every GET tails the
+growing buffer with a chunked response, so playback starts with the first
+chunk; result(token) returns the finished MP3 for the admin to keep.
+discard(token) cancels a preview that is still generating: its next write
+raises StreamCancelled and the backend stops pulling audio.
+"""
+import secrets
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Optional
+
+from helpers.tts_backends import StreamCancelled
+
+PREVIEW_TTL = 15 * 60
+
+
+class Preview:
+    def __init__(self):
+        self.chunks = []
+        self.size = 0
+        self.done = False
+        self.error: Optional[str] = None
+        self.created = time.monotonic()
+        self.first_chunk_s: Optional[float] = None
+        self.cancelled = False
+        self._cond = threading.Condition()
+
+    def write(self, chunk: bytes):
+        if self.cancelled:
+            raise StreamCancelled("preview discarded")
+        if not chunk:
+            return
+        with self._cond:
+            if self.first_chunk_s is None:
+                self.first_chunk_s = time.monotonic() - self.created
+            self.chunks.append(bytes(chunk))
+            self.size += len(chunk)
+            self._cond.notify_all()
+
+    def finish(self, error: Optional[str] = None):
+        with self._cond:
+            if self.done:
+                return
+            self.done = True
+            self.error = error
+            self._cond.notify_all()
+
+    def cancel(self):
+        """Stop generating: the producer's next write() raises StreamCancelled."""
+        with self._cond:
+            self.cancelled = True
+        self.finish("discarded")
+
+    def read_from(self, index: int, timeout: float = 1.0):
+        """(new chunks from `index` on, finished?) — waits up to `timeout` for more data."""
+        with self._cond:
+            if index >= len(self.chunks) and not self.done:
+                self._cond.wait(timeout)
+            return self.chunks[index:], self.done
+
+    def audio(self) -> bytes:
+        with self._cond:
+            return b"".join(self.chunks)
+
+
+class PreviewRelay:
+    def __init__(self, server: ThreadingHTTPServer):
+        self.server = server
+        self._previews: Dict[str, Preview] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def port(self) -> int:
+        return self.server.server_address[1]
+
+    def start(self, produce: Callable[[Callable[[bytes], None]], None]) -> str:
+        """
+        Register a preview and run produce(write) on a daemon thread. Raising
+        inside produce marks the preview failed with the exception message.
+        """
+        self._expire()
+        token = secrets.token_urlsafe(16)
+        preview = Preview()
+        with self._lock:
+            self._previews[token] = preview
+
+        def run():
+            try:
+                produce(preview.write)
+            except Exception as exc:
+                preview.finish(str(exc) or type(exc).__name__)
+            else:
+                preview.finish()
+
+        threading.Thread(target=run, name="tts-preview", daemon=True).start()
+        return token
+
+    def get(self, token: str) -> Optional[Preview]:
+        with self._lock:
+            return self._previews.get(token)
+
+    def result(self, token: str) -> Optional[bytes]:
+        """The finished MP3, or None while it is still streaming (or failed / expired)."""
+        preview = self.get(token)
+        if preview is None or not preview.done or preview.error:
+            return None
+        return preview.audio()
+
+    def discard(self, token: str):
+        """Forget a preview and cancel its generation if it is still running."""
+        with self._lock:
+            preview = self._previews.pop(token, None)
+        if preview is not None:
+            preview.cancel()
+
+    def _expire(self):
+        cutoff = time.monotonic() - PREVIEW_TTL
+        with self._lock:
+            for token in [t for t, p in self._previews.items() if p.done and p.created < cutoff]:
+                del self._previews[token]
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    relay: PreviewRelay = None
+
+    def do_GET(self):
+        path = self.path.split("?")[0]
+        token = path.rsplit("/", 1)[-1].removesuffix(".mp3")
+        preview = self.relay.get(token) if path.startswith("/preview/") else None
+        if preview is None:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "audio/mpeg")
+        self.send_header("Cache-Control", "no-store")
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        index = 0
+        try:
+            while True:
+                chunks, done = preview.read_from(index)
+                for chunk in chunks:
+                    self.wfile.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+                index += len(chunks)
+                if chunks:
+                    self.wfile.flush()
+                if done and not chunks:
+                    break
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # el navegador cerró el reproductor; la generación sigue
+
+    def log_message(self, *args):
+        pass
+
+
+_RELAY: Dict[str, PreviewRelay] = {}
+_RELAY_LOCK = threading.Lock()
+
+
+def start_preview_relay(port: int, host: str = "127.0.0.1") -> Optional[PreviewRelay]:
+    """
+    Serve previews on http://host:port/preview/<token>.mp3 from a daemon
+    thread, once per process. Returns None if the port is taken.
+    """
+    with _RELAY_LOCK:
+        if "relay" in _RELAY:
+            return _RELAY["relay"]
+        handler = type("PreviewHandler", (_Handler,), {})
+        try:
+            server = ThreadingHTTPServer((host, port), handler)
+        except OSError:
+            return None
+        server.daemon_threads = True
+        relay = PreviewRelay(server)
+        handler.relay = relay
+        threading.Thread(target=server.serve_forever, name="tts-preview-http", daemon=True).start()
+        _RELAY["relay"] = relay
+        return relay
+
+
+def get_preview_relay() -> Optional[PreviewRelay]:
+    return _RELAY.get("relay")
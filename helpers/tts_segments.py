@@ -0,0 +1,259 @@
+"""
+Incremental narration synthesis.
+
+A script is split into segments (paragraphs; long paragraphs are cut into
+runs of whole sentences). Each segment's MP3 is cached on disk under a hash
+of its text + voice + model, so after an edit only the segments whose text
+changed go back to the TTS API, in parallel. The final file is the segments' MPEG
+audio frames joined back to back: ID3 tags and the Xing/Info header of each
+part are dropped, so players see one continuous stream.
+"""
+import hashlib
+import os
+import re
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from helpers.metrics import CACHE_LOOKUPS, CACHE_MISSES
+
+DEFAULT_SEGMENT_CHARS = 300
+
+_SENTENCE_END = re.compile(r"(?<=[.!?…])[\"')\]]*\s+")
+_PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+
+
+def split_sentences(paragraph: str) -> List[str]:
+    return [s.strip() for s in _SENTENCE_END.split(paragraph) if s.strip()]
+
+
+def _cut_after(sentence: str) -> bool:
+    # ~1 de cada 2 oraciones cierra un segmento (chunking definido por contenido).
+    return hashlib.md5(sentence.encode("utf-8")).digest()[0] % 2 == 0
+
+
+def split_script(text: str, max_chars: int = DEFAULT_SEGMENT_CHARS) -> List[str]:
+    """
+    Paragraphs stay whole when they fit in `max_chars`; longer ones are cut
+    into runs of whole sentences. Where to cut depends on the sentence text
+    itself (a hash), not on running length, so editing one sentence leaves
+    the boundaries around the other segments where they were.
+    """
+    segments: List[str] = []
+    for paragraph in _PARAGRAPH_BREAK.split(text or ""):
+        paragraph = " ".join(paragraph.split())
+        if not paragraph:
+            continue
+        if len(paragraph) <= max_chars:
+            segments.append(paragraph)
+            continue
+        current = ""
+        for sentence in split_sentences(paragraph):
+            if current and len(current) + 1 + len(sentence) > max_chars:
+                segments.append(current)
+                current = ""
+            current = f"{current} {sentence}" if current else sentence
+            if len(current) >= max_chars // 4 and _cut_after(sentence):
+                segments.append(current)
+                current = ""
+        if current:
+            segments.append(current)
+    return segments
+
+
+def segment_key(text: str, *parts: str) -> str:
+    digest = hashlib.sha256()
+    for part in (text, *parts):
+        digest.update(str(part).encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()[:32]
+
+
+class SegmentCache:
+    """One MP3 per segment key, written atomically (safe across processes)."""
+
+    def __init__(self, directory: Path):
+        self.directory = Path(directory)
+
+    def path(self, key: str) -> Path:
+        return self.directory / f"{key}.mp3"
+
+    def get(self, key: str) -> Optional[bytes]:
+        CACHE_LOOKUPS.inc(layer="tts_segments")
+        try:
+            return self.path(key).read_bytes()
+        except OSError:
+            CACHE_MISSES.inc(layer="tts_segments")
+            return None
+
+    def put(self, key: str, data: bytes):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, self.path(key))
+        except BaseException:
+            Path(tmp).unlink(missing_ok=True)
+            raise
+
+
+# ==========================
+# MP3 frames
+# ==========================
+
+# kbps por (versión MPEG 1 / 2-2.5, layer III)
+_BITRATES = {
+    1: (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    2: (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+_SAMPLE_RATES = {3: (44100, 48000, 32000), 2: (22050, 24000, 16000), 0: (11025, 12000, 8000)}
+
+
+def _frame_info(header: bytes) -> Optional[Tuple[int, int, int]]:
+    """(frame bytes, sample rate, samples per frame) of a Layer III header, None if not one."""
+    if len(header) < 4 or header[0] != 0xFF or (header[1] & 0xE0) != 0xE0:
+        return None
+    version = (header[1] >> 3) & 0x3  # 3 = MPEG1, 2 = MPEG2, 0 = MPEG2.5
+    layer = (header[1] >> 1) & 0x3  # 1 = layer III
+    bitrate_index = header[2] >> 4
+    rate_index = (header[2] >> 2) & 0x3
+    padding = (header[2] >> 1) & 0x1
+    if version == 1 or layer != 1 or bitrate_index in (0, 15) or rate_index == 3:
+        return None
+    bitrate = _BITRATES[1 if version == 3 else 2][bitrate_index] * 1000
+    sample_rate = _SAMPLE_RATES[version][rate_index]
+    length = (144 if version == 3 else 72) * bitrate // sample_rate + padding
+    return length, sample_rate, 1152 if version == 3 else 576
+
+
+def _frame_length(header: bytes) -> int:
+    info = _frame_info(header)
+    return info[0] if info else 0
+
+
+def _is_info_frame(frame: bytes) -> bool:
+    head = frame[:64]
+    return b"Xing" in head or b"Info" in head or b"VBRI" in head
+
+
+def mp3_frames(data: bytes) -> bytes:
+    """
+    The audio frames of an MP3 file: leading ID3v2 tag, Xing/Info/VBRI header
+    frame and trailing ID3v1 tag removed. Raises ValueError if no frames are found.
+    """
+    start = 0
+    if data[:3] == b"ID3" and len(data) >= 10:
+        size = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+        start = 10 + size + (10 if data[5] & 0x10 else 0)
+    end = len(data) - 128 if data[-128:-125] == b"TAG" else len(data)
+
+    frames = []
+    synced = False
+    pos = start
+    while pos + 4 <= end:
+        length = _frame_length(data[pos:pos + 4])
+        if not length or pos + length > end:
+            if synced:
+                break  # basura o frame truncado al final
+            pos += 1  # todavía buscando el primer sync
+            continue
+        frame = data[pos:pos + length]
+        # El primer frame puede ser la cabecera Xing/Info (sin audio): se descarta.
+        if synced or not _is_info_frame(frame):
+            frames.append(frame)
+        synced = True
+        pos += length
+    audio = b"".join(frames)
+    if not audio:
+        raise ValueError("no MPEG audio frames found")
+    return audio
+
+
+def silence_frames(duration_ms: int, like_frame: bytes) -> bytes:
+    """
+    Silent MP3 frames in the format of `like_frame` (same MPEG version, sample
+    rate, bitrate and channel mode). A Layer III frame whose side info and
+    main data are all zero decodes to silence, so no encoder is needed.
+    """
+    if duration_ms <= 0:
+        return b""
+    header = bytearray(like_frame[:4])
+    header[1] |= 0x01  # sin CRC
+    header[2] &= 0xFD  # sin padding: todos los frames del mismo tamaño
+    info = _frame_info(bytes(header))
+    if info is None:
+        raise ValueError("not an MPEG Layer III frame")
+    length, sample_rate, samples = info
+    count = max(1, round(duration_ms / 1000 * sample_rate / samples))
+    return (bytes(header) + bytes(length - 4)) * count
+
+
+def stitch_mp3(parts: Sequence[bytes], pause_ms: int = 0) -> bytes:
+    """Frames of every part in order, with `pause_ms` of silence between consecutive parts."""
+    frames = [mp3_frames(part) for part in parts]
+    if not frames:
+        return b""
+    return silence_frames(pause_ms, frames[0]).join(frames)
+
+
+# ==========================
+# Synthesis
+# ==========================
+
+def fetch_segments(
+    segments: Sequence[str],
+    synthesize: Callable[[int], bytes],
+    cache: SegmentCache,
+    keys: Sequence[str],
+    *,
+    max_workers: int = 4,
+    on_progress: Optional[Callable[[int, int], None]] = None,
+    refresh: bool = False,
+) -> Tuple[List[bytes], Dict[str, int]]:
+    """
+    MP3 bytes for every segment, in order. `synthesize(i)` returns the MP3 of
+    segments[i]; it is only called for segments missing from `cache`, from
+    up to `max_workers` threads. on_progress(done, total_missing) is called
+    from the calling thread. If any segment fails the first error is raised
+    after the rest finish; the ones that succeeded stay cached for the retry.
+    With `refresh` every segment is synthesized again and replaces its cached
+    copy (e.g. to get rid of a bad take).
+    """
+    audio: List[Optional[bytes]] = [None] * len(keys) if refresh else [cache.get(key) for key in keys]
+    missing = [i for i, part in enumerate(audio) if part is None]
+    stats = {
+        "segments": len(segments),
+        "reused": len(segments) - len(missing),
+        "synthesized": len(missing),
+        "chars_synthesized": sum(len(segments[i]) for i in missing),
+    }
+    if missing:
+        errors: List[BaseException] = []
+        lock = threading.Lock()
+
+        def job(i: int):
+            data = synthesize(i)
+            cache.put(keys[i], data)
+            with lock:
+                audio[i] = data
+
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(missing)))) as pool:
+            futures = [pool.submit(job, i) for i in missing]
+            for done, future in enumerate(as_completed(futures), start=1):
+                exc = future.exception()
+                if exc is not None:
+                    errors.append(exc)
+                if on_progress is not None:
+                    on_progress(done, len(missing))
+        if errors:
+            raise errors[0]
+    return audio, stats
+
+
+def synthesize_segments(segments, synthesize, cache, keys, **kwargs) -> Tuple[bytes, Dict[str, int]]:
+    """fetch_segments() stitched into one MP3."""
+    parts, stats = fetch_segments(segments, synthesize, cache, keys, **kwargs)
+    return stitch_mp3(parts), stats